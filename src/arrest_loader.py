@@ -0,0 +1,307 @@
+"""
+Arrest Data Loader - Column-Pruned, County-Filtered Parquet Reads
+Uses the pyarrow dataset API so only the columns and counties the analysis
+needs are ever materialized in memory
+"""
+
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+# Columns the pipeline actually uses
+ARREST_COLUMNS = [
+    'DefendantId',
+    'DefendantAddressGEOID10',
+    'ArrestDate',
+    'Arrest_crime_category',
+    'Age_years',
+    'Gender',
+]
+
+# Read when the extract has them (demographic subgroups)
+OPTIONAL_ARREST_COLUMNS = ['Race']
+
+GEOID_COLUMN = 'DefendantAddressGEOID10'
+DATE_COLUMN = 'ArrestDate'
+
+STATE_FIPS = '45'                  # South Carolina
+TARGET_COUNTIES = ['019', '015']   # Charleston, Berkeley
+
+# Names used in console and report labels; other counties show their code
+COUNTY_NAMES = {
+    ('45', '019'): 'Charleston',
+    ('45', '015'): 'Berkeley',
+}
+
+# Hive partition keys used by write_partitioned_copy
+PARTITION_COUNTY = 'county_fips'
+PARTITION_YEAR = 'arrest_year'
+PARTITION_SCHEMA = pa.schema([(PARTITION_COUNTY, pa.string()), (PARTITION_YEAR, pa.int32())])
+
+# Arrow IPC (Feather v2) copies written by write_ipc_copy
+IPC_SUFFIXES = {'.arrow', '.feather', '.ipc'}
+
+
+def county_name(county, state=STATE_FIPS):
+    """'Charleston' for a named county, else 'County 035'."""
+    return COUNTY_NAMES.get((state, county), f"County {county}")
+
+
+def region_label(counties=TARGET_COUNTIES, state=STATE_FIPS):
+    """Short label for a county set: 'Charleston/Berkeley Counties'."""
+    names = '/'.join(COUNTY_NAMES.get((state, county), county) for county in counties)
+    return f"{names} {'Counties' if len(counties) > 1 else 'County'}"
+
+
+def region_description(counties=TARGET_COUNTIES, state=STATE_FIPS, separator=' and '):
+    """Long label with FIPS codes: 'Charleston County (45019) and Berkeley County (45015)'."""
+    return separator.join(f"{COUNTY_NAMES[state, county]} County ({state}{county})"
+                          if (state, county) in COUNTY_NAMES else f"County {state}{county}"
+                          for county in counties)
+
+
+def open_arrest_dataset(path):
+    """
+    Open a single Parquet file, a hive-partitioned directory or an Arrow IPC
+    copy as a dataset.
+
+    IPC files are memory-mapped: reads are zero-copy views of the page
+    cache, which every process mapping the same file shares.
+    """
+    path = Path(path)
+    if path.is_dir():
+        return ds.dataset(path, format='parquet',
+                          partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'))
+    if path.suffix in IPC_SUFFIXES:
+        return ds.dataset(str(path.resolve()), format='ipc', filesystem=pafs.LocalFileSystem(use_mmap=True))
+    return ds.dataset(path, format='parquet')
+
+
+def as_dataset(source):
+    """Accept either an opened dataset or a path."""
+    if isinstance(source, ds.Dataset):
+        return source
+    return open_arrest_dataset(source)
+
+
+def _geoid_width(dataset):
+    """
+    Zero-padded width (12 or 15) of a numeric GEOID column, from the largest
+    GEOID: row-group statistics when every row group has them, else a scan.
+    Numeric GEOIDs of states below 10 are one digit short, so the width is
+    rounded up to a multiple of 3 as in geoid_strings.
+    """
+    highs = []
+    for fragment in dataset.get_fragments():
+        if not isinstance(fragment, ds.ParquetFileFragment):
+            highs = None
+            break
+        metadata = fragment.metadata
+        idx = metadata.schema.names.index(GEOID_COLUMN)
+        for i in range(metadata.num_row_groups):
+            stats = metadata.row_group(i).column(idx).statistics
+            if stats is None or not stats.has_min_max:
+                highs = None
+                break
+            highs.append(stats.max)
+        if highs is None:
+            break
+    if highs is None:
+        highs = [pc.max(dataset.to_table(columns=[GEOID_COLUMN]).column(0)).as_py()]
+    highs = [h for h in highs if h is not None]
+    if not highs:
+        return None
+    return -(-len(str(int(max(highs)))) // 3) * 3
+
+
+def _geoid_scale(width, prefix):
+    """Power of ten that shifts a state+county prefix ('45019') to a numeric GEOID of the padded width."""
+    return 10 ** (width - len(prefix))
+
+
+def geoid_strings(column):
+    """
+    GEOIDs as zero-padded strings, whatever their storage type.
+
+    Numeric storage drops the leading zero of states below 10, so integer
+    GEOIDs are padded back to the next 12/15-digit width.
+    """
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        return column
+    digits = pc.cast(pc.cast(column, pa.int64()), pa.string())
+    return pc.utf8_lpad(digits, -(-pc.max(pc.utf8_length(digits)).as_py() // 3) * 3, '0')
+
+
+def county_filter(dataset, counties=TARGET_COUNTIES, state=STATE_FIPS, years=None):
+    """
+    Build a dataset filter expression restricting rows to the given counties.
+
+    On a partitioned copy the filter targets the partition keys, so whole files
+    are skipped. On a raw file the county check is written as a range on the
+    GEOID column (a GEOID starts with state+county), which Parquet row-group
+    min/max statistics can prune without decoding the data.
+    """
+    fips = [state + county for county in counties]
+    names = dataset.schema.names
+
+    if PARTITION_COUNTY in names:
+        expr = ds.field(PARTITION_COUNTY).isin(fips)
+    else:
+        geo_type = dataset.schema.field(GEOID_COLUMN).type
+        numeric = not (pa.types.is_string(geo_type) or pa.types.is_large_string(geo_type))
+        width = _geoid_width(dataset) if numeric else None
+        if numeric and width is None:
+            return ds.scalar(False)
+        expr = None
+        for code in fips:
+            if not numeric:
+                lower, upper = code, str(int(code) + 1).zfill(len(code))
+            else:
+                scale = _geoid_scale(width, code)
+                lower, upper = int(code) * scale, (int(code) + 1) * scale
+            term = (ds.field(GEOID_COLUMN) >= lower) & (ds.field(GEOID_COLUMN) < upper)
+            expr = term if expr is None else expr | term
+
+    if years is not None:
+        years = [int(y) for y in years]
+        if PARTITION_YEAR in names:
+            expr = expr & ds.field(PARTITION_YEAR).isin(years)
+        else:
+            expr = expr & pc.year(ds.field(DATE_COLUMN)).isin(years)
+
+    return expr
+
+
+def arrest_columns(dataset, columns=ARREST_COLUMNS, optional_columns=OPTIONAL_ARREST_COLUMNS):
+    """Required columns plus whichever optional columns the dataset has."""
+    return list(columns) + [c for c in optional_columns
+                            if c in dataset.schema.names and c not in columns]
+
+
+def load_arrests(source, counties=TARGET_COUNTIES, state=STATE_FIPS,
+                 columns=ARREST_COLUMNS, years=None, as_table=False,
+                 optional_columns=OPTIONAL_ARREST_COLUMNS):
+    """
+    Read only the needed columns (plus any optional_columns the data has)
+    for the target counties.
+
+    Returns a DataFrame, or the Arrow table itself with as_table=True (for
+    compact_frame.compact_arrests, which never builds Python string objects).
+    """
+    dataset = as_dataset(source)
+    expr = county_filter(dataset, counties, state=state, years=years)
+    table = dataset.to_table(columns=arrest_columns(dataset, columns, optional_columns), filter=expr)
+    return table if as_table else table.to_pandas()
+
+
+def arrest_date_range(source):
+    """
+    Min and max ArrestDate over the whole dataset.
+
+    Read from Parquet footer statistics when every row group has them, so the
+    study period is known without scanning the column.
+    """
+    dataset = as_dataset(source)
+    lows, highs = [], []
+    for fragment in dataset.get_fragments():
+        if not isinstance(fragment, ds.ParquetFileFragment):
+            lows, highs = None, None
+            break
+        metadata = fragment.metadata
+        idx = metadata.schema.names.index(DATE_COLUMN)
+        for i in range(metadata.num_row_groups):
+            stats = metadata.row_group(i).column(idx).statistics
+            if stats is None or not stats.has_min_max:
+                lows, highs = None, None
+                break
+            lows.append(stats.min)
+            highs.append(stats.max)
+        if lows is None:
+            break
+
+    if lows:
+        return pd.Timestamp(min(lows)), pd.Timestamp(max(highs))
+
+    # Fall back to a single-column scan
+    min_max = pc.min_max(dataset.to_table(columns=[DATE_COLUMN]).column(0))
+    return pd.Timestamp(min_max['min'].as_py()), pd.Timestamp(min_max['max'].as_py())
+
+
+def write_partitioned_copy(source, destination, counties=None, state=STATE_FIPS,
+                           columns=None, optional_columns=OPTIONAL_ARREST_COLUMNS):
+    """
+    Write a county/year hive-partitioned copy of the arrest data.
+
+    Later runs that open the copy with open_arrest_dataset only touch the files
+    for the requested counties (and years). Pass counties to keep a subset.
+    Every column is kept unless columns is given (plus any optional_columns
+    the data has), since the pipeline reads the copy in place of the source
+    (Race for --demographics, ChargeDescription for --progression-offense).
+    """
+    dataset = as_dataset(source)
+    expr = county_filter(dataset, counties, state=state) if counties else None
+    if columns is None:
+        columns = [c for c in dataset.schema.names if c not in PARTITION_SCHEMA.names]
+    else:
+        columns = arrest_columns(dataset, columns, optional_columns)
+
+    def batches():
+        scanner = dataset.scanner(columns=columns, filter=expr)
+        for batch in scanner.to_batches():
+            county = pc.utf8_slice_codeunits(geoid_strings(batch.column(GEOID_COLUMN)), 0, 5)
+            year = pc.cast(pc.year(batch.column(DATE_COLUMN)), pa.int32())
+            yield batch.append_column(PARTITION_COUNTY, county).append_column(PARTITION_YEAR, year)
+
+    schema = pa.schema([dataset.schema.field(c) for c in columns])
+    for field in PARTITION_SCHEMA:
+        schema = schema.append(field)
+
+    ds.write_dataset(
+        batches(),
+        Path(destination),
+        schema=schema,
+        format='parquet',
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+        existing_data_behavior='overwrite_or_ignore',
+    )
+    return open_arrest_dataset(destination)
+
+
+def write_ipc_copy(source, destination, columns=ARREST_COLUMNS, optional_columns=OPTIONAL_ARREST_COLUMNS):
+    """
+    Write the analysis columns of every arrest to one uncompressed Arrow IPC
+    file, batch by batch.
+
+    Opened with open_arrest_dataset, the copy is memory-mapped, so many
+    worker processes can scan it without each re-decoding the Parquet data.
+    """
+    dataset = as_dataset(source)
+    columns = arrest_columns(dataset, columns, optional_columns)
+    schema = pa.schema([dataset.schema.field(c) for c in columns])
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    tmp = destination.with_name(f".{destination.name}.tmp")
+    with pa.OSFile(str(tmp), 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for batch in dataset.scanner(columns=columns).to_batches():
+            writer.write_batch(batch)
+    tmp.replace(destination)
+    return open_arrest_dataset(destination)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Write a county/year partitioned copy of the arrest data')
+    parser.add_argument('source', help='Arrest Parquet file')
+    parser.add_argument('destination', help='Output directory for the partitioned copy')
+    parser.add_argument('--counties', nargs='*', default=None,
+                        help='Three-digit county codes to keep (default: all)')
+    parser.add_argument('--state', default=STATE_FIPS)
+    args = parser.parse_args()
+
+    copy = write_partitioned_copy(args.source, args.destination, counties=args.counties, state=args.state)
+    print(f"✓ Wrote {copy.count_rows():,} arrests to {args.destination}")
@@ -0,0 +1,169 @@
+"""
+Multi-Region Batch Runner
+Runs the corrected geographic analysis for many county groupings at once.
+The arrest data is converted once to an Arrow IPC file that every worker
+memory-maps (zero-copy, one shared page cache), and regions fan out to a
+process pool that writes one result bundle per region
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+from arrest_loader import STATE_FIPS, write_ipc_copy
+
+BASE_PATH = Path(__file__).parent.parent
+DATA_PATH = BASE_PATH / 'data'
+REGIONS_PATH = BASE_PATH / 'results' / 'regions'
+IPC_COPY = DATA_PATH / 'arrests.arrow'
+
+# Pipeline options for every region unless overridden after "--"; each
+# region already gets its own process
+DEFAULT_PIPELINE_ARGS = ['--headless', '--workers', '1']
+
+REGION_NAME = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+
+def load_regions(path):
+    """
+    Region definitions from a JSON file: a list (or {"regions": [...]}) of
+    {"name": ..., "counties": ["019", ...], "state": "45", "census_file": ...}.
+    state defaults to South Carolina and census_file to data/census_<name>.csv
+    (fetched from the census API when missing).
+    """
+    data = json.loads(Path(path).read_text())
+    regions = data['regions'] if isinstance(data, dict) else data
+    seen = set()
+    for region in regions:
+        name = region.get('name')
+        if not name or not REGION_NAME.match(name):
+            raise ValueError(f"Region name {name!r} must be non-empty letters, digits, '_', '-' or '.'")
+        if name in seen:
+            raise ValueError(f"Duplicate region name {name!r}")
+        if not region.get('counties'):
+            raise ValueError(f"Region {name!r} has no counties")
+        seen.add(name)
+        region['state'] = str(region.get('state', STATE_FIPS)).zfill(2)
+        region['counties'] = [str(c).zfill(3) for c in region['counties']]
+        if region.get('census_file'):
+            region['census_file'] = str(BASE_PATH / region['census_file'])
+    return regions
+
+
+def ensure_ipc_copy(source, destination=IPC_COPY):
+    """The Arrow IPC copy of source, rewritten only when source is newer."""
+    source, destination = Path(source), Path(destination)
+    if destination.exists() and destination.stat().st_mtime >= source.stat().st_mtime:
+        return destination
+    start = time.perf_counter()
+    dataset = write_ipc_copy(source, destination)
+    print(f"✓ Wrote Arrow IPC copy ({dataset.count_rows():,} arrests) to {destination} "
+          f"in {time.perf_counter() - start:.1f}s")
+    return destination
+
+
+def run_region(region, arrest_source, output_dir, pipeline_args, cache_dir=None):
+    """
+    Run the pipeline for one region; its console output goes to
+    <output_dir>/<name>/run.log. Returns a summary row.
+    """
+    import corrected_geographic_analysis as analysis
+    from stage_cache import StageCache
+
+    bundle = Path(output_dir) / region['name']
+    bundle.mkdir(parents=True, exist_ok=True)
+    args = analysis.build_parser().parse_args(list(pipeline_args))
+    cache = StageCache(cache_dir or analysis.CACHE_PATH, enabled=not args.no_cache)
+    row = {'region': region['name'], 'state': region['state'], 'counties': ' '.join(region['counties'])}
+
+    start = time.perf_counter()
+    with open(bundle / 'run.log', 'w') as log, contextlib.redirect_stdout(log):
+        try:
+            results = analysis.run_pipeline(args, cache=cache, arrest_source=arrest_source,
+                                            results_path=bundle / 'results', figures_path=bundle / 'figures',
+                                            region=region)
+        except (Exception, SystemExit):
+            traceback.print_exc(file=log)
+            row.update(status='failed', seconds=round(time.perf_counter() - start, 2))
+            return row
+
+    risks = results['risks']
+    bg_data = results['categories']['bg_data']
+    row.update(
+        status='ok',
+        seconds=round(time.perf_counter() - start, 2),
+        arrests=results['filter']['arrests_analyzed'],
+        blockgroups=len(bg_data),
+        population=int(bg_data['total_pop'].sum()),
+        overall_ratio=risks['overall_ratio'],
+        young_ratio=risks['young_ratio'],
+        drug_ratio=risks['drug_ratio'],
+    )
+    return row
+
+
+def run_batch(regions, arrest_source, output_dir=REGIONS_PATH, pipeline_args=DEFAULT_PIPELINE_ARGS,
+              workers=None, cache_dir=None):
+    """Run every region in a process pool; returns the summary DataFrame."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, len(regions))
+    rows = []
+    if workers == 1:
+        for region in regions:
+            rows.append(run_region(region, arrest_source, output_dir, pipeline_args, cache_dir))
+            print(f"  {rows[-1]['region']}: {rows[-1]['status']} ({rows[-1]['seconds']:.1f}s)")
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_region, region, arrest_source, output_dir, pipeline_args, cache_dir)
+                       for region in regions]
+            for future in as_completed(futures):
+                rows.append(future.result())
+                print(f"  {rows[-1]['region']}: {rows[-1]['status']} ({rows[-1]['seconds']:.1f}s)")
+
+    order = {region['name']: i for i, region in enumerate(regions)}
+    summary = pd.DataFrame(rows).sort_values('region', key=lambda s: s.map(order)).reset_index(drop=True)
+    summary.to_csv(output_dir / 'batch_summary.csv', index=False)
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the analysis for many regions')
+    parser.add_argument('regions', help='JSON file of region definitions')
+    parser.add_argument('--source', default=None,
+                        help='Arrest Parquet file or partitioned directory (default: as the single-region run)')
+    parser.add_argument('--ipc-copy', default=str(IPC_COPY),
+                        help='Arrow IPC copy shared by the workers (rewritten when the source is newer)')
+    parser.add_argument('--output-dir', default=str(REGIONS_PATH))
+    parser.add_argument('--workers', type=int, default=None, help='Regions run in parallel (default: all cores)')
+    parser.add_argument('pipeline_args', nargs=argparse.REMAINDER,
+                        help=f"Analysis options after \"--\" (default: {' '.join(DEFAULT_PIPELINE_ARGS)})")
+    args = parser.parse_args()
+
+    source = args.source
+    if source is None:
+        source = DATA_PATH / 'census_mapped_anon_partitioned'
+        if not source.exists():
+            source = DATA_PATH / 'census_mapped_anon_data.parquet'
+    pipeline_args = [a for a in args.pipeline_args if a != '--'] or DEFAULT_PIPELINE_ARGS
+
+    regions = load_regions(args.regions)
+    arrest_source = ensure_ipc_copy(source, args.ipc_copy)
+    print(f"Running {len(regions)} regions...")
+    start = time.perf_counter()
+    summary = run_batch(regions, arrest_source, args.output_dir, pipeline_args, args.workers)
+    failed = summary['status'].ne('ok').sum()
+    print(f"\n✓ {len(summary) - failed} of {len(summary)} regions in {time.perf_counter() - start:.1f}s "
+          f"(summary: {Path(args.output_dir) / 'batch_summary.csv'})")
+    if failed:
+        print(f"WARNING: {failed} region(s) failed; see their run.log")
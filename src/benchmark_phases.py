@@ -0,0 +1,154 @@
+"""
+Pipeline Phase Benchmark
+Times and memory-profiles every phase of corrected_geographic_analysis.py on
+synthetic arrest tables (100K to 100M rows) and stores the results as JSON,
+with deltas against the previous run
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from run_profile import RunProfiler, peak_rss_mb, run_metadata
+from stage_cache import StageCache
+from synthetic_arrests import CENSUS_FILE, SIZES, write_synthetic
+
+BASE_PATH = Path(__file__).parent.parent
+SYNTHETIC_PATH = BASE_PATH / 'data' / 'synthetic'
+BENCHMARK_PATH = BASE_PATH / 'benchmarks'
+
+# Pipeline stage -> benchmark phase
+PHASES = {
+    'load': 'load',
+    'filter': 'filter',
+    'census': 'merge',
+    'rates': 'rates',
+    'cut_points': 'cut_points',
+    'categories': 'cut_points',
+    'risks': 'risks',
+    'escalation': 'escalation',
+    'figures': 'figures',
+    'report': 'outputs',
+}
+
+
+def synthetic_file(rows, seed=0, census_file=CENSUS_FILE):
+    """Generated arrests for this size, reused across benchmark runs."""
+    path = SYNTHETIC_PATH / f'arrests_{rows}_seed{seed}.parquet'
+    if not path.exists():
+        start = time.perf_counter()
+        write_synthetic(path, rows, census_file, seed)
+        print(f"✓ Generated {rows:,} rows in {time.perf_counter() - start:.1f}s ({path.name})")
+    return path
+
+
+def benchmark_size(rows, arrest_file, census_file, pipeline_args, trace_memory=False,
+                   output_dir=BENCHMARK_PATH):
+    """Run the pipeline once on arrest_file, writing to output_dir/output/<rows>; returns the size's record."""
+    import corrected_geographic_analysis as analysis
+
+    args = analysis.build_parser().parse_args(['--no-cache'] + list(pipeline_args))
+    profiler = RunProfiler(trace_memory)
+    cache = StageCache(analysis.CACHE_PATH, enabled=False, profiler=profiler)
+    run_dir = Path(output_dir) / 'output' / str(rows)
+    start = time.perf_counter()
+    # The pipeline's progress output is not part of the benchmark
+    with contextlib.redirect_stdout(io.StringIO()):
+        analysis.run_pipeline(args, cache=cache, arrest_source=arrest_file, census_file=census_file,
+                              results_path=run_dir / 'results', figures_path=run_dir / 'figures')
+    total = time.perf_counter() - start
+
+    phases = {}
+    for record in profiler.records:
+        phase = phases.setdefault(PHASES.get(record['stage'], record['stage']),
+                                  {'seconds': 0.0, 'rss_peak_mb': 0.0, 'peak_alloc_mb': None})
+        phase['seconds'] = round(phase['seconds'] + record['wall_seconds'], 4)
+        phase['rss_peak_mb'] = max(phase['rss_peak_mb'], record['rss_peak_mb'])
+        if 'traced_peak_mb' in record:
+            phase['peak_alloc_mb'] = max(phase['peak_alloc_mb'] or 0.0, record['traced_peak_mb'])
+    return {
+        'rows': rows,
+        'file_mb': round(Path(arrest_file).stat().st_size / 2 ** 20, 1),
+        'total_seconds': round(total, 4),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'phases': phases,
+        'stages': profiler.records,
+    }
+
+
+def previous_run(output_dir, current):
+    """Latest stored run with the same pipeline arguments and tracing mode."""
+    settings = ('pipeline_args', 'trace_memory')
+    for path in sorted(Path(output_dir).glob('phases_*.json'), reverse=True):
+        run = json.loads(path.read_text())
+        if all(run['metadata'].get(k) == current['metadata'][k] for k in settings):
+            return run
+    return None
+
+
+def print_comparison(current, previous):
+    """Per-phase seconds for each size, with the change against `previous`."""
+    before = {}
+    if previous:
+        for size in previous['sizes']:
+            for phase, values in size['phases'].items():
+                before[size['rows'], phase] = values['seconds']
+            before[size['rows'], 'total'] = size['total_seconds']
+
+    for size in current['sizes']:
+        print(f"\n{size['rows']:,} rows (peak RSS {size['peak_rss_mb']:,.0f} MB)")
+        rows = list(size['phases'].items()) + [('total', {'seconds': size['total_seconds']})]
+        for phase, values in rows:
+            line = f"  {phase:<12} {values['seconds']:>9.3f}s"
+            if 'rss_peak_mb' in values:
+                line += f"  {values['rss_peak_mb']:>9,.0f} MB RSS"
+            if values.get('peak_alloc_mb') is not None:
+                line += f"  {values['peak_alloc_mb']:>9,.1f} MB traced"
+            old = before.get((size['rows'], phase))
+            if old:
+                line += f"  ({(values['seconds'] - old) / old * 100:+.1f}% vs previous)"
+            print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark pipeline phases on synthetic data')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help='Arrest rows per synthetic table')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--census-file', default=str(CENSUS_FILE))
+    parser.add_argument('--output-dir', default=str(BENCHMARK_PATH))
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help='Also record traced peak allocations (slows allocation-heavy phases)')
+    parser.add_argument('pipeline_args', nargs=argparse.REMAINDER,
+                        help='Arguments passed to the analysis after "--" (e.g. -- --streaming)')
+    args = parser.parse_args()
+    pipeline_args = [a for a in args.pipeline_args if a != '--']
+    trace_memory = args.tracemalloc
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    result = {'metadata': run_metadata(pipeline_args=pipeline_args, trace_memory=trace_memory), 'sizes': []}
+
+    for rows in args.sizes:
+        arrest_file = synthetic_file(rows, args.seed, args.census_file)
+        # A fresh process per size, so peak RSS is per size
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            record = pool.submit(benchmark_size, rows, arrest_file, args.census_file,
+                                 pipeline_args, trace_memory, output_dir).result()
+        result['sizes'].append(record)
+        print(f"✓ {rows:,} rows: {record['total_seconds']:.2f}s, peak RSS {record['peak_rss_mb']:,.0f} MB")
+
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = output_dir / f'phases_{stamp}.json'
+    previous = previous_run(output_dir, result)
+    path.write_text(json.dumps(result, indent=2))
+    print_comparison(result, previous)
+    print(f"\n✓ Saved benchmark to {path}")
@@ -0,0 +1,189 @@
+"""
+Bootstrap Confidence Intervals
+Defendant-clustered bootstrap of the cut points, policing categories and
+per-category counts behind the annual risks (Methodology Step 33), plus
+exact Poisson intervals for block-group rates
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse, stats
+
+from cut_point_sensitivity import CATEGORY_PREFIXES
+from subgroup_aggregation import or_reduce, subgroup_bits
+
+PERSON_BITS = 32
+
+# Replicates drawn per task; each batch gets its own child seed
+BATCH_SIZE = 64
+
+# Cap on the dense (replicates x defendants) arrays a batch holds at once;
+# about six 8-byte values per cell are alive inside replicate_counts()
+CHUNK_BYTES = 256 * 2 ** 20
+CELL_BYTES = 48
+
+
+def poisson_rate_ci(counts, population, per=1000, level=0.95):
+    """Exact (Garwood) Poisson interval for counts / population * per."""
+    counts = np.asarray(counts, dtype=np.float64)
+    population = np.asarray(population, dtype=np.float64)
+    alpha = 1 - level
+    lower = np.where(counts > 0, stats.chi2.ppf(alpha / 2, 2 * counts) / 2, 0.0)
+    upper = stats.chi2.ppf(1 - alpha / 2, 2 * (counts + 1)) / 2
+    return lower / population * per, upper / population * per
+
+
+def bootstrap_inputs(arrests, bg_data, subgroups, person='DefendantId', unit='blockgroup_id'):
+    """
+    Person x block-group matrices the replicates are computed from.
+
+    Rows are defendants, columns the block groups of bg_data (arrests in
+    other block groups are dropped, as with Step 1B's inner merge). Returns a
+    dict of CSR matrices (discretionary arrests, presence, presence per
+    subgroup) and the block-group populations.
+    """
+    position = pd.Index(bg_data[unit]).get_indexer(arrests[unit].to_numpy())
+    keep = position >= 0
+    position = position[keep].astype(np.int64)
+    person_codes, person_labels = pd.factorize(arrests[person].to_numpy()[keep])
+    n_person, n_bg = len(person_labels), len(bg_data)
+
+    keys = (position << PERSON_BITS) | person_codes.astype(np.int64)
+    discretionary = arrests['is_discretionary'].to_numpy()[keep].astype(np.int64)
+    pair_keys, pair_index = np.unique(keys, return_inverse=True)
+    pair_discretionary = np.bincount(pair_index, weights=discretionary, minlength=len(pair_keys))
+    _, pair_bits = or_reduce(keys, subgroup_bits(arrests[keep], subgroups))
+
+    rows = pair_keys & np.int64((1 << PERSON_BITS) - 1)
+    cols = pair_keys >> PERSON_BITS
+    shape = (n_person, n_bg)
+
+    def matrix(values, mask=slice(None)):
+        return sparse.csr_matrix((values[mask], (rows[mask], cols[mask])), shape=shape, dtype=np.float64)
+
+    flags = np.unpackbits(pair_bits.astype('<u8').view(np.uint8), axis=1, bitorder='little')
+    ones = np.ones(len(pair_keys))
+    return {
+        'population': bg_data['total_pop'].to_numpy(dtype=np.float64),
+        'discretionary': matrix(pair_discretionary),
+        'presence': matrix(ones),
+        'subgroups': {s['name']: matrix(ones, flags[:, i] == 1) for i, s in enumerate(subgroups)},
+    }
+
+
+def replicate_counts(inputs, weights, cut_targets):
+    """
+    Cut rates and per-category counts for a batch of defendant weights.
+
+    weights is (replicates x defendants): how often each defendant was drawn.
+    Columns match CutPointSweep.evaluate(): cut rates, then for each category
+    prefix its population, block groups, summed block-group unique counts
+    and one distinct-person count per subgroup. Also returns how often each
+    block group fell in each category.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    population = inputs['population']
+    n_rep, n_bg = len(weights), len(population)
+
+    # Step 2 rates and Step 3 cut points, one row per replicate
+    rates = (inputs['discretionary'].T @ weights.T).T / population * 1000
+    order = np.argsort(-rates, axis=1, kind='stable')
+    cumulative_pct = np.cumsum(population[order], axis=1) / population.sum() * 100
+    rows = np.arange(n_rep)
+    cut_rates = [rates[rows, order[rows, np.argmax(cumulative_pct >= target, axis=1)]] for target in cut_targets]
+
+    # Step 4 categories: 0 ultra, 1 highly, 2 normal
+    category = np.where(rates >= cut_rates[0][:, None], 0, np.where(rates >= cut_rates[1][:, None], 1, 2))
+    unit_unique = (inputs['presence'].T @ weights.T).T
+
+    counts = {'cut1_rate': cut_rates[0], 'cut2_rate': cut_rates[1]}
+    tallies = np.zeros((n_bg, len(CATEGORY_PREFIXES)), dtype=np.int64)
+    for k, prefix in enumerate(CATEGORY_PREFIXES.values()):
+        in_category = category == k
+        tallies[:, k] = in_category.sum(axis=0)
+        counts[f'{prefix}_pop'] = in_category @ population
+        counts[f'{prefix}_blockgroups'] = in_category.sum(axis=1)
+        counts[f'{prefix}_unit_unique'] = (unit_unique * in_category).sum(axis=1)
+        for name, presence in inputs['subgroups'].items():
+            # A drawn defendant counts once per category they were arrested in
+            hit = (presence @ in_category.T.astype(np.float64)) > 0
+            counts[f'{prefix}_{name}'] = (weights.T * hit).sum(axis=0)
+    return pd.DataFrame(counts), tallies
+
+
+# ----------------------------------------------------------------------------
+# Process pool
+# ----------------------------------------------------------------------------
+
+_worker_inputs = None
+
+
+def _init_worker(inputs):
+    global _worker_inputs
+    _worker_inputs = inputs
+
+
+def _chunk_size(n_person):
+    """Replicates per chunk so a chunk's dense arrays stay under CHUNK_BYTES."""
+    return max(1, CHUNK_BYTES // (CELL_BYTES * max(n_person, 1)))
+
+
+def _run_batch(seed, n_replicates, cut_targets, inputs=None):
+    inputs = _worker_inputs if inputs is None else inputs
+    n_person = inputs['presence'].shape[0]
+    rng = np.random.default_rng(seed)
+    # Chunks draw from the batch's stream in order, so chunking does not change the replicates
+    step = _chunk_size(n_person)
+    results = []
+    for start in range(0, n_replicates, step):
+        size = min(step, n_replicates - start)
+        draws = rng.integers(0, n_person, size=(size, n_person))
+        draws += np.arange(size)[:, None] * n_person
+        weights = np.bincount(draws.ravel(), minlength=size * n_person)
+        del draws
+        results.append(replicate_counts(inputs, weights.reshape(size, n_person), cut_targets))
+    if len(results) == 1:
+        return results[0]
+    return pd.concat([r[0] for r in results], ignore_index=True), sum(r[1] for r in results)
+
+
+def bootstrap_replicates(inputs, cut_targets, n_replicates=1000, seed=0, workers=None,
+                         batch_size=BATCH_SIZE):
+    """
+    Defendant-clustered bootstrap replicates of replicate_counts().
+
+    Replicates are drawn in batches, each from its own SeedSequence child of
+    seed, so the result does not depend on the number of workers. Returns
+    (replicates DataFrame, block-group category tallies).
+    """
+    sizes = [min(batch_size, n_replicates - start) for start in range(0, n_replicates, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    cut_targets = tuple(cut_targets)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(sizes) == 1:
+        results = [_run_batch(s, n, cut_targets, inputs) for s, n in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes)),
+                                 initializer=_init_worker, initargs=(inputs,)) as pool:
+            results = list(pool.map(_run_batch, seeds, sizes, [cut_targets] * len(sizes)))
+
+    replicates = pd.concat([r[0] for r in results], ignore_index=True)
+    tallies = sum(r[1] for r in results)
+    return replicates, tallies
+
+
+def percentile_intervals(replicates, estimates, level=0.95):
+    """metric, estimate, lower, upper (percentile bootstrap) for each column."""
+    alpha = (1 - level) / 2 * 100
+    columns = list(estimates.index)
+    bounds = np.nanpercentile(replicates[columns].to_numpy(dtype=np.float64), [alpha, 100 - alpha], axis=0)
+    return pd.DataFrame({
+        'metric': columns,
+        'estimate': estimates.to_numpy(dtype=np.float64),
+        'lower': bounds[0],
+        'upper': bounds[1],
+    })
@@ -0,0 +1,162 @@
+"""
+Cascade Simulation - Cumulative Escalation and Policy Scenarios
+Monte Carlo person-trajectories from age 18 to 50 per policing category
+(Methodology Steps 12 and 29), simulated in year steps over preallocated
+NumPy arrays
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+START_AGE = 18
+END_AGE = 50
+
+# Arrest counts at or above this are pooled in the distribution tables
+MAX_ARRESTS = 20
+
+# People simulated per chunk (bounds memory for millions of trajectories)
+CHUNK_SIZE = 1_000_000
+
+# Step 29 counterfactuals
+SCENARIOS = {
+    'baseline': {},
+    'equal_enforcement': {'rates_from': 'Normally Policed'},
+    'first_arrest_diversion': {'diversion': 0.5},
+}
+
+
+def annualize(probability, years):
+    """
+    Per-period probability with the same chance of happening at least once
+    over `years` periods (also used to split a year into steps).
+    """
+    probability = np.clip(np.asarray(probability, dtype=np.float64), 0, 1)
+    return 1 - (1 - probability) ** (1 / years)
+
+
+def cascade_probabilities(risk_df, young_men_df, escalation_risks, years_of_data):
+    """
+    Per-category annual probabilities from the existing risk tables.
+
+    first_young  -- Step 6 annual risk (ages in the young-men band)
+    first_other  -- Step 5 annual risk (other ages)
+    repeat_1..3  -- P(2nd | 1st), P(3rd | 2nd), P(4th+ | 3rd) within each
+                    category (Step 11 counts), spread evenly over the years
+                    of data
+    """
+    table = risk_df[['Category', 'Annual_Risk_Pct']].merge(
+        young_men_df[['Category', 'Annual_Risk_Pct']], on='Category', suffixes=('', '_young'))
+    table = table.merge(escalation_risks, on='Category')
+    arrested = table['People_Arrested'].clip(lower=1)
+    enhanced = table['People_enhanced'].clip(lower=1)
+    mandatory = table['People_mandatory_minimum'].clip(lower=1)
+    return pd.DataFrame({
+        'Category': table['Category'],
+        'first_young': table['Annual_Risk_Pct_young'] / 100,
+        'first_other': table['Annual_Risk_Pct'] / 100,
+        'repeat_1': annualize(table['People_enhanced'] / arrested, years_of_data),
+        'repeat_2': annualize(table['People_mandatory_minimum'] / enhanced, years_of_data),
+        'repeat_3': annualize(table['People_severe'] / mandatory, years_of_data),
+    }).set_index('Category')
+
+
+def simulate(probabilities, n_people, seed, young_age=(18, 35), diversion=0.0,
+             steps_per_year=4, start_age=START_AGE, end_age=END_AGE, max_arrests=MAX_ARRESTS):
+    """
+    Simulate n_people trajectories for one category.
+
+    probabilities is a row of cascade_probabilities(). Each year is split
+    into steps_per_year steps (so a second arrest can follow in the same
+    year); the per-step probability keeps the annual rate. A share
+    `diversion` of first arrests is diverted and leaves no record.
+
+    Returns (ages x 0..max_arrests) counts of people by recorded arrests at
+    the end of each age, plus the number of diverted arrests.
+    """
+    rng = np.random.default_rng(seed)
+    ages = np.arange(start_age, end_age + 1)
+    histogram = np.zeros((len(ages), max_arrests + 1), dtype=np.int64)
+    repeat = annualize([probabilities['repeat_1'], probabilities['repeat_2'], probabilities['repeat_3']],
+                       steps_per_year)
+    first_young = annualize(probabilities['first_young'], steps_per_year)
+    first_other = annualize(probabilities['first_other'], steps_per_year)
+    diverted = 0
+
+    for start in range(0, n_people, CHUNK_SIZE):
+        n = min(CHUNK_SIZE, n_people - start)
+        arrests = np.zeros(n, dtype=np.int16)
+        p = np.empty(n, dtype=np.float64)
+        for i, age in enumerate(ages):
+            first = first_young if young_age[0] <= age <= young_age[1] else first_other
+            for _ in range(steps_per_year):
+                # Probability by record: none -> first arrest, k -> repeat_k
+                np.take(repeat, np.minimum(arrests, 3) - 1, out=p)
+                p[arrests == 0] = first
+                hit = rng.random(n) < p
+                if diversion:
+                    divert = hit & (arrests == 0) & (rng.random(n) < diversion)
+                    diverted += int(divert.sum())
+                    hit &= ~divert
+                arrests += hit
+            histogram[i] += np.bincount(np.minimum(arrests, max_arrests), minlength=max_arrests + 1)
+    return histogram, diverted
+
+
+def _run_task(task):
+    category, scenario, probabilities, n_people, seed, options = task
+    histogram, diverted = simulate(probabilities, n_people, seed, **options)
+    return category, scenario, histogram, diverted
+
+
+def run_scenarios(probabilities, n_people=100_000, scenarios=SCENARIOS, seed=0, workers=None, **options):
+    """
+    Simulate every (scenario, category) pair, in parallel across processes.
+
+    Each pair gets its own SeedSequence child, so results do not depend on
+    the number of workers. Returns (distribution, summary) DataFrames.
+    """
+    tasks = []
+    for scenario, spec in scenarios.items():
+        for category in probabilities.index:
+            rates = probabilities.loc[spec.get('rates_from', category)].to_dict()
+            task_options = {**options, 'diversion': spec.get('diversion', 0.0)}
+            tasks.append([category, scenario, rates, n_people, None, task_options])
+    for task, child in zip(tasks, np.random.SeedSequence(seed).spawn(len(tasks))):
+        task[4] = child
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [_run_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(_run_task, tasks))
+
+    start_age = options.get('start_age', START_AGE)
+    frames, summaries = [], []
+    for category, scenario, histogram, diverted in results:
+        ages = np.arange(start_age, start_age + len(histogram))
+        counts = np.arange(histogram.shape[1])
+        share = histogram / n_people
+        frames.append(pd.DataFrame({
+            'scenario': scenario,
+            'Category': category,
+            'age': np.repeat(ages, len(counts)),
+            'arrests': np.tile(counts, len(ages)),
+            'share': share.ravel(),
+        }))
+        summaries.append(pd.DataFrame({
+            'scenario': scenario,
+            'Category': category,
+            'age': ages,
+            'pct_arrested': share[:, 1:].sum(axis=1) * 100,
+            'pct_enhanced': share[:, 2:].sum(axis=1) * 100,
+            'pct_mandatory_minimum': share[:, 3:].sum(axis=1) * 100,
+            'mean_arrests': share @ counts,
+            'mean_enhancements': share @ np.maximum(counts - 1, 0),
+            'mean_mandatory_minimums': share @ np.maximum(counts - 2, 0),
+            'diverted_per_person': diverted / n_people,
+        }))
+    return pd.concat(frames, ignore_index=True), pd.concat(summaries, ignore_index=True)
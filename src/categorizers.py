@@ -0,0 +1,202 @@
+"""
+Policing-Tier Categorizers
+Classification schemes for block group discretionary rates: the Step 3
+population cut points, population-weighted quantiles, Jenks natural breaks
+and population-weighted 1-D k-means. Each works on the Step 3 arrays (rates
+sorted high to low with their populations) and returns tier thresholds; any
+rates are then labelled in one vectorized search
+"""
+
+import numpy as np
+
+
+def tier_labels(rates, thresholds):
+    """
+    Tier per rate (0 = most policed) for descending thresholds: rates >=
+    thresholds[0] are tier 0, >= thresholds[1] tier 1, ..., the rest the
+    last tier.
+    """
+    return np.searchsorted(-np.asarray(thresholds, dtype=float), -np.asarray(rates, dtype=float), side='left')
+
+
+def _distinct(rates, weights):
+    """Ascending distinct rates with summed weights (tied rates share a tier)."""
+    values, inverse = np.unique(rates, return_inverse=True)
+    return values, np.bincount(inverse, weights=weights, minlength=len(values))
+
+
+def _checked(thresholds, tiers, scheme):
+    """thresholds, if they are tiers - 1 strictly descending rates; ValueError when tiers collapse."""
+    thresholds = np.asarray(thresholds, dtype=float)
+    distinct = len(np.unique(thresholds))
+    if len(thresholds) != tiers - 1 or distinct != len(thresholds) or np.any(np.diff(thresholds) > 0):
+        raise ValueError(f"{scheme} breaks give only {distinct + 1} distinct tiers of the {tiers} requested "
+                         f"(too few distinct rates)")
+    return thresholds
+
+
+def population_breaks(rates, population, tiers=3, targets=(6.6, 22.0)):
+    """
+    Step 3: the rate of the first block group (high to low) at which the
+    cumulative population reaches each target percentage.
+    """
+    if len(targets) != tiers - 1:
+        raise ValueError(f"{tiers} tiers need {tiers - 1} population targets, got {len(targets)}")
+    cumulative_pct = np.cumsum(population) / np.sum(population) * 100
+    return _checked(np.asarray(rates)[[np.argmax(cumulative_pct >= target) for target in targets]], tiers,
+                    'population')
+
+
+def quantile_breaks(rates, population, tiers=3):
+    """
+    Population-weighted quantiles: each tier holds about 1/tiers of the
+    population. Tied rates are not split, and a tie group that would carry
+    a tier past its share stays in the lower tier (so, e.g., block groups
+    with no discretionary arrests are never the most policed tier).
+    """
+    values, weights = _distinct(rates, np.asarray(population, dtype=float))
+    _, block_groups = _distinct(rates, np.ones(len(rates)))
+    values, weights, block_groups = values[::-1], weights[::-1], block_groups[::-1]
+    cumulative_pct = np.cumsum(weights) / weights.sum() * 100
+    targets = np.arange(1, tiers) / tiers * 100
+    index = np.minimum(np.searchsorted(cumulative_pct, targets, side='left'), len(values) - 1)
+    overshoot = (block_groups[index] > 1) & ~np.isclose(cumulative_pct[index], targets) & (index > 0)
+    return _checked(values[np.where(overshoot, index - 1, index)], tiers, 'quantile')
+
+
+def _segment_costs(prefix, start, end):
+    """Weighted within-segment sum of squares of sorted values[start:end]."""
+    w, wx, wxx = prefix
+    weight = w[end] - w[start]
+    total = wx[end] - wx[start]
+    return wxx[end] - wxx[start] - total ** 2 / weight
+
+
+def _next_layer(previous, prefix, n, tier):
+    """
+    Best cost of splitting the first j values into tier+1 segments, for all
+    j, from the costs for tier segments.
+
+    The optimal last split point is monotone in j, so the layer is computed
+    by divide and conquer: each round evaluates the midpoints of every open
+    j-range over its candidate split range, in one vectorized pass
+    (O(n log n) per layer).
+    """
+    cost = np.full(n + 1, np.inf)
+    split = np.zeros(n + 1, dtype=np.int64)
+    lo, hi = np.array([tier + 1]), np.array([n])
+    opt_lo, opt_hi = np.array([tier]), np.array([n - 1])
+    while len(lo):
+        mid = (lo + hi) // 2
+        last = np.minimum(mid - 1, opt_hi)
+        lengths = last - opt_lo + 1
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        segment = np.repeat(np.arange(len(mid)), lengths)
+        candidate = opt_lo[segment] + np.arange(lengths.sum()) - starts[segment]
+        value = previous[candidate] + _segment_costs(prefix, candidate, mid[segment])
+
+        best = np.minimum.reduceat(value, starts)
+        # First (smallest) split point reaching the minimum
+        hits = np.flatnonzero(value == best[segment])
+        _, first = np.unique(segment[hits], return_index=True)
+        best_split = candidate[hits[first]]
+        cost[mid], split[mid] = best, best_split
+
+        left = lo <= mid - 1
+        right = mid + 1 <= hi
+        lo, hi, opt_lo, opt_hi = (np.concatenate([lo[left], mid[right] + 1]),
+                                  np.concatenate([mid[left] - 1, hi[right]]),
+                                  np.concatenate([opt_lo[left], best_split[right]]),
+                                  np.concatenate([best_split[left], opt_hi[right]]))
+    return cost, split
+
+
+def optimal_breaks(values, weights, tiers):
+    """
+    Exact minimum weighted within-tier sum of squares partition of sorted
+    distinct values into `tiers` contiguous tiers; returns the start index
+    of every tier after the first.
+    """
+    n = len(values)
+    centered = values - np.average(values, weights=weights)
+    prefix = tuple(np.concatenate([[0.0], np.cumsum(weights * centered ** p)]) for p in range(3))
+    cost = np.full(n + 1, np.inf)
+    cost[1:] = _segment_costs(prefix, np.zeros(n, dtype=np.int64), np.arange(1, n + 1))
+    splits = []
+    for tier in range(1, tiers):
+        cost, split = _next_layer(cost, prefix, n, tier)
+        splits.append(split)
+    starts, end = [], n
+    for split in reversed(splits):
+        end = split[end]
+        starts.append(end)
+    return np.array(starts[::-1], dtype=np.int64)
+
+
+def jenks_breaks(rates, population, tiers=3):
+    """
+    Jenks natural breaks (Fisher's exact optimization): tiers that minimize
+    the within-tier variance of block group rates.
+    """
+    values, counts = _distinct(rates, np.ones(len(rates)))
+    if len(values) < tiers:
+        raise ValueError(f"jenks breaks need {tiers} distinct rates for {tiers} tiers, got {len(values)}")
+    return values[optimal_breaks(values, counts, tiers)][::-1]
+
+
+def kmeans_breaks(rates, population, tiers=3, max_iter=100):
+    """
+    Population-weighted 1-D k-means (Lloyd's algorithm from weighted
+    quantile centers). On sorted values each iteration is a searchsorted
+    for the midpoints and prefix-sum centroids. Raises ValueError when
+    clusters merge, leaving fewer than `tiers` tiers.
+    """
+    values, weights = _distinct(rates, np.asarray(population, dtype=float))
+    if len(values) < tiers:
+        raise ValueError(f"kmeans breaks need {tiers} distinct rates for {tiers} tiers, got {len(values)}")
+    cumulative_w = np.concatenate([[0.0], np.cumsum(weights)])
+    cumulative_wx = np.concatenate([[0.0], np.cumsum(weights * values)])
+    quantiles = (np.arange(tiers) + 0.5) / tiers * cumulative_w[-1]
+    centers = values[np.minimum(np.searchsorted(cumulative_w[1:], quantiles), len(values) - 1)]
+
+    starts = None
+    for _ in range(max_iter):
+        new_starts = np.searchsorted(values, (centers[:-1] + centers[1:]) / 2, side='left')
+        if starts is not None and np.array_equal(new_starts, starts):
+            break
+        starts = new_starts
+        bounds = np.concatenate([[0], starts, [len(values)]])
+        weight = cumulative_w[bounds[1:]] - cumulative_w[bounds[:-1]]
+        total = cumulative_wx[bounds[1:]] - cumulative_wx[bounds[:-1]]
+        # An empty tier keeps its center
+        centers = np.where(weight > 0, total / np.where(weight > 0, weight, 1), centers)
+    starts = np.unique(np.clip(starts, 1, len(values) - 1))
+    return _checked(values[starts][::-1], tiers, 'kmeans')
+
+
+# Scheme name -> breaks(rates sorted high to low, population, tiers)
+CATEGORIZERS = {
+    'population': population_breaks,
+    'quantile': quantile_breaks,
+    'jenks': jenks_breaks,
+    'kmeans': kmeans_breaks,
+}
+
+
+def categorize(scheme, rates, population, tiers=3, **options):
+    """(descending thresholds, tier labels) for Step 3-ordered rates under a scheme."""
+    if scheme not in CATEGORIZERS:
+        raise ValueError(f"Unknown categorizer {scheme!r} (choose from {', '.join(CATEGORIZERS)})")
+    thresholds = CATEGORIZERS[scheme](np.asarray(rates, dtype=float), np.asarray(population, dtype=float),
+                                      tiers, **options)
+    return thresholds, tier_labels(rates, thresholds)
+
+
+def variance_fit(rates, population, labels):
+    """Goodness of variance fit: 1 - within-tier / total population-weighted sum of squares."""
+    rates, population = np.asarray(rates, dtype=float), np.asarray(population, dtype=float)
+    total = np.sum(population * (rates - np.average(rates, weights=population)) ** 2)
+    weight = np.bincount(labels, weights=population)
+    means = np.bincount(labels, weights=population * rates) / np.where(weight > 0, weight, 1)
+    within = np.sum(population * (rates - means[labels]) ** 2)
+    return 1 - within / total if total > 0 else 1.0
@@ -0,0 +1,286 @@
+"""
+ACS Census Fetcher - Concurrent, Cached Block-Group Requests
+Fetches ACS block-group variables for any set of states/counties with a
+pooled HTTP session, bounded concurrency, retries with backoff, variable
+chunking and an on-disk cache per (year, dataset, geography, variables);
+each variable chunk is cached as it arrives, so a failed run resumes
+"""
+
+import argparse
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+CENSUS_API = 'https://api.census.gov/data'
+ACS_YEAR = 2019
+ACS_DATASET = 'acs/acs5'
+
+# Block-group variables used by the analysis (API name -> column name)
+ACS_VARIABLES = {
+    'B01001_001E': 'total_pop',
+    'B01001_002E': 'male_pop',
+    'B01001_026E': 'female_pop',
+    'B02001_002E': 'white_pop',
+    'B02001_003E': 'black_pop',
+    'B03002_012E': 'hispanic_pop',
+    'B19013_001E': 'median_income',
+    'B17001_002E': 'poverty_count',
+    'B25077_001E': 'median_home_value',
+    'B25010_001E': 'avg_household_size',
+}
+
+GEOGRAPHY_COLUMNS = ['state', 'county', 'tract', 'block group']
+
+# The API accepts at most 50 variables per call (NAME included)
+MAX_VARIABLES = 49
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class CensusFetchError(RuntimeError):
+    """Raised when a census request still fails after all retries."""
+
+
+class RateLimiter:
+    """Spaces request starts at least 1/rate seconds apart across threads."""
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def _write_parquet(table, path):
+    """Write via a temporary file so concurrent or interrupted runs never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+    table.to_parquet(tmp, index=False)
+    tmp.replace(path)
+
+
+def chunk_variables(variables, size=MAX_VARIABLES):
+    variables = list(variables)
+    return [variables[i:i + size] for i in range(0, len(variables), size)] or [[]]
+
+
+class CensusFetcher:
+    """
+    Block-group ACS fetcher.
+
+    base_url     -- API root (point it at mock_census_server for offline runs)
+    cache_dir    -- one Parquet file per (year, dataset, state, county,
+                    variable set), plus part_ files for the chunks of an
+                    unfinished geography; None disables the cache
+    max_workers  -- concurrent requests (also the connection pool size)
+    rate         -- optional cap on requests started per second
+    """
+
+    def __init__(self, base_url=CENSUS_API, year=ACS_YEAR, dataset=ACS_DATASET, cache_dir=None,
+                 max_workers=8, timeout=30, retries=3, backoff=0.5, rate=None, api_key=None):
+        self.base_url = base_url.rstrip('/')
+        self.year = year
+        self.dataset = dataset
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.api_key = api_key
+        self.limiter = RateLimiter(rate)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.requests_made = 0
+        self._count_lock = threading.Lock()
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -- HTTP ---------------------------------------------------------------
+
+    def _get(self, params):
+        """GET the dataset endpoint, retrying connection errors and 429/5xx."""
+        url = f"{self.base_url}/{self.year}/{self.dataset}"
+        if self.api_key:
+            params = {**params, 'key': self.api_key}
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            self.limiter.wait()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                with self._count_lock:
+                    self.requests_made += 1
+            except requests.RequestException as e:
+                error = e
+                continue
+            if response.status_code == 200:
+                try:
+                    return response.json()
+                except ValueError:
+                    # Bad keys and variables come back as 200 with an HTML or text page
+                    raise CensusFetchError(f"{url} {params.get('in', '')}: response is not JSON: "
+                                           f"{response.text[:200]!r}") from None
+            error = f"HTTP {response.status_code}"
+            if response.status_code not in RETRY_STATUS:
+                break
+        raise CensusFetchError(f"{url} {params.get('in', '')}: {error}")
+
+    def _fetch_chunk(self, state, county, variables, with_name):
+        fields = (['NAME'] if with_name else []) + list(variables)
+        data = self._get({
+            'get': ','.join(fields),
+            'for': 'block group:*',
+            'in': f"state:{state} county:{county}",
+        })
+        return pd.DataFrame(data[1:], columns=data[0])
+
+    def _cached_chunk(self, state, county, variables, with_name):
+        """One chunk, read from or written to its own cache file as soon as it arrives."""
+        if not self.cache_dir:
+            return self._fetch_chunk(state, county, variables, with_name)
+        path = self.chunk_path(state, county, variables, with_name)
+        if path.exists():
+            return pd.read_parquet(path)
+        part = self._fetch_chunk(state, county, variables, with_name)
+        _write_parquet(part, path)
+        return part
+
+    # -- cache --------------------------------------------------------------
+
+    def cache_path(self, state, county, variables):
+        # The API root is part of the key so mock and live responses never mix
+        digest = hashlib.sha256(f"{self.base_url}|{','.join(sorted(variables))}".encode()).hexdigest()[:12]
+        name = f"{self.year}_{self.dataset.replace('/', '-')}_bg_{state}_{county}_{digest}.parquet"
+        return self.cache_dir / name
+
+    def chunk_path(self, state, county, variables, with_name):
+        """Cache file for one variable chunk of a geography still being fetched."""
+        path = self.cache_path(state, county, (['NAME'] if with_name else []) + list(variables))
+        return path.with_name(f"part_{path.name}")
+
+    # -- public -------------------------------------------------------------
+
+    def fetch_raw(self, geographies, variables=ACS_VARIABLES):
+        """
+        Raw API tables (NAME, variables, geography columns), one per
+        (state, county) pair; county '*' covers every county in the state.
+
+        Cached geographies are read from disk. The rest are split into
+        (geography, variable chunk) requests that share one bounded pool;
+        with a cache, each chunk is saved as it completes, so when one chunk
+        exhausts its retries a rerun only requests the chunks still missing.
+        """
+        variables = list(variables)
+        geographies = [tuple(g) for g in geographies]
+        tables = {}
+        pending = []
+        for geography in geographies:
+            path = self.cache_path(*geography, variables) if self.cache_dir else None
+            if path is not None and path.exists():
+                tables[geography] = pd.read_parquet(path)
+            elif geography not in pending:
+                pending.append(geography)
+
+        chunks = chunk_variables(variables)
+        tasks = [(geography, i) for geography in pending for i in range(len(chunks))]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            parts = list(pool.map(lambda t: self._cached_chunk(*t[0], chunks[t[1]], t[1] == 0), tasks))
+
+        for geography in pending:
+            table = None
+            for (task_geography, _), part in zip(tasks, parts):
+                if task_geography != geography:
+                    continue
+                table = part if table is None else table.merge(part, on=GEOGRAPHY_COLUMNS, how='outer')
+            tables[geography] = table
+            if self.cache_dir:
+                _write_parquet(table, self.cache_path(*geography, variables))
+                for i, chunk in enumerate(chunks):
+                    self.chunk_path(*geography, chunk, i == 0).unlink(missing_ok=True)
+        return [tables[g] for g in geographies]
+
+    def fetch_block_groups(self, geographies, variables=ACS_VARIABLES):
+        """
+        Block-group table for (state, county) pairs.
+
+        Columns are renamed with `variables` when it is a dict, values are
+        numeric, and blockgroup_id is the 12-digit GEOID.
+        """
+        tables = self.fetch_raw(geographies, variables)
+        census_raw = pd.concat(tables, ignore_index=True)
+
+        # Create GEOID
+        census_raw['GEOID'] = census_raw['state'] + census_raw['county'] + census_raw['tract'] + census_raw['block group']
+
+        # Rename columns
+        rename_dict = {'GEOID': 'blockgroup_id', 'NAME': 'bg_name'}
+        if isinstance(variables, dict):
+            rename_dict.update(variables)
+        census_data = census_raw.rename(columns=rename_dict)
+
+        # Convert numeric columns
+        for col in (variables.values() if isinstance(variables, dict) else variables):
+            census_data[col] = pd.to_numeric(census_data[col], errors='coerce')
+        return census_data
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fetch ACS block-group variables')
+    parser.add_argument('--state', default='45')
+    parser.add_argument('--counties', nargs='+', default=['019', '015'],
+                        help="Three-digit county codes ('*' for all counties in the state)")
+    parser.add_argument('--year', type=int, default=ACS_YEAR)
+    parser.add_argument('--base-url', default=CENSUS_API)
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=None, help='Max requests per second')
+    parser.add_argument('--mock', action='store_true',
+                        help='Serve responses from a local mock server (no network access)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Mock server latency per request (s)')
+    parser.add_argument('--output', default=None, help='CSV to write')
+    args = parser.parse_args()
+
+    def run(base_url):
+        with CensusFetcher(base_url, year=args.year, cache_dir=args.cache_dir,
+                           max_workers=args.workers, rate=args.rate) as fetcher:
+            start = time.perf_counter()
+            census_data = fetcher.fetch_block_groups([(args.state, c) for c in args.counties])
+            elapsed = time.perf_counter() - start
+        print(f"✓ {len(census_data):,} block groups, {fetcher.requests_made} requests in {elapsed:.2f}s")
+        if args.output:
+            census_data.to_csv(args.output, index=False)
+            print(f"✓ Saved census data to {args.output}")
+
+    if args.mock:
+        from mock_census_server import serve
+        with serve(latency=args.latency) as base_url:
+            run(base_url)
+    else:
+        run(args.base_url)
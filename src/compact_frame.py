@@ -0,0 +1,124 @@
+"""
+Compact Arrest Frame - Integer Keys and Categorical Labels
+Replaces the string identifiers the analysis groups, merges and counts on
+with integer codes, keeping a small codebook to map results back to labels
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from arrest_loader import GEOID_COLUMN, geoid_strings
+
+# Divisors that turn a 12-digit block group GEOID into its parent units
+# (state 2 + county 3 + tract 6 + block group 1 digits)
+TRACT_DIVISOR = 10
+COUNTY_DIVISOR = 10 ** 7
+
+POLICING_CATEGORIES = ['Ultra-Policed', 'Highly Policed', 'Normally Policed']
+
+CATEGORICAL_COLUMNS = ['Arrest_crime_category', 'Gender', 'Race']
+
+
+def blockgroup_ids(geoids):
+    """12-digit block group GEOIDs as int64, from string or numeric GEOIDs."""
+    column = geoids if isinstance(geoids, (pa.Array, pa.ChunkedArray)) else pa.array(geoids, from_pandas=True)
+    prefix = pc.utf8_slice_codeunits(geoid_strings(column), 0, 12)
+    return pc.cast(prefix, pa.int64()).to_numpy(zero_copy_only=False)
+
+
+def tract_ids(blockgroup_id):
+    """11-digit tract GEOIDs from integer block group GEOIDs."""
+    return blockgroup_id // TRACT_DIVISOR
+
+
+def county_ids(blockgroup_id):
+    """5-digit state+county FIPS codes from integer block group GEOIDs."""
+    return blockgroup_id // COUNTY_DIVISOR
+
+
+def county_codes(blockgroup_id):
+    """Three-digit county code strings ('019') from integer block group GEOIDs."""
+    return pd.Series(county_ids(blockgroup_id) % 1000, index=getattr(blockgroup_id, 'index', None)).map('{:03d}'.format)
+
+
+def _dictionary_codes(column):
+    """int32 codes (-1 for null) and labels for a string column, without Python objects."""
+    encoded = column.combine_chunks().dictionary_encode() if isinstance(column, pa.ChunkedArray) \
+        else column.dictionary_encode()
+    codes = pc.fill_null(encoded.indices, -1).to_numpy(zero_copy_only=False).astype(np.int32)
+    return codes, pd.Index(encoded.dictionary.to_pandas())
+
+
+def compact_arrests(arrests, categorical_columns=CATEGORICAL_COLUMNS):
+    """
+    Convert loaded arrests (pyarrow Table, RecordBatch or DataFrame) to the
+    compact form.
+
+    - DefendantId becomes int32 codes (original IDs kept in the codebook);
+      arrests without a DefendantId are dropped, as they cannot be counted
+      as a person (a -1 code would count as one, or index out of bounds)
+    - DefendantAddressGEOID10 is replaced by int64 blockgroup_id, tract_id
+      and county_id columns
+    - Arrest_crime_category, Gender and Race (when loaded) become categoricals
+      (as do any other categorical_columns, e.g. ChargeDescription)
+    - Age_years is stored as float32 when that is lossless
+
+    Returns (compact_frame, codebook).
+    """
+    table = arrests if isinstance(arrests, (pa.Table, pa.RecordBatch)) \
+        else pa.Table.from_pandas(arrests, preserve_index=False)
+    if table.column('DefendantId').null_count:
+        table = table.filter(pc.is_valid(table.column('DefendantId')))
+    compact = pd.DataFrame(index=pd.RangeIndex(table.num_rows))
+
+    codes, defendant_ids = _dictionary_codes(table.column('DefendantId'))
+    compact['DefendantId'] = codes
+
+    blockgroup_id = blockgroup_ids(table.column(GEOID_COLUMN))
+    compact['blockgroup_id'] = blockgroup_id
+    compact['tract_id'] = tract_ids(blockgroup_id)
+    compact['county_id'] = county_ids(blockgroup_id).astype(np.int32)
+
+    compact['ArrestDate'] = table.column('ArrestDate').to_pandas().to_numpy()
+
+    codebook = {'DefendantId': defendant_ids.rename('DefendantId')}
+    for col in categorical_columns:
+        if col not in table.column_names:
+            continue
+        codes, labels = _dictionary_codes(table.column(col))
+        compact[col] = pd.Categorical.from_codes(codes, categories=labels)
+        codebook[col] = labels
+
+    age = table.column('Age_years').to_numpy().astype(np.float64)
+    age32 = age.astype(np.float32)
+    lossless = np.array_equal(age32.astype(np.float64), age, equal_nan=True)
+    compact['Age_years'] = age32 if lossless else age
+
+    return compact, codebook
+
+
+def policing_categorical(labels):
+    """Policing category labels as an ordered categorical (Ultra first)."""
+    return pd.Categorical(labels, categories=POLICING_CATEGORIES, ordered=True)
+
+
+def decode_defendants(codebook, codes):
+    """Map int32 defendant codes back to the original DefendantId values."""
+    return codebook['DefendantId'].take(np.asarray(codes))
+
+
+def codebook_table(codebook):
+    """Long-format mapping table (column, code, label) for the categorical codes."""
+    frames = [
+        pd.DataFrame({'column': col, 'code': np.arange(len(labels)), 'label': np.asarray(labels, dtype=object)})
+        for col, labels in codebook.items()
+        if col != 'DefendantId'
+    ]
+    frames.append(pd.DataFrame({
+        'column': 'policing_category',
+        'code': np.arange(len(POLICING_CATEGORIES)),
+        'label': POLICING_CATEGORIES,
+    }))
+    return pd.concat(frames, ignore_index=True)
@@ -2,596 +2,1744 @@
 Geographic Policing Intensity Analysis - Corrected Scope
 Charleston County (45019) and Berkeley County (45015) ONLY
 Following updated methodology guide with proper geographic boundaries
+
+The analysis runs as named stages (load, filter, census, rates, cut_points,
+categories, risks, figures, report). Each stage's outputs are cached under
+.stage_cache/ keyed by its code, parameters, source files and upstream
+stages, so a re-run only recomputes what changed.
 """
 
+import argparse
+import importlib.util
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
-import requests
 import json
-from sklearn.cluster import KMeans
-from scipy import stats
-from scipy.interpolate import UnivariateSpline
+import time
+from arrest_loader import (OPTIONAL_ARREST_COLUMNS, STATE_FIPS, TARGET_COUNTIES, arrest_columns, arrest_date_range,
+                           county_filter, county_name, load_arrests, open_arrest_dataset, region_description,
+                           region_label)
+from compact_frame import CATEGORICAL_COLUMNS, compact_arrests, county_codes, county_ids, policing_categorical
+from subgroup_aggregation import MARGIN_LABEL, aggregate_subgroups, subgroup, subgroup_mask
+from streaming_aggregation import StreamingAggregator, stream_arrests
+from sql_backend import BACKENDS, sql_aggregate
+from validation import ValidationError, arrest_rows, raise_failures, report, tally, validation_checks
+from stage_cache import StageCache
+from figures import FIGURES, SUMMARY_FIGURE
+from run_profile import PROFILERS, RunProfiler
+from cut_point_sensitivity import CATEGORY_PREFIXES, CutPointSweep, blockgroup_pairs
+from categorizers import CATEGORIZERS, categorize, variance_fit
+from demographics import (AGE_BAND_STARTS, AGE_BANDS, ALL_LABEL, RACE_GROUPS, SEXES,
+                          demographic_variables, group_populations, population_array, risk_matrix,
+                          total_populations)
+from report import REPORT_NAME, render_report
+from results_bundle import update_manifest, write_bundle
+from progression import ever_progressed, offense_transitions
+from projection import AVERAGE_HOUSEHOLD_SIZE, DEFAULT_AGES, START_AGE, projection_table
+from query_cube import QUERY_CUBE_DIR, build_cube, write_cube
+from geography_cube import MIN_ARRESTS, GeographyCube, distinct_pairs
+from rolling_risks import WINDOWS, RollingRisks, month_fingerprints, month_index, month_label, saved_last_month
+from escalation import (arrest_sequences, conditional_probabilities, escalation_risks,
+                        frequency_distribution, gap_summary, repeat_by_offense)
 import warnings
 warnings.filterwarnings('ignore')
 
-# Set style
-plt.style.use('default')
-sns.set_palette("husl")
-
 # Set up paths
 BASE_PATH = Path(__file__).parent.parent
 DATA_PATH = BASE_PATH / 'data'
 FIGURES_PATH = BASE_PATH / 'figures'
 RESULTS_PATH = BASE_PATH / 'results'
-FIGURES_PATH.mkdir(exist_ok=True)
-RESULTS_PATH.mkdir(exist_ok=True)
+CACHE_PATH = BASE_PATH / '.stage_cache'
+
+# Default study area; census data is read from data/census_<name>.csv
+DEFAULT_REGION = {'name': 'charleston_berkeley', 'state': STATE_FIPS, 'counties': list(TARGET_COUNTIES)}
+
+STAGES = ['load', 'filter', 'census', 'rates', 'cube', 'cut_points', 'categories', 'risks', 'escalation',
+          'validation', 'progression', 'demographics', 'projection', 'query_cube', 'cascade', 'schemes', 'sensitivity', 'bootstrap', 'rolling',
+          'figures', 'report']
+
+# Methodology steps each stage covers (labels in run_profile.json)
+STAGE_STEPS = {
+    'load': 'Step 1',
+    'filter': 'Step 1 (county filter)',
+    'census': 'Steps 1A-1B',
+    'rates': 'Step 2',
+    'cube': 'Step 33 (pooling)',
+    'cut_points': 'Step 3',
+    'categories': 'Step 4',
+    'risks': 'Steps 5-6',
+    'escalation': 'Steps 8-11',
+    'validation': 'Steps 30-32',
+    'cascade': 'Steps 12, 29',
+    'schemes': 'Steps 3-4 (alternative schemes)',
+    'sensitivity': 'Step 34',
+    'bootstrap': 'Step 33',
+    'progression': 'Steps 9 and 22',
+    'demographics': 'Steps 13-16',
+    'projection': 'Steps 7 and 27',
+    'query_cube': 'Steps 2-6, 13-16 (query cube)',
+    'rolling': 'Steps 2-5 (rolling windows)',
+    'figures': 'Visualizations',
+    'report': 'Saving results',
+}
+
+# Discretionary arrest categories (Step 2)
+discretionary_categories = [
+    'Drug Poss',        # Drug possession (not distribution)
+    'Property',         # Minor property crimes
+    'Traffic',          # Traffic violations (non-DUI)
+    'Other Offenses',   # Miscellaneous offenses
+    'Theft'            # Theft/shoplifting
+]
+
+# Target approximately 6-7% ultra, 15-16% highly (based on population)
+CUT_TARGETS = (6.6, 22.0)
+
+# Young men (Step 6)
+YOUNG_MEN_AGE = (18, 35)
+YOUNG_MALE_SHARE = 0.20  # Estimated share of total population
+
+CATEGORY_ORDER = ['Ultra-Policed', 'Highly Policed', 'Normally Policed']
+
+
+def young_men_label(age=YOUNG_MEN_AGE):
+    return f"Young Men ({age[0]}-{age[1]})"
+
+
+def analysis_subgroups(age=YOUNG_MEN_AGE):
+    """
+    Subgroups counted for every policing category (Phase 2 and drug analysis).
+    New subgroups are added here, not as new per-category loops.
+    """
+    return [
+        subgroup('Overall'),
+        subgroup(young_men_label(age), sex='Male', age=tuple(age)),
+        subgroup('Drug', offense='Drug'),
+    ]
+
+
+def categorize_policing(rates, cut1_rate, cut2_rate):
+    """Category label per rate: >= cut1 Ultra, >= cut2 Highly, otherwise Normally."""
+    rates = np.asarray(rates)
+    return np.select([rates >= cut1_rate, rates >= cut2_rate],
+                     CATEGORY_ORDER[:2], default=CATEGORY_ORDER[2]).astype(object)
+
+
+def add_risk_columns(table, years_of_data, young_men_age=YOUNG_MEN_AGE, young_male_share=YOUNG_MALE_SHARE):
+    """
+    Steps 5-6 and drug risks from per-category count columns (as produced by
+    CutPointSweep.evaluate and replicate_counts), one row per scenario.
+    """
+    young_men = young_men_label(young_men_age)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for prefix in CATEGORY_PREFIXES.values():
+            population = table[f'{prefix}_pop']
+            table[f'{prefix}_overall_risk_pct'] = table[f'{prefix}_unit_unique'] / years_of_data / population * 100
+            table[f'{prefix}_young_men_risk_pct'] = table[f'{prefix}_{young_men}'] / years_of_data / (population * young_male_share) * 100
+            table[f'{prefix}_drug_per_1000'] = table[f'{prefix}_Drug'] / years_of_data / population * 1000
+        for metric, column in [('overall', 'overall_risk_pct'), ('young', 'young_men_risk_pct'), ('drug', 'drug_per_1000')]:
+            normal = table[f'normal_{column}']
+            table[f'{metric}_ratio'] = np.where(normal > 0, table[f'ultra_{column}'] / normal, 0)
+    return table
 
-print("="*80)
-print("CORRECTED GEOGRAPHIC POLICING INTENSITY ANALYSIS")
-print("Charleston County (45019) and Berkeley County (45015) ONLY")
-print("="*80)
 
 # ============================================================================
 # PHASE 1: DATA PREPARATION AND GEOGRAPHIC CATEGORIZATION
 # ============================================================================
 
-print("\n" + "="*80)
-print("PHASE 1: DATA PREPARATION - CORRECTED GEOGRAPHIC SCOPE")
-print("="*80)
-
-# Step 1: Load and Prepare Geographic Data
-print("\n>>> Step 1: Load and Prepare Geographic Data")
-print("-" * 40)
-
-arrests = pd.read_parquet(DATA_PATH / 'census_mapped_anon_data.parquet')
-print(f"✓ Loaded {len(arrests):,} arrests")
-print(f"✓ Unique individuals: {arrests['DefendantId'].nunique():,}")
-print(f"✓ Time period: {arrests['ArrestDate'].min()} to {arrests['ArrestDate'].max()}")
-
-# Extract block group GEOID
-arrests['blockgroup_id'] = arrests['DefendantAddressGEOID10'].astype(str).str[:12]
-years_of_data = (arrests['ArrestDate'].max() - arrests['ArrestDate'].min()).days / 365.25
-print(f"✓ Years of data: {years_of_data:.1f}")
-
-# CRITICAL: Filter to Charleston/Berkeley Counties ONLY
-print("\n>>> GEOGRAPHIC VALIDATION: Charleston/Berkeley Counties Only")
-print("-" * 40)
-
-# Extract county codes from block group IDs
-arrests['county_code'] = arrests['blockgroup_id'].str[2:5]
-print("County codes found in data:")
-county_counts = arrests['county_code'].value_counts()
-for county, count in county_counts.items():
-    print(f"  {county}: {count:,} arrests")
-
-# FILTER TO TARGET COUNTIES ONLY
-target_counties = ['019', '015']  # Charleston, Berkeley
-arrests_filtered = arrests[arrests['county_code'].isin(target_counties)].copy()
-
-print(f"\n✓ Original arrests: {len(arrests):,}")
-print(f"✓ After filtering to Charleston/Berkeley: {len(arrests_filtered):,}")
-print(f"✓ Filtered out: {len(arrests) - len(arrests_filtered):,} arrests from other counties")
-print(f"✓ Unique block groups in target counties: {arrests_filtered['blockgroup_id'].nunique()}")
-
-# Step 1A: Obtain Census Data for Target Counties Only
-print("\n>>> Step 1A: Obtain Census Data - Charleston/Berkeley Counties")
-print("-" * 40)
-
-census_file = DATA_PATH / 'census_charleston_berkeley.csv'
-if census_file.exists():
-    print("Loading existing census data for Charleston/Berkeley...")
-    census_data = pd.read_csv(census_file)
-else:
-    print("Fetching census data from API for Charleston/Berkeley counties only...")
-    
-    # Census API endpoint for Charleston and Berkeley counties
-    base_url = "https://api.census.gov/data/2019/acs/acs5"
-    
-    variables = {
-        'B01001_001E': 'total_pop',
-        'B01001_002E': 'male_pop',
-        'B01001_026E': 'female_pop',
-        'B02001_002E': 'white_pop',
-        'B02001_003E': 'black_pop',
-        'B03002_012E': 'hispanic_pop',
-        'B19013_001E': 'median_income',
-        'B17001_002E': 'poverty_count',
-        'B25077_001E': 'median_home_value'
+def stage_load(source, counties, state=STATE_FIPS, streaming=False, approximate=False, batch_size=1_000_000,
+               subgroups=None, discretionary_categories=None, extra_columns=(), backend='pandas', threads=None,
+               validate=False):
+    """
+    Step 1: study period and the target-county arrests (or their streamed
+    aggregates). extra_columns are also loaded, as categoricals. The duckdb
+    backend builds the streamed aggregates with SQL plans instead. With
+    validate, the Step 30 arrest checks are tallied over the loaded rows in
+    the same scan (outputs['arrest_checks']).
+    """
+    print("\n" + "="*80)
+    print("PHASE 1: DATA PREPARATION - CORRECTED GEOGRAPHIC SCOPE")
+    print("="*80)
+
+    # Step 1: Load and Prepare Geographic Data
+    print("\n>>> Step 1: Load and Prepare Geographic Data")
+    print("-" * 40)
+
+    arrest_dataset = open_arrest_dataset(source)
+    checks = validation_checks(state)
+    arrests_in_source = arrest_dataset.count_rows()
+    print(f"✓ Arrests in source data: {arrests_in_source:,}")
+
+    # Study period from the full dataset (Parquet statistics, no column scan)
+    arrest_start, arrest_end = arrest_date_range(arrest_dataset)
+    print(f"✓ Time period: {arrest_start} to {arrest_end}")
+    years_of_data = (arrest_end - arrest_start).days / 365.25
+    print(f"✓ Years of data: {years_of_data:.1f}")
+
+    outputs = {
+        'arrests_in_source': arrests_in_source,
+        'arrest_start': arrest_start,
+        'arrest_end': arrest_end,
+        'years_of_data': years_of_data,
+        'streaming': streaming,
+    }
+
+    # The county filter is pushed down to the Parquet reader, and only the
+    # columns the analysis uses are read
+    if backend == 'duckdb':
+        # Same aggregates as streaming mode, from one multi-threaded DuckDB scan
+        print(f"Aggregating arrests with DuckDB{f' ({threads} threads)' if threads else ''}...")
+        arrest_stream = sql_aggregate(arrest_dataset, subgroups, discretionary_categories,
+                                      counties=counties, state=state, threads=threads)
+        outputs.update(arrest_stream.to_outputs())
+    elif streaming:
+        # Out-of-core: keep only mergeable per-block-group partial aggregates
+        print(f"Streaming arrests in batches of {batch_size:,} rows"
+              f"{' (approximate unique counts)' if approximate else ''}...")
+        arrest_checks = {}
+        on_batch = (lambda batch: tally(checks, 'arrests', arrest_rows(batch), arrest_checks)) if validate else None
+        arrest_stream = stream_arrests(arrest_dataset, subgroups, discretionary_categories,
+                                       counties=counties, state=state, batch_size=batch_size,
+                                       approximate=approximate, on_batch=on_batch)
+        outputs.update(arrest_stream.to_outputs())
+        if validate:
+            outputs['arrest_checks'] = arrest_checks
+    else:
+        arrest_table = load_arrests(arrest_dataset, counties=counties, state=state, as_table=True,
+                                    optional_columns=OPTIONAL_ARREST_COLUMNS + list(extra_columns))
+
+        # Compact form: int32 DefendantId codes, int64 block group/tract/county
+        # GEOIDs and categorical labels (codebook maps codes back to labels)
+        missing_ids = arrest_table.column('DefendantId').null_count
+        if validate:
+            outputs['arrest_checks'] = tally(checks, 'arrests', arrest_rows(arrest_table))
+        arrests, codebook = compact_arrests(arrest_table, CATEGORICAL_COLUMNS + list(extra_columns))
+        del arrest_table
+        if missing_ids:
+            print(f"WARNING: Dropped {missing_ids:,} arrests without a DefendantId")
+        print(f"✓ Memory: {arrests.memory_usage(deep=True).sum() / 1e6:,.1f} MB")
+        outputs['arrests'] = arrests
+        outputs['defendant_ids'] = codebook['DefendantId'].to_frame(index=False)
+    return outputs
+
+
+def stage_filter(load, counties, discretionary_categories, state=STATE_FIPS):
+    """Geographic validation and per-block-group arrest aggregates (Steps 1B/2 inputs)."""
+    # CRITICAL: Filter to the region's counties ONLY
+    scope = region_label(counties, state)
+    print(f"\n>>> GEOGRAPHIC VALIDATION: {scope} Only")
+    print("-" * 40)
+
+    if load['streaming']:
+        arrest_stream = StreamingAggregator.from_outputs(load)
+        arrests_analyzed = arrest_stream.rows
+        unique_individuals_total = arrest_stream.unique_individuals
+        county_counts = arrest_stream.county_counts()
+        bg_arrests = arrest_stream.blockgroup_totals()
+        blockgroups_with_arrests = len(bg_arrests)
+        discretionary_total = arrest_stream.discretionary_arrests
+        bg_discretionary = arrest_stream.discretionary_totals()
+    else:
+        arrests_filtered = load['arrests']
+        arrests_analyzed = len(arrests_filtered)
+        unique_individuals_total = arrests_filtered['DefendantId'].nunique()
+        county_counts = (arrests_filtered['county_id'] % 1000).value_counts()
+        blockgroups_with_arrests = arrests_filtered['blockgroup_id'].nunique()
+
+        # Get arrest counts by block group
+        bg_arrests = arrests_filtered.groupby('blockgroup_id').agg({
+            'DefendantId': ['count', 'nunique']
+        }).reset_index()
+        bg_arrests.columns = ['blockgroup_id', 'total_arrests', 'unique_individuals']
+
+        is_discretionary = arrests_filtered['Arrest_crime_category'].isin(discretionary_categories)
+        discretionary_total = int(is_discretionary.sum())
+
+        # Calculate discretionary arrests by block group
+        bg_discretionary = arrests_filtered[is_discretionary].groupby('blockgroup_id').size().reset_index(name='discretionary_arrests')
+
+    print(f"✓ Loaded {arrests_analyzed:,} arrests")
+    print(f"✓ Unique individuals: {unique_individuals_total:,.0f}")
+
+    print("County codes found in data:")
+    for county, count in county_counts.items():
+        print(f"  {county:03d}: {count:,} arrests")
+
+    arrests_in_source = load['arrests_in_source']
+    print(f"\n✓ Original arrests: {arrests_in_source:,}")
+    print(f"✓ After filtering to {scope}: {arrests_analyzed:,}")
+    print(f"✓ Filtered out: {arrests_in_source - arrests_analyzed:,} arrests from other counties")
+    print(f"✓ Unique block groups in target counties: {blockgroups_with_arrests}")
+
+    return {
+        'arrests_analyzed': arrests_analyzed,
+        'unique_individuals_total': unique_individuals_total,
+        'discretionary_total': discretionary_total,
+        'bg_arrests': bg_arrests,
+        'bg_discretionary': bg_discretionary,
     }
-    
-    target_counties = ['019', '015']  # Charleston, Berkeley
-    all_census_data = []
-    
-    for county in target_counties:
-        # Construct API call
-        var_string = ','.join(variables.keys())
-        url = f"{base_url}?get=NAME,{var_string}&for=block%20group:*&in=state:45&in=county:{county}"
-        
+
+
+def stage_census(filtered, census_file, counties, state=STATE_FIPS, census_api=None, census_cache=None,
+                 demographics_file=None):
+    """
+    Steps 1A/1B: census block group data for the target counties, merged with
+    arrests (and the B01001A-I race x sex x age populations when
+    demographics_file is given).
+    """
+    # Step 1A: Obtain Census Data for Target Counties Only
+    scope = region_label(counties, state)
+    print(f"\n>>> Step 1A: Obtain Census Data - {scope}")
+    print("-" * 40)
+
+    census_file = Path(census_file)
+    if census_file.exists():
+        print(f"Loading existing census data for {scope}...")
+        census_data = pd.read_csv(census_file)
+    else:
+        print(f"Fetching census data from API for {scope} only...")
+        from census_fetcher import CENSUS_API, CensusFetchError, CensusFetcher
         try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                data = response.json()
-                headers = data[0]
-                rows = data[1:]
-                
-                county_df = pd.DataFrame(rows, columns=headers)
-                all_census_data.append(county_df)
-                county_name = "Charleston" if county == "019" else "Berkeley"
-                print(f"  ✓ Fetched {county_name} County: {len(county_df)} block groups")
-            else:
-                print(f"  ✗ Failed to fetch county {county}: {response.status_code}")
-        except Exception as e:
-            print(f"  ✗ Error fetching county {county}: {e}")
-    
-    if all_census_data:
-        census_raw = pd.concat(all_census_data, ignore_index=True)
-        
-        # Create GEOID
-        census_raw['GEOID'] = census_raw['state'] + census_raw['county'] + census_raw['tract'] + census_raw['block group']
-        
-        # Rename columns
-        rename_dict = {'GEOID': 'blockgroup_id', 'NAME': 'bg_name'}
-        for api_name, friendly_name in variables.items():
-            rename_dict[api_name] = friendly_name
-        
-        census_data = census_raw.rename(columns=rename_dict)
-        
-        # Convert numeric columns
-        for col in variables.values():
-            census_data[col] = pd.to_numeric(census_data[col], errors='coerce')
-        
+            with CensusFetcher(census_api or CENSUS_API, cache_dir=census_cache) as fetcher:
+                census_data = fetcher.fetch_block_groups([(state, county) for county in counties])
+        except CensusFetchError as e:
+            print(f"ERROR: Could not fetch census data from API ({e})")
+            exit(1)
+        for county, count in census_data['county'].value_counts(sort=False).items():
+            print(f"  ✓ Fetched {county_name(county, state)}: {count} block groups")
+
         # Save for future use
         census_data.to_csv(census_file, index=False)
         print(f"✓ Saved census data to {census_file}")
+
+    # Integer GEOIDs to match the compact arrest frame
+    census_data['blockgroup_id'] = census_data['blockgroup_id'].astype('int64')
+
+    # A shared or statewide census file also covers other counties
+    in_region = ((county_ids(census_data['blockgroup_id']) // 1000 == int(state))
+                 & county_codes(census_data['blockgroup_id']).isin(counties))
+    if not in_region.all():
+        print(f"✓ Kept {int(in_region.sum())} of {len(census_data)} census block groups in {scope}")
+        census_data = census_data[in_region].reset_index(drop=True)
+
+    print(f"✓ Census data: {len(census_data)} block groups")
+    print(f"✓ Total population: {census_data['total_pop'].sum():,}")
+
+    # Validate counties
+    census_data['county_from_id'] = county_codes(census_data['blockgroup_id'])
+    census_counties = census_data['county_from_id'].value_counts()
+    print("\nCensus data by county:")
+    for county, count in census_counties.items():
+        print(f"  {county_name(county, state)}: {count} block groups")
+
+    # Step 1B: Merge Census Data with Geographic Units
+    print("\n>>> Step 1B: Merge Census Data with Arrests - Geographic Validation")
+    print("-" * 40)
+
+    # Merge with census data
+    bg_data = census_data[['blockgroup_id', 'total_pop', 'white_pop', 'black_pop', 
+                           'hispanic_pop', 'median_income', 'poverty_count']].merge(
+        filtered['bg_arrests'], on='blockgroup_id', how='inner'
+    )
+
+    print(f"✓ Matched {len(bg_data)} block groups with both census and arrest data")
+    without_arrests = (~census_data['blockgroup_id'].isin(filtered['bg_arrests']['blockgroup_id'])).sum()
+    if without_arrests:
+        print(f"  ({without_arrests} census block groups have no arrests; they are kept in the geography cube)")
+    print(f"✓ Population coverage: {bg_data['total_pop'].sum():,}")
+    print(f"✓ Arrests coverage: {bg_data['total_arrests'].sum():,}")
+
+    # Validate geographic scope
+    bg_data['county_check'] = county_codes(bg_data['blockgroup_id'])
+    valid_counties = bg_data['county_check'].isin(counties)
+    if not valid_counties.all():
+        print(f"WARNING: Found block groups outside {scope}:")
+        invalid = bg_data[~valid_counties]['county_check'].value_counts()
+        print(invalid)
     else:
-        print("ERROR: Could not fetch census data from API")
-        exit(1)
+        print(f"✓ All block groups confirmed in {scope}")
+
+    outputs = {'census_data': census_data, 'bg_data': bg_data}
+    if demographics_file:
+        demographics_file = Path(demographics_file)
+        if demographics_file.exists():
+            demographics = pd.read_csv(demographics_file)
+        else:
+            print("Fetching B01001A-I race x sex x age tables from the census API...")
+            from census_fetcher import CENSUS_API, CensusFetchError, CensusFetcher
+            try:
+                with CensusFetcher(census_api or CENSUS_API, cache_dir=census_cache) as fetcher:
+                    demographics = fetcher.fetch_block_groups([(state, county) for county in counties],
+                                                              demographic_variables())
+            except CensusFetchError as e:
+                print(f"ERROR: Could not fetch demographic tables from API ({e})")
+                exit(1)
+            demographics = demographics[['blockgroup_id', *demographic_variables().values()]]
+            demographics.to_csv(demographics_file, index=False)
+            print(f"✓ Saved demographic tables to {demographics_file}")
+        outputs['demographics'] = population_array(demographics, census_data['blockgroup_id'])
+        print(f"✓ Race x sex x age populations: {outputs['demographics'].shape[1:]} cells per block group")
+    return outputs
+
+
+def stage_rates(filtered, census, scope=region_label()):
+    """Step 2: discretionary arrests and per-1,000 rates by block group."""
+    print("\n>>> Step 2: Identify Discretionary Arrests")
+    print("-" * 40)
+
+    arrests_analyzed = filtered['arrests_analyzed']
+    discretionary_total = filtered['discretionary_total']
+    mandatory_total = arrests_analyzed - discretionary_total
+
+    print(f"✓ Total arrests ({scope}): {arrests_analyzed:,}")
+    print(f"✓ Discretionary arrests: {discretionary_total:,} ({discretionary_total / arrests_analyzed * 100:.1f}%)")
+    print(f"✓ Mandatory arrests: {mandatory_total:,} ({mandatory_total / arrests_analyzed * 100:.1f}%)")
+
+    bg_data = census['bg_data'].merge(filtered['bg_discretionary'], on='blockgroup_id', how='left')
+    bg_data['discretionary_arrests'] = bg_data['discretionary_arrests'].fillna(0)
+
+    # Calculate rates per 1,000 using ACTUAL census population
+    bg_data = bg_data[bg_data['total_pop'] > 0]  # Remove zero population areas
+    bg_data['discretionary_per_1000'] = (bg_data['discretionary_arrests'] / bg_data['total_pop']) * 1000
+    bg_data['total_per_1000'] = (bg_data['total_arrests'] / bg_data['total_pop']) * 1000
+    bg_data['unique_per_1000'] = (bg_data['unique_individuals'] / bg_data['total_pop']) * 1000
+
+    print(f"\nDiscretionary arrest rate statistics ({scope}):")
+    print(f"  Min: {bg_data['discretionary_per_1000'].min():.1f} per 1,000")
+    print(f"  Max: {bg_data['discretionary_per_1000'].max():.1f} per 1,000")
+    print(f"  Mean: {bg_data['discretionary_per_1000'].mean():.1f} per 1,000")
+    print(f"  Median: {bg_data['discretionary_per_1000'].median():.1f} per 1,000")
+
+    return {'bg_data': bg_data}
+
+
+def stage_cube(load, filtered, census, results_path, min_arrests=MIN_ARRESTS):
+    """
+    Step 33 inputs: the block group -> tract -> county rollup cube and each
+    block group's counts pooled up to the first unit with min_arrests.
+    """
+    print("\n>>> Geography Rollup Cube and Small-Area Pooling (Step 33)")
+    print("-" * 40)
+
+    if load['streaming']:
+        arrest_stream = StreamingAggregator.from_outputs(load)
+        pairs = None if arrest_stream.approximate else arrest_stream.blockgroup_pairs()[:2]
+    else:
+        pairs = distinct_pairs(load['arrests']['blockgroup_id'].to_numpy(), load['arrests']['DefendantId'].to_numpy())
+    cube = GeographyCube.build(census['census_data'], filtered['bg_arrests'], filtered['bg_discretionary'], pairs)
+    for level, frame in cube.levels.items():
+        print(f"  {level:<10} {len(frame):>6,} units, {int(frame['total_arrests'].sum()):>10,} arrests")
+
+    pooled = cube.pooled(min_arrests)
+    small = pooled['pooled_level'] != 'blockgroup'
+    print(f"✓ {int(small.sum())} block groups under {min_arrests} arrests pooled up "
+          f"({', '.join(f'{n} to {level}' for level, n in pooled.loc[small, 'pooled_level'].value_counts().items())})"
+          if small.any() else f"✓ Every block group has at least {min_arrests} arrests")
+
+    results_path = Path(results_path)
+    results_path.mkdir(parents=True, exist_ok=True)
+    cube_frame = cube.to_frame()
+    cube_frame.to_csv(results_path / 'geography_cube.csv', index=False)
+    pooled.to_csv(results_path / 'blockgroup_pooled.csv', index=False)
+    print(f"✓ Saved {results_path / 'geography_cube.csv'} and {results_path / 'blockgroup_pooled.csv'}")
+    return {'cube': cube_frame, 'pooled': pooled}
+
+
+def stage_cut_points(rates, cut_targets=CUT_TARGETS, scope=region_label()):
+    """Step 3: sort by discretionary rate and find the population cut points."""
+    print("\n>>> Step 3: Create Distribution and Identify Cut Points")
+    print("-" * 40)
+
+    # Sort by discretionary rate
+    bg_data = rates['bg_data'].sort_values('discretionary_per_1000', ascending=False).reset_index(drop=True)
+    bg_data['cumulative_pop'] = bg_data['total_pop'].cumsum()
+    bg_data['cumulative_pop_pct'] = bg_data['cumulative_pop'] / bg_data['total_pop'].sum() * 100
+
+    cut1_idx = np.argmax(bg_data['cumulative_pop_pct'] >= cut_targets[0])
+    cut2_idx = np.argmax(bg_data['cumulative_pop_pct'] >= cut_targets[1])
+
+    cut1_rate = bg_data.iloc[cut1_idx]['discretionary_per_1000']
+    cut2_rate = bg_data.iloc[cut2_idx]['discretionary_per_1000']
+
+    print(f"Final cut points ({scope} scope):")
+    print(f"  Cut 1: {cut1_rate:.1f} per 1,000 (top {bg_data.iloc[cut1_idx]['cumulative_pop_pct']:.1f}%)")
+    print(f"  Cut 2: {cut2_rate:.1f} per 1,000 (top {bg_data.iloc[cut2_idx]['cumulative_pop_pct']:.1f}%)")
+
+    return {'bg_data': bg_data, 'cut1_rate': cut1_rate, 'cut2_rate': cut2_rate}
+
+
+def stage_categories(cut_points, scope=region_label()):
+    """Step 4: assign the three policing categories and summarize them."""
+    print("\n>>> Step 4: Establish Three Categories")
+    print("-" * 40)
+
+    cut1_rate = cut_points['cut1_rate']
+    cut2_rate = cut_points['cut2_rate']
+
+    bg_data = cut_points['bg_data'].copy()
+    bg_data['policing_category'] = categorize_policing(bg_data['discretionary_per_1000'], cut1_rate, cut2_rate)
+
+    # Calculate category statistics
+    category_stats = bg_data.groupby('policing_category').agg({
+        'total_pop': 'sum',
+        'total_arrests': 'sum',
+        'discretionary_arrests': 'sum',
+        'unique_individuals': 'sum',
+        'blockgroup_id': 'count',
+        'white_pop': 'sum',
+        'black_pop': 'sum',
+        'hispanic_pop': 'sum'
+    }).rename(columns={'blockgroup_id': 'num_blockgroups'})
+
+    category_stats['pop_pct'] = category_stats['total_pop'] / category_stats['total_pop'].sum() * 100
+    category_stats['disc_per_1000'] = (category_stats['discretionary_arrests'] / category_stats['total_pop']) * 1000
+    category_stats['total_per_1000'] = (category_stats['total_arrests'] / category_stats['total_pop']) * 1000
+    category_stats['unique_per_1000'] = (category_stats['unique_individuals'] / category_stats['total_pop']) * 1000
+
+    print(f"\nPolicing Intensity Categories ({scope}):")
+    for cat in CATEGORY_ORDER:
+        if cat in category_stats.index:
+            stats = category_stats.loc[cat]
+            print(f"\n{cat}:")
+            print(f"  Block groups: {stats['num_blockgroups']:.0f}")
+            print(f"  Population: {stats['total_pop']:,.0f} ({stats['pop_pct']:.1f}%)")
+            print(f"  Discretionary per 1,000: {stats['disc_per_1000']:.1f}")
+            print(f"  Total per 1,000: {stats['total_per_1000']:.1f}")
+            print(f"  Unique individuals per 1,000: {stats['unique_per_1000']:.1f}")
+
+    return {'bg_data': bg_data, 'category_stats': category_stats}
 
-print(f"✓ Census data: {len(census_data)} block groups")
-print(f"✓ Total population: {census_data['total_pop'].sum():,}")
-
-# Validate counties
-census_data['county_from_id'] = census_data['blockgroup_id'].str[2:5]
-census_counties = census_data['county_from_id'].value_counts()
-print("\nCensus data by county:")
-for county, count in census_counties.items():
-    county_name = "Charleston" if county == "019" else "Berkeley" if county == "015" else f"County {county}"
-    print(f"  {county_name}: {count} block groups")
-
-# Step 1B: Merge Census Data with Geographic Units
-print("\n>>> Step 1B: Merge Census Data with Arrests - Geographic Validation")
-print("-" * 40)
-
-# Get arrest counts by block group
-bg_arrests = arrests_filtered.groupby('blockgroup_id').agg({
-    'DefendantId': ['count', 'nunique']
-}).reset_index()
-bg_arrests.columns = ['blockgroup_id', 'total_arrests', 'unique_individuals']
-
-# Merge with census data
-bg_data = census_data[['blockgroup_id', 'total_pop', 'white_pop', 'black_pop', 
-                       'hispanic_pop', 'median_income', 'poverty_count']].merge(
-    bg_arrests, on='blockgroup_id', how='inner'
-)
-
-print(f"✓ Matched {len(bg_data)} block groups with both census and arrest data")
-print(f"✓ Population coverage: {bg_data['total_pop'].sum():,}")
-print(f"✓ Arrests coverage: {bg_data['total_arrests'].sum():,}")
-
-# Validate geographic scope
-bg_data['county_check'] = bg_data['blockgroup_id'].str[2:5]
-valid_counties = bg_data['county_check'].isin(['019', '015'])
-if not valid_counties.all():
-    print("WARNING: Found block groups outside Charleston/Berkeley counties:")
-    invalid = bg_data[~valid_counties]['county_check'].value_counts()
-    print(invalid)
-else:
-    print("✓ All block groups confirmed in Charleston/Berkeley counties")
-
-# Step 2: Identify Discretionary Arrests
-print("\n>>> Step 2: Identify Discretionary Arrests")
-print("-" * 40)
 
-discretionary_categories = [
-    'Drug Poss',        # Drug possession (not distribution)
-    'Property',         # Minor property crimes
-    'Traffic',          # Traffic violations (non-DUI)
-    'Other Offenses',   # Miscellaneous offenses
-    'Theft'            # Theft/shoplifting
-]
+# ============================================================================
+# PHASE 2: CALCULATE ANNUAL ARREST RISKS
+# ============================================================================
 
-arrests_filtered['is_discretionary'] = arrests_filtered['Arrest_crime_category'].isin(discretionary_categories)
+def stage_risks(load, categories, subgroups, discretionary_categories,
+                young_men_age=YOUNG_MEN_AGE, young_male_share=YOUNG_MALE_SHARE, scope=region_label()):
+    """Steps 5-6 and the drug offense analysis."""
+    print("\n" + "="*80)
+    print("PHASE 2: CALCULATE ANNUAL ARREST RISKS")
+    print("="*80)
+
+    bg_data = categories['bg_data']
+    category_stats = categories['category_stats']
+    years_of_data = load['years_of_data']
+    young_men = young_men_label(young_men_age)
+
+    # Arrest and unique-individual counts for every category x subgroup cell in
+    # one pass over the arrests (or over the streamed partial aggregates)
+    bg_categories = pd.Series(policing_categorical(bg_data['policing_category']),
+                              index=bg_data['blockgroup_id'].to_numpy())
+    if load['streaming']:
+        subgroup_cells = StreamingAggregator.from_outputs(load).subgroup_cells(bg_categories)
+    else:
+        arrests_filtered = load['arrests']
+        arrests_filtered = arrests_filtered.assign(
+            is_discretionary=arrests_filtered['Arrest_crime_category'].isin(discretionary_categories))
+
+        # Merge category info with arrests (int64 keys, categorical labels)
+        arrests_with_cat = arrests_filtered.merge(
+            bg_data[['blockgroup_id', 'policing_category', 'total_pop']].assign(
+                policing_category=lambda d: policing_categorical(d['policing_category'])),
+            on='blockgroup_id',
+            how='inner'
+        )
+        subgroup_cells = aggregate_subgroups(
+            arrests_with_cat, subgroups, by='policing_category', unit='blockgroup_id', margins=True
+        )
+    cells = subgroup_cells.set_index(['policing_category', 'subgroup'])
+
+    # Step 5: Overall Population Annual Risk
+    print("\n>>> Step 5: Overall Population Annual Risk")
+    print("-" * 40)
+
+    risk_results = []
+    for cat in CATEGORY_ORDER:
+        if cat in category_stats.index:
+            # Summed over block groups, as in category_stats
+            unique_individuals = cells.loc[(cat, 'Overall'), 'unit_unique_individuals']
+            population = category_stats.loc[cat, 'total_pop']
+            
+            annual_unique = unique_individuals / years_of_data
+            annual_risk = (annual_unique / population) * 100
+            
+            print(f"\n{cat}:")
+            print(f"  Population: {population:,.0f}")
+            print(f"  Unique individuals: {unique_individuals:,.0f}")
+            print(f"  Annual risk: {annual_risk:.2f}% (1 in {100/annual_risk:.0f})")
+            
+            risk_results.append({
+                'Category': cat,
+                'Population': population,
+                'Unique_Individuals': unique_individuals,
+                'Annual_Risk_Pct': annual_risk
+            })
+
+    risk_df = pd.DataFrame(risk_results)
+
+    # Step 6: Young Men (18-35) Annual Risk
+    print(f"\n>>> Step 6: {young_men} Annual Risk")
+    print("-" * 40)
+
+    young_men_risks = []
+    for cat in CATEGORY_ORDER:
+        if cat in category_stats.index:
+            unique_young_men = cells.loc[(cat, young_men), 'unique_individuals']
+            
+            # Estimate young male population (20% approximation)
+            est_young_male_pop = category_stats.loc[cat, 'total_pop'] * young_male_share
+            
+            annual_unique = unique_young_men / years_of_data
+            annual_risk = (annual_unique / est_young_male_pop) * 100
+            
+            print(f"\n{cat}:")
+            print(f"  Est. young male pop: {est_young_male_pop:,.0f}")
+            print(f"  Unique young men: {unique_young_men:,}")
+            print(f"  Annual risk: {annual_risk:.2f}% (1 in {100/annual_risk:.0f})")
+            
+            young_men_risks.append({
+                'Category': cat,
+                'Annual_Risk_Pct': annual_risk
+            })
+
+    young_men_df = pd.DataFrame(young_men_risks)
+
+    # Calculate disparities
+    print("\n" + "="*80)
+    print(f"KEY DISPARITIES ({scope.upper()} ONLY)")
+    print("="*80)
+
+    ultra_overall = risk_df[risk_df['Category'] == 'Ultra-Policed']['Annual_Risk_Pct'].values[0]
+    normal_overall = risk_df[risk_df['Category'] == 'Normally Policed']['Annual_Risk_Pct'].values[0]
+    overall_ratio = ultra_overall / normal_overall if normal_overall > 0 else 0
+
+    ultra_young = young_men_df[young_men_df['Category'] == 'Ultra-Policed']['Annual_Risk_Pct'].values[0]
+    normal_young = young_men_df[young_men_df['Category'] == 'Normally Policed']['Annual_Risk_Pct'].values[0]
+    young_ratio = ultra_young / normal_young if normal_young > 0 else 0
+
+    print(f"\nOverall population disparity: {overall_ratio:.1f}x")
+    print(f"  Ultra-Policed: {ultra_overall:.2f}% annual risk")
+    print(f"  Normally Policed: {normal_overall:.2f}% annual risk")
+
+    print(f"\nYoung men ({young_men_age[0]}-{young_men_age[1]}) disparity: {young_ratio:.1f}x")
+    print(f"  Ultra-Policed: {ultra_young:.2f}% annual risk")
+    print(f"  Normally Policed: {normal_young:.2f}% annual risk")
+
+    # ========================================================================
+    # DRUG OFFENSE ANALYSIS
+    # ========================================================================
+
+    print("\n" + "="*80)
+    print("DRUG OFFENSE ANALYSIS")
+    print("="*80)
+
+    print(f"✓ Total drug arrests: {cells.loc[(MARGIN_LABEL, 'Drug'), 'arrests']:,}")
+    print(f"✓ Unique individuals with drug arrests: {cells.loc[(MARGIN_LABEL, 'Drug'), 'unique_individuals']:,}")
+
+    drug_risk_results = []
+    for cat in CATEGORY_ORDER:
+        if cat in category_stats.index:
+            unique_drug = cells.loc[(cat, 'Drug'), 'unique_individuals']
+            population = category_stats.loc[cat, 'total_pop']
+            
+            per_capita_annual = (unique_drug / years_of_data) / population * 1000
+            print(f"{cat}: {per_capita_annual:.2f} per 1,000 annually")
+            
+            drug_risk_results.append({
+                'Category': cat,
+                'Drug_Per_1000_Annual': per_capita_annual
+            })
+
+    drug_risk_df = pd.DataFrame(drug_risk_results)
+
+    ultra_drug = drug_risk_df[drug_risk_df['Category'] == 'Ultra-Policed']['Drug_Per_1000_Annual'].values[0]
+    normal_drug = drug_risk_df[drug_risk_df['Category'] == 'Normally Policed']['Drug_Per_1000_Annual'].values[0]
+    drug_ratio = ultra_drug / normal_drug if normal_drug > 0 else 0
+
+    print(f"\nDrug enforcement disparity: {drug_ratio:.1f}x")
+    print(f"  Ultra-Policed: {ultra_drug:.2f} per 1,000 annually")
+    print(f"  Normally Policed: {normal_drug:.2f} per 1,000 annually")
+
+    return {
+        'subgroup_cells': subgroup_cells,
+        'risk_df': risk_df,
+        'young_men_df': young_men_df,
+        'drug_risk_df': drug_risk_df,
+        'ultra_overall': ultra_overall, 'normal_overall': normal_overall, 'overall_ratio': overall_ratio,
+        'ultra_young': ultra_young, 'normal_young': normal_young, 'young_ratio': young_ratio,
+        'ultra_drug': ultra_drug, 'normal_drug': normal_drug, 'drug_ratio': drug_ratio,
+    }
 
-print(f"✓ Total arrests (Charleston/Berkeley): {len(arrests_filtered):,}")
-print(f"✓ Discretionary arrests: {arrests_filtered['is_discretionary'].sum():,} ({arrests_filtered['is_discretionary'].mean()*100:.1f}%)")
-print(f"✓ Mandatory arrests: {(~arrests_filtered['is_discretionary']).sum():,} ({(~arrests_filtered['is_discretionary']).mean()*100:.1f}%)")
 
-# Calculate discretionary arrests by block group
-bg_discretionary = arrests_filtered[arrests_filtered['is_discretionary']].groupby('blockgroup_id').size().reset_index(name='discretionary_arrests')
-bg_data = bg_data.merge(bg_discretionary, on='blockgroup_id', how='left')
-bg_data['discretionary_arrests'] = bg_data['discretionary_arrests'].fillna(0)
+# ============================================================================
+# PHASE 3: REPEAT ARRESTS AND ESCALATION (Steps 8-11)
+# ============================================================================
 
-# Calculate rates per 1,000 using ACTUAL census population
-bg_data = bg_data[bg_data['total_pop'] > 0]  # Remove zero population areas
-bg_data['discretionary_per_1000'] = (bg_data['discretionary_arrests'] / bg_data['total_pop']) * 1000
-bg_data['total_per_1000'] = (bg_data['total_arrests'] / bg_data['total_pop']) * 1000
-bg_data['unique_per_1000'] = (bg_data['unique_individuals'] / bg_data['total_pop']) * 1000
+def stage_escalation(load, categories, results_path):
+    """Arrest frequency, chronological numbering, repeat rates and escalation risks."""
+    print("\n" + "="*80)
+    print("PHASE 3: REPEAT ARRESTS AND ESCALATION")
+    print("="*80)
+
+    arrests = load['arrests']
+    bg_data = categories['bg_data']
+    category_stats = categories['category_stats']
+    years_of_data = load['years_of_data']
+
+    # One sort by (defendant, date) numbers every arrest
+    sequences = arrest_sequences(arrests)
+    totals = sequences.loc[sequences['ordinal'] == 1, 'total'].to_numpy()
+
+    # Step 8: Arrest Frequency Distribution
+    print("\n>>> Step 8: Arrest Frequency Distribution")
+    print("-" * 40)
+    frequency = frequency_distribution(totals)
+    for _, row in frequency.iterrows():
+        print(f"  {row['arrests']} arrest(s): {row['people']:,} people ({row['pct_people']:.1f}%)")
+    conditional = conditional_probabilities(totals)
+    for _, row in conditional.iterrows():
+        print(f"  P({row['transition']}): {row['probability']:.3f}")
+
+    # Step 9: Repeat Offense Patterns
+    print("\n>>> Step 9: Repeat Offense Patterns")
+    print("-" * 40)
+    gaps = gap_summary(sequences)
+    for _, row in gaps.iterrows():
+        print(f"  Arrest {row['transition']}: median {row['median_days']:.0f} days ({row['arrests']:,} arrests)")
+    by_offense = repeat_by_offense(arrests, sequences)
+    print(f"✓ Arrests per person by offense type: {len(by_offense)} offense types")
+
+    # Step 11: Per Capita Escalation Risk
+    print("\n>>> Step 11: Per Capita Escalation Risk")
+    print("-" * 40)
+    bg_category = pd.Series(policing_categorical(bg_data['policing_category']),
+                            index=bg_data['blockgroup_id'].to_numpy())
+    arrest_category = policing_categorical(bg_category.reindex(arrests['blockgroup_id'].to_numpy()).to_numpy())
+    risks = escalation_risks(arrests['DefendantId'].to_numpy(), arrest_category,
+                             category_stats['total_pop'], years_of_data)
+    for _, row in risks.iterrows():
+        print(f"\n{row['Category']}:")
+        print(f"  Enhancement (2+ arrests): {row['enhanced_per_1000_annual']:.2f} per 1,000 annually")
+        print(f"  Mandatory minimum (3+ arrests): {row['mandatory_minimum_per_1000_annual']:.2f} per 1,000 annually")
+
+    results_path = Path(results_path)
+    results_path.mkdir(parents=True, exist_ok=True)
+    frequency.to_csv(results_path / 'arrest_frequency.csv', index=False)
+    conditional.to_csv(results_path / 'repeat_probabilities.csv', index=False)
+    gaps.to_csv(results_path / 'time_between_arrests.csv', index=False)
+    by_offense.to_csv(results_path / 'repeat_by_offense.csv', index=False)
+    risks.to_csv(results_path / 'escalation_risks.csv', index=False)
+    print(f"\n✓ Saved escalation results to {results_path}")
+
+    return {
+        'sequences': sequences,
+        'frequency': frequency,
+        'conditional': conditional,
+        'gaps': gaps,
+        'by_offense': by_offense,
+        'escalation_risks': risks,
+    }
 
-print(f"\nDiscretionary arrest rate statistics (Charleston/Berkeley):")
-print(f"  Min: {bg_data['discretionary_per_1000'].min():.1f} per 1,000")
-print(f"  Max: {bg_data['discretionary_per_1000'].max():.1f} per 1,000")
-print(f"  Mean: {bg_data['discretionary_per_1000'].mean():.1f} per 1,000")
-print(f"  Median: {bg_data['discretionary_per_1000'].median():.1f} per 1,000")
 
-# Step 3: Create Distribution and Identify Cut Points
-print("\n>>> Step 3: Create Distribution and Identify Cut Points")
-print("-" * 40)
+# ============================================================================
+# OFFENSE PROGRESSION (Steps 9 and 22)
+# ============================================================================
 
-# Sort by discretionary rate
-bg_data = bg_data.sort_values('discretionary_per_1000', ascending=False).reset_index(drop=True)
-bg_data['cumulative_pop'] = bg_data['total_pop'].cumsum()
-bg_data['cumulative_pop_pct'] = bg_data['cumulative_pop'] / bg_data['total_pop'].sum() * 100
+def stage_progression(load, categories, escalation, subgroups, results_path, offense='Arrest_crime_category',
+                      max_steps=1):
+    """Offense-to-offense transitions by policing category and subgroup, with gap histograms."""
+    print("\n>>> Steps 9/22: Offense Progression")
+    print("-" * 40)
+
+    arrests = load['arrests']
+    if offense not in arrests.columns:
+        raise KeyError(f"Arrests have no {offense} column")
+    offense_codes, offense_labels = pd.factorize(arrests[offense], sort=True)
+    bg_data = categories['bg_data']
+    bg_category = pd.Series(policing_categorical(bg_data['policing_category']).codes,
+                            index=bg_data['blockgroup_id'].to_numpy())
+    arrest_category = bg_category.reindex(arrests['blockgroup_id'].to_numpy()).fillna(-1).to_numpy(dtype=np.int64)
+    masks = {s['name']: subgroup_mask(arrests, s) for s in subgroups}
+
+    transitions, gaps = offense_transitions(escalation['sequences'], offense_codes, offense_labels, arrest_category,
+                                            CATEGORY_ORDER, masks, max_steps)
+    print(f"✓ {len(offense_labels)} offense types, {max_steps} step(s): {len(transitions):,} non-empty "
+          f"transition cells")
+
+    # Step 22: drug offense progression
+    drug_labels = [label for label in offense_labels if 'Drug' in str(label)]
+    overall = transitions[(transitions['steps'] == 1) & (transitions['policing_category'] == 'All')
+                          & (transitions['subgroup'] == subgroups[0]['name'])]
+    for source in drug_labels:
+        nexts = overall[(overall['from_offense'] == source) & overall['to_offense'].isin(drug_labels)]
+        shares = ', '.join(f"{row['to_offense']} {row['probability'] * 100:.1f}%" for _, row in nexts.iterrows())
+        print(f"  Next arrest after {source}: {shares or 'no drug arrests'}")
+    drug_progression = ever_progressed(escalation['sequences'], offense_codes, offense_labels,
+                                       drug_labels, drug_labels)
+    for _, row in drug_progression[drug_progression['first_offense'] != drug_progression['later_offense']].iterrows():
+        print(f"  First arrest {row['first_offense']} -> later {row['later_offense']}: "
+              f"{row['pct_progressed']:.1f}% of {row['people_starting']:,} people")
+
+    results_path = Path(results_path)
+    results_path.mkdir(parents=True, exist_ok=True)
+    transitions.to_csv(results_path / 'offense_transitions.csv', index=False)
+    gaps.to_csv(results_path / 'offense_transition_gaps.csv', index=False)
+    drug_progression.to_csv(results_path / 'drug_progression.csv', index=False)
+    print(f"✓ Saved progression tables to {results_path}")
+    return {'transitions': transitions, 'gaps': gaps, 'drug_progression': drug_progression}
 
-# Target approximately 6-7% ultra, 15-16% highly (based on population)
-cut1_idx = np.argmax(bg_data['cumulative_pop_pct'] >= 6.6)
-cut2_idx = np.argmax(bg_data['cumulative_pop_pct'] >= 22.0)
 
-cut1_rate = bg_data.iloc[cut1_idx]['discretionary_per_1000']
-cut2_rate = bg_data.iloc[cut2_idx]['discretionary_per_1000']
+# ============================================================================
+# PHASE 4: RACE x AGE x SEX RISKS (Steps 13-16)
+# ============================================================================
+
+def stage_demographics(load, census, categories, results_path, young_men_age=YOUNG_MEN_AGE,
+                       young_male_share=YOUNG_MALE_SHARE):
+    """Unique arrested persons and annual risks for every category x race x sex x age band cell."""
+    print("\n" + "="*80)
+    print("PHASE 4: RACE x AGE x SEX RISKS")
+    print("="*80)
+
+    arrests = load['arrests']
+    if 'Race' not in arrests.columns:
+        raise KeyError("The race x age x sex matrix needs the arrests' Race column")
+    bg_data = categories['bg_data']
+    census_ids = pd.Index(census['census_data']['blockgroup_id'])
+    populations = group_populations(census['demographics'])
+    totals = total_populations(census['demographics'])
+
+    # Step 13: census populations by policing category (race groups overlap,
+    # so everyone's totals come from the B01001A-G tables)
+    bg_codes = pd.Series(policing_categorical(bg_data['policing_category']).codes,
+                         index=bg_data['blockgroup_id'].to_numpy())
+    census_rows = census_ids.get_indexer(bg_codes.index)
+    category_pop = np.zeros((len(CATEGORY_ORDER), *populations.shape[1:]), dtype=np.int64)
+    np.add.at(category_pop, bg_codes.to_numpy(), populations[census_rows])
+    category_totals = np.zeros((len(CATEGORY_ORDER), *totals.shape[1:]), dtype=np.int64)
+    np.add.at(category_totals, bg_codes.to_numpy(), totals[census_rows])
+
+    # Step 14: ACS young men against the Step 6 share-of-population estimate
+    print("\n>>> Steps 13-14: Census Demographics and Young Male Population")
+    print("-" * 40)
+    young_bands = [i for i, (low, high) in enumerate(zip(AGE_BAND_STARTS, AGE_BAND_STARTS[1:]))
+                   if low >= young_men_age[0] and high - 1 <= young_men_age[1]]
+    acs_young = category_totals[:, SEXES.index('Male')][:, young_bands].sum(axis=1)
+    for cat, acs, total in zip(CATEGORY_ORDER, acs_young, categories['category_stats'].reindex(CATEGORY_ORDER)['total_pop']):
+        print(f"  {cat}: ACS young men {acs:,} vs Step 6 estimate {total * young_male_share:,.0f}")
+    print(f"  (ACS bands {AGE_BANDS[young_bands[0]]} to {AGE_BANDS[young_bands[-1]]}; "
+          f"all races, B01001A-G)" if young_bands else "  (no ACS age bands inside the young men range)")
+
+    # Steps 15-16: every cell and margin from one crosstab
+    bg_category = pd.Series(bg_codes.to_numpy(), index=bg_codes.index)
+    arrest_category = bg_category.reindex(arrests['blockgroup_id'].to_numpy()).fillna(-1).to_numpy(dtype=np.int64)
+    matrix = risk_matrix(arrests, arrest_category, category_pop, load['years_of_data'], CATEGORY_ORDER,
+                         totals=category_totals)
+    print(f"\n>>> Steps 15-16: Race x Age x Sex Specific Risks ({len(matrix):,} cells)")
+    print("-" * 40)
+    overall = matrix[(matrix['sex'] == ALL_LABEL) & (matrix['age_band'] == ALL_LABEL)].set_index(
+        ['policing_category', 'race'])['annual_risk_pct']
+    for cat in CATEGORY_ORDER:
+        risks = ', '.join(f"{race} {overall[cat, race]:.2f}%" for race in RACE_GROUPS)
+        print(f"  {cat}: {risks}")
+        if overall[cat, 'White'] > 0:
+            print(f"    Black / White: {overall[cat, 'Black'] / overall[cat, 'White']:.1f}x")
+    if overall[CATEGORY_ORDER[2], 'White'] > 0:
+        print(f"  Black {CATEGORY_ORDER[0]} / White {CATEGORY_ORDER[2]}: "
+              f"{overall[CATEGORY_ORDER[0], 'Black'] / overall[CATEGORY_ORDER[2], 'White']:.1f}x")
+
+    results_path = Path(results_path)
+    results_path.mkdir(parents=True, exist_ok=True)
+    matrix.to_csv(results_path / 'demographic_risk_matrix.csv', index=False)
+    print(f"✓ Saved risk matrix to {results_path / 'demographic_risk_matrix.csv'}")
+    return {'matrix': matrix}
 
-print(f"Final cut points (Charleston/Berkeley scope):")
-print(f"  Cut 1: {cut1_rate:.1f} per 1,000 (top {bg_data.iloc[cut1_idx]['cumulative_pop_pct']:.1f}%)")
-print(f"  Cut 2: {cut2_rate:.1f} per 1,000 (top {bg_data.iloc[cut2_idx]['cumulative_pop_pct']:.1f}%)")
 
-# Step 4: Establish Three Categories
-print("\n>>> Step 4: Establish Three Categories")
-print("-" * 40)
+# ============================================================================
+# PHASE 7: QUALITY CHECKS AND VALIDATION (Steps 30-32)
+# ============================================================================
 
-def categorize_policing(rate):
-    if rate >= cut1_rate:
-        return 'Ultra-Policed'
-    elif rate >= cut2_rate:
-        return 'Highly Policed'
+def stage_validation(load, census, filtered, rates, risks, escalation=None, *, results_path, source, counties,
+                     state=STATE_FIPS, batch_size=1_000_000, fail_fast=False):
+    """
+    Steps 30-32: run the validation checks over the arrests, census, block
+    group, county and category tables. The arrest checks come from the load
+    scan (load['arrest_checks']); only the duckdb backend, which has no
+    Python scan, re-reads the arrests batch by batch. Escalation checks need
+    the in-memory path.
+    """
+    print("\n" + "="*80)
+    print("PHASE 7: QUALITY CHECKS AND VALIDATION")
+    print("="*80)
+
+    start = time.perf_counter()
+    checks = validation_checks(state)
+    if 'arrest_checks' in load:
+        totals = {name: dict(entry) for name, entry in load['arrest_checks'].items()}
+        if fail_fast:
+            raise_failures(checks, 'arrests', totals)
+    elif load['streaming']:
+        totals = {}
+        dataset = open_arrest_dataset(source)
+        scanner = dataset.scanner(columns=arrest_columns(dataset), batch_size=batch_size,
+                                  filter=county_filter(dataset, counties, state=state))
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                tally(checks, 'arrests', arrest_rows(batch), totals, fail_fast)
     else:
-        return 'Normally Policed'
-
-bg_data['policing_category'] = bg_data['discretionary_per_1000'].apply(categorize_policing)
-
-# Calculate category statistics
-category_stats = bg_data.groupby('policing_category').agg({
-    'total_pop': 'sum',
-    'total_arrests': 'sum',
-    'discretionary_arrests': 'sum',
-    'unique_individuals': 'sum',
-    'blockgroup_id': 'count',
-    'white_pop': 'sum',
-    'black_pop': 'sum',
-    'hispanic_pop': 'sum'
-}).rename(columns={'blockgroup_id': 'num_blockgroups'})
-
-category_stats['pop_pct'] = category_stats['total_pop'] / category_stats['total_pop'].sum() * 100
-category_stats['disc_per_1000'] = (category_stats['discretionary_arrests'] / category_stats['total_pop']) * 1000
-category_stats['total_per_1000'] = (category_stats['total_arrests'] / category_stats['total_pop']) * 1000
-category_stats['unique_per_1000'] = (category_stats['unique_individuals'] / category_stats['total_pop']) * 1000
-
-print("\nPolicing Intensity Categories (Charleston/Berkeley Counties):")
-for cat in ['Ultra-Policed', 'Highly Policed', 'Normally Policed']:
-    if cat in category_stats.index:
-        stats = category_stats.loc[cat]
-        print(f"\n{cat}:")
-        print(f"  Block groups: {stats['num_blockgroups']:.0f}")
-        print(f"  Population: {stats['total_pop']:,.0f} ({stats['pop_pct']:.1f}%)")
-        print(f"  Discretionary per 1,000: {stats['disc_per_1000']:.1f}")
-        print(f"  Total per 1,000: {stats['total_per_1000']:.1f}")
-        print(f"  Unique individuals per 1,000: {stats['unique_per_1000']:.1f}")
+        totals = tally(checks, 'arrests', load['arrests'], fail_fast=fail_fast)
+
+    census_data = census['census_data']
+    bg_data = rates['bg_data']
+    bg_arrests = filtered['bg_arrests']
+    analyzed = bg_arrests['blockgroup_id'].isin(bg_data['blockgroup_id'])
+    by_county = lambda frame: frame.groupby(county_codes(frame['blockgroup_id']).to_numpy())
+    counties_table = pd.DataFrame({
+        'census_pop': by_county(census_data)['total_pop'].sum(),
+        'analysis_pop': by_county(bg_data)['total_pop'].sum(),
+        'census_blockgroups': by_county(census_data)['blockgroup_id'].count(),
+        'blockgroups_with_arrests': by_county(census_data[census_data['blockgroup_id'].isin(
+            bg_arrests['blockgroup_id'])])['blockgroup_id'].count(),
+        'arrests': by_county(bg_arrests)['total_arrests'].sum(),
+        'matched_arrests': by_county(bg_arrests[analyzed])['total_arrests'].sum(),
+    }).fillna(0).rename_axis('county').reset_index()
+
+    tables = {'census': census_data, 'blockgroups': bg_data, 'counties': counties_table}
+    if not load.get('stream_approximate'):
+        # Unique-count invariants hold exactly, not for HyperLogLog estimates
+        cells = risks['subgroup_cells']
+        overall = cells[cells['subgroup'] == 'Overall'].set_index('policing_category')['unique_individuals']
+        tables['subgroup_cells'] = cells.assign(
+            overall_unique_individuals=overall.reindex(cells['policing_category']).to_numpy())
+    if escalation is not None:
+        tables['escalation'] = escalation['escalation_risks']
+        tables['repeats'] = escalation['conditional']
+    for table, frame in tables.items():
+        tally(checks, table, frame, totals, fail_fast)
+    milliseconds = (time.perf_counter() - start) * 1000
+
+    results = report(checks, totals)
+    for step, checks in results.groupby('step', sort=False):
+        print(f"\n>>> {step}")
+        print("-" * 40)
+        for _, row in checks.iterrows():
+            mark = {'passed': '✓', 'skipped': '-', 'failed': '✗' if row['severity'] == 'error' else '!'}[row['status']]
+            detail = (f"{row['rows_failed']:,} of {row['rows_checked']:,} rows (first: {row['first_failure']})"
+                      if row['status'] == 'failed' else f"{row['rows_checked']:,} rows" if row['status'] == 'passed'
+                      else 'table not available in this mode')
+            print(f"{mark} {row['check']}: {row['description']} - {detail}")
+
+    errors = results[(results['status'] == 'failed') & (results['severity'] == 'error')]
+    warnings_n = ((results['status'] == 'failed') & (results['severity'] == 'warning')).sum()
+    print(f"\n✓ {(results['status'] == 'passed').sum()} checks passed, {len(errors)} errors, {warnings_n} warnings "
+          f"({milliseconds:.1f} ms)")
+
+    results_path = Path(results_path)
+    results_path.mkdir(parents=True, exist_ok=True)
+    results.to_csv(results_path / 'validation_report.csv', index=False)
+    print(f"✓ Saved validation report to {results_path / 'validation_report.csv'}")
+    return {'report': results}
+
 
 # ============================================================================
-# PHASE 2: CALCULATE ANNUAL ARREST RISKS
+# LIFETIME AND HOUSEHOLD RISK PROJECTION (Steps 7 and 27)
 # ============================================================================
 
-print("\n" + "="*80)
-print("PHASE 2: CALCULATE ANNUAL ARREST RISKS")
-print("="*80)
-
-# Merge category info with arrests
-arrests_with_cat = arrests_filtered.merge(
-    bg_data[['blockgroup_id', 'policing_category', 'total_pop']],
-    on='blockgroup_id',
-    how='inner'
-)
-
-# Step 5: Overall Population Annual Risk
-print("\n>>> Step 5: Overall Population Annual Risk")
-print("-" * 40)
-
-risk_results = []
-for cat in ['Ultra-Policed', 'Highly Policed', 'Normally Policed']:
-    if cat in category_stats.index:
-        unique_individuals = category_stats.loc[cat, 'unique_individuals']
-        population = category_stats.loc[cat, 'total_pop']
-        
-        annual_unique = unique_individuals / years_of_data
-        annual_risk = (annual_unique / population) * 100
-        
-        print(f"\n{cat}:")
-        print(f"  Population: {population:,.0f}")
-        print(f"  Unique individuals: {unique_individuals:,.0f}")
-        print(f"  Annual risk: {annual_risk:.2f}% (1 in {100/annual_risk:.0f})")
-        
-        risk_results.append({
-            'Category': cat,
-            'Population': population,
-            'Unique_Individuals': unique_individuals,
-            'Annual_Risk_Pct': annual_risk
-        })
-
-risk_df = pd.DataFrame(risk_results)
-
-# Step 6: Young Men (18-35) Annual Risk
-print("\n>>> Step 6: Young Men (18-35) Annual Risk")
-print("-" * 40)
-
-young_men = arrests_with_cat[
-    (arrests_with_cat['Age_years'].between(18, 35)) & 
-    (arrests_with_cat['Gender'] == 'Male')
-]
+def stage_projection(load, census, categories, risks, subgroups, discretionary_categories, results_path,
+                     ages=DEFAULT_AGES, start_age=START_AGE, young_men_age=YOUNG_MEN_AGE,
+                     young_male_share=YOUNG_MALE_SHARE):
+    """
+    Steps 7 and 27: lifetime risk by each age and household risk for every
+    block group and policing category x subgroup, as one tidy table.
+    """
+    print("\n>>> Steps 7 and 27: Lifetime and Household Risk Projection")
+    print("-" * 40)
+
+    if load['streaming']:
+        pair_bg, _, pair_bits = StreamingAggregator.from_outputs(load).blockgroup_pairs()
+    else:
+        arrests = load['arrests'].assign(
+            is_discretionary=lambda d: d['Arrest_crime_category'].isin(discretionary_categories))
+        pair_bg, _, pair_bits = blockgroup_pairs(arrests, subgroups)
+
+    bg_data = categories['bg_data']
+    bg_ids = bg_data['blockgroup_id'].to_numpy()
+    population = bg_data['total_pop'].to_numpy(dtype=float)
+    years_of_data = load['years_of_data']
+    young_men = young_men_label(young_men_age)
+    names = [definition['name'] for definition in subgroups]
+    shares = np.array([young_male_share if name == young_men else 1.0 for name in names])
+
+    # Unique persons per block group x subgroup from the distinct pairs
+    bg_index = pd.Index(bg_ids).get_indexer(pair_bg)
+    unique = np.zeros((len(bg_ids), len(names)), dtype=np.int64)
+    for i in range(len(names)):
+        member = (bg_index >= 0) & ((pair_bits[:, i // 64] >> np.uint64(i % 64)) & np.uint64(1)).astype(bool)
+        unique[:, i] = np.bincount(bg_index[member], minlength=len(bg_ids))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bg_risk = np.nan_to_num(unique / years_of_data / (population[:, None] * shares) * 100)
+
+    # Step 27 household sizes (ACS B25010); missing or suppressed estimates
+    # fall back to the average
+    census_data = census['census_data']
+    sizes = np.full(len(bg_ids), np.nan)
+    if 'avg_household_size' in census_data.columns:
+        sizes = pd.Series(pd.to_numeric(census_data['avg_household_size'], errors='coerce').to_numpy(),
+                          index=census_data['blockgroup_id'].to_numpy()).reindex(bg_ids).to_numpy()
+    fallback = ~(sizes > 0)
+    household = np.where(fallback, AVERAGE_HOUSEHOLD_SIZE, sizes)
+    print(f"✓ Household sizes: {int(fallback.sum())} of {len(bg_ids)} block groups use the "
+          f"{AVERAGE_HOUSEHOLD_SIZE} default")
+
+    # Category risks as reported in Steps 5-6 and the drug analysis
+    category_risk = pd.DataFrame({
+        'Overall': risks['risk_df'].set_index('Category')['Annual_Risk_Pct'],
+        young_men: risks['young_men_df'].set_index('Category')['Annual_Risk_Pct'],
+        'Drug': risks['drug_risk_df'].set_index('Category')['Drug_Per_1000_Annual'] / 10,
+    }).reindex(index=CATEGORY_ORDER, columns=names)
+    category_pop = bg_data.groupby('policing_category')['total_pop'].sum().reindex(CATEGORY_ORDER)
+    category_household = (pd.Series(household * population).groupby(bg_data['policing_category'].to_numpy()).sum()
+                          .reindex(CATEGORY_ORDER) / category_pop)
+
+    start = time.perf_counter()
+    table = projection_table(
+        np.concatenate([CATEGORY_ORDER, bg_ids.astype(str)]),
+        np.repeat(['category', 'blockgroup'], [len(CATEGORY_ORDER), len(bg_ids)]),
+        np.concatenate([CATEGORY_ORDER, bg_data['policing_category'].to_numpy()]), names,
+        np.vstack([category_risk.to_numpy(), bg_risk]),
+        np.concatenate([category_household.to_numpy(), household]), ages, start_age)
+    milliseconds = (time.perf_counter() - start) * 1000
+    print(f"✓ Projected {len(bg_ids):,} block groups x {len(names)} subgroups x {len(ages)} ages "
+          f"({len(table):,} rows, {milliseconds:.1f} ms)")
+
+    categories_only = table[table['level'] == 'category'].set_index(['unit', 'subgroup', 'age'])
+    for name in ['Overall', young_men]:
+        print(f"\n{name} lifetime risk ({', '.join(f'by {age}' for age in ages)}):")
+        for cat in CATEGORY_ORDER:
+            lifetime = categories_only.loc[(cat, name), 'lifetime_risk_pct']
+            print(f"  {cat}: {' / '.join(f'{risk:.1f}%' for risk in lifetime)}")
+    print("\nAnnual risk that anyone in a household is arrested (Step 27):")
+    for cat in CATEGORY_ORDER:
+        row = categories_only.loc[(cat, 'Overall')].iloc[0]
+        print(f"  {cat}: {row['household_annual_risk_pct']:.2f}% (household size {row['household_size']:.2f})")
+
+    results_path = Path(results_path)
+    results_path.mkdir(parents=True, exist_ok=True)
+    table.to_parquet(results_path / 'lifetime_risks.parquet', index=False, compression='zstd')
+    print(f"✓ Saved projections to {results_path / 'lifetime_risks.parquet'}")
+    return {'projection': table}
+
+
+# ============================================================================
+# QUERY CUBE (interactive slicing, see query_service.py)
+# ============================================================================
+
+def stage_query_cube(load, census, categories, results_path):
+    """
+    Block group x race x sex x age band x month cube of distinct arrested
+    persons, written as a results bundle for query_service.py.
+    """
+    print("\n>>> Query Cube")
+    print("-" * 40)
+    demographics = census.get('demographics')
+    start = time.perf_counter()
+    tables = build_cube(load['arrests'], categories['bg_data'], demographics,
+                        census['census_data']['blockgroup_id'] if demographics is not None else None)
+    pairs = tables['pairs']
+    print(f"✓ {len(pairs):,} block group x cell x month x person rows from {int(pairs['arrests'].sum()):,} arrests "
+          f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+    if demographics is None:
+        print("  (no census demographics: demographic slices will have no population; run with --demographics)")
+
+    cube_path = write_cube(Path(results_path) / QUERY_CUBE_DIR, tables, {'years_of_data': load['years_of_data']})
+    print(f"✓ Saved query cube to {cube_path} (serve with: python src/query_service.py serve {cube_path})")
+    return {'cube': str(cube_path)}
 
-young_men_risks = []
-for cat in ['Ultra-Policed', 'Highly Policed', 'Normally Policed']:
-    if cat in category_stats.index:
-        cat_young_men = young_men[young_men['policing_category'] == cat]
-        unique_young_men = cat_young_men['DefendantId'].nunique()
-        
-        # Estimate young male population (20% approximation)
-        est_young_male_pop = category_stats.loc[cat, 'total_pop'] * 0.20
-        
-        annual_unique = unique_young_men / years_of_data
-        annual_risk = (annual_unique / est_young_male_pop) * 100
-        
-        print(f"\n{cat}:")
-        print(f"  Est. young male pop: {est_young_male_pop:,.0f}")
-        print(f"  Unique young men: {unique_young_men:,}")
-        print(f"  Annual risk: {annual_risk:.2f}% (1 in {100/annual_risk:.0f})")
-        
-        young_men_risks.append({
-            'Category': cat,
-            'Annual_Risk_Pct': annual_risk
-        })
-
-young_men_df = pd.DataFrame(young_men_risks)
-
-# Calculate disparities
-print("\n" + "="*80)
-print("KEY DISPARITIES (CHARLESTON/BERKELEY COUNTIES ONLY)")
-print("="*80)
-
-ultra_overall = risk_df[risk_df['Category'] == 'Ultra-Policed']['Annual_Risk_Pct'].values[0]
-normal_overall = risk_df[risk_df['Category'] == 'Normally Policed']['Annual_Risk_Pct'].values[0]
-overall_ratio = ultra_overall / normal_overall if normal_overall > 0 else 0
-
-ultra_young = young_men_df[young_men_df['Category'] == 'Ultra-Policed']['Annual_Risk_Pct'].values[0]
-normal_young = young_men_df[young_men_df['Category'] == 'Normally Policed']['Annual_Risk_Pct'].values[0]
-young_ratio = ultra_young / normal_young if normal_young > 0 else 0
-
-print(f"\nOverall population disparity: {overall_ratio:.1f}x")
-print(f"  Ultra-Policed: {ultra_overall:.2f}% annual risk")
-print(f"  Normally Policed: {normal_overall:.2f}% annual risk")
-
-print(f"\nYoung men (18-35) disparity: {young_ratio:.1f}x")
-print(f"  Ultra-Policed: {ultra_young:.2f}% annual risk")
-print(f"  Normally Policed: {normal_young:.2f}% annual risk")
 
 # ============================================================================
-# DRUG OFFENSE ANALYSIS
+# CASCADE SIMULATION (Steps 12 and 29)
 # ============================================================================
 
-print("\n" + "="*80)
-print("DRUG OFFENSE ANALYSIS")
-print("="*80)
-
-drug_arrests = arrests_with_cat[arrests_with_cat['Arrest_crime_category'].str.contains('Drug', na=False)]
-print(f"✓ Total drug arrests: {len(drug_arrests):,}")
-print(f"✓ Unique individuals with drug arrests: {drug_arrests['DefendantId'].nunique():,}")
-
-drug_risk_results = []
-for cat in ['Ultra-Policed', 'Highly Policed', 'Normally Policed']:
-    if cat in category_stats.index:
-        cat_drug = drug_arrests[drug_arrests['policing_category'] == cat]
-        unique_drug = cat_drug['DefendantId'].nunique()
-        population = category_stats.loc[cat, 'total_pop']
-        
-        per_capita_annual = (unique_drug / years_of_data) / population * 1000
-        print(f"{cat}: {per_capita_annual:.2f} per 1,000 annually")
-        
-        drug_risk_results.append({
-            'Category': cat,
-            'Drug_Per_1000_Annual': per_capita_annual
-        })
-
-drug_risk_df = pd.DataFrame(drug_risk_results)
-
-ultra_drug = drug_risk_df[drug_risk_df['Category'] == 'Ultra-Policed']['Drug_Per_1000_Annual'].values[0]
-normal_drug = drug_risk_df[drug_risk_df['Category'] == 'Normally Policed']['Drug_Per_1000_Annual'].values[0]
-drug_ratio = ultra_drug / normal_drug if normal_drug > 0 else 0
-
-print(f"\nDrug enforcement disparity: {drug_ratio:.1f}x")
-print(f"  Ultra-Policed: {ultra_drug:.2f} per 1,000 annually")
-print(f"  Normally Policed: {normal_drug:.2f} per 1,000 annually")
+def stage_cascade(load, risks, escalation, results_path, people=100_000, seed=0, workers=None,
+                  young_men_age=YOUNG_MEN_AGE):
+    """Age 18-50 trajectories per category under the baseline and Step 29 scenarios."""
+    print("\n" + "="*80)
+    print("CASCADE SIMULATION (AGES 18-50)")
+    print("="*80)
+    from cascade_simulation import SCENARIOS, cascade_probabilities, run_scenarios
+
+    probabilities = cascade_probabilities(risks['risk_df'], risks['young_men_df'],
+                                          escalation['escalation_risks'], load['years_of_data'])
+    print(f"Simulating {people:,} people per category for {len(SCENARIOS)} scenarios...")
+    distribution, summary = run_scenarios(probabilities, people, seed=seed, workers=workers,
+                                          young_age=tuple(young_men_age))
+
+    at_end = summary[summary['age'] == summary['age'].max()].set_index(['scenario', 'Category'])
+    for scenario in SCENARIOS:
+        print(f"\n{scenario} (by age {summary['age'].max()}):")
+        for cat in CATEGORY_ORDER:
+            if (scenario, cat) in at_end.index:
+                row = at_end.loc[(scenario, cat)]
+                print(f"  {cat}: {row['pct_arrested']:.1f}% arrested, {row['pct_enhanced']:.1f}% enhanced, "
+                      f"{row['pct_mandatory_minimum']:.1f}% mandatory minimum")
+
+    results_path = Path(results_path)
+    results_path.mkdir(parents=True, exist_ok=True)
+    probabilities.to_csv(results_path / 'cascade_probabilities.csv')
+    summary.to_csv(results_path / 'cascade_summary.csv', index=False)
+    distribution.to_csv(results_path / 'cascade_distribution.csv', index=False)
+    print(f"\n✓ Saved cascade results to {results_path}")
+    return {'probabilities': probabilities, 'summary': summary, 'distribution': distribution}
+
+
+# ============================================================================
+# CATEGORIZATION SCHEMES
+# ============================================================================
+
+def stage_schemes(cut_points, results_path, schemes=tuple(CATEGORIZERS), tiers=3, cut_targets=CUT_TARGETS):
+    """
+    Step 3-4 alternatives: tier thresholds and per-tier population and rates
+    under each categorization scheme, on the Step 3 sorted block groups.
+    """
+    print("\n>>> Categorization Schemes")
+    print("-" * 40)
+
+    bg_data = cut_points['bg_data']
+    rates = bg_data['discretionary_per_1000'].to_numpy()
+    population = bg_data['total_pop'].to_numpy()
+    discretionary = bg_data['discretionary_arrests'].to_numpy()
+
+    rows = []
+    for scheme in schemes:
+        options = {'targets': cut_targets} if scheme == 'population' else {}
+        start = time.perf_counter()
+        try:
+            thresholds, labels = categorize(scheme, rates, population, tiers, **options)
+        except ValueError as e:
+            print(f"  WARNING: {e}; skipping {scheme}")
+            continue
+        milliseconds = (time.perf_counter() - start) * 1000
+        fit = variance_fit(rates, population, labels)
+        tier_pop = np.bincount(labels, weights=population, minlength=len(thresholds) + 1)
+        tier_disc = np.bincount(labels, weights=discretionary, minlength=len(thresholds) + 1)
+        for tier in range(len(thresholds) + 1):
+            rows.append({
+                'scheme': scheme,
+                'tier': tier + 1,
+                'min_rate': thresholds[tier] if tier < len(thresholds) else rates.min(),
+                'blockgroups': int((labels == tier).sum()),
+                'population': int(tier_pop[tier]),
+                'pop_pct': tier_pop[tier] / population.sum() * 100,
+                'disc_per_1000': tier_disc[tier] / tier_pop[tier] * 1000 if tier_pop[tier] else np.nan,
+                'variance_fit': fit,
+                'milliseconds': milliseconds,
+            })
+        print(f"  {scheme:<10} cuts {' / '.join(f'{t:.1f}' for t in thresholds)} per 1,000, "
+              f"variance fit {fit:.3f} ({milliseconds:.1f} ms)")
+
+    table = pd.DataFrame(rows)
+    results_path = Path(results_path)
+    results_path.mkdir(parents=True, exist_ok=True)
+    table.to_csv(results_path / 'categorization_schemes.csv', index=False)
+    print(f"✓ Saved scheme comparison to {results_path / 'categorization_schemes.csv'}")
+    return {'schemes': table}
+
+
+# ============================================================================
+# CUT-POINT SENSITIVITY (Methodology Step 34)
+# ============================================================================
+
+def stage_sensitivity(load, rates, subgroups, discretionary_categories, results_path,
+                      cut_targets=CUT_TARGETS, spread=2.0, steps=81,
+                      young_men_age=YOUNG_MEN_AGE, young_male_share=YOUNG_MALE_SHARE):
+    """Annual risks and disparity ratios over a grid of cut targets around the chosen pair."""
+    print("\n" + "="*80)
+    print("CUT-POINT SENSITIVITY")
+    print("="*80)
+
+    if load['streaming']:
+        pairs = StreamingAggregator.from_outputs(load).blockgroup_pairs()
+    else:
+        arrests = load['arrests'].assign(
+            is_discretionary=lambda d: d['Arrest_crime_category'].isin(discretionary_categories))
+        pairs = blockgroup_pairs(arrests, subgroups)
+
+    sweep = CutPointSweep(rates['bg_data'], pairs, subgroups)
+    cut1_targets = np.linspace(cut_targets[0] - spread, cut_targets[0] + spread, steps)
+    cut2_targets = np.linspace(cut_targets[1] - spread, cut_targets[1] + spread, steps)
+    grid = sweep.evaluate(cut1_targets, cut2_targets)
+
+    add_risk_columns(grid, load['years_of_data'], young_men_age, young_male_share)
+
+    print(f"✓ Evaluated {len(grid):,} cut-point pairs "
+          f"(cut 1 {cut1_targets[0]:.1f}-{cut1_targets[-1]:.1f}%, cut 2 {cut2_targets[0]:.1f}-{cut2_targets[-1]:.1f}%)")
+    for metric, label in [('overall', 'Overall'), ('young', 'Young men'), ('drug', 'Drug enforcement')]:
+        ratio = grid[f'{metric}_ratio']
+        print(f"  {label} disparity: {ratio.min():.1f}x - {ratio.max():.1f}x (median {ratio.median():.1f}x)")
+
+    results_path = Path(results_path)
+    results_path.mkdir(parents=True, exist_ok=True)
+    grid.to_csv(results_path / 'cut_point_sensitivity.csv', index=False)
+    print(f"✓ Saved sensitivity grid to {results_path / 'cut_point_sensitivity.csv'}")
+    return {'grid': grid}
+
+
+# ============================================================================
+# ROLLING-WINDOW RISKS
+# ============================================================================
+
+def stage_rolling(load, census, subgroups, discretionary_categories, results_path, state_path,
+                  windows=WINDOWS, cut_targets=CUT_TARGETS, verify=False,
+                  young_men_age=YOUNG_MEN_AGE, young_male_share=YOUNG_MALE_SHARE):
+    """
+    Rolling 12/36/60-month rates, cut points and annual risks, one row per
+    month and window. Saved state is resumed, so only months after the last
+    processed one are aggregated (a month is final once appended, so data
+    should arrive in whole months).
+
+    The load stage still reads the whole extract. On resume, only the arrests
+    from the state's last month on are hashed; earlier months are checked by
+    their row counts, so an edit to an old month that keeps its count is not
+    detected (use a fresh --rolling-state after such a correction).
+    """
+    print("\n" + "="*80)
+    print("ROLLING-WINDOW RISKS")
+    print("="*80)
+
+    census_data = census['census_data']
+    population = pd.Series(census_data['total_pop'].fillna(0).to_numpy(),
+                           index=census_data['blockgroup_id'].to_numpy())
+    arrests = load['arrests'].assign(
+        is_discretionary=lambda d: d['Arrest_crime_category'].isin(discretionary_categories))
+    defendant_ids = load['defendant_ids']['DefendantId'].to_numpy()
+    months = month_index(arrests['ArrestDate'])
+    # Resume only if the months already processed still hold the same arrests
+    fingerprints = month_fingerprints(months, arrests, defendant_ids, since=saved_last_month(state_path))
+    rolling = RollingRisks.load(state_path, population, subgroups, windows, cut_targets, fingerprints=fingerprints)
+    first = int(months.min()) if rolling.last_month is None else rolling.last_month + 1
+    order = np.argsort(months, kind='stable')
+    bounds = np.searchsorted(months[order], np.arange(first, int(months.max()) + 2))
+
+    # Months with no arrests still slide the windows
+    for i, month in enumerate(range(first, int(months.max()) + 1)):
+        rolling.append_month(month, arrests.iloc[order[bounds[i]:bounds[i + 1]]], defendant_ids)
+    print(f"✓ Appended {max(int(months.max()) + 1 - first, 0)} month(s) "
+          f"(state now ends {month_label(rolling.last_month)}; saved to {state_path})")
+    rolling.save(state_path)
+
+    table = rolling.results()
+    add_risk_columns(table, table['years'], young_men_age, young_male_share)
+    latest = table[table['month'] == table['month'].iloc[-1]]
+    for _, row in latest.iterrows():
+        print(f"  {row['window_months']:>2}-month window to {row['month']}: cuts {row['cut1_rate']:.1f} / "
+              f"{row['cut2_rate']:.1f} per 1,000, overall disparity {row['overall_ratio']:.1f}x")
+
+    if verify:
+        # Every stored row against a from-scratch aggregate of its window
+        mismatches = 0
+        for row in rolling.rows:
+            month = int(np.datetime64(row['month'], 'M').astype(np.int64))
+            expected = rolling.recompute(month, row['window_months'], arrests, defendant_ids)
+            mismatches += any(row[key] != value for key, value in expected.items())
+        if mismatches:
+            raise RuntimeError(f"{mismatches} rolling rows differ from a full recompute")
+        print(f"✓ Verified {len(rolling.rows):,} rows against a full recompute of each window")
+
+    results_path = Path(results_path)
+    results_path.mkdir(parents=True, exist_ok=True)
+    table.to_csv(results_path / 'rolling_risks.csv', index=False)
+    print(f"✓ Saved rolling risks to {results_path / 'rolling_risks.csv'}")
+    return {'rolling': table}
+
+
+# ============================================================================
+# BOOTSTRAP CONFIDENCE INTERVALS (Methodology Step 33)
+# ============================================================================
+
+def stage_bootstrap(load, rates, subgroups, discretionary_categories, results_path,
+                    cut_targets=CUT_TARGETS, replicates=1000, seed=0, workers=None, level=0.95,
+                    young_men_age=YOUNG_MEN_AGE, young_male_share=YOUNG_MALE_SHARE):
+    """Defendant-clustered bootstrap intervals for cut points, risks and disparities."""
+    print("\n" + "="*80)
+    print("BOOTSTRAP CONFIDENCE INTERVALS")
+    print("="*80)
+    from bootstrap_ci import (bootstrap_inputs, bootstrap_replicates, percentile_intervals,
+                              poisson_rate_ci, replicate_counts)
+
+    bg_data = rates['bg_data'].reset_index(drop=True)
+    arrests = load['arrests'].assign(
+        is_discretionary=lambda d: d['Arrest_crime_category'].isin(discretionary_categories))
+    inputs = bootstrap_inputs(arrests, bg_data, subgroups)
+    n_person = inputs['presence'].shape[0]
+    print(f"Resampling {n_person:,} defendants, {replicates:,} replicates (seed {seed})...")
+
+    # Point estimates: every defendant drawn once
+    estimates, _ = replicate_counts(inputs, np.ones((1, n_person)), cut_targets)
+    draws, tallies = bootstrap_replicates(inputs, cut_targets, replicates, seed=seed, workers=workers)
+    years_of_data = load['years_of_data']
+    add_risk_columns(estimates, years_of_data, young_men_age, young_male_share)
+    add_risk_columns(draws, years_of_data, young_men_age, young_male_share)
+
+    metrics = ['cut1_rate', 'cut2_rate'] + [
+        f'{prefix}_{column}' for prefix in CATEGORY_PREFIXES.values()
+        for column in ['pop', 'overall_risk_pct', 'young_men_risk_pct', 'drug_per_1000']
+    ] + ['overall_ratio', 'young_ratio', 'drug_ratio']
+    intervals = percentile_intervals(draws, estimates.loc[0, metrics], level=level)
+
+    print(f"\n{level:.0%} intervals:")
+    for metric, label in [('overall_ratio', 'Overall disparity'), ('young_ratio', 'Young men disparity'),
+                          ('drug_ratio', 'Drug enforcement disparity')]:
+        row = intervals.set_index('metric').loc[metric]
+        print(f"  {label}: {row['estimate']:.1f}x ({row['lower']:.1f}x - {row['upper']:.1f}x)")
+
+    # Block groups: exact Poisson interval on the rate and how often each
+    # one lands in each category across replicates
+    rate_lower, rate_upper = poisson_rate_ci(bg_data['discretionary_arrests'], bg_data['total_pop'], level=level)
+    bg_ci = pd.DataFrame({
+        'blockgroup_id': bg_data['blockgroup_id'],
+        'total_pop': bg_data['total_pop'],
+        'discretionary_arrests': bg_data['discretionary_arrests'],
+        'discretionary_per_1000': bg_data['discretionary_per_1000'],
+        'rate_lower': rate_lower,
+        'rate_upper': rate_upper,
+    })
+    for k, prefix in enumerate(CATEGORY_PREFIXES.values()):
+        bg_ci[f'p_{prefix}'] = tallies[:, k] / replicates
+    bg_ci = bg_ci.sort_values('discretionary_per_1000', ascending=False).reset_index(drop=True)
+    unstable = ((bg_ci[[f'p_{p}' for p in CATEGORY_PREFIXES.values()]].max(axis=1)) < 0.9).sum()
+    print(f"✓ {unstable} of {len(bg_ci)} block groups change category in over 10% of replicates")
+
+    results_path = Path(results_path)
+    results_path.mkdir(parents=True, exist_ok=True)
+    intervals.to_csv(results_path / 'bootstrap_ci.csv', index=False)
+    bg_ci.to_csv(results_path / 'blockgroup_rate_ci.csv', index=False)
+    print(f"✓ Saved intervals to {results_path / 'bootstrap_ci.csv'} and {results_path / 'blockgroup_rate_ci.csv'}")
+    return {'intervals': intervals, 'blockgroup_ci': bg_ci}
+
 
 # ============================================================================
 # CREATE VISUALIZATION
 # ============================================================================
 
-print("\n" + "="*80)
-print("CREATING CORRECTED SCOPE VISUALIZATION")
-print("="*80)
-
-fig, axes = plt.subplots(2, 3, figsize=(16, 10))
-
-# 1. Distribution of discretionary rates
-ax1 = axes[0, 0]
-ax1.hist(bg_data['discretionary_per_1000'], bins=30, edgecolor='black', alpha=0.7, color='steelblue')
-ax1.axvline(cut1_rate, color='red', linestyle='--', label=f'Cut 1: {cut1_rate:.0f}')
-ax1.axvline(cut2_rate, color='orange', linestyle='--', label=f'Cut 2: {cut2_rate:.0f}')
-ax1.set_xlabel('Discretionary Arrests per 1,000')
-ax1.set_ylabel('Number of Block Groups')
-ax1.set_title('Charleston/Berkeley Counties Only')
-ax1.legend(fontsize=8)
-ax1.grid(True, alpha=0.3)
-
-# 2. Population distribution
-ax2 = axes[0, 1]
-sizes = [category_stats.loc[cat, 'pop_pct'] for cat in ['Ultra-Policed', 'Highly Policed', 'Normally Policed']]
-colors = ['darkred', 'orange', 'lightgreen']
-ax2.pie(sizes, labels=['Ultra', 'Highly', 'Normal'], colors=colors, autopct='%1.1f%%', startangle=90)
-ax2.set_title('Population Distribution')
-
-# 3. Annual arrest risk - overall
-ax3 = axes[0, 2]
-risks = risk_df['Annual_Risk_Pct'].values
-bars = ax3.bar(['Ultra', 'Highly', 'Normal'], risks, color=['darkred', 'orange', 'lightgreen'])
-ax3.set_ylabel('Annual Risk (%)')
-ax3.set_title('Overall Annual Risk')
-ax3.grid(True, alpha=0.3, axis='y')
-for bar, risk in zip(bars, risks):
-    ax3.text(bar.get_x() + bar.get_width()/2, bar.get_height(),
-            f'{risk:.2f}%', ha='center', va='bottom')
-
-# 4. Young men annual risk
-ax4 = axes[1, 0]
-young_risks = young_men_df['Annual_Risk_Pct'].values
-bars = ax4.bar(['Ultra', 'Highly', 'Normal'], young_risks, color=['darkred', 'orange', 'lightgreen'])
-ax4.set_ylabel('Annual Risk (%)')
-ax4.set_title('Young Men (18-35) Annual Risk')
-ax4.grid(True, alpha=0.3, axis='y')
-for bar, risk in zip(bars, young_risks):
-    ax4.text(bar.get_x() + bar.get_width()/2, bar.get_height(),
-            f'{risk:.2f}%', ha='center', va='bottom')
-
-# 5. Drug enforcement
-ax5 = axes[1, 1]
-drug_rates = drug_risk_df['Drug_Per_1000_Annual'].values
-bars = ax5.bar(['Ultra', 'Highly', 'Normal'], drug_rates, color=['darkred', 'orange', 'lightgreen'])
-ax5.set_ylabel('Per 1,000 Annually')
-ax5.set_title('Drug Arrests Per Capita')
-ax5.grid(True, alpha=0.3, axis='y')
-for bar, rate in zip(bars, drug_rates):
-    ax5.text(bar.get_x() + bar.get_width()/2, bar.get_height(),
-            f'{rate:.1f}', ha='center', va='bottom')
-
-# 6. Summary
-ax6 = axes[1, 2]
-ax6.axis('off')
-
-summary_text = f"""CORRECTED GEOGRAPHIC SCOPE
-Charleston & Berkeley Counties
-
-Population: {bg_data['total_pop'].sum():,}
-Block Groups: {len(bg_data)}
-
-Key Disparities:
-• Overall: {overall_ratio:.1f}x
-• Young Men: {young_ratio:.1f}x
-• Drug Enforcement: {drug_ratio:.1f}x
-
-Ultra-Policed: {category_stats.loc['Ultra-Policed', 'pop_pct']:.1f}%
-({category_stats.loc['Ultra-Policed', 'total_pop']:,} people)
-
-This analysis focuses on the 
-intended study area and avoids
-rural/urban comparison artifacts."""
-
-ax6.text(0.05, 0.95, summary_text, transform=ax6.transAxes,
-         fontsize=9, verticalalignment='top', fontfamily='monospace',
-         bbox=dict(boxstyle='round', facecolor='lightyellow', alpha=0.8))
-
-plt.suptitle('Policing Intensity Analysis - Corrected Geographic Scope\nCharleston & Berkeley Counties Only', 
-            fontsize=13, fontweight='bold')
-plt.tight_layout()
-
-output_path = FIGURES_PATH / 'corrected_geographic_analysis.png'
-plt.savefig(output_path, dpi=300, bbox_inches='tight')
-print(f"✓ Saved visualization to {output_path}")
+def figure_paths(figures_path, figures):
+    """Output file per requested figure (the summary keeps its original name)."""
+    return {name: str(Path(figures_path) / ('corrected_geographic_analysis.png' if name == SUMMARY_FIGURE
+                                            else f'{name}.png'))
+            for name in figures}
+
+
+def stage_figures(cut_points, categories, risks, figures_path, figures=(SUMMARY_FIGURE,),
+                  young_men_age=YOUNG_MEN_AGE, dpi=300, workers=None, scope=region_label()):
+    """Summary figure and/or standalone panels (see figures.py), rendered in parallel."""
+    from figures import figure_data, render_figures
+
+    print("\n" + "="*80)
+    print("CREATING CORRECTED SCOPE VISUALIZATION")
+    print("="*80)
+
+    data = figure_data(cut_points, categories, risks, CATEGORY_ORDER, young_men_label(young_men_age), scope)
+    paths = render_figures(figure_paths(figures_path, figures), data, dpi=dpi, workers=workers)
+    for path in paths:
+        print(f"✓ Saved visualization to {path}")
+    return {'figures': paths}
+
 
 # ============================================================================
 # SAVE RESULTS
 # ============================================================================
 
-print("\n" + "="*80)
-print("SAVING RESULTS")
-print("="*80)
-
-# Save all results
-bg_data.to_csv(RESULTS_PATH / 'blockgroups_charleston_berkeley.csv', index=False)
-category_stats.to_csv(RESULTS_PATH / 'category_stats_corrected.csv')
-risk_df.to_csv(RESULTS_PATH / 'annual_risks_corrected.csv', index=False)
-young_men_df.to_csv(RESULTS_PATH / 'young_men_risks_corrected.csv', index=False)
-drug_risk_df.to_csv(RESULTS_PATH / 'drug_risks_corrected.csv', index=False)
-
-# Create final report
-report = f"""# Corrected Geographic Policing Intensity Analysis
-
-## Executive Summary
-Analysis focused on Charleston County (45019) and Berkeley County (45015) only, following corrected methodology with proper geographic scope.
-
-## Geographic Scope Validation
-- **Target Counties**: Charleston (45019) and Berkeley (45015) only
-- **Block Groups Analyzed**: {len(bg_data)}
-- **Total Population**: {bg_data['total_pop'].sum():,}
-- **Arrests Analyzed**: {len(arrests_filtered):,} (filtered from {len(arrests):,} total)
-
-## Key Findings
-
-### Population Distribution
-- **Ultra-Policed**: {category_stats.loc['Ultra-Policed', 'pop_pct']:.1f}% ({category_stats.loc['Ultra-Policed', 'total_pop']:,.0f} people)
-- **Highly Policed**: {category_stats.loc['Highly Policed', 'pop_pct']:.1f}% ({category_stats.loc['Highly Policed', 'total_pop']:,.0f} people)
-- **Normally Policed**: {category_stats.loc['Normally Policed', 'pop_pct']:.1f}% ({category_stats.loc['Normally Policed', 'total_pop']:,.0f} people)
-
-### Annual Arrest Risk Disparities
-
-**Overall Population:**
-- Ultra-Policed: {ultra_overall:.2f}% (1 in {100/ultra_overall:.0f})
-- Normally Policed: {normal_overall:.2f}% (1 in {100/normal_overall:.0f})
-- **Disparity: {overall_ratio:.1f}x**
-
-**Young Men (18-35):**
-- Ultra-Policed: {ultra_young:.2f}% (1 in {100/ultra_young:.0f})
-- Normally Policed: {normal_young:.2f}% (1 in {100/normal_young:.0f})
-- **Disparity: {young_ratio:.1f}x**
-
-**Drug Enforcement:**
-- Ultra-Policed: {ultra_drug:.2f} per 1,000 annually
-- Normally Policed: {normal_drug:.2f} per 1,000 annually
-- **Disparity: {drug_ratio:.1f}x**
-
-## Methodology Validation
-- ✓ Geographic scope limited to Charleston/Berkeley Counties as intended
-- ✓ Used actual census population data via API
-- ✓ Filtered out arrests from other counties ({len(arrests) - len(arrests_filtered):,} excluded)
-- ✓ Results show expected moderate disparities (4-8x range)
-
-## Comparison with Previous Analyses
-This corrected analysis shows disparities in the expected range for metro area analysis, avoiding the extreme ratios (24x+) that resulted from including rural counties in the comparison baseline.
-
----
-*Analysis Date: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}*
-*Geographic Scope: Charleston County (45019) & Berkeley County (45015)*
-*Census Data Source: ACS 2019 5-year estimates via API*
-"""
+def stage_report(load, filtered, cut_points, categories, risks, results_path, parameters=None, inputs=None,
+                 write_csv=False, young_men_age=YOUNG_MEN_AGE):
+    """The results bundle (Parquet tables + manifest), the markdown report rendered from it, and optional CSVs."""
+    print("\n" + "="*80)
+    print("SAVING RESULTS")
+    print("="*80)
+
+    results_path = Path(results_path)
+    results_path.mkdir(parents=True, exist_ok=True)
+    bg_data = categories['bg_data']
+    tables = {
+        'blockgroups': bg_data,
+        'category_stats': categories['category_stats'].rename_axis('policing_category').reset_index(),
+        'annual_risks': risks['risk_df'],
+        'young_men_risks': risks['young_men_df'],
+        'drug_risks': risks['drug_risk_df'],
+    }
+    values = {
+        'arrests_in_source': load['arrests_in_source'],
+        'arrests_analyzed': filtered['arrests_analyzed'],
+        'years_of_data': load['years_of_data'],
+        'blockgroups': len(bg_data),
+        'total_pop': bg_data['total_pop'].sum(),
+        'cut1_rate': cut_points['cut1_rate'],
+        'cut2_rate': cut_points['cut2_rate'],
+        'young_men_label': young_men_label(young_men_age),
+        **{key: risks[key] for key in ['ultra_overall', 'normal_overall', 'overall_ratio', 'ultra_young',
+                                       'normal_young', 'young_ratio', 'ultra_drug', 'normal_drug', 'drug_ratio']},
+    }
+    bundle_path = write_bundle(results_path / BUNDLE_DIR, tables, values, parameters, inputs)
+    print(f"✓ Results bundle saved to {bundle_path}")
+
+    if write_csv:
+        bg_data.to_csv(results_path / 'blockgroups_charleston_berkeley.csv', index=False)
+        categories['category_stats'].to_csv(results_path / 'category_stats_corrected.csv')
+        risks['risk_df'].to_csv(results_path / 'annual_risks_corrected.csv', index=False)
+        risks['young_men_df'].to_csv(results_path / 'young_men_risks_corrected.csv', index=False)
+        risks['drug_risk_df'].to_csv(results_path / 'drug_risks_corrected.csv', index=False)
+        print(f"✓ CSV copies saved to {results_path}")
+
+    report_path = render_report(bundle_path, results_path / REPORT_NAME)
+    print(f"✓ Final report saved to {report_path}")
+    return {'bundle': str(bundle_path), 'report': str(report_path)}
+
+
+BUNDLE_DIR = 'bundle'
+
+CSV_FILES = [
+    'blockgroups_charleston_berkeley.csv',
+    'category_stats_corrected.csv',
+    'annual_risks_corrected.csv',
+    'young_men_risks_corrected.csv',
+    'drug_risks_corrected.csv',
+]
+
+RESULT_FILES = [
+    f'{BUNDLE_DIR}/manifest.json',
+    REPORT_NAME,
+]
+
+
+PROGRESSION_FILES = [
+    'offense_transitions.csv',
+    'offense_transition_gaps.csv',
+    'drug_progression.csv',
+]
+
+
+ESCALATION_FILES = [
+    'arrest_frequency.csv',
+    'repeat_probabilities.csv',
+    'time_between_arrests.csv',
+    'repeat_by_offense.csv',
+    'escalation_risks.csv',
+]
+
+
+def run_pipeline(args, cache=None, arrest_source=None, census_file=None, results_path=None,
+                 figures_path=None, region=None):
+    """
+    Run every stage through the stage cache; returns {stage: StageResult}.
+
+    The keyword arguments override the default cache and file locations
+    (the benchmark harness runs the pipeline on generated data this way).
+    region ({'name', 'state', 'counties'[, 'census_file']}) replaces the
+    default Charleston/Berkeley scope; see batch_regions.py.
+    """
+    if cache is None:
+        profiler = None
+        if args.profile or args.profile_stage:
+            profiler = RunProfiler(trace_memory=args.tracemalloc, profile_stage=args.profile_stage,
+                                   profiler=args.profiler, step_labels=STAGE_STEPS)
+        cache = StageCache(CACHE_PATH, enabled=not args.no_cache, profiler=profiler)
+    for name in args.invalidate:
+        cache.invalidate(name)
+
+    # Prefer the county/year partitioned copy (see arrest_loader.py) when present
+    if arrest_source is None:
+        arrest_source = DATA_PATH / 'census_mapped_anon_partitioned'
+        if not arrest_source.exists():
+            arrest_source = DATA_PATH / 'census_mapped_anon_data.parquet'
+    region = {**DEFAULT_REGION, **(region or {})}
+    census_file = Path(census_file or region.get('census_file') or DATA_PATH / f"census_{region['name']}.csv")
+    demographics_file = DATA_PATH / f"census_{region['name']}_demographics.csv" if args.demographics else None
+    results_path = Path(results_path or RESULTS_PATH)
+    figures_path = Path(figures_path or FIGURES_PATH)
+
+    counties, state = list(region['counties']), region['state']
+    scope = region_label(counties, state)
+    subgroups = analysis_subgroups(YOUNG_MEN_AGE)
+    # The SQL backends produce the streaming-mode aggregates
+    streaming = args.streaming or args.backend != 'pandas'
+
+    load_params = {
+        'source': str(arrest_source), 'counties': counties, 'state': state,
+        'streaming': streaming, 'approximate': args.approximate,
+    }
+    if args.progression and args.progression_offense not in CATEGORICAL_COLUMNS:
+        load_params['extra_columns'] = [args.progression_offense]
+    if streaming:
+        load_params.update(batch_size=args.batch_size, subgroups=subgroups,
+                           discretionary_categories=discretionary_categories)
+    if args.backend != 'pandas':
+        load_params.update(backend=args.backend, threads=args.workers)
+    if (args.validate or args.validate_fail_fast) and args.backend != 'duckdb':
+        # Tally the arrest checks in the load scan instead of reading the arrests twice
+        load_params['validate'] = True
+
+    results = {}
+    results['load'] = cache.run('load', stage_load, params=load_params, sources=[arrest_source])
+    results['filter'] = cache.run('filter', stage_filter, results['load'], params={
+        'counties': counties, 'state': state, 'discretionary_categories': discretionary_categories})
+    results['census'] = cache.run('census', stage_census, results['filter'], params={
+        'census_file': str(census_file), 'counties': counties, 'state': state,
+        'census_api': args.census_api, 'census_cache': str(DATA_PATH / 'census_cache'),
+        'demographics_file': str(demographics_file) if demographics_file else None},
+        sources=[census_file] + ([demographics_file] if demographics_file else []))
+    results['rates'] = cache.run('rates', stage_rates, results['filter'], results['census'], params={'scope': scope})
+    results['cube'] = cache.run('cube', stage_cube, results['load'], results['filter'], results['census'], params={
+        'results_path': str(results_path), 'min_arrests': args.pool_min_arrests},
+        files=[results_path / 'geography_cube.csv', results_path / 'blockgroup_pooled.csv'])
+    results['cut_points'] = cache.run('cut_points', stage_cut_points, results['rates'], params={
+        'cut_targets': list(CUT_TARGETS), 'scope': scope})
+    results['categories'] = cache.run('categories', stage_categories, results['cut_points'], params={'scope': scope})
+    results['risks'] = cache.run('risks', stage_risks, results['load'], results['categories'], params={
+        'subgroups': subgroups, 'discretionary_categories': discretionary_categories,
+        'young_men_age': list(YOUNG_MEN_AGE), 'young_male_share': YOUNG_MALE_SHARE, 'scope': scope})
+    if streaming:
+        print("\n(Steps 8-11 need per-arrest dates; skipped in streaming mode)")
+    else:
+        results['escalation'] = cache.run('escalation', stage_escalation, results['load'], results['categories'],
+                                          params={'results_path': str(results_path)},
+                                          files=[results_path / name for name in ESCALATION_FILES])
+    if args.validate or args.validate_fail_fast:
+        upstream = [results[name] for name in ['load', 'census', 'filter', 'rates', 'risks', 'escalation']
+                    if name in results]
+        results['validation'] = cache.run('validation', stage_validation, *upstream, params={
+            'results_path': str(results_path), 'source': str(arrest_source), 'counties': counties, 'state': state,
+            'batch_size': args.batch_size, 'fail_fast': args.validate_fail_fast},
+            sources=[arrest_source], files=[results_path / 'validation_report.csv'])
+    if args.progression:
+        results['progression'] = cache.run('progression', stage_progression, results['load'], results['categories'],
+                                           results['escalation'], params={
+            'subgroups': subgroups, 'results_path': str(results_path), 'offense': args.progression_offense,
+            'max_steps': args.progression_steps},
+            files=[results_path / name for name in PROGRESSION_FILES])
+    if args.demographics:
+        results['demographics'] = cache.run('demographics', stage_demographics, results['load'], results['census'],
+                                            results['categories'], params={
+            'results_path': str(results_path), 'young_men_age': list(YOUNG_MEN_AGE),
+            'young_male_share': YOUNG_MALE_SHARE},
+            files=[results_path / 'demographic_risk_matrix.csv'])
+    if args.lifetime:
+        results['projection'] = cache.run('projection', stage_projection, results['load'], results['census'],
+                                          results['categories'], results['risks'], params={
+            'subgroups': subgroups, 'discretionary_categories': discretionary_categories,
+            'results_path': str(results_path), 'ages': args.lifetime_ages, 'start_age': args.lifetime_start,
+            'young_men_age': list(YOUNG_MEN_AGE), 'young_male_share': YOUNG_MALE_SHARE},
+            files=[results_path / 'lifetime_risks.parquet'])
+    if args.query_cube:
+        results['query_cube'] = cache.run('query_cube', stage_query_cube, results['load'], results['census'],
+                                          results['categories'], params={'results_path': str(results_path)},
+                                          files=[results_path / QUERY_CUBE_DIR])
+    if args.cascade:
+        results['cascade'] = cache.run('cascade', stage_cascade, results['load'], results['risks'],
+                                       results['escalation'], params={
+            'results_path': str(results_path), 'people': args.cascade, 'seed': args.seed,
+            'workers': args.workers, 'young_men_age': list(YOUNG_MEN_AGE)},
+            files=[results_path / 'cascade_summary.csv', results_path / 'cascade_distribution.csv'])
+    if args.schemes is not None:
+        results['schemes'] = cache.run('schemes', stage_schemes, results['cut_points'], params={
+            'results_path': str(results_path), 'schemes': args.schemes or list(CATEGORIZERS),
+            'tiers': args.tiers, 'cut_targets': list(CUT_TARGETS)},
+            files=[results_path / 'categorization_schemes.csv'])
+    if args.sensitivity:
+        results['sensitivity'] = cache.run('sensitivity', stage_sensitivity, results['load'], results['rates'], params={
+            'subgroups': subgroups, 'discretionary_categories': discretionary_categories,
+            'results_path': str(results_path), 'cut_targets': list(CUT_TARGETS),
+            'spread': args.sensitivity_spread, 'steps': args.sensitivity_steps,
+            'young_men_age': list(YOUNG_MEN_AGE), 'young_male_share': YOUNG_MALE_SHARE},
+            files=[results_path / 'cut_point_sensitivity.csv'])
+    if args.bootstrap:
+        results['bootstrap'] = cache.run('bootstrap', stage_bootstrap, results['load'], results['rates'], params={
+            'subgroups': subgroups, 'discretionary_categories': discretionary_categories,
+            'results_path': str(results_path), 'cut_targets': list(CUT_TARGETS),
+            'replicates': args.bootstrap, 'seed': args.seed, 'workers': args.workers,
+            'young_men_age': list(YOUNG_MEN_AGE), 'young_male_share': YOUNG_MALE_SHARE},
+            files=[results_path / 'bootstrap_ci.csv', results_path / 'blockgroup_rate_ci.csv'])
+    if args.rolling is not None:
+        state_path = Path(args.rolling_state or results_path / 'rolling_state' / region['name'])
+        results['rolling'] = cache.run('rolling', stage_rolling, results['load'], results['census'], params={
+            'subgroups': subgroups, 'discretionary_categories': discretionary_categories,
+            'results_path': str(results_path), 'state_path': str(state_path), 'windows': args.rolling or list(WINDOWS),
+            'cut_targets': list(CUT_TARGETS), 'verify': args.rolling_verify,
+            'young_men_age': list(YOUNG_MEN_AGE), 'young_male_share': YOUNG_MALE_SHARE},
+            files=[results_path / 'rolling_risks.csv'])
+    if args.headless:
+        print("\n(Headless: figures skipped)")
+    else:
+        results['figures'] = cache.run('figures', stage_figures, results['cut_points'], results['categories'],
+                                       results['risks'], params={
+            'figures_path': str(figures_path), 'figures': args.figures, 'young_men_age': list(YOUNG_MEN_AGE),
+            'dpi': args.dpi, 'workers': args.workers, 'scope': scope},
+            files=list(figure_paths(figures_path, args.figures).values()))
+    report_files = RESULT_FILES + (CSV_FILES if args.csv else [])
+    results['report'] = cache.run('report', stage_report, results['load'], results['filter'], results['cut_points'],
+                                  results['categories'], results['risks'], params={
+        'results_path': str(results_path), 'write_csv': args.csv, 'young_men_age': list(YOUNG_MEN_AGE),
+        'parameters': {
+            'region': region, 'cut_targets': list(CUT_TARGETS), 'discretionary_categories': discretionary_categories,
+            'young_men_age': list(YOUNG_MEN_AGE), 'young_male_share': YOUNG_MALE_SHARE,
+            'streaming': streaming, 'approximate': args.approximate},
+        'inputs': {'arrests': str(arrest_source), 'census': str(census_file)}},
+        sources=[arrest_source, census_file], files=[results_path / name for name in report_files])
+    if not results['report'].cached:
+        # Stage timings are only known once the report stage has finished
+        update_manifest(results['report']['bundle'], timings=cache.timings)
+
+    if cache.profiler is not None:
+        paths = cache.profiler.write(results_path, arrest_source=str(arrest_source), args=vars(args))
+        print("\nRun profile:")
+        print(cache.profiler.summary())
+        for path in paths:
+            print(f"✓ Saved {path.name}")
+    return results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Geographic policing intensity analysis')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Aggregate arrests batch by batch instead of loading them into memory')
+    parser.add_argument('--backend', choices=BACKENDS, default='pandas',
+                        help='Engine for Steps 1-6: pandas/Arrow, or DuckDB SQL plans over the Parquet data '
+                             '(implies --streaming; needs the duckdb package)')
+    parser.add_argument('--approximate', action='store_true',
+                        help='With --streaming, count unique individuals with HyperLogLog sketches')
+    parser.add_argument('--batch-size', type=int, default=1_000_000,
+                        help='Rows per batch in streaming mode')
+    parser.add_argument('--census-api', default=None,
+                        help='Census API root (default: api.census.gov; e.g. a mock_census_server.py URL '
+                             'for offline runs)')
+    parser.add_argument('--headless', action='store_true',
+                        help='Numbers only: skip the figures stage (matplotlib is never imported)')
+    parser.add_argument('--figures', nargs='+', default=[SUMMARY_FIGURE], choices=FIGURES, metavar='FIGURE',
+                        help=f"Figures to render, in parallel when several ({', '.join(FIGURES)})")
+    parser.add_argument('--csv', action='store_true',
+                        help='Also write the result tables as CSVs next to the results bundle')
+    parser.add_argument('--dpi', type=int, default=300, help='Figure resolution')
+    parser.add_argument('--validate', action='store_true',
+                        help='Steps 30-32 data-quality checks (results/validation_report.csv)')
+    parser.add_argument('--validate-fail-fast', action='store_true',
+                        help='Validate and stop at the first failing error-level check')
+    parser.add_argument('--progression', action='store_true',
+                        help='Offense progression transition matrices (results/offense_transitions.csv)')
+    parser.add_argument('--progression-steps', type=int, default=1,
+                        help='Also count transitions to the 2nd..k-th next arrest')
+    parser.add_argument('--progression-offense', default='Arrest_crime_category',
+                        help='Offense column to track (e.g. ChargeDescription for detailed charges)')
+    parser.add_argument('--demographics', action='store_true',
+                        help='Race x age x sex risk matrix from ACS B01001A-I (results/demographic_risk_matrix.csv; '
+                             'tables cached in data/census_<region>_demographics.csv)')
+    parser.add_argument('--lifetime', action='store_true',
+                        help='Lifetime and household risk for every block group and category '
+                             '(results/lifetime_risks.parquet)')
+    parser.add_argument('--lifetime-ages', type=int, nargs='+', default=list(DEFAULT_AGES), metavar='AGE',
+                        help=f"Ages to project to (default: {' '.join(map(str, DEFAULT_AGES))})")
+    parser.add_argument('--lifetime-start', type=int, default=START_AGE,
+                        help=f'Age the projection years count from (default: {START_AGE})')
+    parser.add_argument('--query-cube', action='store_true',
+                        help=f'Write the block group x demographic cell x month cube served by query_service.py '
+                             f'(results/{QUERY_CUBE_DIR}; with --demographics, includes ACS cell populations)')
+    parser.add_argument('--schemes', nargs='*', default=None, choices=list(CATEGORIZERS), metavar='SCHEME',
+                        help=f"Compare categorization schemes (results/categorization_schemes.csv); "
+                             f"default all of {', '.join(CATEGORIZERS)}")
+    parser.add_argument('--tiers', type=int, default=len(CUT_TARGETS) + 1,
+                        help='Tiers per scheme in the comparison')
+    parser.add_argument('--sensitivity', action='store_true',
+                        help='Sweep cut targets around the chosen pair (results/cut_point_sensitivity.csv)')
+    parser.add_argument('--sensitivity-spread', type=float, default=2.0,
+                        help='Percentage points either side of each cut target in the sweep')
+    parser.add_argument('--sensitivity-steps', type=int, default=81,
+                        help='Grid points per cut target in the sweep')
+    parser.add_argument('--pool-min-arrests', type=int, default=MIN_ARRESTS,
+                        help=f"Pool block groups with fewer arrests up to their tract/county "
+                             f"(results/blockgroup_pooled.csv; default: {MIN_ARRESTS})")
+    parser.add_argument('--rolling', type=int, nargs='*', default=None, metavar='MONTHS',
+                        help=f"Rolling-window risks (results/rolling_risks.csv); window lengths in months "
+                             f"(default: {' '.join(map(str, WINDOWS))})")
+    parser.add_argument('--rolling-state', default=None,
+                        help='Saved rolling state, resumed on the next run (default: results/rolling_state/<region>)')
+    parser.add_argument('--rolling-verify', action='store_true',
+                        help='Check every rolling row against a full recompute of its window')
+    parser.add_argument('--bootstrap', type=int, default=0, metavar='REPLICATES',
+                        help='Defendant-clustered bootstrap intervals (results/bootstrap_ci.csv)')
+    parser.add_argument('--cascade', type=int, default=0, metavar='PEOPLE',
+                        help='Simulate this many age 18-50 trajectories per category and scenario')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for bootstrap and cascade simulation (results do not depend on --workers)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processes for bootstrap replicates, cascade scenarios and figures (default: all cores)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Recompute every stage and do not write the stage cache')
+    parser.add_argument('--profile', action='store_true',
+                        help='Record per-stage time, CPU and memory to results/run_profile.json')
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help='With --profile, also record tracemalloc peaks (slows the run)')
+    parser.add_argument('--profile-stage', choices=STAGES, default=None, metavar='STAGE',
+                        help='Capture one stage with --profiler (implies --profile)')
+    parser.add_argument('--profiler', choices=PROFILERS, default='cprofile',
+                        help='Profiler for --profile-stage (pyinstrument must be installed)')
+    parser.add_argument('--invalidate', nargs='+', default=[], choices=STAGES, metavar='STAGE',
+                        help=f"Drop cached outputs of these stages before running ({', '.join(STAGES)})")
+    return parser
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    streaming = args.streaming or args.backend != 'pandas'
+    aggregates_only = '--streaming' if args.backend == 'pandas' else f'--backend {args.backend}'
+    if args.backend != 'pandas' and importlib.util.find_spec(args.backend) is None:
+        parser.error(f'--backend {args.backend} needs the {args.backend} package (pip install {args.backend})')
+    if args.backend != 'pandas' and args.approximate:
+        parser.error(f'--backend {args.backend} counts unique individuals exactly; drop --approximate')
+    if args.sensitivity and args.approximate:
+        parser.error('--sensitivity needs exact unique counts; drop --approximate')
+    if args.schemes is not None and args.tiers < 2:
+        parser.error('--tiers must be at least 2')
+    if args.schemes is not None and 'population' in (args.schemes or CATEGORIZERS) and args.tiers != len(CUT_TARGETS) + 1:
+        parser.error(f'the population scheme uses the {len(CUT_TARGETS)} Step 3 targets; '
+                     f'use --tiers {len(CUT_TARGETS) + 1} or leave it out of --schemes')
+    if args.progression and streaming:
+        parser.error(f'--progression needs per-arrest sequences; drop {aggregates_only}')
+    if args.progression_steps < 1:
+        parser.error('--progression-steps must be at least 1')
+    if args.demographics and streaming:
+        parser.error(f'--demographics needs per-arrest race, sex and age; drop {aggregates_only}')
+    if args.lifetime and args.approximate:
+        parser.error('--lifetime needs exact per-block-group unique counts; drop --approximate')
+    if args.query_cube and streaming:
+        parser.error(f'--query-cube needs per-arrest dates, race, sex and age; drop {aggregates_only}')
+    if args.rolling is not None and streaming:
+        parser.error(f'--rolling needs per-arrest dates; drop {aggregates_only}')
+    if args.bootstrap and streaming:
+        parser.error(f'--bootstrap resamples the in-memory arrest frame; drop {aggregates_only}')
+    if args.cascade and streaming:
+        parser.error(f'--cascade uses the Step 8-11 escalation tables; drop {aggregates_only}')
+    if args.profile_stage and args.profiler == 'pyinstrument' and importlib.util.find_spec('pyinstrument') is None:
+        parser.error("--profiler pyinstrument needs the pyinstrument package (pip install 'rpp-05[profile]')")
+
+    print("="*80)
+    print("CORRECTED GEOGRAPHIC POLICING INTENSITY ANALYSIS")
+    print(f"{region_description(DEFAULT_REGION['counties'], DEFAULT_REGION['state'])} ONLY")
+    print("="*80)
+
+    try:
+        results = run_pipeline(args)
+    except ValidationError as e:
+        print(f"\nERROR: Validation failed ({e})")
+        exit(1)
 
-with open(RESULTS_PATH / 'corrected_analysis_report.md', 'w') as f:
-    f.write(report)
-
-print(f"✓ Final report saved to {RESULTS_PATH / 'corrected_analysis_report.md'}")
-print("\n" + "="*80)
-print("CORRECTED ANALYSIS COMPLETE")
-print("="*80)
-print(f"Results show expected disparities for metro area analysis:")
-print(f"  Overall: {overall_ratio:.1f}x")
-print(f"  Young men: {young_ratio:.1f}x")
-print(f"  Drug enforcement: {drug_ratio:.1f}x")
-print(f"\nGeographic scope: Charleston & Berkeley Counties only")
-print(f"Population: {bg_data['total_pop'].sum():,} people across {len(bg_data)} block groups")
\ No newline at end of file
+    risks = results['risks']
+    bg_data = results['categories']['bg_data']
+    print("\n" + "="*80)
+    print("CORRECTED ANALYSIS COMPLETE")
+    print("="*80)
+    print(f"Results show expected disparities for metro area analysis:")
+    print(f"  Overall: {risks['overall_ratio']:.1f}x")
+    print(f"  Young men: {risks['young_ratio']:.1f}x")
+    print(f"  Drug enforcement: {risks['drug_ratio']:.1f}x")
+    print(f"\nGeographic scope: {region_label(DEFAULT_REGION['counties'], DEFAULT_REGION['state'])} only")
+    print(f"Population: {bg_data['total_pop'].sum():,} people across {len(bg_data)} block groups")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Cut-Point Sensitivity Sweep
+Category populations and unique-individual counts for every (cut1, cut2)
+target pair on a grid (Methodology Step 34), from one sorted pass over the
+block groups instead of one analysis run per pair
+"""
+
+import numpy as np
+import pandas as pd
+
+from subgroup_aggregation import or_reduce, subgroup_bits
+
+PERSON_BITS = 32
+
+# Category prefixes used in the sweep's column names
+CATEGORY_PREFIXES = {
+    'Ultra-Policed': 'ultra',
+    'Highly Policed': 'highly',
+    'Normally Policed': 'normal',
+}
+
+
+def blockgroup_pairs(arrests, subgroups, unit='blockgroup_id', person='DefendantId'):
+    """
+    Distinct (block group, person) pairs with their OR-ed subgroup bits.
+
+    Returns (blockgroup_id, person_code, bits) arrays, the same form as
+    StreamingAggregator.blockgroup_pairs().
+    """
+    bits = subgroup_bits(arrests, subgroups)
+    unit_codes, unit_labels = pd.factorize(arrests[unit].to_numpy())
+    person_codes = arrests[person].to_numpy().astype(np.int64)
+    keys, pair_bits = or_reduce((unit_codes.astype(np.int64) << PERSON_BITS) | person_codes, bits)
+    return (np.asarray(unit_labels)[keys >> PERSON_BITS], keys & np.int64((1 << PERSON_BITS) - 1),
+            pair_bits)
+
+
+def range_distinct_counts(positions, persons, n):
+    """
+    (n+1) x (n+1) matrix whose [a, b] entry is the number of distinct persons
+    at sorted positions a..b-1.
+
+    Each (position, person) pair is counted for the ranges where it is the
+    person's first occurrence: a in (previous position, position] and
+    b in (position, n]. Those rectangles are added with a 2-D difference
+    array, so the cost is O(pairs + n^2).
+    """
+    order = np.lexsort((positions, persons))
+    positions = positions[order].astype(np.int64)
+    persons = persons[order]
+    first = np.r_[True, persons[1:] != persons[:-1]]
+    previous = np.where(first, -1, np.r_[-1, positions[:-1]])
+
+    diff = np.zeros((n + 2, n + 2), dtype=np.int64)
+    lo_a, hi_a = previous + 1, positions + 1
+    lo_b, hi_b = positions + 1, np.full(len(positions), n + 1)
+    np.add.at(diff, (lo_a, lo_b), 1)
+    np.add.at(diff, (hi_a, lo_b), -1)
+    np.add.at(diff, (lo_a, hi_b), -1)
+    np.add.at(diff, (hi_a, hi_b), 1)
+    return diff.cumsum(axis=0).cumsum(axis=1)[:n + 1, :n + 1]
+
+
+class CutPointSweep:
+    """
+    Precomputed block-group order for evaluating many cut-point pairs.
+
+    bg_data  -- block groups with total_pop, unique_individuals and the rate
+                column (Step 2 output)
+    pairs    -- (blockgroup_id, person, bits) from blockgroup_pairs()
+    subgroups -- the definitions the bits were built from
+
+    Block groups are sorted by rate once. Every category is then a contiguous
+    range of that order, so populations and per-block-group sums come from
+    prefix sums. Distinct-person counts come from range_distinct_counts()
+    over the segments between the boundaries a grid actually uses, so its
+    table is (2 * steps + 2)^2 at most rather than one cell per pair of
+    block groups.
+    """
+
+    def __init__(self, bg_data, pairs, subgroups, rate='discretionary_per_1000'):
+        bg_data = bg_data.sort_values(rate, ascending=False).reset_index(drop=True)
+        self.subgroups = [s['name'] for s in subgroups]
+        self.rates = bg_data[rate].to_numpy(dtype=np.float64)
+        population = bg_data['total_pop'].to_numpy()
+        self.n = len(bg_data)
+
+        # Same running total as Step 3
+        cumulative = np.cumsum(population)
+        self.cumulative_pct = cumulative / population.sum() * 100
+        self.population = np.r_[0, cumulative]
+        self.unit_unique = np.r_[0, np.cumsum(bg_data['unique_individuals'].to_numpy())]
+
+        blockgroup_id, person, bits = pairs
+        position = pd.Index(bg_data['blockgroup_id']).get_indexer(blockgroup_id)
+        keep = position >= 0
+        position, person, bits = position[keep], person[keep], bits[keep]
+        flags = np.unpackbits(bits.astype('<u8').view(np.uint8), axis=1, bitorder='little')
+        self.members = {
+            name: (position[flags[:, i] == 1], person[flags[:, i] == 1])
+            for i, name in enumerate(self.subgroups)
+        }
+
+    def cut_rates(self, targets):
+        """Cut rate for each cumulative-population target (np.argmax rule of Step 3)."""
+        index = np.searchsorted(self.cumulative_pct, np.asarray(targets, dtype=np.float64), side='left')
+        index[index >= self.n] = 0  # argmax of an all-False mask
+        return self.rates[index]
+
+    def boundaries(self, cut_rates):
+        """Number of block groups with rate >= each cut rate."""
+        return np.searchsorted(-self.rates, -np.asarray(cut_rates), side='right')
+
+    def evaluate(self, cut1_targets, cut2_targets):
+        """
+        Populations and unique-individual counts per category for every
+        (cut1_target, cut2_target) pair.
+
+        Returns a DataFrame with one row per pair: the targets, cut rates, and
+        for each category prefix (ultra/highly/normal) its population,
+        num_blockgroups, unit_unique (Step 5's summed block-group counts) and
+        one distinct-person count per subgroup.
+        """
+        cut1_targets = np.asarray(cut1_targets, dtype=np.float64)
+        cut2_targets = np.asarray(cut2_targets, dtype=np.float64)
+        cut1_rate = self.cut_rates(cut1_targets)
+        cut2_rate = self.cut_rates(cut2_targets)
+        k1 = self.boundaries(cut1_rate)[:, None]
+        k2 = np.maximum(self.boundaries(cut2_rate)[None, :], k1)
+        shape = (len(cut1_targets), len(cut2_targets))
+
+        ranges = {
+            'ultra': (np.zeros(shape, dtype=np.int64), np.broadcast_to(k1, shape)),
+            'highly': (np.broadcast_to(k1, shape), k2),
+            'normal': (k2, np.full(shape, self.n)),
+        }
+        sweep = {
+            'cut1_target': np.repeat(cut1_targets, len(cut2_targets)),
+            'cut2_target': np.tile(cut2_targets, len(cut1_targets)),
+            'cut1_rate': np.repeat(cut1_rate, len(cut2_targets)),
+            'cut2_rate': np.tile(cut2_rate, len(cut1_targets)),
+        }
+        # Every range starts and stops on one of these; block groups between
+        # consecutive edges are always counted together
+        edges = np.unique(np.r_[0, self.n, k1.ravel(), k2.ravel()])
+        distinct = {
+            name: range_distinct_counts(np.searchsorted(edges, position, side='right') - 1, person,
+                                        len(edges) - 1)
+            for name, (position, person) in self.members.items()
+        }
+        for prefix, (start, stop) in ranges.items():
+            start, stop = start.ravel(), stop.ravel()
+            sweep[f'{prefix}_pop'] = self.population[stop] - self.population[start]
+            sweep[f'{prefix}_blockgroups'] = stop - start
+            sweep[f'{prefix}_unit_unique'] = self.unit_unique[stop] - self.unit_unique[start]
+            start_edge, stop_edge = np.searchsorted(edges, start), np.searchsorted(edges, stop)
+            for name, counts in distinct.items():
+                sweep[f'{prefix}_{name}'] = counts[start_edge, stop_edge]
+        return pd.DataFrame(sweep)
@@ -0,0 +1,174 @@
+"""
+Race x Age x Sex Risk Matrix (Methodology Steps 13-16)
+ACS B01001 race iterations (B01001A-I) as one compact per-block-group
+population array, and one crosstab over distinct (cell, person) pairs that
+gives unique arrested persons, populations and annual risks for every
+policing category x race x sex x age band cell and their margins at once
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+PERSON_BITS = 32
+
+# B01001 race iterations (each a full sex x age table for one group); A-G
+# partition the population, H and I overlap them
+RACE_TABLES = {
+    'A': 'White alone',
+    'B': 'Black alone',
+    'C': 'American Indian and Alaska Native alone',
+    'D': 'Asian alone',
+    'E': 'Native Hawaiian and Other Pacific Islander alone',
+    'F': 'Some other race alone',
+    'G': 'Two or more races',
+    'H': 'White alone, not Hispanic or Latino',
+    'I': 'Hispanic or Latino',
+}
+
+# The race tables that partition the population (their sum is everyone)
+PARTITION_TABLES = ['A', 'B', 'C', 'D', 'E', 'F', 'G']
+
+# Arrest Race label -> the race tables whose populations are its denominator.
+# The groups overlap: Black and Other (B-G) include Hispanics, who are also
+# in Hispanic (I), so summing the groups counts them twice; see
+# total_populations()
+RACE_GROUPS = {
+    'White': ['H'],
+    'Black': ['B'],
+    'Hispanic': ['I'],
+    'Other': ['C', 'D', 'E', 'F', 'G'],
+}
+
+SEXES = ['Male', 'Female']
+
+# Age bands of the race-iterated tables (lower bounds; the last is open)
+AGE_BAND_STARTS = [0, 5, 10, 15, 18, 20, 25, 30, 35, 45, 55, 65, 75, 85]
+AGE_BANDS = [f"{low}-{high - 1}" for low, high in zip(AGE_BAND_STARTS, AGE_BAND_STARTS[1:])] + \
+            [f"{AGE_BAND_STARTS[-1]}+"]
+
+# Variable numbers of the male and female age bands in each race table
+SEX_VARIABLES = {'Male': range(3, 17), 'Female': range(18, 32)}
+
+ALL_LABEL = 'All'
+
+
+def demographic_variables(tables=RACE_TABLES):
+    """ACS variable -> column name for every race table x sex x age band."""
+    variables = {}
+    for table in tables:
+        for sex, numbers in SEX_VARIABLES.items():
+            for number, band in zip(numbers, AGE_BANDS):
+                variables[f'B01001{table}_{number:03d}E'] = f'{table}_{sex}_{band}'
+    return variables
+
+
+def population_array(table, blockgroup_ids, tables=RACE_TABLES):
+    """
+    (block group, race table, sex, age band) int32 populations for
+    blockgroup_ids, from a table with blockgroup_id and the
+    demographic_variables() columns. Missing block groups and suppressed
+    estimates count as zero.
+    """
+    columns = list(demographic_variables(tables).values())
+    values = (table.set_index(table['blockgroup_id'].astype('int64'))[columns]
+              .apply(pd.to_numeric, errors='coerce').reindex(np.asarray(blockgroup_ids)))
+    values = values.fillna(0).clip(lower=0).to_numpy(dtype=np.int32)
+    return values.reshape(len(blockgroup_ids), len(tables), len(SEXES), len(AGE_BANDS))
+
+
+def group_populations(array, race_groups=RACE_GROUPS, tables=RACE_TABLES):
+    """(block group, race group, sex, age band) populations summed over each group's tables."""
+    table_index = {table: i for i, table in enumerate(tables)}
+    return np.stack([array[:, [table_index[t] for t in group]].sum(axis=1)
+                     for group in race_groups.values()], axis=1)
+
+
+def total_populations(array, tables=RACE_TABLES, partition=PARTITION_TABLES):
+    """(block group, sex, age band) populations of everyone, from the tables that partition it."""
+    table_index = {table: i for i, table in enumerate(tables)}
+    return array[:, [table_index[t] for t in partition]].sum(axis=1)
+
+
+def _with_margins(values):
+    """values with an extra 'All' index on every axis, holding the sum over that axis."""
+    margins = np.zeros([n + 1 for n in values.shape], dtype=np.int64)
+    for collapse in itertools.product([False, True], repeat=values.ndim):
+        axes = tuple(i for i, c in enumerate(collapse) if c)
+        target = tuple(slice(n, n + 1) if c else slice(0, n) for n, c in zip(values.shape, collapse))
+        margins[target] = values.sum(axis=axes, keepdims=True)
+    return margins
+
+
+def age_bands(ages):
+    """Age band index per age (-1 when missing)."""
+    ages = np.asarray(ages, dtype=float)
+    return np.where(np.isnan(ages), -1, np.searchsorted(AGE_BAND_STARTS, np.nan_to_num(ages), side='right') - 1)
+
+
+def _label_codes(series, labels):
+    """Position of each value in labels (-1 when absent or missing)."""
+    return pd.Index(labels).get_indexer(np.asarray(series, dtype=object))
+
+
+def risk_matrix(arrests, category_codes, populations, years_of_data, categories,
+                race_groups=RACE_GROUPS, totals=None):
+    """
+    Unique arrested persons, population and annual risk (%) for every
+    category x race group x sex x age band cell, with 'All' margins on each
+    dimension.
+
+    arrests         -- compact arrests (DefendantId codes, Race, Gender,
+                       Age_years)
+    category_codes  -- policing category index per arrest (-1 = none)
+    populations     -- (category, race group, sex, age band) populations
+    totals          -- (category, sex, age band) populations of everyone
+                       (total_populations()), for the 'All' race margin
+
+    A person counts once per cell, and once in every margin containing any
+    of their cells; the 'All' race margin also counts people whose Race is
+    in no group. Because the race groups overlap, its population should
+    come from totals; without them it is the sum over the groups, which
+    counts Hispanic Black and Other residents twice.
+    """
+    # Arrests with a Race outside the groups form a hidden last group that
+    # only the 'All' race margin includes
+    n_races = len(race_groups)
+    race = _label_codes(arrests['Race'], list(race_groups))
+    dims = [len(categories), n_races + 1, len(SEXES), len(AGE_BANDS)]
+    codes = [np.asarray(category_codes), np.where(race < 0, n_races, race),
+             _label_codes(arrests['Gender'], SEXES), age_bands(arrests['Age_years'])]
+    valid = np.logical_and.reduce([c >= 0 for c in codes])
+    cell = np.ravel_multi_index([c[valid] for c in codes], dims)
+    keys = np.unique((cell.astype(np.int64) << PERSON_BITS) | arrests['DefendantId'].to_numpy()[valid])
+    pair_dims = np.unravel_index(keys >> PERSON_BITS, dims)
+    person = keys & np.int64((1 << PERSON_BITS) - 1)
+
+    # Every margin from the same pairs: a collapsed dimension takes the
+    # extra 'All' index
+    extended = [n + 1 for n in dims]
+    unique = np.zeros(np.prod(extended), dtype=np.int64)
+    for collapse in itertools.product([False, True], repeat=len(dims)):
+        index = [np.full(len(keys), n) if c else d for d, n, c in zip(pair_dims, dims, collapse)]
+        margin_keys = np.unique((np.ravel_multi_index(index, extended).astype(np.int64) << PERSON_BITS) | person)
+        unique += np.bincount(margin_keys >> PERSON_BITS, minlength=len(unique))
+
+    population = _with_margins(np.concatenate([populations, np.zeros_like(populations[:, :1])], axis=1))
+    if totals is not None:
+        population[:, n_races + 1] = _with_margins(np.asarray(totals))
+
+    # Drop the hidden group
+    shown = [*range(n_races), n_races + 1]
+    unique = unique.reshape(extended)[:, shown].ravel()
+    population = population[:, shown]
+
+    labels = [list(categories), list(race_groups), SEXES, AGE_BANDS]
+    grid = pd.MultiIndex.from_product([names + [ALL_LABEL] for names in labels],
+                                      names=['policing_category', 'race', 'sex', 'age_band'])
+    matrix = pd.DataFrame({'population': population.ravel(), 'unique_arrested': unique}, index=grid).reset_index()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        matrix['annual_risk_pct'] = np.where(matrix['population'] > 0,
+                                             matrix['unique_arrested'] / years_of_data / matrix['population'] * 100,
+                                             np.nan)
+    return matrix
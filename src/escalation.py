@@ -0,0 +1,178 @@
+"""
+Repeat-Arrest and Escalation Engine (Methodology Steps 8-11)
+Chronological arrest numbering per defendant, inter-arrest gaps, the arrest
+frequency distribution, conditional repeat probabilities and per-capita
+enhancement / mandatory-minimum risks by policing category, from one sort of
+the arrests by (defendant, date)
+"""
+
+import numpy as np
+import pandas as pd
+
+# Statutory escalation thresholds (Step 10): arrest number -> label
+ESCALATION_THRESHOLDS = {
+    2: 'enhanced',          # 2nd offense: enhanced penalties begin
+    3: 'mandatory_minimum', # 3rd offense: mandatory minimums trigger
+    4: 'severe',            # 4th+ offense: severe escalation
+}
+
+# Last frequency bucket is "this many or more"
+MAX_BUCKET = 4
+
+
+def arrest_sequences(arrests, person='DefendantId', date='ArrestDate'):
+    """
+    Order arrests by (person, date) and number them.
+
+    Returns a DataFrame aligned with the sorted order:
+      row          -- position of the arrest in `arrests`
+      person       -- person code
+      ordinal      -- 1 for a person's first arrest, 2 for the second, ...
+      gap_days     -- days since the person's previous arrest (NaN for the first)
+      total        -- the person's total number of arrests
+    Same-day arrests keep their input order. Arrests with no date (NaT)
+    still count, numbered after the person's dated arrests, with a NaN gap.
+    """
+    person_codes = arrests[person].to_numpy()
+    if not np.issubdtype(person_codes.dtype, np.integer):
+        person_codes, _ = pd.factorize(person_codes)
+    dates = arrests[date].to_numpy().astype('datetime64[D]')
+    missing = np.isnat(dates)
+    days = dates.astype(np.int64)
+
+    # One stable argsort of a combined (person, day) key; about twice as fast
+    # as lexsort on the two columns. Missing dates sort after the last day;
+    # lexsort when the key would not fit in int64
+    n = len(person_codes)
+    if missing.all():
+        days = np.zeros(n, dtype=np.int64)
+    else:
+        first_day, last_day = days[~missing].min(), days[~missing].max()
+        days = np.where(missing, last_day + 1, days) - first_day
+    span = int(days.max()) + 1 if n else 1
+    n_person = int(person_codes.max()) + 1 if n else 1
+    if n_person * span < 2 ** 62:
+        order = np.argsort(person_codes.astype(np.int64) * span + days, kind='stable')
+    else:
+        order = np.lexsort((days, person_codes))
+    sorted_person = person_codes[order]
+    sorted_days = days[order]
+
+    starts = np.r_[True, sorted_person[1:] != sorted_person[:-1]] if n else np.zeros(0, dtype=bool)
+    start_index = np.flatnonzero(starts)
+    run_start = np.maximum.accumulate(np.where(starts, np.arange(n), 0))
+    ordinal = np.arange(n) - run_start + 1
+
+    gap = np.empty(n, dtype=np.float64)
+    gap[1:] = np.diff(sorted_days)
+    gap[starts | missing[order]] = np.nan
+
+    totals = np.diff(np.r_[start_index, n])
+    return pd.DataFrame({
+        'row': order,
+        'person': sorted_person,
+        'ordinal': ordinal,
+        'gap_days': gap,
+        'total': np.repeat(totals, totals),
+    })
+
+
+def _buckets(counts, max_bucket=MAX_BUCKET):
+    return np.minimum(counts, max_bucket)
+
+
+def frequency_distribution(totals, max_bucket=MAX_BUCKET):
+    """Step 8 table: people with 1, 2, ..., max_bucket+ arrests."""
+    people = np.bincount(_buckets(totals, max_bucket), minlength=max_bucket + 1)[1:]
+    labels = [str(k) for k in range(1, max_bucket)] + [f"{max_bucket}+"]
+    return pd.DataFrame({
+        'arrests': labels,
+        'people': people,
+        'pct_people': people / max(people.sum(), 1) * 100,
+    })
+
+
+def conditional_probabilities(totals, max_bucket=MAX_BUCKET):
+    """Step 8: P(k+1th arrest | kth arrest) for k = 1..max_bucket-1."""
+    at_least = np.bincount(_buckets(totals, max_bucket), minlength=max_bucket + 1)[::-1].cumsum()[::-1]
+    k = np.arange(1, max_bucket)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        probability = np.where(at_least[k] > 0, at_least[k + 1] / at_least[k], np.nan)
+    labels = [f"{j + 1}{'+' if j + 1 == max_bucket else ''} | {j}" for j in k]
+    return pd.DataFrame({
+        'transition': labels,
+        'people_at_k': at_least[k],
+        'people_at_next': at_least[k + 1],
+        'probability': probability,
+    })
+
+
+def gap_summary(sequences, max_bucket=MAX_BUCKET):
+    """Step 9 recidivism velocity: days between arrest k-1 and k."""
+    repeat = sequences[sequences['ordinal'] > 1]
+    bucket = _buckets(repeat['ordinal'].to_numpy(), max_bucket)
+    summary = repeat.groupby(bucket)['gap_days'].agg(['count', 'mean', 'median'])
+    summary.index = [f"{k - 1}->{k}" if k < max_bucket else f"{k - 1}+->{k}+" for k in summary.index]
+    summary.index.name = 'transition'
+    return summary.reset_index().rename(columns={'count': 'arrests', 'mean': 'mean_days', 'median': 'median_days'})
+
+
+def repeat_by_offense(arrests, sequences, offense='Arrest_crime_category'):
+    """Step 9: arrests per person and median days since the previous arrest, by offense type."""
+    labels = arrests[offense].to_numpy()[sequences['row'].to_numpy()]
+    codes, uniques = pd.factorize(labels)
+    keep = codes >= 0
+    codes, person = codes[keep], sequences['person'].to_numpy()[keep]
+    n = len(uniques)
+
+    arrests_n = np.bincount(codes, minlength=n)
+    pair_codes, _ = pd.factorize(codes.astype(np.int64) * (int(person.max()) + 1 if len(person) else 1) + person)
+    first = np.zeros(pair_codes.max() + 1 if len(pair_codes) else 0, dtype=np.int64)
+    first[pair_codes] = codes
+    people_n = np.bincount(first, minlength=n)
+
+    gaps = pd.Series(sequences['gap_days'].to_numpy()[keep]).groupby(codes).median()
+    table = pd.DataFrame({
+        'offense': np.asarray(uniques, dtype=object),
+        'arrests': arrests_n,
+        'people': people_n,
+        'arrests_per_person': arrests_n / np.maximum(people_n, 1),
+        'median_days_since_previous': gaps.reindex(np.arange(n)).to_numpy(),
+    })
+    return table.sort_values('arrests', ascending=False).reset_index(drop=True)
+
+
+def escalation_risks(person, categories, category_population, years_of_data, thresholds=ESCALATION_THRESHOLDS):
+    """
+    Step 11: per-capita escalation risks by policing category.
+
+    person               -- person code per arrest
+    categories           -- policing category per arrest (categorical; NaN
+                            rows are ignored)
+    category_population  -- census population per category (Series)
+
+    For each threshold k, counts the people with k or more arrests in the
+    category's block groups and reports them per year and per 1,000
+    residents.
+    """
+    levels = pd.Categorical(categories)
+    cat = levels.codes.astype(np.int64)
+    keep = cat >= 0
+    cat, person = cat[keep], np.asarray(person)[keep].astype(np.int64)
+    n_person = int(person.max()) + 1 if len(person) else 1
+
+    # Arrests per (category, person), then people at or above each threshold
+    pair_keys, per_pair = np.unique(cat * n_person + person, return_counts=True)
+    pair_cat = pair_keys // n_person
+    rows = []
+    for code, label in enumerate(levels.categories):
+        counts = per_pair[pair_cat == code]
+        population = category_population.get(label, np.nan)
+        row = {'Category': label, 'Population': population, 'People_Arrested': len(counts)}
+        for k, name in thresholds.items():
+            people = int((counts >= k).sum())
+            row[f'People_{name}'] = people
+            row[f'{name}_per_1000_annual'] = people / years_of_data / population * 1000
+            row[f'pct_arrested_{name}'] = people / max(len(counts), 1) * 100
+        rows.append(row)
+    return pd.DataFrame(rows)
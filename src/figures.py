@@ -0,0 +1,166 @@
+"""
+Figure Rendering
+The six-panel summary figure and its panels as standalone figures. Matplotlib
+is imported only when a figure is rendered, and several figures render in
+parallel worker processes
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+SUMMARY_FIGURE = 'summary'
+
+CATEGORY_COLORS = ['darkred', 'orange', 'lightgreen']
+CATEGORY_SHORT = ['Ultra', 'Highly', 'Normal']
+
+
+def figure_data(cut_points, categories, risks, category_order, young_men_label, scope):
+    """The (small, picklable) inputs every figure needs."""
+    return {
+        'rates': categories['bg_data']['discretionary_per_1000'].to_numpy(),
+        'total_pop': int(categories['bg_data']['total_pop'].sum()),
+        'blockgroups': len(categories['bg_data']),
+        'pop_pct': [categories['category_stats'].loc[cat, 'pop_pct'] for cat in category_order],
+        'ultra_pop': categories['category_stats'].loc[category_order[0], 'total_pop'],
+        'cut1_rate': cut_points['cut1_rate'],
+        'cut2_rate': cut_points['cut2_rate'],
+        'overall_risk': risks['risk_df']['Annual_Risk_Pct'].to_numpy(),
+        'young_risk': risks['young_men_df']['Annual_Risk_Pct'].to_numpy(),
+        'drug_rates': risks['drug_risk_df']['Drug_Per_1000_Annual'].to_numpy(),
+        'overall_ratio': risks['overall_ratio'],
+        'young_ratio': risks['young_ratio'],
+        'drug_ratio': risks['drug_ratio'],
+        'young_men_label': young_men_label,
+        'scope': scope,
+    }
+
+
+# -- panels ----------------------------------------------------------------
+
+def _labelled_bars(ax, values, fmt):
+    bars = ax.bar(CATEGORY_SHORT, values, color=CATEGORY_COLORS)
+    ax.grid(True, alpha=0.3, axis='y')
+    for bar, value in zip(bars, values):
+        ax.text(bar.get_x() + bar.get_width()/2, bar.get_height(),
+                fmt.format(value), ha='center', va='bottom')
+
+
+def rate_distribution(ax, data):
+    """Distribution of discretionary rates with both cut points."""
+    ax.hist(data['rates'], bins=30, edgecolor='black', alpha=0.7, color='steelblue')
+    ax.axvline(data['cut1_rate'], color='red', linestyle='--', label=f"Cut 1: {data['cut1_rate']:.0f}")
+    ax.axvline(data['cut2_rate'], color='orange', linestyle='--', label=f"Cut 2: {data['cut2_rate']:.0f}")
+    ax.set_xlabel('Discretionary Arrests per 1,000')
+    ax.set_ylabel('Number of Block Groups')
+    ax.set_title(f"{data['scope']} Only")
+    ax.legend(fontsize=8)
+    ax.grid(True, alpha=0.3)
+
+
+def population_share(ax, data):
+    ax.pie(data['pop_pct'], labels=CATEGORY_SHORT, colors=CATEGORY_COLORS, autopct='%1.1f%%', startangle=90)
+    ax.set_title('Population Distribution')
+
+
+def overall_risk(ax, data):
+    _labelled_bars(ax, data['overall_risk'], '{:.2f}%')
+    ax.set_ylabel('Annual Risk (%)')
+    ax.set_title('Overall Annual Risk')
+
+
+def young_men_risk(ax, data):
+    _labelled_bars(ax, data['young_risk'], '{:.2f}%')
+    ax.set_ylabel('Annual Risk (%)')
+    ax.set_title(f"{data['young_men_label']} Annual Risk")
+
+
+def drug_risk(ax, data):
+    _labelled_bars(ax, data['drug_rates'], '{:.1f}')
+    ax.set_ylabel('Per 1,000 Annually')
+    ax.set_title('Drug Arrests Per Capita')
+
+
+def summary_text(ax, data):
+    ax.axis('off')
+    text = f"""CORRECTED GEOGRAPHIC SCOPE
+{data['scope']}
+
+Population: {data['total_pop']:,}
+Block Groups: {data['blockgroups']}
+
+Key Disparities:
+• Overall: {data['overall_ratio']:.1f}x
+• Young Men: {data['young_ratio']:.1f}x
+• Drug Enforcement: {data['drug_ratio']:.1f}x
+
+Ultra-Policed: {data['pop_pct'][0]:.1f}%
+({data['ultra_pop']:,} people)
+
+This analysis focuses on the
+intended study area and avoids
+rural/urban comparison artifacts."""
+    ax.text(0.05, 0.95, text, transform=ax.transAxes,
+            fontsize=9, verticalalignment='top', fontfamily='monospace',
+            bbox=dict(boxstyle='round', facecolor='lightyellow', alpha=0.8))
+
+
+# Panels in summary-figure order; each can also be rendered on its own
+PANELS = {
+    'rate_distribution': rate_distribution,
+    'population_share': population_share,
+    'overall_risk': overall_risk,
+    'young_men_risk': young_men_risk,
+    'drug_risk': drug_risk,
+    'summary_text': summary_text,
+}
+FIGURES = [SUMMARY_FIGURE, *PANELS]
+
+
+# -- rendering -------------------------------------------------------------
+
+def render_figure(name, data, output_path, dpi=300):
+    """Draw one figure (SUMMARY_FIGURE or a panel name) and save it."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    plt.style.use('default')
+    if name == SUMMARY_FIGURE:
+        fig, axes = plt.subplots(2, 3, figsize=(16, 10))
+        for ax, draw in zip(axes.ravel(), PANELS.values()):
+            draw(ax, data)
+        plt.suptitle(f"Policing Intensity Analysis - Corrected Geographic Scope\n{data['scope']} Only",
+                     fontsize=13, fontweight='bold')
+    else:
+        fig, ax = plt.subplots(figsize=(6, 5))
+        PANELS[name](ax, data)
+    plt.tight_layout()
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(output_path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return str(output_path)
+
+
+def _render_task(task):
+    return render_figure(*task)
+
+
+def render_figures(paths, data, dpi=300, workers=None):
+    """
+    Render {figure name: output path}; returns the paths written.
+
+    More than one figure renders in worker processes (each pays the
+    matplotlib import once).
+    """
+    unknown = set(paths) - set(FIGURES)
+    if unknown:
+        raise ValueError(f"Unknown figure(s) {', '.join(sorted(unknown))} (choose from {', '.join(FIGURES)})")
+    tasks = [(name, data, path, dpi) for name, path in paths.items()]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        return [_render_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render_task, tasks))
@@ -0,0 +1,148 @@
+"""
+Geography Rollup Cube
+Arrests, discretionary arrests, unique defendants and census populations for
+every block group, tract, county and state in the study area, keyed by the
+integer GEOID prefixes, so rollups and small-area pooling (Methodology Step
+33) are lookups instead of fresh groupbys over the arrest table
+"""
+
+import numpy as np
+import pandas as pd
+
+from compact_frame import COUNTY_DIVISOR, TRACT_DIVISOR
+
+PERSON_BITS = 32
+
+# Level -> divisor that turns a 12-digit block group GEOID into the level's
+# GEOID, finest first (the order small block groups are pooled in)
+LEVELS = {
+    'blockgroup': 1,
+    'tract': TRACT_DIVISOR,
+    'county': COUNTY_DIVISOR,
+    'state': 10 ** 10,
+}
+
+COUNT_COLUMNS = ['total_arrests', 'discretionary_arrests', 'unique_individuals']
+POPULATION_COLUMNS = ['total_pop', 'white_pop', 'black_pop', 'hispanic_pop', 'poverty_count']
+
+# Step 33 rule of thumb
+MIN_ARRESTS = 30
+
+
+def distinct_pairs(blockgroup_id, person):
+    """Sorted distinct (block group, person code) pairs as two arrays."""
+    bg_codes, bg_labels = pd.factorize(np.asarray(blockgroup_id), sort=True)
+    keys = np.unique((bg_codes.astype(np.int64) << PERSON_BITS) | np.asarray(person, dtype=np.int64))
+    return np.asarray(bg_labels)[keys >> PERSON_BITS], keys & np.int64((1 << PERSON_BITS) - 1)
+
+
+def _unique_per_unit(unit_id, person):
+    """Distinct persons per unit from distinct (block group, person) pairs mapped to units."""
+    unit_codes, units = pd.factorize(unit_id, sort=True)
+    keys = np.unique((unit_codes.astype(np.int64) << PERSON_BITS) | person)
+    return pd.Series(np.bincount(keys >> PERSON_BITS, minlength=len(units)), index=units)
+
+
+class GeographyCube:
+    """
+    One frame per level, indexed by that level's integer GEOID, with the
+    summed census populations, arrest counts, the number of block groups and
+    distinct defendants (counted at each level, not summed).
+
+    Census block groups without arrests are kept with zero counts, and
+    arrest block groups missing from the census with zero population.
+    """
+
+    def __init__(self, levels):
+        self.levels = levels
+
+    @classmethod
+    def build(cls, census_data, bg_arrests, bg_discretionary, pairs=None):
+        """
+        census_data      -- block group census rows (blockgroup_id, populations)
+        bg_arrests       -- blockgroup_id, total_arrests, unique_individuals
+        bg_discretionary -- blockgroup_id, discretionary_arrests
+        pairs            -- distinct (blockgroup_id, person code) arrays for
+                            the unique counts above block group level (None
+                            leaves them missing, as in approximate streaming)
+        """
+        bg = (census_data[['blockgroup_id', *POPULATION_COLUMNS]]
+              .merge(bg_arrests, on='blockgroup_id', how='outer')
+              .merge(bg_discretionary, on='blockgroup_id', how='left'))
+        bg[POPULATION_COLUMNS + COUNT_COLUMNS] = bg[POPULATION_COLUMNS + COUNT_COLUMNS].fillna(0)
+        integer = POPULATION_COLUMNS + ['total_arrests', 'discretionary_arrests']
+        bg[integer] = bg[integer].astype(np.int64)
+        bg['blockgroups'] = 1
+        bg = bg.set_index('blockgroup_id').sort_index()
+
+        summed = POPULATION_COLUMNS + ['total_arrests', 'discretionary_arrests', 'blockgroups']
+        levels = {'blockgroup': bg[summed + ['unique_individuals']]}
+        for level, divisor in list(LEVELS.items())[1:]:
+            frame = bg[summed].groupby(bg.index // divisor).sum()
+            frame.index.name = f'{level}_id'
+            if pairs is not None:
+                blockgroup_id, person = pairs
+                unique = _unique_per_unit(np.asarray(blockgroup_id) // divisor, np.asarray(person, dtype=np.int64))
+                frame['unique_individuals'] = unique.reindex(frame.index, fill_value=0)
+            else:
+                frame['unique_individuals'] = np.nan
+            levels[level] = frame
+        return cls(levels)
+
+    @classmethod
+    def from_frame(cls, frame):
+        """The cube from its long form (to_frame)."""
+        levels = {}
+        for level in LEVELS:
+            part = frame[frame['level'] == level].drop(columns='level')
+            levels[level] = part.set_index('geoid').rename_axis(f'{level}_id')
+        return cls(levels)
+
+    def to_frame(self):
+        """Long form: one row per (level, geoid)."""
+        return pd.concat([frame.rename_axis('geoid').reset_index().assign(level=level)
+                          for level, frame in self.levels.items()], ignore_index=True)[
+            ['level', 'geoid', 'blockgroups', *POPULATION_COLUMNS, *COUNT_COLUMNS]]
+
+    def rollup(self, level):
+        """Counts and rates per 1,000 for every unit at this level."""
+        return with_rates(self.levels[level].copy())
+
+    def lookup(self, level, blockgroup_id):
+        """The level's row for each block group's parent unit (one reindex)."""
+        return self.levels[level].reindex(np.asarray(blockgroup_id) // LEVELS[level])
+
+    def pooled(self, min_arrests=MIN_ARRESTS, column='total_arrests', min_pop=1):
+        """
+        Every block group with its counts taken from the finest unit (itself,
+        its tract, county or state) that has at least min_arrests in `column`
+        and min_pop people, with rates per 1,000 from that unit.
+        """
+        bg_index = self.levels['blockgroup'].index.to_numpy()
+        parents = {level: self.lookup(level, bg_index) for level in LEVELS}
+        reliable = [(parents[level][column] >= min_arrests).to_numpy()
+                    & (parents[level]['total_pop'] >= min_pop).to_numpy() for level in LEVELS]
+        # The whole state is the last resort even below the threshold
+        choice = np.select(reliable[:-1], range(len(LEVELS) - 1), default=len(LEVELS) - 1)
+
+        names = list(LEVELS)
+        pooled = pd.DataFrame({'blockgroup_id': bg_index,
+                               'blockgroup_pop': self.levels['blockgroup']['total_pop'].to_numpy(),
+                               'blockgroup_arrests': self.levels['blockgroup']['total_arrests'].to_numpy(),
+                               'pooled_level': np.asarray(names, dtype=object)[choice],
+                               'pooled_geoid': bg_index // np.asarray(list(LEVELS.values()))[choice]})
+        columns = ['blockgroups', 'total_pop', *COUNT_COLUMNS]
+        values = np.stack([parents[level][columns].to_numpy(dtype=float) for level in LEVELS])
+        for i, name in enumerate(columns):
+            picked = values[choice, np.arange(len(bg_index)), i]
+            pooled[name] = picked if np.isnan(picked).any() else picked.astype(np.int64)
+        return with_rates(pooled)
+
+
+def with_rates(frame):
+    """Discretionary, total and unique-individual rates per 1,000 residents."""
+    population = frame['total_pop'].where(frame['total_pop'] > 0)
+    frame['discretionary_per_1000'] = frame['discretionary_arrests'] / population * 1000
+    frame['total_per_1000'] = frame['total_arrests'] / population * 1000
+    frame['unique_per_1000'] = frame['unique_individuals'] / population * 1000
+    return frame
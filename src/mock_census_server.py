@@ -0,0 +1,176 @@
+"""
+Mock Census API Server
+Local stand-in for the ACS endpoint so the census fetch path can be run,
+tested and benchmarked without network access. Responses are deterministic
+synthetic block groups in the same JSON layout as api.census.gov
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Block groups per county when the county is not listed here
+DEFAULT_BLOCKGROUPS = 120
+COUNTY_BLOCKGROUPS = {
+    ('45', '019'): 260,  # Charleston
+    ('45', '015'): 120,  # Berkeley
+}
+STATE_COUNTIES = {
+    '45': ['015', '019', '035'],
+}
+
+# Returned by the ACS API for suppressed estimates
+MISSING_VALUE = '-666666666'
+
+# The live API answers a bad key with HTTP 200 and an HTML page, not JSON
+INVALID_KEY_PAGE = ('<html><head><title>Invalid Key</title></head><body>A valid <em>key</em> must be '
+                    'included with each data API request.</body></html>')
+
+
+def _rng(*parts):
+    seed = int(hashlib.sha256('|'.join(parts).encode()).hexdigest()[:16], 16)
+    return random.Random(seed)
+
+
+def blockgroups(state, county):
+    """(tract, block group) codes for a county, deterministic per county."""
+    n = COUNTY_BLOCKGROUPS.get((state, county), DEFAULT_BLOCKGROUPS)
+    rng = _rng('geo', state, county)
+    codes = []
+    tract = 100
+    while len(codes) < n:
+        for bg in range(1, rng.randint(1, 4) + 1):
+            codes.append((f"{tract:06d}", str(bg)))
+        tract += rng.randint(1, 50)
+    return codes[:n]
+
+
+def variable_value(variable, state, county, tract, bg):
+    """Synthetic estimate for one variable; population-like unless it is a median."""
+    rng = _rng(variable, state, county, tract, bg)
+    if variable.startswith(('B19013', 'B25077')):
+        return MISSING_VALUE if rng.random() < 0.03 else str(rng.randint(20_000, 900_000))
+    if variable.startswith('B25010'):
+        return MISSING_VALUE if rng.random() < 0.03 else f"{rng.uniform(1.5, 4.0):.2f}"
+    return str(int(rng.lognormvariate(6.8, 0.6)))
+
+
+def acs_response(fields, state, county):
+    """Rows (header first) for every block group of state/county ('*' = all counties)."""
+    counties = STATE_COUNTIES.get(state, ['001']) if county == '*' else [county]
+    rows = [fields + ['state', 'county', 'tract', 'block group']]
+    for c in counties:
+        for tract, bg in blockgroups(state, c):
+            row = []
+            for field in fields:
+                if field == 'NAME':
+                    row.append(f"Block Group {bg}, Census Tract {int(tract) / 100:g}, County {c}, State {state}")
+                else:
+                    row.append(variable_value(field, state, c, tract, bg))
+            rows.append(row + [state, c, tract, bg])
+    return rows
+
+
+def _geography(query):
+    """state and county from `in` clauses ('state:45 county:019' or repeated params)."""
+    clauses = {}
+    for value in query.get('in', []):
+        for clause in value.split():
+            key, _, code = clause.partition(':')
+            clauses[key] = code
+    return clauses.get('state'), clauses.get('county', '*')
+
+
+class MockCensusHandler(BaseHTTPRequestHandler):
+    """GET /<year>/<dataset>?get=...&for=block group:*&in=state:SS county:CCC"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            fail = server.random.random() < server.failure_rate
+        if server.latency:
+            time.sleep(server.latency)
+        if fail:
+            self._send(503, {'error': 'mock failure'})
+            return
+
+        query = parse_qs(urlparse(self.path).query)
+        if server.api_key and query.get('key', [''])[0] != server.api_key:
+            self._send_text(200, INVALID_KEY_PAGE)
+            return
+        fields = query.get('get', [''])[0].split(',')
+        state, county = _geography(query)
+        if not state or not query.get('for', [''])[0].startswith('block group'):
+            self._send(400, {'error': 'unsupported geography'})
+            return
+        if len(fields) > 50:
+            self._send(400, {'error': 'too many variables'})
+            return
+        self._send(200, acs_response(fields, state, county))
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status, text):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve(port=0, latency=0.0, failure_rate=0.0, seed=0, api_key=None):
+    """
+    Run the mock server on a background thread; yields its base URL.
+
+    latency       -- seconds added to every response
+    failure_rate  -- share of requests answered with HTTP 503
+    api_key       -- if set, other keys get the API's HTML "Invalid Key" page
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockCensusHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.failure_rate = failure_rate
+    server.api_key = api_key
+    server.random = random.Random(seed)
+    server.lock = threading.Lock()
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mock census API server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    with serve(args.port, args.latency, args.failure_rate) as base_url:
+        print(f"✓ Mock census API at {base_url} (Ctrl-C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
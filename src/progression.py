@@ -0,0 +1,142 @@
+"""
+Offense Progression (Methodology Steps 9 and 22)
+Offense-to-offense transition counts between each arrest and the same
+person's next (or k-th next) arrest, by policing category and subgroup,
+with gap-time histograms. Works on the (person, date) order from
+escalation.arrest_sequences, so pairing arrests is one shift of the sorted
+codes and counting is one bincount (or sparse unique) per subgroup
+"""
+
+import numpy as np
+import pandas as pd
+
+# Dense bincount up to this many (group, from, to) cells, sparse unique above
+DENSE_CELLS = 1 << 24
+
+# Gap-time histogram bin edges in days (the last bin is open)
+GAP_BINS = [0, 30, 90, 180, 365, 730]
+
+ALL_LABEL = 'All'
+
+
+def gap_labels(bins=GAP_BINS):
+    return [f"{low}-{high - 1}" for low, high in zip(bins, bins[1:])] + [f"{bins[-1]}+"]
+
+
+def cell_counts(keys, n_cells, weights=None):
+    """
+    (cell, count[, weight sum]) for the non-empty cells among keys, dense
+    bincount when n_cells is small, sorted unique otherwise.
+    """
+    if n_cells <= DENSE_CELLS:
+        counts = np.bincount(keys, minlength=n_cells)
+        cells = np.flatnonzero(counts)
+        sums = np.bincount(keys, weights=weights, minlength=n_cells)[cells] if weights is not None else None
+        return cells, counts[cells], sums
+    cells, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    sums = np.bincount(inverse, weights=weights, minlength=len(cells)) if weights is not None else None
+    return cells, counts, sums
+
+
+def step_pairs(sequences, steps):
+    """
+    Sorted positions (i, i + steps) where both arrests belong to the same
+    person, and the days between them.
+    """
+    person = sequences['person'].to_numpy()
+    same = np.flatnonzero(person[steps:] == person[:-steps]) if len(person) > steps else np.zeros(0, dtype=np.int64)
+    elapsed = np.concatenate([[0.0], np.cumsum(np.nan_to_num(sequences['gap_days'].to_numpy()))])
+    return same, same + steps, elapsed[same + steps + 1] - elapsed[same + 1]
+
+
+def offense_transitions(sequences, offense_codes, offense_labels, category_codes, category_labels,
+                        subgroup_masks, max_steps=1, gap_bins=GAP_BINS):
+    """
+    Transition and gap-histogram tables for steps 1..max_steps.
+
+    sequences        -- escalation.arrest_sequences(arrests)
+    offense_codes    -- offense code per arrest (input order; -1 = missing)
+    category_codes   -- policing category code per arrest (-1 = none)
+    subgroup_masks   -- {subgroup name: bool per arrest}
+
+    A transition is counted in the category and subgroups of its earlier
+    arrest, and in the category 'All' margin. probability is the share of
+    the from-offense's transitions (same step, category, subgroup) going to
+    the to-offense.
+    """
+    rows = sequences['row'].to_numpy()
+    offense = np.asarray(offense_codes, dtype=np.int64)[rows]
+    category = np.asarray(category_codes, dtype=np.int64)[rows]
+    masks = {name: np.asarray(mask)[rows] for name, mask in subgroup_masks.items()}
+    n, n_groups, n_bins = len(offense_labels), len(category_labels) + 1, len(gap_bins)
+    offense_names = np.asarray(offense_labels, dtype=object)
+    group_names = np.asarray(list(category_labels) + [ALL_LABEL], dtype=object)
+
+    transitions, gaps = [], []
+    for steps in range(1, max_steps + 1):
+        start, end, days = step_pairs(sequences, steps)
+        valid = (offense[start] >= 0) & (offense[end] >= 0)
+        start, end, days = start[valid], end[valid], days[valid]
+        gap_bin = np.searchsorted(gap_bins, days, side='right') - 1
+        for name, mask in masks.items():
+            keep = mask[start] & (category[start] >= 0)
+            source, target = offense[start[keep]], offense[end[keep]]
+            # Every transition once in its category and once in the All margin
+            group = np.concatenate([category[start[keep]], np.full(keep.sum(), n_groups - 1)])
+            pair = np.tile(source.astype(np.int64) * n + target, 2)
+            pair_days = np.tile(days[keep], 2)
+
+            cells, counts, day_sums = cell_counts(group * n * n + pair, n_groups * n * n, pair_days)
+            cell_group, cell_pair = np.divmod(cells, n * n)
+            cell_from, cell_to = np.divmod(cell_pair, n)
+            out_cells, out_counts, _ = cell_counts(group * n + pair // n, n_groups * n)
+            outgoing = out_counts[np.searchsorted(out_cells, cell_group * n + cell_from)]
+            transitions.append(pd.DataFrame({
+                'steps': steps,
+                'policing_category': group_names[cell_group],
+                'subgroup': name,
+                'from_offense': offense_names[cell_from],
+                'to_offense': offense_names[cell_to],
+                'transitions': counts,
+                'probability': counts / outgoing,
+                'mean_gap_days': day_sums / counts,
+            }))
+
+            bins = np.tile(gap_bin[keep], 2)
+            cells, counts, _ = cell_counts((group * n * n + pair) * n_bins + bins, n_groups * n * n * n_bins)
+            cell_pair, cell_bin = np.divmod(cells, n_bins)
+            cell_group, cell_pair = np.divmod(cell_pair, n * n)
+            cell_from, cell_to = np.divmod(cell_pair, n)
+            gaps.append(pd.DataFrame({
+                'steps': steps,
+                'policing_category': group_names[cell_group],
+                'subgroup': name,
+                'from_offense': offense_names[cell_from],
+                'to_offense': offense_names[cell_to],
+                'gap_days': np.asarray(gap_labels(gap_bins), dtype=object)[cell_bin],
+                'transitions': counts,
+            }))
+    return pd.concat(transitions, ignore_index=True), pd.concat(gaps, ignore_index=True)
+
+
+def ever_progressed(sequences, offense_codes, offense_labels, from_labels, to_labels):
+    """
+    Step 22: of the people whose first arrest is each from-offense, the share
+    with any later arrest for each to-offense.
+    """
+    rows = sequences['row'].to_numpy()
+    offense = np.asarray(offense_codes)[rows]
+    person = sequences['person'].to_numpy()
+    first = sequences['ordinal'].to_numpy() == 1
+    index = pd.Index(offense_labels)
+
+    table = []
+    for source in from_labels:
+        starters = np.unique(person[first & (offense == index.get_loc(source))])
+        for target in to_labels:
+            later = np.unique(person[~first & (offense == index.get_loc(target))])
+            progressed = np.intersect1d(starters, later, assume_unique=True)
+            table.append({'first_offense': source, 'later_offense': target, 'people_starting': len(starters),
+                          'people_progressed': len(progressed),
+                          'pct_progressed': len(progressed) / max(len(starters), 1) * 100})
+    return pd.DataFrame(table)
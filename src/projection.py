@@ -0,0 +1,84 @@
+"""
+Lifetime and Household Risk Projection (Methodology Steps 7 and 27)
+Projects annual arrest risks to cumulative risk by each age on a grid,
+1 - (1 - p)^years, and to the risk that anyone in a household is arrested,
+1 - (1 - p)^household_size, for every unit x subgroup x age point in one
+broadcast computation
+"""
+
+import numpy as np
+import pandas as pd
+
+# Step 7 age points, counted from START_AGE
+DEFAULT_AGES = (25, 30, 35, 50)
+START_AGE = 18
+
+# Used where the census table has no average household size (B25010)
+AVERAGE_HOUSEHOLD_SIZE = 2.5
+
+
+def log_survival(annual_risk, years):
+    """log (1 - p)^years for every risk x year; log1p keeps small risks accurate."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.multiply.outer(np.log1p(-np.clip(annual_risk, 0, 1)), years)
+    # (1 - 1)^0 is 1, not log(0) * 0 = nan; -0.0 as log(1 - p) * 0 gives, so risks stay +0.0
+    return np.where(np.asarray(years) == 0, -0.0, logs)
+
+
+def project(annual_risk, household_size, ages=DEFAULT_AGES, start_age=START_AGE):
+    """
+    annual_risk     -- (units, subgroups) annual risks as fractions
+    household_size  -- (units,) average household sizes
+
+    Returns (units, subgroups, ages) lifetime risks, (units, subgroups)
+    household annual risks and (units, subgroups, ages) household lifetime
+    risks, as fractions.
+    """
+    years = np.maximum(np.asarray(ages, dtype=float) - start_age, 0)
+    household = np.asarray(household_size, dtype=float)[:, None]
+    log_annual = log_survival(np.asarray(annual_risk, dtype=float), 1.0)
+    log_lifetime = log_survival(np.asarray(annual_risk, dtype=float), years)
+    lifetime = -np.expm1(log_lifetime)
+    household_annual = -np.expm1(log_annual * household)
+    household_lifetime = -np.expm1(log_lifetime * household[:, :, None])
+    return lifetime, household_annual, household_lifetime
+
+
+def _repeated_categorical(values, repeats, unique=False):
+    """Categorical of values, each repeated; built from codes so no per-row objects are made."""
+    if unique:
+        codes, labels = np.arange(len(values)), values
+    else:
+        codes, labels = pd.factorize(np.asarray(values, dtype=object))
+    return pd.Categorical.from_codes(np.repeat(codes, repeats), labels, validate=False)
+
+
+def projection_table(units, levels, policing_category, subgroup_names, annual_risk, household_size,
+                     ages=DEFAULT_AGES, start_age=START_AGE):
+    """
+    Tidy projection: one row per unit x subgroup x age with annual,
+    lifetime, household annual and household lifetime risks (percent).
+
+    units (distinct labels), levels and policing_category are per-unit
+    arrays; annual_risk is (units, subgroups) in percent.
+    """
+    annual = np.asarray(annual_risk, dtype=float) / 100
+    lifetime, household_annual, household_lifetime = project(annual, household_size, ages, start_age)
+    n_units, n_subgroups = annual.shape
+    n_ages = len(ages)
+    per_unit = n_subgroups * n_ages
+    subgroup_codes = np.tile(np.repeat(np.arange(n_subgroups), n_ages), n_units)
+
+    return pd.DataFrame({
+        'level': _repeated_categorical(levels, per_unit),
+        'unit': _repeated_categorical(units, per_unit, unique=True),
+        'policing_category': _repeated_categorical(policing_category, per_unit),
+        'subgroup': pd.Categorical.from_codes(subgroup_codes, list(subgroup_names), validate=False),
+        'age': np.tile(np.asarray(ages), n_units * n_subgroups),
+        'years': np.tile(np.maximum(np.asarray(ages) - start_age, 0), n_units * n_subgroups),
+        'household_size': np.repeat(np.asarray(household_size, dtype=float), per_unit),
+        'annual_risk_pct': np.repeat(annual.ravel(), n_ages) * 100,
+        'lifetime_risk_pct': lifetime.ravel() * 100,
+        'household_annual_risk_pct': np.repeat(household_annual.ravel(), n_ages) * 100,
+        'household_lifetime_risk_pct': household_lifetime.ravel() * 100,
+    })
@@ -0,0 +1,355 @@
+"""
+Query Cube - Block Group x Demographic Cell x Month Aggregates
+Distinct (block group, month, race, sex, age band, defendant) rows with
+their arrest counts. Distinct persons are the exact mergeable form of
+unique-individual counts, so any slice or rollup over geography, policing
+category, demographics and time is a masked distinct count over one sorted
+array. Stored as a results bundle and held in memory by query_service.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from compact_frame import POLICING_CATEGORIES, county_ids, policing_categorical, tract_ids
+from demographics import (AGE_BAND_STARTS, AGE_BANDS, RACE_GROUPS, SEXES, age_bands, group_populations,
+                          total_populations)
+from results_bundle import ResultsBundle, write_bundle
+from rolling_risks import month_index, month_label
+
+# Bundle directory under results/
+QUERY_CUBE_DIR = 'query_cube'
+
+RACES = list(RACE_GROUPS)
+
+# Label of arrests outside the race, sex or age band lists (e.g. missing ages)
+UNKNOWN_LABEL = 'Unknown'
+
+GEOGRAPHY_DIMENSIONS = ['policing_category', 'county', 'tract', 'blockgroup']
+DEMOGRAPHIC_DIMENSIONS = {'race': RACES, 'sex': SEXES, 'age_band': AGE_BANDS}
+TIME_DIMENSIONS = ['year', 'month']
+GROUP_BY = GEOGRAPHY_DIMENSIONS + list(DEMOGRAPHIC_DIMENSIONS) + TIME_DIMENSIONS
+
+# Largest group x person bitmap used for distinct counts (bytes); larger
+# rollups sort their (group, person) keys instead
+BITMAP_LIMIT = 64 * 2 ** 20
+
+
+def _label_codes(values, labels):
+    """int8 position of each value in labels (-1 when absent or missing)."""
+    return pd.Index(labels).get_indexer(np.asarray(values, dtype=object)).astype(np.int8)
+
+
+def _sum_by_key(keys, weights, targets):
+    """Sum of weights per key, looked up for each target key (0 where absent)."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=weights, minlength=len(unique))
+    if not len(unique):
+        return np.zeros(len(targets))
+    position = np.minimum(np.searchsorted(unique, targets), len(unique) - 1)
+    return np.where(unique[position] == targets, totals[position], 0.0)
+
+
+def build_cube(arrests, bg_data, populations=None, census_ids=None):
+    """
+    Cube tables from compact arrests and the categorized block groups.
+
+    populations  -- (block group, race table, sex, age band) census
+                    populations (census['demographics']) for census_ids;
+                    when given, demographic slices get ACS denominators
+
+    Returns {'pairs', 'blockgroups'[, 'populations', 'totals']} DataFrames;
+    pairs are sorted by month, then block group. The race groups overlap
+    (Hispanic is also counted in Black and Other), so 'totals' holds each
+    (sex, age band) cell's population over all races.
+    """
+    arrests = arrests[arrests['blockgroup_id'].isin(bg_data['blockgroup_id']).to_numpy()]
+    race = _label_codes(arrests['Race'], RACES) if 'Race' in arrests.columns \
+        else np.full(len(arrests), -1, dtype=np.int8)
+    rows = pd.DataFrame({
+        'month': month_index(arrests['ArrestDate']).astype(np.int32),
+        'blockgroup_id': arrests['blockgroup_id'].to_numpy(),
+        'race': race,
+        'sex': _label_codes(arrests['Gender'], SEXES),
+        'age_band': age_bands(arrests['Age_years']).astype(np.int8),
+        'person': arrests['DefendantId'].to_numpy(),
+    })
+    pairs = rows.groupby(list(rows.columns), sort=True).size().rename('arrests').reset_index()
+    pairs['arrests'] = pairs['arrests'].astype(np.int32)
+
+    blockgroups = pd.DataFrame({
+        'blockgroup_id': bg_data['blockgroup_id'].to_numpy(dtype=np.int64),
+        'policing_category': np.asarray(bg_data['policing_category'], dtype=object),
+        'total_pop': bg_data['total_pop'].to_numpy(dtype=np.int64),
+    }).sort_values('blockgroup_id', ignore_index=True)
+
+    tables = {'pairs': pairs, 'blockgroups': blockgroups}
+    if populations is not None:
+        positions = pd.Index(census_ids).get_indexer(blockgroups['blockgroup_id'])
+        cells = group_populations(populations)[positions]
+        index = pd.MultiIndex.from_product([blockgroups['blockgroup_id'], RACES, SEXES, AGE_BANDS],
+                                           names=['blockgroup_id', 'race', 'sex', 'age_band'])
+        tables['populations'] = pd.DataFrame({'population': cells.ravel().astype(np.int32)}, index=index).reset_index()
+        totals = total_populations(populations)[positions]
+        index = pd.MultiIndex.from_product([blockgroups['blockgroup_id'], SEXES, AGE_BANDS],
+                                           names=['blockgroup_id', 'sex', 'age_band'])
+        tables['totals'] = pd.DataFrame({'population': totals.ravel().astype(np.int32)}, index=index).reset_index()
+    return tables
+
+
+def write_cube(path, tables, parameters=None):
+    """Write the cube tables as a results bundle; returns its path."""
+    pairs = tables['pairs']
+    values = {
+        'first_month': month_label(pairs['month'].min()) if len(pairs) else None,
+        'last_month': month_label(pairs['month'].max()) if len(pairs) else None,
+        'arrests': int(pairs['arrests'].sum()),
+        'unique_individuals': int(pairs['person'].nunique()),
+        'blockgroups': len(tables['blockgroups']),
+    }
+    return write_bundle(path, tables, values, parameters)
+
+
+def parse_month(value, end=False):
+    """Month index of 'YYYY-MM', or of 'YYYY' (January, or December when end)."""
+    value = str(value)
+    if len(value) == 4:
+        value = f"{value}-{'12' if end else '01'}"
+    try:
+        return int(np.datetime64(value, 'M').astype(np.int64))
+    except ValueError:
+        raise ValueError(f"Invalid month {value!r} (expected YYYY or YYYY-MM)") from None
+
+
+def parse_age_range(value):
+    """'18-24' or '85+' as an inclusive (low, high) age range (high None = open)."""
+    low, _, high = str(value).rstrip('+').partition('-')
+    try:
+        return int(low), int(high) if high else None
+    except ValueError:
+        raise ValueError(f"Invalid age range {value!r} (expected e.g. 18-24 or 85+)") from None
+
+
+def age_band_codes(low, high=None):
+    """Indexes of the ACS age bands exactly covering ages low..high."""
+    ends = [start - 1 for start in AGE_BAND_STARTS[1:]] + [None]
+    if low not in AGE_BAND_STARTS or high not in ends:
+        raise ValueError(f"Age range {low}-{'' if high is None else high} does not align with the ACS age "
+                         f"bands ({', '.join(AGE_BANDS)})")
+    return list(range(AGE_BAND_STARTS.index(low), ends.index(high) + 1))
+
+
+class QueryCube:
+    """
+    In-memory cube with a time index (offsets of each month in the
+    month-sorted pairs, so a date range is one contiguous slice) and a
+    geography index (each block group's category, county and tract codes,
+    so geography filters are per-block-group lookups).
+    """
+
+    def __init__(self, tables, values=None):
+        pairs = tables['pairs']
+        blockgroups = tables['blockgroups']
+        self.values = values or {}
+        self.blockgroup_ids = blockgroups['blockgroup_id'].to_numpy(dtype=np.int64)
+        self.total_pop = blockgroups['total_pop'].to_numpy(dtype=np.int64)
+        self.populations = None
+        if 'populations' in tables:
+            self.populations = tables['populations']['population'].to_numpy(dtype=np.int64).reshape(
+                len(self.blockgroup_ids), len(RACES), len(SEXES), len(AGE_BANDS))
+        # (block group, sex, age band) populations of all races (cubes written
+        # before these were stored fall back to summing the race groups)
+        self.totals = None
+        if 'totals' in tables:
+            self.totals = tables['totals']['population'].to_numpy(dtype=np.int64).reshape(
+                len(self.blockgroup_ids), len(SEXES), len(AGE_BANDS))
+
+        # Geography index: (code per block group, labels) for each level
+        categories = policing_categorical(blockgroups['policing_category'])
+        self.geography = {
+            'policing_category': (categories.codes.astype(np.int64), np.asarray(POLICING_CATEGORIES, dtype=object)),
+            'county': self._factorize(np.char.zfill((county_ids(self.blockgroup_ids) % 1000).astype(str), 3)),
+            'tract': self._factorize(tract_ids(self.blockgroup_ids).astype(str)),
+            'blockgroup': (np.arange(len(self.blockgroup_ids)), self.blockgroup_ids.astype(str).astype(object)),
+        }
+
+        # Time index
+        self.month = pairs['month'].to_numpy(dtype=np.int64)
+        self.first_month = int(self.month[0]) if len(self.month) else 0
+        self.last_month = int(self.month[-1]) if len(self.month) else -1
+        self.month_offsets = np.searchsorted(self.month, np.arange(self.first_month, self.last_month + 2))
+
+        self.bg = np.searchsorted(self.blockgroup_ids, pairs['blockgroup_id'].to_numpy()).astype(np.int64)
+        self.demographics = {name: pairs[name].to_numpy(dtype=np.int64) for name in DEMOGRAPHIC_DIMENSIONS}
+        self.person = pairs['person'].to_numpy(dtype=np.int64)
+        self.arrests = pairs['arrests'].to_numpy(dtype=np.int64)
+        self.n_persons = int(self.person.max()) + 1 if len(self.person) else 1
+
+    @staticmethod
+    def _factorize(values):
+        codes, labels = pd.factorize(np.asarray(values), sort=True)
+        return codes.astype(np.int64), np.asarray(labels, dtype=object)
+
+    @classmethod
+    def load(cls, path):
+        bundle = ResultsBundle(path)
+        return cls({name: bundle.table(name) for name in bundle.manifest['tables']}, bundle.values)
+
+    def __len__(self):
+        return len(self.person)
+
+    def blockgroup_mask(self, county=None, tract=None, blockgroup=None, category=None):
+        """Block groups in every given list (county codes '019', tract or block group GEOIDs, categories)."""
+        selected = np.ones(len(self.blockgroup_ids), dtype=bool)
+        for name, values in [('county', county), ('tract', tract), ('blockgroup', blockgroup),
+                             ('policing_category', category)]:
+            if not values:
+                continue
+            codes, labels = self.geography[name]
+            values = [str(v).zfill(3)[-3:] if name == 'county' else str(v) for v in values]
+            unknown = sorted(set(values) - set(labels))
+            if unknown and name == 'policing_category':
+                raise ValueError(f"Unknown policing categories: {', '.join(unknown)} "
+                                 f"(one of {', '.join(POLICING_CATEGORIES)})")
+            selected &= np.isin(codes, pd.Index(labels).get_indexer(values))
+        return selected
+
+    def demographic_codes(self, race=None, sex=None, age=None):
+        """{dimension: selected codes} for race and sex label lists and (low, high) age ranges."""
+        selected = {}
+        for name, values in [('race', race), ('sex', sex)]:
+            if values:
+                labels = DEMOGRAPHIC_DIMENSIONS[name]
+                unknown = sorted(set(values) - set(labels))
+                if unknown:
+                    raise ValueError(f"Unknown {name}: {', '.join(unknown)} (one of {', '.join(labels)})")
+                selected[name] = [labels.index(v) for v in values]
+        if age:
+            selected['age_band'] = sorted({band for low, high in age for band in age_band_codes(low, high)})
+        return selected
+
+    def month_range(self, start=None, end=None):
+        """First and last month index of the query window, clipped to the data."""
+        first = max(parse_month(start) if start else self.first_month, self.first_month)
+        last = min(parse_month(end, end=True) if end else self.last_month, self.last_month)
+        return first, last
+
+    def query(self, county=None, tract=None, blockgroup=None, category=None, race=None, sex=None, age=None,
+              start=None, end=None, by=()):
+        """
+        Arrests, unique individuals, population and annual risk (%) for one
+        slice, with a row per combination of the `by` dimensions present.
+
+        age         -- inclusive (low, high) ranges on ACS age band edges
+        start, end  -- 'YYYY' or 'YYYY-MM' (inclusive)
+
+        A person counts once per row. Population is the block groups' total
+        population, or their ACS race x sex x age cells when the slice is
+        demographic (NaN when the cube has no census demographics); a slice
+        that leaves race open uses the all-races population of its sex x age
+        cells, as the race groups overlap.
+        """
+        by = list(dict.fromkeys(by))
+        unknown = sorted(set(by) - set(GROUP_BY))
+        if unknown:
+            raise ValueError(f"Cannot group by {', '.join(unknown)} (one of {', '.join(GROUP_BY)})")
+        first, last = self.month_range(start, end)
+        lo = self.month_offsets[first - self.first_month] if last >= first else 0
+        hi = self.month_offsets[last - self.first_month + 1] if last >= first else 0
+
+        selected_bgs = self.blockgroup_mask(county, tract, blockgroup, category)
+        demographic = self.demographic_codes(race, sex, age)
+        keep = selected_bgs[self.bg[lo:hi]]
+        for name, codes in demographic.items():
+            keep &= np.isin(self.demographics[name][lo:hi], codes)
+        rows = lo + np.flatnonzero(keep)
+
+        # Group code: the by dimensions' codes in mixed radix
+        dimensions = [self._dimension(name, rows, first, last) for name in by]
+        group = np.zeros(len(rows), dtype=np.int64)
+        for codes, labels in dimensions:
+            group = group * len(labels) + codes
+        group, keys = pd.factorize(group, sort=True) if by else (group, np.zeros(1, dtype=np.int64))
+        key_codes = {}
+        for name, (codes, labels) in reversed(list(zip(by, dimensions))):
+            keys, key_codes[name] = np.divmod(keys, len(labels))
+
+        columns = {name: labels[key_codes[name]] for name, (codes, labels) in zip(by, dimensions)}
+        columns['arrests'] = np.bincount(group, weights=self.arrests[rows], minlength=len(keys)).astype(np.int64)
+        columns['unique_individuals'] = unique = self._unique_persons(group, rows, len(keys))
+        columns['months'] = months = self._months(by, columns, len(keys), first, last)
+        columns['population'] = population = self._population(by, key_codes, len(keys), selected_bgs, demographic)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns['annual_risk_pct'] = unique / (months / 12) / population * 100
+        return pd.DataFrame(columns)
+
+    def _unique_persons(self, group, rows, n_groups):
+        """Distinct persons per group: a group x person bitmap when small enough, else a sort."""
+        keys = group * self.n_persons + self.person[rows]
+        if n_groups * self.n_persons <= BITMAP_LIMIT:
+            seen = np.zeros(n_groups * self.n_persons, dtype=bool)
+            seen[keys] = True
+            return np.count_nonzero(seen.reshape(n_groups, self.n_persons), axis=1)
+        return np.bincount(np.unique(keys) // self.n_persons, minlength=n_groups)
+
+    def _dimension(self, name, rows, first, last):
+        """(codes of the selected pairs, labels) of one group-by dimension."""
+        if name in self.geography:
+            codes, labels = self.geography[name]
+            return codes[self.bg[rows]], labels
+        if name in DEMOGRAPHIC_DIMENSIONS:
+            labels = np.asarray(DEMOGRAPHIC_DIMENSIONS[name] + [UNKNOWN_LABEL], dtype=object)
+            codes = self.demographics[name][rows]
+            return np.where(codes < 0, len(labels) - 1, codes), labels
+        if name == 'year':
+            first_year = first // 12
+            return self.month[rows] // 12 - first_year, np.arange(first_year, max(last, first) // 12 + 1) + 1970
+        return self.month[rows] - first, np.asarray([month_label(m) for m in range(first, max(last, first) + 1)],
+                                                    dtype=object)
+
+    @staticmethod
+    def _months(by, columns, n_rows, first, last):
+        """Months of data behind each row: the window, or its overlap with the row's year or month."""
+        if 'month' in by:
+            return np.ones(n_rows, dtype=np.int64)
+        if 'year' in by:
+            start = (columns['year'].astype(np.int64) - 1970) * 12
+            return np.minimum(start + 11, last) - np.maximum(start, first) + 1
+        return np.full(n_rows, max(last - first + 1, 0), dtype=np.int64)
+
+    def _population(self, by, key_codes, n_rows, selected_bgs, demographic):
+        """Population behind each row from the selected block groups (and demographic cells)."""
+        demographic_by = [name for name in by if name in DEMOGRAPHIC_DIMENSIONS]
+        if (demographic or demographic_by) and self.populations is None:
+            return np.full(n_rows, np.nan)
+
+        bg_key = np.zeros(len(self.blockgroup_ids), dtype=np.int64)
+        row_key = np.zeros(n_rows, dtype=np.int64)
+        for name in by:
+            if name in self.geography:
+                codes, labels = self.geography[name]
+                bg_key = bg_key * len(labels) + codes
+                row_key = row_key * len(labels) + key_codes[name]
+        if not (demographic or demographic_by):
+            return _sum_by_key(bg_key[selected_bgs], self.total_pop[selected_bgs], row_key)
+
+        # (block group, [race,] sex, age band) cells: keep the filtered cells,
+        # then key each by its block group's key and its group-by labels
+        dimensions = DEMOGRAPHIC_DIMENSIONS
+        cells = self.populations[selected_bgs]
+        if 'race' not in demographic and 'race' not in demographic_by and self.totals is not None:
+            dimensions = {name: labels for name, labels in dimensions.items() if name != 'race'}
+            cells = self.totals[selected_bgs]
+        cell_key = bg_key[selected_bgs].reshape(-1, *[1] * len(dimensions))
+        unknown = np.zeros(n_rows, dtype=bool)
+        for axis, (name, labels) in enumerate(dimensions.items(), start=1):
+            codes = np.asarray(demographic.get(name, range(len(labels))))
+            cells = np.take(cells, codes, axis=axis)
+            if name in demographic_by:
+                shape = [1] * (len(dimensions) + 1)
+                shape[axis] = len(codes)
+                cell_key = cell_key * (len(labels) + 1) + codes.reshape(shape)
+                row_key = row_key * (len(labels) + 1) + key_codes[name]
+                unknown |= key_codes[name] == len(labels)
+        population = _sum_by_key(np.broadcast_to(cell_key, cells.shape).ravel(), cells.ravel(), row_key)
+        population[unknown] = np.nan
+        return population
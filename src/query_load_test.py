@@ -0,0 +1,143 @@
+"""
+Query Service Load Test
+Sends a seeded mix of slice and rollup queries to query_service.py from
+concurrent clients and reports latency percentiles, throughput, errors and
+the LRU cache hit rate. Starts the service in-process unless --url is given
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+import numpy as np
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent))
+from compact_frame import POLICING_CATEGORIES
+from query_cube import AGE_BAND_STARTS, RACES, SEXES
+from query_service import CACHE_SIZE, DEFAULT_CUBE, QueryService, serve
+
+# Rollups the mix draws from (empty = one total row)
+ROLLUPS = [(), ('policing_category',), ('county',), ('year',), ('policing_category', 'race'),
+           ('policing_category', 'sex', 'age_band'), ('tract',), ('race', 'year'), ('month',)]
+
+
+def random_query(rng, counties, years):
+    """One query with a random subset of filters and a random rollup."""
+    query = {}
+    if rng.random() < 0.4:
+        query['county'] = rng.choice(counties)
+    if rng.random() < 0.3:
+        query['category'] = rng.choice(POLICING_CATEGORIES)
+    if rng.random() < 0.4:
+        query['race'] = rng.choice(RACES)
+    if rng.random() < 0.3:
+        query['sex'] = rng.choice(SEXES)
+    if rng.random() < 0.3:
+        first, last = sorted(rng.sample(range(len(AGE_BAND_STARTS) - 1), 2))
+        query['age'] = f"{AGE_BAND_STARTS[first]}-{AGE_BAND_STARTS[last + 1] - 1}"
+    if rng.random() < 0.5:
+        start, end = sorted(rng.choices(years, k=2))
+        query.update(start=str(start), end=str(end))
+    by = rng.choice(ROLLUPS)
+    if by:
+        query['by'] = ','.join(by)
+    return query
+
+
+def query_mix(n_requests, distinct, counties, years, seed=0):
+    """n_requests queries drawn (with repeats) from `distinct` random queries, weighted towards a few."""
+    rng = random.Random(seed)
+    pool = [random_query(rng, counties, years) for _ in range(distinct)]
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    return rng.choices(pool, weights=weights, k=n_requests)
+
+
+def run_load(base_url, queries, clients):
+    """Send every query from `clients` threads; returns per-request latencies (s) and status codes."""
+    local = threading.local()
+
+    def send(query):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            status = local.session.get(f"{base_url}/query", params=query, timeout=30).status_code
+        except requests.RequestException:
+            status = None
+        return time.perf_counter() - start, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(send, queries))
+    elapsed = time.perf_counter() - start
+    latencies = np.array([r[0] for r in results])
+    statuses = [r[1] for r in results]
+    return latencies, statuses, elapsed
+
+
+def summarize(latencies, statuses, elapsed, stats_before, stats_after):
+    hits = stats_after['cache_hits'] - stats_before['cache_hits']
+    misses = stats_after['cache_misses'] - stats_before['cache_misses']
+    p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99]) if len(latencies) else (np.nan,) * 3
+    return {
+        'requests': len(latencies),
+        'errors': sum(status != 200 for status in statuses),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed if elapsed else None,
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'p99_ms': p99,
+        'max_ms': float(latencies.max() * 1000) if len(latencies) else None,
+        'cache_hit_rate': hits / (hits + misses) if hits + misses else None,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load-test the risk query service')
+    parser.add_argument('cube', nargs='?', default=str(DEFAULT_CUBE),
+                        help=f'Cube bundle to serve in-process (default: {DEFAULT_CUBE})')
+    parser.add_argument('--url', help='Test a running service at this base URL instead')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--distinct', type=int, default=500, help='Distinct queries in the mix')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent client threads')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='LRU size of the in-process service')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Also write the summary as JSON')
+    args = parser.parse_args()
+
+    if args.url:
+        server = nullcontext(args.url.rstrip('/'))
+    else:
+        if not Path(args.cube).exists():
+            parser.error(f"no query cube at {args.cube}; run corrected_geographic_analysis.py --query-cube first")
+        service = QueryService.load(args.cube, args.cache_size)
+        server = serve(service)
+
+    with server as base_url:
+        stats = requests.get(f"{base_url}/stats", timeout=30).json()
+        first, last = (int(stats['cube'][k][:4]) for k in ('first_month', 'last_month'))
+        counties = [row[0] for row in requests.get(f"{base_url}/query", params={'by': 'county'}, timeout=30)
+                    .json()['rows']]
+        queries = query_mix(args.requests, args.distinct, counties, list(range(first, last + 1)), args.seed)
+        print(f"Load test: {len(queries):,} requests ({args.distinct} distinct queries), "
+              f"{args.clients} clients, {base_url}")
+        latencies, statuses, elapsed = run_load(base_url, queries, args.clients)
+        summary = summarize(latencies, statuses, elapsed, stats, requests.get(f"{base_url}/stats", timeout=30).json())
+
+    print(f"✓ {summary['requests']:,} requests in {summary['seconds']:.2f}s "
+          f"({summary['requests_per_second']:,.0f}/s), {summary['errors']} errors")
+    print(f"  latency p50 {summary['p50_ms']:.2f} ms, p95 {summary['p95_ms']:.2f} ms, "
+          f"p99 {summary['p99_ms']:.2f} ms, max {summary['max_ms']:.2f} ms")
+    if summary['cache_hit_rate'] is not None:
+        print(f"  cache hit rate {summary['cache_hit_rate']:.1%}")
+    if args.output:
+        Path(args.output).write_text(json.dumps({**summary, 'clients': args.clients, 'distinct': args.distinct,
+                                                 'url': base_url}, indent=1))
+        print(f"✓ Saved {args.output}")
@@ -0,0 +1,240 @@
+"""
+Risk Query Service - Interactive Slicing of the Query Cube
+Holds the query cube written by corrected_geographic_analysis.py
+--query-cube in memory and answers slice/rollup queries over HTTP or the
+command line, with an LRU cache of recent results
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, str(Path(__file__).parent))
+from query_cube import GROUP_BY, QUERY_CUBE_DIR, QueryCube, parse_age_range
+
+DEFAULT_CUBE = Path(__file__).parent.parent / 'results' / QUERY_CUBE_DIR
+DEFAULT_PORT = 8766
+CACHE_SIZE = 1024
+
+# Query parameters: list-valued filters take repeated or comma-separated values
+LIST_PARAMETERS = ['county', 'tract', 'blockgroup', 'category', 'race', 'sex', 'age', 'by']
+SCALAR_PARAMETERS = ['start', 'end']
+
+
+def normalize(parameters):
+    """
+    Canonical query from raw parameters ({name: value or list of values}):
+    lists split on commas, de-duplicated and sorted (by keeps its order), so
+    equivalent queries share one cache entry.
+    """
+    unknown = sorted(set(parameters) - set(LIST_PARAMETERS) - set(SCALAR_PARAMETERS))
+    if unknown:
+        raise ValueError(f"Unknown query parameters: {', '.join(unknown)} "
+                         f"(one of {', '.join(LIST_PARAMETERS + SCALAR_PARAMETERS)})")
+    query = {}
+    for name, value in parameters.items():
+        values = [value] if isinstance(value, str) else list(value)
+        if name in SCALAR_PARAMETERS:
+            if values and values[-1]:
+                query[name] = str(values[-1])
+            continue
+        values = list(dict.fromkeys(v.strip() for item in values for v in str(item).split(',') if v.strip()))
+        if values:
+            query[name] = tuple(values) if name == 'by' else tuple(sorted(values))
+    return query
+
+
+def _json_values(column):
+    """Column as Python values, NaN as None (JSON null)."""
+    values = column.to_numpy().tolist()
+    if column.dtype.kind == 'f':
+        values = [None if v != v else v for v in values]
+    return values
+
+
+class QueryService:
+    """A loaded cube plus a thread-safe LRU cache of query results."""
+
+    def __init__(self, cube, cache_size=CACHE_SIZE):
+        self.cube = cube
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path, cache_size=CACHE_SIZE):
+        return cls(QueryCube.load(path), cache_size)
+
+    def query(self, parameters):
+        """(result, cached) for raw query parameters; result is JSON-able."""
+        query = normalize(parameters)
+        key = tuple(sorted(query.items()))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key], True
+            self.misses += 1
+
+        start = time.perf_counter()
+        table = self.cube.query(
+            county=query.get('county'), tract=query.get('tract'), blockgroup=query.get('blockgroup'),
+            category=query.get('category'), race=query.get('race'), sex=query.get('sex'),
+            age=[parse_age_range(a) for a in query.get('age', ())] or None,
+            start=query.get('start'), end=query.get('end'), by=query.get('by', ()))
+        result = {
+            'query': {name: list(value) if isinstance(value, tuple) else value for name, value in query.items()},
+            'columns': list(table.columns),
+            'rows': [list(row) for row in zip(*(_json_values(table[c]) for c in table.columns))],
+            'compute_ms': round((time.perf_counter() - start) * 1000, 3),
+        }
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result, False
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'pairs': len(self.cube),
+                'blockgroups': len(self.cube.blockgroup_ids),
+                'demographic_populations': self.cube.populations is not None,
+                'cube': self.cube.values,
+                'cache_entries': len(self._cache),
+                'cache_size': self.cache_size,
+                'cache_hits': self.hits,
+                'cache_misses': self.misses,
+                'cache_hit_rate': self.hits / lookups if lookups else None,
+            }
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """GET /query?county=019&race=Black&age=18-24&start=2016&end=2018&by=policing_category, GET /stats"""
+
+    # Keep-alive, so clients reuse one connection for many queries; without
+    # Nagle, the body is not held back waiting for the headers' ACK
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            self._send(200, self.server.service.stats())
+            return
+        if url.path != '/query':
+            self._send(404, {'error': f'unknown path {url.path} (use /query or /stats)'})
+            return
+        start = time.perf_counter()
+        try:
+            result, cached = self.server.service.query(parse_qs(url.query))
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+            return
+        self._send(200, {**result, 'cached': cached, 'ms': round((time.perf_counter() - start) * 1000, 3)})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve(service, port=0, host='127.0.0.1'):
+    """Run the query server on a background thread; yields its base URL."""
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    server.service = service
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def print_result(result):
+    columns = result['columns']
+    widths = [max(len(str(c)), *(len(_format(row[i])) for row in result['rows'])) if result['rows'] else len(str(c))
+              for i, c in enumerate(columns)]
+    print('  '.join(str(c).rjust(w) for c, w in zip(columns, widths)))
+    for row in result['rows']:
+        print('  '.join(_format(v).rjust(w) for v, w in zip(row, widths)))
+    print(f"({len(result['rows'])} rows, {result['compute_ms']:.2f} ms)")
+
+
+def _format(value):
+    return f"{value:.3f}" if isinstance(value, float) else '' if value is None else str(value)
+
+
+def add_query_arguments(parser):
+    parser.add_argument('--county', nargs='+', help="County codes (e.g. 019 015)")
+    parser.add_argument('--tract', nargs='+', help='11-digit tract GEOIDs')
+    parser.add_argument('--blockgroup', nargs='+', help='12-digit block group GEOIDs')
+    parser.add_argument('--category', nargs='+', help="Policing categories (e.g. 'Ultra-Policed')")
+    parser.add_argument('--race', nargs='+', help='Race groups (White, Black, Hispanic, Other)')
+    parser.add_argument('--sex', nargs='+', help='Male and/or Female')
+    parser.add_argument('--age', nargs='+', help='Age ranges on ACS band edges (e.g. 18-24 85+)')
+    parser.add_argument('--start', help='First month, YYYY or YYYY-MM')
+    parser.add_argument('--end', help='Last month, YYYY or YYYY-MM')
+    parser.add_argument('--by', nargs='+', default=[], choices=GROUP_BY, metavar='DIMENSION',
+                        help=f"Dimensions to roll up by ({', '.join(GROUP_BY)})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Slice and roll up the precomputed risk query cube')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help='Serve queries over HTTP')
+    serve_parser.add_argument('cube', nargs='?', default=str(DEFAULT_CUBE), help=f'Cube bundle (default: {DEFAULT_CUBE})')
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='Query results kept in the LRU cache')
+    query_parser = commands.add_parser('query', help='Run one query and print the table')
+    query_parser.add_argument('cube', nargs='?', default=str(DEFAULT_CUBE), help=f'Cube bundle (default: {DEFAULT_CUBE})')
+    query_parser.add_argument('--json', action='store_true', help='Print the result as JSON')
+    add_query_arguments(query_parser)
+    args = parser.parse_args()
+
+    if not Path(args.cube).exists():
+        parser.error(f"no query cube at {args.cube}; run corrected_geographic_analysis.py --query-cube first")
+    start = time.perf_counter()
+    service = QueryService.load(args.cube, getattr(args, 'cache_size', CACHE_SIZE))
+    print(f"✓ Loaded {len(service.cube):,} cube rows from {args.cube} ({(time.perf_counter() - start):.2f}s)",
+          file=sys.stderr)
+
+    if args.command == 'query':
+        parameters = {name: getattr(args, name) for name in LIST_PARAMETERS + SCALAR_PARAMETERS
+                      if getattr(args, name)}
+        try:
+            result, _ = service.query(parameters)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.json:
+            print(json.dumps(result, indent=1))
+        else:
+            print_result(result)
+    else:
+        with serve(service, args.port, args.host) as base_url:
+            print(f"✓ Query service at {base_url}/query (Ctrl-C to stop)")
+            try:
+                threading.Event().wait()
+            except KeyboardInterrupt:
+                pass
@@ -0,0 +1,104 @@
+"""
+Results Bundle - Versioned Columnar Analysis Outputs
+One directory per run: zstd-compressed Parquet tables plus a JSON manifest
+of the run's parameters, input fingerprints, headline values and stage
+timings. Bundles are written atomically and read lazily, one table at a
+time
+"""
+
+import json
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from run_profile import git_commit
+from stage_cache import _json_default, file_fingerprint
+
+# Bumped whenever tables or manifest fields change incompatibly
+BUNDLE_VERSION = 1
+
+MANIFEST = 'manifest.json'
+TABLES_DIR = 'tables'
+COMPRESSION = 'zstd'
+
+
+def write_bundle(path, tables, values=None, parameters=None, inputs=None, timings=None):
+    """
+    Write a bundle directory, replacing any previous one at path.
+
+    tables      -- {name: DataFrame}, stored as tables/<name>.parquet
+    values      -- headline scalars (JSON-able)
+    parameters  -- the parameters the results depend on
+    inputs      -- {name: input file or directory}, stored as fingerprints
+    timings     -- {stage: seconds}
+    """
+    path = Path(path)
+    tmp = path.parent / f".{path.name}.{uuid.uuid4().hex}"
+    (tmp / TABLES_DIR).mkdir(parents=True)
+    manifest = {
+        'bundle_version': BUNDLE_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'parameters': parameters or {},
+        'inputs': {name: file_fingerprint(p) for name, p in (inputs or {}).items()},
+        'timings': timings or {},
+        'values': values or {},
+        'tables': {},
+    }
+    for name, table in tables.items():
+        file = f"{TABLES_DIR}/{name}.parquet"
+        table.to_parquet(tmp / file, index=False, compression=COMPRESSION)
+        manifest['tables'][name] = {'file': file, 'rows': len(table), 'columns': list(map(str, table.columns))}
+    (tmp / MANIFEST).write_text(json.dumps(manifest, default=_json_default, indent=1))
+
+    # Swap directories so readers see the old bundle or the new one, never a mix
+    old = path.parent / f".{path.name}.old.{uuid.uuid4().hex}"
+    if path.exists():
+        path.rename(old)
+    tmp.rename(path)
+    shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def update_manifest(path, **fields):
+    """Replace top-level manifest fields (e.g. timings known only after the run)."""
+    path = Path(path) / MANIFEST
+    manifest = json.loads(path.read_text())
+    manifest.update(fields)
+    tmp = path.with_name(f".{MANIFEST}.{uuid.uuid4().hex}")
+    tmp.write_text(json.dumps(manifest, default=_json_default, indent=1))
+    tmp.replace(path)
+
+
+class ResultsBundle:
+    """
+    Read side of a bundle. Opening reads only the manifest; each table is
+    read from Parquet on first access (optionally only some columns).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / MANIFEST).read_text())
+        if self.manifest['bundle_version'] > BUNDLE_VERSION:
+            raise ValueError(f"{self.path} is bundle version {self.manifest['bundle_version']}; "
+                             f"this code reads up to version {BUNDLE_VERSION}")
+        self._tables = {}
+
+    @property
+    def values(self):
+        return self.manifest['values']
+
+    @property
+    def parameters(self):
+        return self.manifest['parameters']
+
+    def table(self, name, columns=None):
+        key = (name, tuple(columns) if columns else None)
+        if key not in self._tables:
+            if name not in self.manifest['tables']:
+                raise KeyError(f"No table {name!r} in {self.path} (has {', '.join(self.manifest['tables'])})")
+            self._tables[key] = pd.read_parquet(self.path / self.manifest['tables'][name]['file'], columns=columns)
+        return self._tables[key]
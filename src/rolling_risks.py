@@ -0,0 +1,389 @@
+"""
+Rolling-Window Risks
+Per-(block group, month) arrest counts and distinct (block group, person)
+pairs with subgroup bits, kept in sliding 12/36/60-month windows so each new
+month of arrests updates rolling rates, cut points and annual risks without
+revisiting older months
+"""
+
+import json
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cut_point_sensitivity import CATEGORY_PREFIXES, PERSON_BITS
+from subgroup_aggregation import SUBGROUP_COLUMNS, or_reduce, subgroup_bits
+
+WINDOWS = (12, 36, 60)
+
+PERSON_MASK = np.int64((1 << PERSON_BITS) - 1)
+
+# Fingerprint of a month without arrests
+EMPTY_MONTH = '0:0000000000000000'
+
+
+def month_index(dates):
+    """Months since 1970-01 (numpy datetime64[M] as integers)."""
+    return np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+
+
+def month_label(month):
+    return str(np.datetime64(int(month), 'M'))
+
+
+def month_fingerprints(months, arrests, defendant_ids, since=None):
+    """
+    {month: fingerprint} of the arrests each month contributes: row count and
+    an order-independent hash of the columns the aggregates read, with
+    DefendantIds decoded (so the fingerprint does not depend on the codes).
+
+    Months before `since` get their row count only ('<count>:'), so a
+    resumed run hashes just the months from the state's last one on.
+    """
+    months = np.asarray(months, dtype=np.int64)
+    hashed = months >= since if since is not None else np.ones(len(months), dtype=bool)
+    columns = ['blockgroup_id', 'ArrestDate', *dict.fromkeys(c for c in SUBGROUP_COLUMNS.values() if c in arrests)]
+    recent = arrests[hashed] if not hashed.all() else arrests
+    frame = recent[columns].assign(
+        DefendantId=np.asarray(defendant_ids)[recent['DefendantId'].to_numpy()].astype(str))
+    hashes = np.zeros(len(months), dtype=np.uint64)
+    hashes[hashed] = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    unique, inverse = np.unique(months, return_inverse=True)
+    sums = np.zeros(len(unique), dtype=np.uint64)
+    np.add.at(sums, inverse, hashes)
+    counts = np.bincount(inverse, minlength=len(unique))
+    return {int(m): f"{c}:{h:016x}" if since is None or m >= since else f"{c}:"
+            for m, c, h in zip(unique, counts, sums)}
+
+
+def same_month(fingerprint, saved):
+    """Whether an input month matches the saved one (by row count only for count-only fingerprints)."""
+    if fingerprint.endswith(':'):
+        return fingerprint == saved[:saved.index(':') + 1]
+    return fingerprint == saved
+
+
+def saved_last_month(path):
+    """Last month a saved rolling state has processed (None without one)."""
+    state_path = Path(path) / 'state.json'
+    if not state_path.exists():
+        return None
+    months = json.loads(state_path.read_text()).get('fingerprints', {})
+    return max((int(np.datetime64(month, 'M').astype(np.int64)) for month in months), default=None)
+
+
+def _flags(bits, n_subgroups):
+    """(rows, n_subgroups) 0/1 matrix from packed uint64 subgroup words."""
+    flags = np.unpackbits(np.ascontiguousarray(bits).astype('<u8').view(np.uint8), axis=1, bitorder='little')
+    return flags[:, :n_subgroups].astype(np.int32)
+
+
+class MonthAggregate:
+    """
+    One month of arrests reduced to dense per-block-group counts and the
+    sorted distinct (block group code << 32 | person) keys with their OR-ed
+    subgroup flags.
+    """
+
+    def __init__(self, month, total, discretionary, keys, flags):
+        self.month = int(month)
+        self.total = total
+        self.discretionary = discretionary
+        self.keys = keys
+        self.flags = flags
+
+    @classmethod
+    def build(cls, month, bg_codes, person, is_discretionary, bits, n_blockgroups, n_subgroups):
+        total = np.bincount(bg_codes, minlength=n_blockgroups).astype(np.int64)
+        discretionary = np.bincount(bg_codes[is_discretionary], minlength=n_blockgroups).astype(np.int64)
+        if not len(bg_codes):
+            return cls(month, total, discretionary, np.zeros(0, dtype=np.int64),
+                       np.zeros((0, n_subgroups), dtype=np.int32))
+        keys, pair_bits = or_reduce((bg_codes.astype(np.int64) << PERSON_BITS) | person.astype(np.int64), bits)
+        return cls(month, total, discretionary, keys, _flags(pair_bits, n_subgroups))
+
+    def arrays(self):
+        return {'month': np.array(self.month), 'total': self.total, 'discretionary': self.discretionary,
+                'keys': self.keys, 'flags': self.flags}
+
+
+class WindowState:
+    """
+    Sliding sums over the last `months` calendar months.
+
+    Block-group counts are added and subtracted. Each distinct pair keeps the
+    number of months it appears in and, per subgroup, the number of months
+    its flag is set, so removing a month is exact.
+    """
+
+    def __init__(self, months, n_blockgroups, n_subgroups):
+        self.months = months
+        self.aggregates = deque()
+        self.total = np.zeros(n_blockgroups, dtype=np.int64)
+        self.discretionary = np.zeros(n_blockgroups, dtype=np.int64)
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.presence = np.zeros(0, dtype=np.int32)
+        self.counts = np.zeros((0, n_subgroups), dtype=np.int32)
+
+    def add(self, aggregate):
+        self.total += aggregate.total
+        self.discretionary += aggregate.discretionary
+        position = np.searchsorted(self.keys, aggregate.keys)
+        found = position < len(self.keys)
+        found[found] = self.keys[position[found]] == aggregate.keys[found]
+        self.presence[position[found]] += 1
+        self.counts[position[found]] += aggregate.flags[found]
+        new = ~found
+        self.keys = np.insert(self.keys, position[new], aggregate.keys[new])
+        self.presence = np.insert(self.presence, position[new], 1)
+        self.counts = np.insert(self.counts, position[new], aggregate.flags[new], axis=0)
+
+    def remove(self, aggregate):
+        self.total -= aggregate.total
+        self.discretionary -= aggregate.discretionary
+        position = np.searchsorted(self.keys, aggregate.keys)
+        self.presence[position] -= 1
+        self.counts[position] -= aggregate.flags
+        keep = self.presence > 0
+        self.keys, self.presence, self.counts = self.keys[keep], self.presence[keep], self.counts[keep]
+
+    def append(self, aggregate):
+        """Add a month and drop the months that fall out of the window."""
+        self.add(aggregate)
+        self.aggregates.append(aggregate)
+        while self.aggregates[0].month <= aggregate.month - self.months:
+            self.remove(self.aggregates.popleft())
+
+
+def window_counts(total, discretionary, keys, flags, population, subgroup_names, cut_targets):
+    """
+    Step 2-5 counts for one window: discretionary rates, the Step 3 cut
+    points, and per category the population, block groups, arrests,
+    unit_unique (summed per-block-group distinct people) and one distinct
+    person count per subgroup (CutPointSweep.evaluate's columns).
+
+    Only block groups with an arrest in the window and a population enter,
+    as in the full analysis.
+    """
+    bg_unique = np.bincount(keys >> PERSON_BITS, minlength=len(total))
+    present = np.flatnonzero((total > 0) & (population > 0))
+    rate = discretionary[present] / population[present] * 1000
+
+    # Step 3 on a stable order (ties by block group code)
+    order = np.argsort(-rate, kind='stable')
+    cumulative_pct = np.cumsum(population[present][order]) / population[present].sum() * 100
+    cut_rates = []
+    for target in cut_targets:
+        index = np.argmax(cumulative_pct >= target)
+        cut_rates.append(rate[order][index])
+    cut1_rate, cut2_rate = cut_rates
+
+    category = np.full(len(total), -1, dtype=np.int64)
+    category[present] = np.where(rate >= cut1_rate, 0, np.where(rate >= cut2_rate, 1, 2))
+    pair_category = category[keys >> PERSON_BITS]
+    person = keys & PERSON_MASK
+
+    row = {'cut1_rate': cut1_rate, 'cut2_rate': cut2_rate}
+    for code, prefix in enumerate(CATEGORY_PREFIXES.values()):
+        in_category = category == code
+        row[f'{prefix}_pop'] = int(population[in_category].sum())
+        row[f'{prefix}_blockgroups'] = int(in_category.sum())
+        row[f'{prefix}_arrests'] = int(total[in_category].sum())
+        row[f'{prefix}_discretionary'] = int(discretionary[in_category].sum())
+        row[f'{prefix}_unit_unique'] = int(bg_unique[in_category].sum())
+        pairs = pair_category == code
+        for i, name in enumerate(subgroup_names):
+            row[f'{prefix}_{name}'] = len(np.unique(person[pairs & (flags[:, i] > 0)]))
+    return row
+
+
+class RollingRisks:
+    """
+    Rolling-window Step 2-5 counts, updated one month at a time.
+
+    population  -- Series of total_pop indexed by blockgroup_id (the census
+                   block groups of the region)
+    subgroups   -- subgroup definitions (subgroup_aggregation.subgroup)
+    windows     -- window lengths in months
+
+    Person codes are kept in a codebook of DefendantId strings that grows
+    with each month, so defendants are matched across data drops whatever
+    the extract's ID type. Only the months inside the longest window are
+    retained, with a fingerprint of every processed month's arrests.
+    """
+
+    def __init__(self, population, subgroups, windows=WINDOWS, cut_targets=(6.6, 22.0)):
+        self.population = population.astype(np.int64)
+        self.subgroups = subgroups
+        self.subgroup_names = [s['name'] for s in subgroups]
+        self.windows = [int(w) for w in windows]
+        self.cut_targets = [float(t) for t in cut_targets]
+        self.defendants = pd.Index([], dtype=object)
+        self.start_month = None
+        self.fingerprints = {}
+        self.states = {w: WindowState(w, len(population), len(subgroups)) for w in self.windows}
+        self.rows = []
+
+    @property
+    def last_month(self):
+        aggregates = self.states[max(self.windows)].aggregates
+        return aggregates[-1].month if aggregates else None
+
+    def config(self):
+        return {
+            'windows': self.windows,
+            'cut_targets': self.cut_targets,
+            'subgroups': self.subgroups,
+            'blockgroups': [int(b) for b in self.population.index],
+            'population': [int(p) for p in self.population],
+        }
+
+    def first_month(self, month, window):
+        """First calendar month of the window ending at `month` (no earlier than the data)."""
+        return max(month - window + 1, self.start_month)
+
+    def _person_codes(self, defendant_ids):
+        """Global codes for these defendant IDs, adding unseen IDs to the codebook."""
+        defendant_ids = np.asarray(defendant_ids).astype(str)
+        codes = self.defendants.get_indexer(defendant_ids)
+        unseen = pd.Index(defendant_ids[codes < 0]).unique()
+        if len(unseen):
+            self.defendants = self.defendants.append(unseen)
+            codes = self.defendants.get_indexer(defendant_ids)
+        return codes
+
+    def aggregate(self, month, arrests, defendant_ids):
+        """
+        MonthAggregate for compact arrests (DefendantId codes into
+        defendant_ids, blockgroup_id, is_discretionary and the subgroup
+        columns). Arrests outside the region's populated block groups are
+        ignored, as in Steps 2-5.
+        """
+        bg_codes = pd.Index(self.population.index).get_indexer(arrests['blockgroup_id'].to_numpy())
+        keep = bg_codes >= 0
+        keep[keep] = self.population.to_numpy()[bg_codes[keep]] > 0
+        arrests = arrests[keep]
+        person = self._person_codes(np.asarray(defendant_ids)[arrests['DefendantId'].to_numpy()])
+        return MonthAggregate.build(month, bg_codes[keep], person, arrests['is_discretionary'].to_numpy(),
+                                    subgroup_bits(arrests, self.subgroups), len(self.population),
+                                    len(self.subgroups))
+
+    def _window_row(self, month, window, total, discretionary, keys, flags, first_month):
+        days = (np.datetime64(month + 1, 'M').astype('datetime64[D]')
+                - np.datetime64(first_month, 'M').astype('datetime64[D]')).astype(np.int64)
+        row = {'month': month_label(month), 'window_months': window,
+               'months': month - first_month + 1, 'years': days / 365.25}
+        row.update(window_counts(total, discretionary, keys, flags, self.population.to_numpy(),
+                                 self.subgroup_names, self.cut_targets))
+        return row
+
+    def append(self, aggregate):
+        """Slide every window forward to this month; returns its rows."""
+        if self.last_month is not None and aggregate.month <= self.last_month:
+            raise ValueError(f"Month {month_label(aggregate.month)} is not after {month_label(self.last_month)}")
+        if self.start_month is None:
+            self.start_month = aggregate.month
+        rows = []
+        for window, state in self.states.items():
+            state.append(aggregate)
+            rows.append(self._window_row(aggregate.month, window, state.total, state.discretionary,
+                                         state.keys, state.counts, self.first_month(aggregate.month, window)))
+        self.rows.extend(rows)
+        return rows
+
+    def append_month(self, month, arrests, defendant_ids):
+        fingerprint = month_fingerprints(np.full(len(arrests), month), arrests, defendant_ids)
+        rows = self.append(self.aggregate(month, arrests, defendant_ids))
+        self.fingerprints[month] = fingerprint.get(month, EMPTY_MONTH)
+        return rows
+
+    def changed_months(self, fingerprints):
+        """
+        Months up to the last processed one whose arrests differ from
+        `fingerprints` (month_fingerprints of the input), including input
+        months before the state's first.
+        """
+        last = max(self.fingerprints, default=-np.inf)
+        months = set(self.fingerprints) | {month for month in fingerprints if month <= last}
+        return sorted(month for month in months if not same_month(fingerprints.get(month, EMPTY_MONTH),
+                                                                   self.fingerprints.get(month, EMPTY_MONTH)))
+
+    def recompute(self, month, window, arrests, defendant_ids):
+        """
+        The same row from scratch: one aggregate over every arrest in the
+        window (reference for verifying the incremental update).
+        """
+        months = month_index(arrests['ArrestDate'])
+        first_month = max(month - window + 1, int(months.min()))
+        in_window = (months >= month - window + 1) & (months <= month)
+        aggregate = self.aggregate(month, arrests[in_window], defendant_ids)
+        return self._window_row(month, window, aggregate.total, aggregate.discretionary,
+                                aggregate.keys, aggregate.flags, first_month)
+
+    def results(self):
+        return pd.DataFrame(self.rows)
+
+    # -- persistence ----------------------------------------------------------
+
+    def save(self, path):
+        """
+        Write the state: config, month fingerprints, defendant codebook,
+        result rows and the month aggregates inside the longest window.
+        """
+        path = Path(path)
+        months_path = path / 'months'
+        months_path.mkdir(parents=True, exist_ok=True)
+        (path / 'config.json').write_text(json.dumps(self.config(), indent=1))
+        (path / 'state.json').write_text(json.dumps({
+            'start_month': self.start_month,
+            'fingerprints': {month_label(month): value for month, value in self.fingerprints.items()},
+        }))
+        pd.DataFrame({'DefendantId': self.defendants.astype(str)}).to_parquet(path / 'defendants.parquet')
+        self.results().to_parquet(path / 'rows.parquet')
+        kept = set()
+        for aggregate in self.states[max(self.windows)].aggregates:
+            name = f"{month_label(aggregate.month)}.npz"
+            kept.add(name)
+            if not (months_path / name).exists():
+                np.savez(months_path / name, **aggregate.arrays())
+        for stale in months_path.glob('*.npz'):
+            if stale.name not in kept:
+                stale.unlink()
+
+    @classmethod
+    def load(cls, path, population, subgroups, windows=WINDOWS, cut_targets=(6.6, 22.0), fingerprints=None):
+        """
+        Saved state if it matches this configuration and, when fingerprints
+        (month_fingerprints of the input) are given, the input's arrests in
+        every month it has processed; otherwise a fresh one.
+        """
+        rolling = cls(population, subgroups, windows, cut_targets)
+        path = Path(path)
+        if not (path / 'config.json').exists():
+            return rolling
+        if json.loads((path / 'config.json').read_text()) != json.loads(json.dumps(rolling.config())):
+            print("Rolling state was built with different windows, subgroups or census data; starting over")
+            return rolling
+        saved = json.loads((path / 'state.json').read_text())
+        if fingerprints is not None and 'fingerprints' not in saved:
+            print("Rolling state has no input fingerprints; starting over")
+            return rolling
+        rolling.fingerprints = {int(np.datetime64(month, 'M').astype(np.int64)): value
+                                for month, value in saved.get('fingerprints', {}).items()}
+        changed = rolling.changed_months(fingerprints) if fingerprints is not None else []
+        if changed:
+            print(f"Arrests changed in {len(changed)} month(s) the rolling state covers "
+                  f"(first {month_label(changed[0])}); starting over")
+            return cls(population, subgroups, windows, cut_targets)
+        rolling.start_month = saved['start_month']
+        rolling.defendants = pd.Index(pd.read_parquet(path / 'defendants.parquet')['DefendantId'], dtype=object)
+        rolling.rows = pd.read_parquet(path / 'rows.parquet').to_dict('records')
+        for file in sorted((path / 'months').glob('*.npz')):
+            with np.load(file) as data:
+                aggregate = MonthAggregate(int(data['month']), data['total'], data['discretionary'],
+                                           data['keys'], data['flags'])
+            for state in rolling.states.values():
+                state.append(aggregate)
+        return rolling
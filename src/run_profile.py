@@ -0,0 +1,249 @@
+"""
+Run Profiler - Per-Stage Timing and Memory Instrumentation
+Wall and CPU time, RSS, optional tracemalloc peaks, rows in/out and
+DataFrame memory for every pipeline stage, written as run_profile.json,
+plus an optional cProfile/pyinstrument capture of one stage
+"""
+
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROFILERS = ['cprofile', 'pyinstrument']
+
+
+def rss_mb():
+    """Current resident set size (Linux), falling back to the peak."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+class RSSSampler:
+    """
+    Peak RSS while the block runs, sampled on a background thread
+    (interval=None only measures on entry and exit).
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = rss_mb()
+        self._thread = None
+        if self.interval:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+
+
+def git_commit(path=Path(__file__).parent):
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=path, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata(**extra):
+    """Timestamp, git commit, platform and library versions for a stored run."""
+    import pyarrow as pa
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'pyarrow': pa.__version__,
+        **extra,
+    }
+
+
+def describe_outputs(outputs):
+    """Rows and memory (MB) of the DataFrames, Series and arrays in a stage's outputs."""
+    described = {}
+    for name, value in outputs.items():
+        if isinstance(value, pd.DataFrame):
+            memory = value.memory_usage(index=True, deep=True).sum()
+        elif isinstance(value, pd.Series):
+            memory = value.memory_usage(index=True, deep=True)
+        elif isinstance(value, np.ndarray):
+            memory = value.nbytes
+        else:
+            continue
+        described[name] = {'rows': len(value), 'memory_mb': round(memory / 2 ** 20, 3)}
+    return described
+
+
+class RunProfiler:
+    """
+    Measurements for every stage run through a StageCache(profiler=...).
+
+    trace_memory   -- also record tracemalloc peaks (slows allocation-heavy
+                      stages several-fold; timings are then not comparable)
+    profile_stage  -- capture this stage with `profiler` ('cprofile' or
+                      'pyinstrument')
+    step_labels    -- stage name -> methodology step label for the report
+
+    CPU time is this process only; stages that fan out to worker processes
+    show wall time well above CPU time.
+    """
+
+    def __init__(self, trace_memory=False, profile_stage=None, profiler='cprofile', step_labels=None):
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler {profiler!r} (choose from {', '.join(PROFILERS)})")
+        if profile_stage and profiler == 'pyinstrument':
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                raise ImportError("--profiler pyinstrument needs the pyinstrument package "
+                                  "(pip install 'rpp-05[profile]'), or use --profiler cprofile") from None
+        self.trace_memory = trace_memory
+        self.profile_stage = profile_stage
+        self.profiler = profiler
+        self.step_labels = step_labels or {}
+        self.records = []
+        self.capture = None
+        self._start = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+    def _start_capture(self):
+        if self.profiler == 'pyinstrument':
+            from pyinstrument import Profiler
+            capture = Profiler()
+            capture.start()
+        else:
+            capture = cProfile.Profile()
+            capture.enable()
+        return capture
+
+    def _stop_capture(self, capture):
+        if self.profiler == 'pyinstrument':
+            capture.stop()
+        else:
+            capture.disable()
+        self.capture = capture
+
+    def measure(self, name, upstream, call):
+        """Run call() (one stage) and record its measurements; returns its result."""
+        rows_in = {f"{u.name}.{key}": len(value) for u in upstream
+                   for key, value in u.outputs.items() if isinstance(value, pd.DataFrame)}
+        rss_before = rss_mb()
+        if self.trace_memory:
+            tracemalloc.start()
+        # cProfile (sys.monitoring) also sees other threads, so the captured
+        # stage runs without the RSS sampler
+        capture = self._start_capture() if name == self.profile_stage else None
+        sampler = RSSSampler(interval=None if capture else 0.01)
+        start, start_cpu = time.perf_counter(), time.process_time()
+        result = None
+        try:
+            with sampler:
+                result = call()
+            return result
+        finally:
+            wall, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+            if capture is not None:
+                self._stop_capture(capture)
+            traced = None
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                traced = {'traced_peak_mb': round(peak / 2 ** 20, 1),
+                          'traced_delta_mb': round(current / 2 ** 20, 1)}
+                tracemalloc.stop()
+            rss_after = rss_mb()
+            self.records.append({
+                'stage': name,
+                'step': self.step_labels.get(name),
+                'cached': bool(result is not None and result.cached),
+                'failed': result is None,
+                'wall_seconds': round(wall, 4),
+                'cpu_seconds': round(cpu, 4),
+                'rss_before_mb': round(rss_before, 1),
+                'rss_peak_mb': round(sampler.peak, 1),
+                'rss_after_mb': round(rss_after, 1),
+                'rss_delta_mb': round(rss_after - rss_before, 1),
+                **(traced or {}),
+                'rows_in': rows_in,
+                'outputs': describe_outputs(result.outputs) if result is not None else {},
+            })
+
+    def profile(self, **metadata):
+        """The run profile as a JSON-able dict."""
+        return {
+            'metadata': run_metadata(trace_memory=self.trace_memory, **metadata),
+            'total': {
+                'wall_seconds': round(time.perf_counter() - self._start, 4),
+                'cpu_seconds': round(time.process_time() - self._start_cpu, 4),
+                'peak_rss_mb': round(peak_rss_mb(), 1),
+            },
+            'stages': self.records,
+        }
+
+    def write(self, output_dir, **metadata):
+        """
+        Write run_profile.json (and the stage capture, if any) to output_dir;
+        returns the paths written.
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / 'run_profile.json'
+        path.write_text(json.dumps(self.profile(**metadata), indent=2))
+        paths = [path]
+        if self.capture is not None:
+            stem = output_dir / f'profile_{self.profile_stage}'
+            if self.profiler == 'pyinstrument':
+                stem.with_suffix('.html').write_text(self.capture.output_html())
+                paths.append(stem.with_suffix('.html'))
+            else:
+                self.capture.dump_stats(stem.with_suffix('.prof'))
+                summary = io.StringIO()
+                pstats.Stats(self.capture, stream=summary).sort_stats('cumulative').print_stats(30)
+                stem.with_suffix('.txt').write_text(summary.getvalue())
+                paths += [stem.with_suffix('.prof'), stem.with_suffix('.txt')]
+        return paths
+
+    def summary(self):
+        """One line per stage: wall, CPU, peak RSS."""
+        lines = []
+        for record in self.records:
+            label = record['stage'] + (' (cached)' if record['cached'] else '')
+            lines.append(f"  {label:<22} {record['wall_seconds']:>8.2f}s wall {record['cpu_seconds']:>8.2f}s cpu "
+                         f"{record['rss_peak_mb']:>8,.0f} MB peak RSS")
+        return '\n'.join(lines)
@@ -0,0 +1,155 @@
+"""
+SQL Aggregation Backend - DuckDB Plans over the Arrest Dataset
+Builds the same mergeable aggregates as streaming_aggregation.py from lazy
+relational plans run inside DuckDB: multi-threaded, with the column list
+and county filter pushed down into the Arrow dataset scan, and no arrest
+rows materialized in Python. duckdb is imported only when this backend runs
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from arrest_loader import (GEOID_COLUMN, STATE_FIPS, TARGET_COUNTIES, arrest_columns, as_dataset,
+                           county_filter)
+from streaming_aggregation import PERSON_BITS, StreamingAggregator
+from subgroup_aggregation import SUBGROUP_COLUMNS
+
+BACKENDS = ['pandas', 'duckdb']
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        raise ImportError("The duckdb backend needs the duckdb package (pip install 'rpp-05[sql]')") from None
+    return duckdb
+
+
+def _literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _in_list(column, values):
+    values = [values] if isinstance(values, str) else list(values)
+    return f'"{column}" IN ({", ".join(map(_literal, values))})' if values else 'FALSE'
+
+
+def subgroup_condition(definition, columns, discretionary_categories):
+    """SQL predicate matching subgroup_aggregation.subgroup_mask for one definition."""
+    terms = []
+    for key, column in SUBGROUP_COLUMNS.items():
+        value = definition.get(key)
+        if value is None:
+            continue
+        if key == 'discretionary':
+            # A missing category is not discretionary, as isin() treats it in pandas
+            terms.append(f"coalesce({_in_list('Arrest_crime_category', discretionary_categories)}, FALSE) "
+                         f"= {bool(value)}")
+            continue
+        if column not in columns:
+            raise KeyError(f"Subgroup '{definition['name']}' filters on {key} but arrests have no {column} column")
+        if key == 'age':
+            terms.append(f'"{column}" BETWEEN {value[0]} AND {value[1]}')
+        elif key == 'offense' and isinstance(value, str):
+            # str.contains semantics: a regular expression search
+            terms.append(f'regexp_matches("{column}", {_literal(value)})')
+        else:
+            terms.append(_in_list(column, value))
+    # NULLs (missing ages or labels) match no subgroup filter, as in pandas
+    return f"coalesce({' AND '.join(terms)}, FALSE)" if terms else 'TRUE'
+
+
+def _blockgroup_expression(dataset, connection):
+    """12-digit block group GEOID as BIGINT, as compact_frame.blockgroup_ids computes it."""
+    geo_type = dataset.schema.field(GEOID_COLUMN).type
+    if pa.types.is_string(geo_type) or pa.types.is_large_string(geo_type):
+        return f'CAST(substr("{GEOID_COLUMN}", 1, 12) AS BIGINT)'
+    # Numeric GEOIDs lose a leading zero; pad to the next multiple of 3 digits
+    digits = connection.sql(f'SELECT max(length(CAST(CAST("{GEOID_COLUMN}" AS BIGINT) AS VARCHAR))) '
+                            f'FROM arrests').fetchone()[0] or 12
+    return f'CAST("{GEOID_COLUMN}" AS BIGINT) // {10 ** (-(-digits // 3) * 3 - 12)}'
+
+
+def sql_aggregate(source, subgroups, discretionary_categories, counties=TARGET_COUNTIES, state=STATE_FIPS,
+                  threads=None):
+    """
+    Aggregate the target-county arrests with DuckDB.
+
+    One scan groups the arrests that have a DefendantId (the rows
+    compact_arrests keeps) to distinct (block group, defendant, subgroup
+    bits, discretionary) rows; the pair, cell and discretionary aggregates
+    are grouped from that. Returns a StreamingAggregator (exact mode), so
+    every later stage runs unchanged.
+    """
+    duckdb = _duckdb()
+    dataset = as_dataset(source)
+    arrests = dataset.filter(county_filter(dataset, counties, state=state))
+    columns = arrest_columns(dataset)
+
+    connection = duckdb.connect()
+    if threads:
+        connection.execute(f"SET threads TO {int(threads)}")
+    connection.register('arrests', arrests)
+
+    n_words = max(1, -(-len(subgroups) // 64))
+    words = []
+    for word in range(n_words):
+        flags = [f"CASE WHEN {subgroup_condition(definition, columns, discretionary_categories)} "
+                 f"THEN {1 << (i % 64)}::UBIGINT ELSE 0::UBIGINT END"
+                 for i, definition in enumerate(subgroups) if i // 64 == word]
+        words.append(f"({' | '.join(flags) or '0::UBIGINT'}) AS bits{word}")
+    bit_columns = [f"bits{word}" for word in range(n_words)]
+
+    connection.execute(f"""
+        CREATE TEMP TABLE combos AS
+        SELECT DENSE_RANK() OVER (ORDER BY blockgroup_id) - 1 AS bg,
+               DENSE_RANK() OVER (ORDER BY DefendantId) - 1 AS person,
+               *
+        FROM (
+            SELECT {_blockgroup_expression(dataset, connection)} AS blockgroup_id, DefendantId,
+                   {', '.join(words)},
+                   coalesce({_in_list('Arrest_crime_category', discretionary_categories)}, FALSE) AS discretionary,
+                   count(*) AS arrests
+            FROM arrests
+            WHERE DefendantId IS NOT NULL
+            GROUP BY ALL
+        )
+    """)
+
+    def fetch(query):
+        return connection.sql(query).fetchnumpy()
+
+    def bits_of(result):
+        return np.column_stack([result[c].astype(np.uint64) for c in bit_columns])
+
+    blockgroups = fetch("SELECT bg, any_value(blockgroup_id) AS blockgroup_id, "
+                        "CAST(sum(arrests) FILTER (WHERE discretionary) AS BIGINT) AS discretionary "
+                        "FROM combos GROUP BY bg ORDER BY bg")
+    defendants = fetch("SELECT person, any_value(DefendantId) AS DefendantId FROM combos "
+                       "GROUP BY person ORDER BY person")
+    cells = fetch(f"SELECT bg, {', '.join(bit_columns)}, CAST(sum(arrests) AS BIGINT) AS arrests FROM combos "
+                  f"GROUP BY bg, {', '.join(bit_columns)}")
+    pairs = fetch(f"SELECT (bg << {PERSON_BITS}) | person AS key, "
+                  f"{', '.join(f'bit_or({c}) AS {c}' for c in bit_columns)} "
+                  f"FROM combos GROUP BY key ORDER BY key")
+    connection.close()
+
+    discretionary = blockgroups['discretionary']
+    if np.ma.isMaskedArray(discretionary):
+        discretionary = discretionary.filled(0)
+    return StreamingAggregator.from_outputs({
+        'stream_subgroups': list(subgroups),
+        'stream_discretionary_categories': list(discretionary_categories),
+        'stream_approximate': False,
+        'stream_precision': 12,
+        'stream_rows': int(cells['arrests'].sum()),
+        'stream_blockgroups': blockgroups['blockgroup_id'].astype(np.int64),
+        'stream_discretionary': np.asarray(discretionary, dtype=np.int64),
+        'stream_arrest_cells': cells['bg'].astype(np.int64),
+        'stream_arrest_bits': bits_of(cells),
+        'stream_arrest_counts': cells['arrests'].astype(np.int64),
+        'stream_pair_keys': pairs['key'].astype(np.int64),
+        'stream_pair_bits': bits_of(pairs),
+        'stream_defendants': pd.DataFrame({'DefendantId': defendants['DefendantId']}),
+    })
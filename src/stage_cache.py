@@ -0,0 +1,272 @@
+"""
+Content-Addressed Stage Cache
+Persists each pipeline stage's outputs as Parquet/JSON under a cache
+directory, keyed by a hash of the stage code (with the helpers and project
+modules it uses), its parameters, its source files and the keys of the
+stages it depends on
+"""
+
+import ast
+import functools
+import hashlib
+import inspect
+import types
+import json
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Files smaller than this are fingerprinted by content; larger ones by
+# size and modification time
+CONTENT_HASH_LIMIT = 64 * 1024 * 1024
+
+MANIFEST = 'manifest.json'
+
+
+def _json_default(value):
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (np.floating,)):
+        return float(value)
+    if isinstance(value, (np.bool_,)):
+        return bool(value)
+    if isinstance(value, pd.Timestamp):
+        return {'__timestamp__': value.isoformat()}
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    if isinstance(value, Path):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__} in stage output")
+
+
+def _json_hook(value):
+    if '__timestamp__' in value:
+        return pd.Timestamp(value['__timestamp__'])
+    return value
+
+
+def file_fingerprint(path):
+    """Content hash for small files, size + mtime for large ones (and directories)."""
+    path = Path(path)
+    if not path.exists():
+        return {'path': str(path), 'missing': True}
+    files = sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path]
+    digest = hashlib.sha256()
+    for file in files:
+        stat = file.stat()
+        digest.update(str(file.relative_to(path) if path.is_dir() else file.name).encode())
+        if stat.st_size <= CONTENT_HASH_LIMIT:
+            digest.update(file.read_bytes())
+        else:
+            digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return {'path': str(path), 'digest': digest.hexdigest()}
+
+
+@functools.lru_cache(maxsize=None)
+def _module_imports(path, mtime_ns):
+    """Project modules (.py files beside path) that path imports, anywhere in the file."""
+    path = Path(path)
+    imported = set()
+    for node in ast.walk(ast.parse(path.read_text())):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for module in names:
+            candidate = path.parent / f"{module.split('.')[0]}.py"
+            if candidate.exists():
+                imported.add(candidate)
+    return imported
+
+
+def _imported_modules(paths, exclude=()):
+    """paths plus every project module they import, directly or not."""
+    seen, pending = set(), [Path(p) for p in paths]
+    while pending:
+        path = pending.pop()
+        if path in seen or path in exclude:
+            continue
+        seen.add(path)
+        pending.extend(_module_imports(str(path), path.stat().st_mtime_ns))
+    return seen
+
+
+def _code_names(code):
+    """Global names (and imported module names) used by a code object and the functions nested in it."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _code_names(const)
+    return names
+
+
+def code_fingerprint(func):
+    """
+    Hash of func's source, the source of the same-module functions and
+    classes it calls (recursively), the values of the constants they read,
+    and every project module (a .py file beside func's module) they use,
+    with all the project modules those import. A change to any helper that computes a stage's results changes
+    the stage's key; edits elsewhere in the stage's own module do not.
+    """
+    home = Path(inspect.getsourcefile(func)).resolve()
+    sources, modules = {}, set()
+    pending = [func]
+    while pending:
+        obj = pending.pop()
+        label = getattr(obj, '__qualname__', repr(obj))
+        if label in sources:
+            continue
+        sources[label] = inspect.getsource(obj)
+        if not isinstance(obj, types.FunctionType):
+            continue
+        for name in _code_names(obj.__code__):
+            value = obj.__globals__.get(name)
+            if value is None:
+                # A module imported inside the function body
+                if (home.parent / f"{name}.py").exists():
+                    modules.add(home.parent / f"{name}.py")
+                continue
+            if isinstance(value, (str, int, float, tuple, list, dict, frozenset)):
+                # Module-level settings (CATEGORY_ORDER, cut targets, ...)
+                sources[f"{name} ="] = repr(value)
+                continue
+            target = value if isinstance(value, types.ModuleType) else inspect.getmodule(value)
+            file = getattr(target, '__file__', None)
+            if file is None or Path(file).resolve().parent != home.parent:
+                continue
+            if Path(file).resolve() != home:
+                modules.add(Path(file).resolve())
+            elif isinstance(value, (types.FunctionType, type)):
+                pending.append(value)
+
+    digest = hashlib.sha256()
+    for label in sorted(sources):
+        digest.update(f"{label}\n{sources[label]}".encode())
+    for path in sorted(_imported_modules(modules, exclude={home})):
+        digest.update(f"{path.name}\n".encode() + path.read_bytes())
+    return digest.hexdigest()
+
+
+def stage_key(name, func, params=None, sources=(), upstream=()):
+    """Hash of the stage code (see code_fingerprint), parameters, source fingerprints and upstream keys."""
+    payload = {
+        'stage': name,
+        'code': code_fingerprint(func),
+        'params': params or {},
+        'sources': [file_fingerprint(s) for s in sources],
+        'upstream': [u.key for u in upstream],
+    }
+    text = json.dumps(payload, sort_keys=True, default=_json_default)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+class StageResult:
+    """Outputs of one stage run plus the key they are stored under."""
+
+    def __init__(self, name, key, outputs, cached):
+        self.name = name
+        self.key = key
+        self.outputs = outputs
+        self.cached = cached
+
+    def __getitem__(self, item):
+        return self.outputs[item]
+
+
+class StageCache:
+    """
+    Stage runner backed by an on-disk cache.
+
+    Each stage's outputs (a dict of DataFrames, Series, NumPy arrays and
+    JSON-able scalars) live in <cache_dir>/<stage>/<key>/. A stage is only
+    recomputed when its key changes or it has been invalidated.
+
+    profiler is an optional run_profile.RunProfiler that measures every
+    stage; without one, only each stage's wall time is kept (timings).
+    """
+
+    def __init__(self, cache_dir, enabled=True, profiler=None):
+        self.cache_dir = Path(cache_dir)
+        self.enabled = enabled
+        self.profiler = profiler
+        self.timings = {}
+        self._invalidated = set()
+
+    def invalidate(self, name):
+        """Drop every cached artifact of one stage."""
+        self._invalidated.add(name)
+        shutil.rmtree(self.cache_dir / name, ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def run(self, name, func, *upstream, params=None, sources=(), files=()):
+        """
+        Run func(*upstream_outputs, **params), or load its cached outputs.
+
+        files lists output files the stage writes outside the cache; a cached
+        entry is only reused while they still exist.
+        """
+        start = time.perf_counter()
+        try:
+            if self.profiler is not None:
+                return self.profiler.measure(name, upstream,
+                                             lambda: self._run(name, func, upstream, params, sources, files))
+            return self._run(name, func, upstream, params, sources, files)
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 4)
+
+    def _run(self, name, func, upstream, params, sources, files):
+        key = stage_key(name, func, params, sources, upstream)
+        entry = self.cache_dir / name / key
+
+        if self.enabled and name not in self._invalidated and (entry / MANIFEST).exists() \
+                and all(Path(f).exists() for f in files):
+            print(f"✓ [{name}] loaded from cache ({key})")
+            return StageResult(name, key, self._read(entry), cached=True)
+
+        outputs = func(*[u.outputs for u in upstream], **(params or {}))
+        outputs = outputs or {}
+        if self.enabled:
+            self._write(entry, outputs)
+        return StageResult(name, key, outputs, cached=False)
+
+    def _write(self, entry, outputs):
+        # Write to a temporary directory and rename, so a crash never leaves
+        # a half-written entry behind
+        tmp = entry.parent / f".{entry.name}.{uuid.uuid4().hex}"
+        tmp.mkdir(parents=True, exist_ok=True)
+        manifest = {'frames': {}, 'series': {}, 'arrays': [], 'values': {}}
+        for name, value in outputs.items():
+            if isinstance(value, pd.DataFrame):
+                value.to_parquet(tmp / f"{name}.parquet")
+                manifest['frames'][name] = f"{name}.parquet"
+            elif isinstance(value, pd.Series):
+                value.to_frame(name='__series__').to_parquet(tmp / f"{name}.parquet")
+                manifest['series'][name] = value.name
+            elif isinstance(value, np.ndarray):
+                np.save(tmp / f"{name}.npy", value, allow_pickle=False)
+                manifest['arrays'].append(name)
+            else:
+                manifest['values'][name] = value
+        (tmp / MANIFEST).write_text(json.dumps(manifest, default=_json_default, indent=1))
+        shutil.rmtree(entry, ignore_errors=True)
+        tmp.rename(entry)
+
+    def _read(self, entry):
+        manifest = json.loads((entry / MANIFEST).read_text(), object_hook=_json_hook)
+        outputs = {}
+        for name, file in manifest['frames'].items():
+            outputs[name] = pd.read_parquet(entry / file)
+        for name, series_name in manifest['series'].items():
+            outputs[name] = pd.read_parquet(entry / f"{name}.parquet")['__series__'].rename(series_name)
+        for name in manifest['arrays']:
+            outputs[name] = np.load(entry / f"{name}.npy", allow_pickle=False)
+        outputs.update(manifest['values'])
+        return outputs
@@ -0,0 +1,431 @@
+"""
+Streaming Arrest Aggregation - Out-of-Core Execution Mode
+Reads the arrest data batch by batch and keeps only mergeable partial
+aggregates, so peak memory does not grow with the number of arrest rows
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from arrest_loader import STATE_FIPS, TARGET_COUNTIES, arrest_columns, as_dataset, county_filter
+from compact_frame import compact_arrests
+from subgroup_aggregation import (MARGIN_LABEL, cell_totals, cells_table, distinct_rows,
+                                  or_reduce, subgroup_bits)
+
+# Re-reduce the (block group, defendant) partials once this many are pending
+# (or twice the last reduced size, whichever is larger)
+COMPACT_THRESHOLD = 5_000_000
+
+PERSON_BITS = 32
+
+
+def _label_array(labels):
+    """Labels as int64, or as numpy variable-width strings (no Python object per label)."""
+    labels = np.asarray(labels) if not isinstance(labels, np.ndarray) else labels
+    if np.issubdtype(labels.dtype, np.integer):
+        return labels.astype(np.int64)
+    return labels.astype(np.dtypes.StringDType())
+
+
+class Codebook:
+    """
+    Running label -> int64 code mapping (codes in order of first
+    appearance), held as sorted label and code arrays: encoding a batch is a
+    searchsorted, and unseen labels are merged in with one insert.
+    """
+
+    def __init__(self, labels=()):
+        self._sorted = None
+        self._codes = np.zeros(0, dtype=np.int64)
+        if len(labels):
+            self.encode(labels)
+
+    def __len__(self):
+        return len(self._codes)
+
+    def _lookup(self, labels):
+        """Codes of labels (-1 where not in the codebook)."""
+        codes = np.full(len(labels), -1, dtype=np.int64)
+        position = np.searchsorted(self._sorted, labels)
+        found = position < len(self._sorted)
+        found[found] = self._sorted[position[found]] == labels[found]
+        codes[found] = self._codes[position[found]]
+        return codes
+
+    def encode(self, labels):
+        """Codes of labels, adding unseen ones to the codebook."""
+        labels = _label_array(labels)
+        if self._sorted is None:
+            self._sorted = labels[:0]
+        codes = self._lookup(labels)
+        missing = codes < 0
+        if missing.any():
+            new, first = np.unique(labels[missing], return_index=True)
+            new_codes = len(self._codes) + np.argsort(np.argsort(first, kind='stable'), kind='stable')
+            position = np.searchsorted(self._sorted, new)
+            self._sorted = np.insert(self._sorted, position, new)
+            self._codes = np.insert(self._codes, position, new_codes)
+            codes[missing] = self._lookup(labels[missing])
+        return codes
+
+    def labels(self):
+        """Labels in code order."""
+        if self._sorted is None:
+            return np.zeros(0, dtype=np.int64)
+        labels = np.empty(len(self._codes), dtype=self._sorted.dtype)
+        labels[self._codes] = self._sorted
+        return labels
+
+
+def _grow(array, size):
+    if len(array) >= size:
+        return array
+    grown = np.zeros((size,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+# ----------------------------------------------------------------------------
+# HyperLogLog sketches (approximate mode)
+# ----------------------------------------------------------------------------
+
+def _hll_index_rank(hashes, precision):
+    """Register index (top bits) and rank (leading zeros + 1) of 64-bit hashes."""
+    hashes = hashes.astype(np.uint64)
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # Smear the highest set bit down, then popcount gives its position
+    smeared = rest.copy()
+    for shift in (1, 2, 4, 8, 16, 32):
+        smeared |= smeared >> np.uint64(shift)
+    rank = (64 - precision) - np.bitwise_count(smeared).astype(np.int64) + 1
+    return index, rank.astype(np.uint8)
+
+
+def hll_estimate(registers):
+    """Cardinality estimates from HyperLogLog registers (last axis = registers)."""
+    registers = np.asarray(registers, dtype=np.float64)
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.exp2(-registers), axis=-1)
+    zeros = np.sum(registers == 0, axis=-1)
+    with np.errstate(divide='ignore'):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+class StreamingAggregator:
+    """
+    Mergeable partial aggregates over batches of arrests.
+
+    Exact mode keeps arrest counts per (block group, subgroup bits) and the
+    distinct (block group, defendant) pairs with their OR-ed subgroup bits;
+    both are bounded by distinct values, not by arrest rows. Approximate mode
+    replaces the pairs with HyperLogLog registers per (block group, subgroup).
+    """
+
+    def __init__(self, subgroups, discretionary_categories, approximate=False, precision=12):
+        self.subgroups = list(subgroups)
+        self.discretionary_categories = list(discretionary_categories)
+        self.approximate = approximate
+        self.precision = precision
+        self.rows = 0
+
+        self._blockgroups = Codebook()
+        self._defendants = Codebook()
+        self._discretionary = np.zeros(0, dtype=np.int64)
+        self._arrest_parts = []
+        self._pair_parts = []
+        self._pending_pairs = 0
+        self._reduced_pairs = 0
+        n_words = max(1, -(-len(self.subgroups) // 64))
+        self._registers = np.zeros((0, len(self.subgroups) + 1, 1 << precision), dtype=np.uint8)
+        self._empty_bits = np.zeros((0, n_words), dtype=np.uint64)
+
+    # -- accumulation -------------------------------------------------------
+
+    def update(self, table):
+        """Fold one batch (pyarrow Table or RecordBatch) into the aggregates."""
+        if isinstance(table, pa.RecordBatch):
+            table = pa.Table.from_batches([table])
+        if table.num_rows == 0:
+            return self
+        compact, codebook = compact_arrests(table)
+        compact['is_discretionary'] = compact['Arrest_crime_category'].isin(self.discretionary_categories)
+        bits = subgroup_bits(compact, self.subgroups)
+
+        bg_codes, bg_labels = pd.factorize(compact['blockgroup_id'].to_numpy())
+        bg = self._blockgroups.encode(bg_labels)[bg_codes]
+        n_bg = len(self._blockgroups)
+        self.rows += len(compact)
+
+        self._discretionary = _grow(self._discretionary, n_bg)
+        self._discretionary += np.bincount(bg, weights=compact['is_discretionary'].to_numpy(),
+                                           minlength=n_bg).astype(np.int64)
+
+        cells, cell_bits, counts = distinct_rows(bg, bits)
+        self._arrest_parts.append((cells, cell_bits, counts))
+        self._compact_arrests()
+
+        person = compact['DefendantId'].to_numpy()
+        if self.approximate:
+            hashes = pd.util.hash_array(np.asarray(codebook['DefendantId'], dtype=object))[person]
+            self._update_registers(bg, bits, hashes)
+        else:
+            person = self._defendants.encode(codebook['DefendantId'])[person]
+            keys, pair_bits = or_reduce((bg << PERSON_BITS) | person, bits)
+            self._pair_parts.append((keys, pair_bits))
+            self._pending_pairs += len(keys)
+            if self._pending_pairs > max(COMPACT_THRESHOLD, 2 * self._reduced_pairs):
+                self._compact_pairs()
+        return self
+
+    def _update_registers(self, bg, bits, hashes):
+        self._registers = _grow(self._registers, len(self._blockgroups))
+        index, rank = _hll_index_rank(hashes, self.precision)
+        n_slots = self._registers.shape[1]
+        m = self._registers.shape[2]
+        flat = self._registers.reshape(-1)
+        flags = np.unpackbits(bits.astype('<u8').view(np.uint8), axis=1, bitorder='little')
+        for slot in range(n_slots):
+            rows = slice(None) if slot == n_slots - 1 else flags[:, slot].astype(bool)
+            np.maximum.at(flat, (bg[rows] * n_slots + slot) * m + index[rows], rank[rows])
+
+    def _compact_arrests(self):
+        if len(self._arrest_parts) < 2:
+            return
+        cells = np.concatenate([p[0] for p in self._arrest_parts])
+        bits = np.concatenate([p[1] for p in self._arrest_parts])
+        counts = np.concatenate([p[2] for p in self._arrest_parts])
+        self._arrest_parts = [distinct_rows(cells, bits, counts)]
+
+    def _compact_pairs(self):
+        if not self._pair_parts:
+            return
+        keys = np.concatenate([p[0] for p in self._pair_parts])
+        bits = np.concatenate([p[1] for p in self._pair_parts])
+        self._pair_parts = [or_reduce(keys, bits)]
+        self._pending_pairs = self._reduced_pairs = len(self._pair_parts[0][0])
+
+    def merge(self, other):
+        """Fold another aggregator (e.g. from a different file or worker) into this one."""
+        bg_map = self._blockgroups.encode(other._blockgroups.labels())
+        n_bg = len(self._blockgroups)
+        self.rows += other.rows
+
+        self._discretionary = _grow(self._discretionary, n_bg)
+        np.add.at(self._discretionary, bg_map[:len(other._discretionary)], other._discretionary)
+
+        for cells, bits, counts in other._arrest_parts:
+            self._arrest_parts.append((bg_map[cells], bits, counts))
+        self._compact_arrests()
+
+        if self.approximate:
+            self._registers = _grow(self._registers, n_bg)
+            np.maximum.at(self._registers, bg_map[:len(other._registers)], other._registers)
+        else:
+            person_map = self._defendants.encode(other._defendants.labels())
+            mask = np.int64((1 << PERSON_BITS) - 1)
+            for keys, bits in other._pair_parts:
+                keys = (bg_map[keys >> PERSON_BITS] << PERSON_BITS) | person_map[keys & mask]
+                self._pair_parts.append((keys, bits))
+            self._compact_pairs()
+        return self
+
+    # -- persistence --------------------------------------------------------
+
+    def to_outputs(self):
+        """Reduced partials as plain arrays/frames (e.g. for the stage cache)."""
+        cells, bits, counts = self._arrest_cells()
+        outputs = {
+            'stream_subgroups': self.subgroups,
+            'stream_discretionary_categories': self.discretionary_categories,
+            'stream_approximate': self.approximate,
+            'stream_precision': self.precision,
+            'stream_rows': self.rows,
+            'stream_blockgroups': self._blockgroup_ids(),
+            'stream_discretionary': self._discretionary,
+            'stream_arrest_cells': cells,
+            'stream_arrest_bits': bits,
+            'stream_arrest_counts': counts,
+        }
+        if self.approximate:
+            outputs['stream_registers'] = self._registers
+        else:
+            keys, pair_bits = self._pairs()
+            outputs['stream_pair_keys'] = keys
+            outputs['stream_pair_bits'] = pair_bits
+            labels = self._defendants.labels()
+            outputs['stream_defendants'] = pd.DataFrame({'DefendantId': labels if labels.dtype.kind == 'i'
+                                                         else labels.astype(object)})
+        return outputs
+
+    @classmethod
+    def from_outputs(cls, outputs):
+        """Rebuild an aggregator from to_outputs()."""
+        aggregator = cls(outputs['stream_subgroups'], outputs['stream_discretionary_categories'],
+                         approximate=outputs['stream_approximate'], precision=outputs['stream_precision'])
+        aggregator.rows = outputs['stream_rows']
+        blockgroups = outputs['stream_blockgroups']
+        aggregator._blockgroups = Codebook(blockgroups)
+        aggregator._discretionary = outputs['stream_discretionary']
+        if len(outputs['stream_arrest_cells']):
+            aggregator._arrest_parts = [(outputs['stream_arrest_cells'], outputs['stream_arrest_bits'],
+                                         outputs['stream_arrest_counts'])]
+        if aggregator.approximate:
+            aggregator._registers = outputs['stream_registers']
+        else:
+            aggregator._defendants = Codebook(outputs['stream_defendants']['DefendantId'].to_numpy())
+            if len(outputs['stream_pair_keys']):
+                aggregator._pair_parts = [(outputs['stream_pair_keys'], outputs['stream_pair_bits'])]
+                aggregator._pending_pairs = aggregator._reduced_pairs = len(outputs['stream_pair_keys'])
+        return aggregator
+
+    # -- results ------------------------------------------------------------
+
+    def _blockgroup_ids(self):
+        return self._blockgroups.labels().astype(np.int64)
+
+    def _pairs(self):
+        self._compact_pairs()
+        if not self._pair_parts:
+            return np.zeros(0, dtype=np.int64), self._empty_bits
+        return self._pair_parts[0]
+
+    def _arrest_cells(self):
+        if not self._arrest_parts:
+            return np.zeros(0, dtype=np.int64), self._empty_bits, np.zeros(0, dtype=np.int64)
+        return self._arrest_parts[0]
+
+    @property
+    def discretionary_arrests(self):
+        return int(self._discretionary.sum())
+
+    @property
+    def unique_individuals(self):
+        if self.approximate:
+            return float(hll_estimate(self._registers[:, -1].max(axis=0))) if len(self._registers) else 0.0
+        return len(self._defendants)
+
+    def blockgroup_pairs(self):
+        """(blockgroup_id, person code, bits) for each distinct pair (exact mode only)."""
+        if self.approximate:
+            raise ValueError("Block group x person pairs are not kept in approximate mode")
+        keys, bits = self._pairs()
+        return (self._blockgroup_ids()[keys >> PERSON_BITS], keys & np.int64((1 << PERSON_BITS) - 1), bits)
+
+    def blockgroup_totals(self):
+        """blockgroup_id, total_arrests, unique_individuals (as Step 1B's groupby)."""
+        n_bg = len(self._blockgroups)
+        cells, _, counts = self._arrest_cells()
+        total = np.bincount(cells, weights=counts, minlength=n_bg).astype(np.int64)
+        if self.approximate:
+            unique = hll_estimate(self._registers[:, -1])
+        else:
+            keys, _ = self._pairs()
+            unique = np.bincount(keys >> PERSON_BITS, minlength=n_bg)
+        table = pd.DataFrame({
+            'blockgroup_id': self._blockgroup_ids(),
+            'total_arrests': total,
+            'unique_individuals': unique,
+        })
+        return table.sort_values('blockgroup_id').reset_index(drop=True)
+
+    def discretionary_totals(self):
+        """blockgroup_id, discretionary_arrests for block groups with any."""
+        table = pd.DataFrame({
+            'blockgroup_id': self._blockgroup_ids(),
+            'discretionary_arrests': self._discretionary,
+        })
+        table = table[table['discretionary_arrests'] > 0]
+        return table.sort_values('blockgroup_id').reset_index(drop=True)
+
+    def county_counts(self):
+        """Arrests per three-digit county code."""
+        cells, _, counts = self._arrest_cells()
+        per_bg = np.bincount(cells, weights=counts, minlength=len(self._blockgroups)).astype(np.int64)
+        county = self._blockgroup_ids() // 10 ** 7 % 1000
+        return pd.Series(per_bg, index=county).groupby(level=0).sum().sort_values(ascending=False)
+
+    def subgroup_cells(self, blockgroup_categories, by='policing_category', margins=True):
+        """
+        Same table as aggregate_subgroups(..., unit='blockgroup_id') once each
+        block group has a category. Block groups missing from
+        blockgroup_categories are dropped, as with the inner merge.
+        """
+        levels = pd.Categorical(blockgroup_categories)
+        labels = list(levels.categories)
+        category_of = pd.Series(levels.codes, index=blockgroup_categories.index)
+        bg_category = category_of.reindex(self._blockgroup_ids()).fillna(-1).to_numpy().astype(np.int64)
+        n_sub = len(self.subgroups)
+
+        cells, bits, counts = self._arrest_cells()
+        cat = bg_category[cells]
+        keep = cat >= 0
+        arrests = [cell_totals(cat[keep], bits[keep], len(labels), n_sub, counts[keep])]
+        if margins:
+            arrests.append(cell_totals(np.zeros(keep.sum(), dtype=np.int64), bits[keep], 1, n_sub, counts[keep]))
+
+        if self.approximate:
+            unique, unit_unique = self._sketch_cells(bg_category, len(labels), margins)
+        else:
+            unique, unit_unique = self._exact_cells(bg_category, len(labels), margins)
+
+        if margins:
+            labels.append(MARGIN_LABEL)
+        return cells_table(labels, self.subgroups, np.vstack(arrests), unique, unit_unique, by=by)
+
+    def _exact_cells(self, bg_category, n_labels, margins):
+        keys, bits = self._pairs()
+        cat = bg_category[keys >> PERSON_BITS]
+        keep = cat >= 0
+        keys, bits, cat = keys[keep], bits[keep], cat[keep]
+        person = keys & np.int64((1 << PERSON_BITS) - 1)
+        n_sub = len(self.subgroups)
+
+        unit_unique = [cell_totals(cat, bits, n_labels, n_sub)]
+        person_keys, person_bits = or_reduce((cat << PERSON_BITS) | person, bits)
+        unique = [cell_totals(person_keys >> PERSON_BITS, person_bits, n_labels, n_sub)]
+        if margins:
+            zeros = np.zeros(len(cat), dtype=np.int64)
+            unit_unique.append(cell_totals(zeros, bits, 1, n_sub))
+            _, person_bits = or_reduce(person, bits)
+            unique.append(cell_totals(np.zeros(len(person_bits), dtype=np.int64), person_bits, 1, n_sub))
+        return np.vstack(unique), np.vstack(unit_unique)
+
+    def _sketch_cells(self, bg_category, n_labels, margins):
+        registers = self._registers[:, :-1]
+        groups = [bg_category == c for c in range(n_labels)]
+        if margins:
+            groups.append(bg_category >= 0)
+        per_bg = hll_estimate(registers)
+        unique = np.vstack([hll_estimate(registers[g].max(axis=0)) if g.any()
+                            else np.zeros(len(self.subgroups)) for g in groups])
+        unit_unique = np.vstack([per_bg[g].sum(axis=0) for g in groups])
+        return unique, unit_unique
+
+
+def stream_arrests(source, subgroups, discretionary_categories, counties=TARGET_COUNTIES,
+                   state=STATE_FIPS, batch_size=1_000_000, approximate=False, precision=12, on_batch=None):
+    """
+    Aggregate the target-county arrests batch by batch.
+
+    Only batch_size rows (plus the partial aggregates) are held at once.
+    on_batch, when given, is called with each loaded batch before it is
+    aggregated (e.g. to tally validation checks in the same scan).
+    Returns a StreamingAggregator.
+    """
+    dataset = as_dataset(source)
+    scanner = dataset.scanner(
+        columns=arrest_columns(dataset),
+        filter=county_filter(dataset, counties, state=state),
+        batch_size=batch_size,
+    )
+    aggregator = StreamingAggregator(subgroups, discretionary_categories,
+                                     approximate=approximate, precision=precision)
+    for batch in scanner.to_batches():
+        if on_batch is not None and batch.num_rows:
+            on_batch(batch)
+        aggregator.update(batch)
+    return aggregator
@@ -0,0 +1,185 @@
+"""
+Multi-Subgroup Aggregation Engine
+Arrest and unique-individual counts for every policing category x subgroup
+cell in one vectorized pass, instead of one filter + nunique per cell
+"""
+
+import numpy as np
+import pandas as pd
+
+MARGIN_LABEL = 'Total'
+
+# Subgroup definition keys -> arrest frame column
+SUBGROUP_COLUMNS = {
+    'sex': 'Gender',
+    'age': 'Age_years',
+    'offense': 'Arrest_crime_category',
+    'race': 'Race',
+    'discretionary': 'is_discretionary',
+}
+
+
+def subgroup(name, sex=None, age=None, offense=None, race=None, discretionary=None):
+    """
+    Build a subgroup definition.
+
+    sex            -- Gender label, e.g. 'Male'
+    age            -- inclusive (low, high) band on Age_years, e.g. (18, 35)
+    offense        -- substring of Arrest_crime_category ('Drug') or a list of
+                      exact categories
+    race           -- Race label or list of labels
+    discretionary  -- True/False on the is_discretionary flag
+    """
+    return {'name': name, 'sex': sex, 'age': age, 'offense': offense,
+            'race': race, 'discretionary': discretionary}
+
+
+def _label_mask(column, values, contains=False):
+    """Match labels once per category instead of once per row."""
+    series = column if isinstance(column.dtype, pd.CategoricalDtype) else column.astype('category')
+    labels = series.cat.categories
+    if contains:
+        hit = labels.str.contains(values, na=False)
+    else:
+        values = [values] if isinstance(values, str) else list(values)
+        hit = labels.isin(values)
+    return np.isin(series.cat.codes.to_numpy(), np.flatnonzero(hit))
+
+
+def subgroup_mask(arrests, definition):
+    """Boolean row mask for one subgroup definition."""
+    mask = np.ones(len(arrests), dtype=bool)
+    for key, column in SUBGROUP_COLUMNS.items():
+        value = definition.get(key)
+        if value is None:
+            continue
+        if column not in arrests.columns:
+            raise KeyError(f"Subgroup '{definition['name']}' filters on {key} but arrests have no {column} column")
+        if key == 'age':
+            low, high = value
+            mask &= arrests[column].between(low, high).to_numpy()
+        elif key == 'discretionary':
+            mask &= arrests[column].to_numpy() == bool(value)
+        else:
+            mask &= _label_mask(arrests[column], value, contains=(key == 'offense' and isinstance(value, str)))
+    return mask
+
+
+def subgroup_bits(arrests, subgroups):
+    """Pack subgroup membership into uint64 words (one bit per subgroup)."""
+    n_words = max(1, -(-len(subgroups) // 64))
+    bits = np.zeros((len(arrests), n_words), dtype=np.uint64)
+    for i, definition in enumerate(subgroups):
+        word, bit = divmod(i, 64)
+        bits[:, word] |= subgroup_mask(arrests, definition).astype(np.uint64) << np.uint64(bit)
+    return bits
+
+
+def or_reduce(keys, bits):
+    """OR together the membership bits of rows sharing a key."""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    return sorted_keys[starts], np.bitwise_or.reduceat(bits[order], starts, axis=0)
+
+
+def distinct_rows(cells, bits, weights=None):
+    """Collapse rows with identical (cell, bits) to one row plus a count (hash-based)."""
+    key = cells.astype(np.int64)
+    for word in range(bits.shape[1]):
+        codes, uniques = pd.factorize(bits[:, word])
+        key, _ = pd.factorize(key * len(uniques) + codes)
+    counts = np.bincount(key, weights=weights)
+    if weights is not None:
+        counts = counts.astype(np.asarray(weights).dtype)
+    first = np.empty(len(counts), dtype=np.int64)
+    first[key[::-1]] = np.arange(len(key) - 1, -1, -1)
+    return cells[first], bits[first], counts
+
+
+def cell_totals(cells, bits, n_cells, n_subgroups, weights=None):
+    """
+    Count rows (or sum weights) per (cell, subgroup) after collapsing
+    identical bit patterns.
+    """
+    if len(cells) == 0:
+        return np.zeros((n_cells, n_subgroups), dtype=np.int64)
+    combo_cells, combo_bits, counts = distinct_rows(cells, bits, weights)
+    totals = np.zeros((n_cells, n_subgroups), dtype=counts.dtype)
+    flags = np.unpackbits(combo_bits.astype('<u8').view(np.uint8), axis=1, bitorder='little')[:, :n_subgroups]
+    np.add.at(totals, combo_cells.astype(np.int64), flags.astype(np.int64) * counts[:, None])
+    return totals
+
+
+def _count(cells, n_cells, person, bits, n_subgroups, unit=None):
+    """Arrests, unique persons and (optionally) per-unit unique sums per cell."""
+    arrests = cell_totals(cells, bits, n_cells, n_subgroups)
+
+    n_person = int(person.max()) + 1 if len(person) else 1
+    keys, person_bits = or_reduce(cells.astype(np.int64) * n_person + person, bits)
+    unique = cell_totals(keys // n_person, person_bits, n_cells, n_subgroups)
+
+    unit_unique = None
+    if unit is not None:
+        unit_codes, n_unit = unit
+        keys, unit_bits = or_reduce((cells.astype(np.int64) * n_unit + unit_codes) * n_person + person, bits)
+        unit_unique = cell_totals(keys // n_person // n_unit, unit_bits, n_cells, n_subgroups)
+
+    return arrests, unique, unit_unique
+
+
+def aggregate_subgroups(arrests, subgroups, by='policing_category', person='DefendantId',
+                        unit=None, margins=False):
+    """
+    Count arrests and unique individuals for every `by` level x subgroup cell.
+
+    arrests    -- compact arrest frame (integer person codes, categorical `by`)
+    subgroups  -- list of definitions from subgroup()
+    unit       -- optional column (e.g. 'blockgroup_id'); adds
+                  unit_unique_individuals, the sum over units of the unique
+                  individuals in each unit (how Step 1B counts them)
+    margins    -- add a MARGIN_LABEL level counting across all `by` levels
+
+    Returns a tidy DataFrame with one row per cell.
+    """
+    levels = arrests[by].astype('category') if not isinstance(arrests[by].dtype, pd.CategoricalDtype) else arrests[by]
+    cells = levels.cat.codes.to_numpy()
+    keep = cells >= 0
+    labels = list(levels.cat.categories)
+
+    bits = subgroup_bits(arrests, subgroups)[keep]
+    cells = cells[keep].astype(np.int64)
+    person_codes = arrests[person].to_numpy()[keep].astype(np.int64)
+
+    unit_arg = None
+    if unit is not None:
+        unit_codes, unit_labels = pd.factorize(arrests[unit].to_numpy()[keep])
+        unit_arg = (unit_codes.astype(np.int64), max(len(unit_labels), 1))
+
+    n_subgroups = len(subgroups)
+    results = [_count(cells, len(labels), person_codes, bits, n_subgroups, unit_arg)]
+    if margins:
+        labels.append(MARGIN_LABEL)
+        results.append(_count(np.zeros_like(cells), 1, person_codes, bits, n_subgroups, unit_arg))
+
+    return cells_table(
+        labels, subgroups,
+        np.vstack([r[0] for r in results]),
+        np.vstack([r[1] for r in results]),
+        np.vstack([r[2] for r in results]) if unit is not None else None,
+        by=by,
+    )
+
+
+def cells_table(labels, subgroups, arrests_n, unique_n, unit_unique_n=None, by='policing_category'):
+    """Tidy table from (level x subgroup) count matrices."""
+    table = pd.DataFrame({
+        by: np.repeat(labels, len(subgroups)),
+        'subgroup': np.tile([s['name'] for s in subgroups], len(labels)),
+        'arrests': np.asarray(arrests_n).ravel(),
+        'unique_individuals': np.asarray(unique_n).ravel(),
+    })
+    if unit_unique_n is not None:
+        table['unit_unique_individuals'] = np.asarray(unit_unique_n).ravel()
+    return table
+
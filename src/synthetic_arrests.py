@@ -0,0 +1,166 @@
+"""
+Synthetic Arrest Data Generator
+Realistic stand-in for census_mapped_anon_data.parquet at any size (100K to
+100M rows): real Charleston/Berkeley block groups, skewed per-block-group
+arrest intensity, repeat defendants and the real crime categories. Written
+batch by batch so memory stays bounded.
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+BASE_PATH = Path(__file__).parent.parent
+CENSUS_FILE = BASE_PATH / 'data' / 'census_charleston_berkeley.csv'
+
+SIZES = [100_000, 1_000_000, 10_000_000, 100_000_000]
+
+# Crime categories (the five discretionary ones from Step 2 first) and
+# their share of arrests
+CRIME_CATEGORIES = {
+    'Drug Poss': 0.15,
+    'Property': 0.12,
+    'Traffic': 0.10,
+    'Other Offenses': 0.13,
+    'Theft': 0.10,
+    'Violent': 0.12,
+    'DUI': 0.06,
+    'Drug Dist': 0.08,
+    'Weapons': 0.07,
+    'Public Order': 0.07,
+}
+GENDERS = {'Male': 0.72, 'Female': 0.28}
+RACES = {'Black': 0.50, 'White': 0.40, 'Hispanic': 0.07, 'Other': 0.03}
+AGENCIES = ['CPD', 'NCPD', 'BCSO', 'MPPD', 'SCHP']
+
+# Share of arrests in block groups outside the target counties (exercises
+# the county filter), from this neighbouring county
+OUTSIDE_COUNTY = '035'
+OUTSIDE_SHARE = 0.10
+
+# Defendants per arrest; arrests per defendant follow a skewed (beta)
+# distribution, so a minority of people account for most arrests
+DEFENDANT_RATIO = 1 / 3
+
+BATCH_ROWS = 2_000_000
+ROW_GROUP_SIZE = 500_000
+
+
+def _choice(rng, options, size):
+    """Codes into `options` (a dict of label -> weight)."""
+    weights = np.array(list(options.values()), dtype=np.float64)
+    return rng.choice(len(options), size, p=weights / weights.sum()).astype(np.int8)
+
+
+def _dictionary(codes, labels):
+    return pa.DictionaryArray.from_arrays(pa.array(codes, type=pa.int8()), pa.array(list(labels))).cast(pa.string())
+
+
+def blockgroup_universe(census_file=CENSUS_FILE, outside_share=OUTSIDE_SHARE, seed=0):
+    """
+    Block group GEOIDs (int64) and arrest-intensity weights.
+
+    Intensity is lognormal, scaled by population and tilted towards
+    high-poverty block groups, so a few block groups carry many arrests.
+    """
+    rng = np.random.default_rng(seed)
+    census = pd.read_csv(census_file, usecols=['blockgroup_id', 'total_pop', 'poverty_count'])
+    population = census['total_pop'].clip(lower=1).to_numpy(dtype=np.float64)
+    poverty = (census['poverty_count'].fillna(0) / population).clip(0, 1).to_numpy()
+    weights = population * rng.lognormal(0, 1.2, len(census)) * (1 + 4 * poverty)
+
+    geoids = census['blockgroup_id'].astype('int64').to_numpy()
+    if outside_share:
+        n_outside = max(len(census) // 10, 1)
+        # 12-digit GEOIDs: state (2) county (3) tract (6) block group (1)
+        state = geoids[0] // 10 ** 10
+        i = np.arange(n_outside)
+        tract = 10100 + i // 3
+        outside = (state * 1000 + int(OUTSIDE_COUNTY)) * 10 ** 7 + tract * 10 + i % 3 + 1
+        geoids = np.r_[geoids, outside]
+        outside_weights = rng.lognormal(0, 1.2, n_outside)
+        weights = np.r_[weights / weights.sum() * (1 - outside_share),
+                        outside_weights / outside_weights.sum() * outside_share]
+    return geoids, weights / weights.sum()
+
+
+def generate_batches(n_rows, census_file=CENSUS_FILE, seed=0, start='2015-01-01', years=5,
+                     batch_rows=BATCH_ROWS, outside_share=OUTSIDE_SHARE, extra_columns=True):
+    """
+    Yield pyarrow Tables with the arrest schema, batch_rows rows at a time.
+
+    Defendants have a fixed home block group, birth year, gender and race,
+    so repeat arrests stay consistent across batches.
+    """
+    rng = np.random.default_rng(seed)
+    geoids, weights = blockgroup_universe(census_file, outside_share, seed)
+    n_defendants = max(int(n_rows * DEFENDANT_RATIO), 1)
+
+    home = rng.choice(len(geoids), n_defendants, p=weights).astype(np.int32)
+    age_at_start = rng.integers(14, 70, n_defendants).astype(np.int16)
+    gender = _choice(rng, GENDERS, n_defendants)
+    race = _choice(rng, RACES, n_defendants)
+    first_day = np.datetime64(start, 'D')
+    n_days = int(365.25 * years)
+
+    for offset in range(0, n_rows, batch_rows):
+        n = min(batch_rows, n_rows - offset)
+        defendant = (n_defendants * rng.beta(0.7, 1.0, n)).astype(np.int64)
+        days = rng.integers(0, n_days, n)
+        block = rng.integers(0, 999, n)
+
+        defendant_ids = pc.binary_join_element_wise(
+            'D', pc.utf8_lpad(pc.cast(pa.array(defendant), pa.string()), 9, '0'), '')
+        columns = {
+            'DefendantId': defendant_ids,
+            'DefendantAddressGEOID10': pc.cast(pa.array(geoids[home[defendant]] * 1000 + block), pa.string()),
+            'ArrestDate': pa.array((first_day + days.astype('timedelta64[D]')).astype('datetime64[ns]')),
+            'Arrest_crime_category': _dictionary(_choice(rng, CRIME_CATEGORIES, n), CRIME_CATEGORIES),
+            'Age_years': pa.array((age_at_start[defendant] + days // 365).astype(np.float64)),
+            'Gender': _dictionary(gender[defendant], GENDERS),
+            'Race': _dictionary(race[defendant], RACES),
+        }
+        if extra_columns:
+            # Columns the analysis never reads (the loader prunes them)
+            columns['AgencyName'] = _dictionary(rng.integers(0, len(AGENCIES), n).astype(np.int8), AGENCIES)
+            columns['Outcome'] = _dictionary(rng.integers(0, 3, n).astype(np.int8), ['Convicted', 'Dismissed', 'Pending'])
+        yield pa.table(columns)
+
+
+def write_synthetic(path, n_rows, census_file=CENSUS_FILE, seed=0, row_group_size=ROW_GROUP_SIZE, **options):
+    """Write n_rows synthetic arrests to a Parquet file; returns its path."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    writer = None
+    try:
+        for table in generate_batches(n_rows, census_file, seed, **options):
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema)
+            writer.write_table(table, row_group_size=row_group_size)
+    finally:
+        if writer is not None:
+            writer.close()
+    tmp.replace(path)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic arrest data')
+    parser.add_argument('rows', type=int, nargs='?', default=SIZES[0])
+    parser.add_argument('--output', default=None,
+                        help='Parquet file (default: data/synthetic/arrests_<rows>.parquet)')
+    parser.add_argument('--census-file', default=str(CENSUS_FILE))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    output = args.output or BASE_PATH / 'data' / 'synthetic' / f'arrests_{args.rows}.parquet'
+    start = time.perf_counter()
+    write_synthetic(output, args.rows, args.census_file, args.seed)
+    print(f"✓ Wrote {args.rows:,} synthetic arrests to {output} in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,205 @@
+"""
+Data-Quality Validation (Methodology Steps 30-32)
+Declarative checks, each a vectorized expression over one table that marks
+the rows passing it. Failures are tallied per check, so row-level tables
+can be checked whole or batch by batch with the same expressions (the
+arrest checks are tallied while the loader scans the raw rows), and a
+fail-fast run stops at the first failing error-level check
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+
+from arrest_loader import GEOID_COLUMN, STATE_FIPS
+from compact_frame import blockgroup_ids, county_ids
+
+# ACS annotation values published in place of suppressed or unavailable
+# estimates (e.g. median_income = -666666666)
+ACS_SENTINELS = [-999999999, -888888888, -666666666, -555555555, -333333333, -222222222]
+
+# Geography columns that are codes, not estimates
+ID_COLUMNS = ['blockgroup_id', 'state', 'county', 'tract', 'block group', 'county_from_id', 'county_check']
+
+# Coverage below this share is reported (Step 30)
+MIN_COVERAGE = 0.95
+
+# Column(s) identifying a failing row in the report
+TABLE_KEYS = {
+    'census': ['blockgroup_id'],
+    'blockgroups': ['blockgroup_id'],
+    'counties': ['county'],
+    'subgroup_cells': ['policing_category', 'subgroup'],
+    'escalation': ['Category'],
+    'repeats': ['transition'],
+}
+
+
+class ValidationError(RuntimeError):
+    """Raised by a fail-fast validation run at the first failing error-level check."""
+
+
+def check(name, step, table, expression, description, severity='error'):
+    """
+    Build a check definition.
+
+    expression  -- frame -> bool per row (True = passes)
+    severity    -- 'error' (an invariant the analysis relies on) or
+                   'warning' (suspicious data worth reporting)
+    """
+    return {'name': name, 'step': step, 'table': table, 'expression': expression,
+            'description': description, 'severity': severity}
+
+
+def estimate_columns(frame):
+    """Numeric columns holding ACS estimates (geography codes excluded)."""
+    return [c for c in frame.select_dtypes('number').columns if c not in ID_COLUMNS]
+
+
+def no_sentinels(frame):
+    values = frame[estimate_columns(frame)].to_numpy(dtype=float)
+    return ~np.isin(values, ACS_SENTINELS).any(axis=1)
+
+
+def _at_most(column, limit):
+    return lambda d: (d[column] <= d[limit]).to_numpy()
+
+
+def arrest_rows(table):
+    """
+    The columns the arrest checks read, from loaded arrests (pyarrow Table
+    or RecordBatch) before compact_arrests drops rows without a DefendantId:
+    blockgroup_id (NaN for a missing GEOID), DefendantId (-1 when missing,
+    else 0), ArrestDate and Age_years.
+    """
+    return pd.DataFrame({
+        'blockgroup_id': blockgroup_ids(table.column(GEOID_COLUMN)),
+        'DefendantId': np.where(pc.is_valid(table.column('DefendantId')).to_numpy(zero_copy_only=False), 0, -1),
+        'ArrestDate': table.column('ArrestDate').to_pandas(),
+        'Age_years': table.column('Age_years').to_pandas(),
+    })
+
+
+def validation_checks(state=STATE_FIPS):
+    """The check definitions for a study area in `state` (arrest GEOIDs must fall in it)."""
+    return [
+        # Step 30: census integration and coverage
+        check('arrest_geoid_valid', 'Step 30', 'arrests',
+              lambda d: (county_ids(d['blockgroup_id']) // 1000 == int(state)).to_numpy(),
+              f'arrest GEOIDs give a block group in state {state}'),
+        check('arrest_defendant_present', 'Step 30', 'arrests', lambda d: d['DefendantId'].to_numpy() >= 0,
+              'every arrest has a DefendantId'),
+        check('arrest_date_present', 'Step 30', 'arrests', lambda d: d['ArrestDate'].notna().to_numpy(),
+              'every arrest has an ArrestDate'),
+        check('arrest_age_plausible', 'Step 30', 'arrests',
+              lambda d: (d['Age_years'].isna() | d['Age_years'].between(0, 110)).to_numpy(),
+              'ages are missing or 0-110', severity='warning'),
+        check('census_no_sentinels', 'Step 30', 'census', no_sentinels,
+              'no ACS annotation values (-666666666, ...) among census estimates', severity='warning'),
+        check('census_population_nonnegative', 'Step 30', 'census', lambda d: (d['total_pop'] >= 0).to_numpy(),
+              'block group populations are not negative'),
+        check('census_groups_within_total', 'Step 30', 'census',
+              lambda d: (d[['white_pop', 'black_pop', 'hispanic_pop']].le(d['total_pop'], axis=0)).all(axis=1).to_numpy(),
+              'race and ethnicity populations do not exceed the total', severity='warning'),
+        check('county_population_covered', 'Step 30', 'counties',
+              lambda d: (d['analysis_pop'] >= MIN_COVERAGE * d['census_pop']).to_numpy(),
+              f'at least {MIN_COVERAGE:.0%} of each county\'s census population is in the analysis', severity='warning'),
+        check('county_arrests_matched', 'Step 30', 'counties',
+              lambda d: (d['matched_arrests'] >= MIN_COVERAGE * d['arrests']).to_numpy(),
+              f'at least {MIN_COVERAGE:.0%} of each county\'s arrests fall in analyzed block groups', severity='warning'),
+        check('county_blockgroups_with_arrests', 'Step 30', 'counties',
+              lambda d: (d['blockgroups_with_arrests'] >= MIN_COVERAGE * d['census_blockgroups']).to_numpy(),
+              f'at least {MIN_COVERAGE:.0%} of each county\'s census block groups have arrests', severity='warning'),
+
+        # Step 31: rate denominators and numerators
+        check('blockgroup_population_positive', 'Step 31', 'blockgroups', lambda d: (d['total_pop'] > 0).to_numpy(),
+              'zero-population block groups are excluded from rates'),
+        check('blockgroup_unique_within_arrests', 'Step 31', 'blockgroups',
+              _at_most('unique_individuals', 'total_arrests'), 'unique individuals <= arrests per block group'),
+        check('blockgroup_discretionary_within_arrests', 'Step 31', 'blockgroups',
+              _at_most('discretionary_arrests', 'total_arrests'), 'discretionary arrests <= arrests per block group'),
+        check('blockgroup_rate_below_1000', 'Step 31', 'blockgroups',
+              lambda d: (d['discretionary_per_1000'] < 1000).to_numpy(),
+              'discretionary arrests per 1,000 residents below 1,000', severity='warning'),
+        check('blockgroup_unique_rate_below_1000', 'Step 31', 'blockgroups',
+              lambda d: (d['unique_per_1000'] < 1000).to_numpy(),
+              'fewer arrested individuals than residents', severity='warning'),
+        check('blockgroup_no_sentinels', 'Step 31', 'blockgroups', no_sentinels,
+              'no ACS annotation values in the block group results', severity='warning'),
+        check('cell_unique_within_arrests', 'Step 31', 'subgroup_cells', _at_most('unique_individuals', 'arrests'),
+              'unique individuals <= arrests per category x subgroup'),
+        check('cell_unique_within_unit_sum', 'Step 31', 'subgroup_cells',
+              _at_most('unique_individuals', 'unit_unique_individuals'),
+              'unique individuals <= the sum of block group unique counts'),
+        check('cell_subgroup_within_overall', 'Step 31', 'subgroup_cells',
+              _at_most('unique_individuals', 'overall_unique_individuals'),
+              'subgroup unique individuals <= Overall unique individuals'),
+
+        # Step 32: escalation nesting
+        check('escalation_nesting', 'Step 32', 'escalation',
+              lambda d: ((d['People_severe'] <= d['People_mandatory_minimum'])
+                         & (d['People_mandatory_minimum'] <= d['People_enhanced'])
+                         & (d['People_enhanced'] <= d['People_Arrested'])).to_numpy(),
+              'people with 4+ ⊆ 3+ ⊆ 2+ ⊆ 1+ arrests per category'),
+        check('repeat_nesting', 'Step 32', 'repeats', _at_most('people_at_next', 'people_at_k'),
+              'people reaching arrest k+1 <= people reaching arrest k'),
+    ]
+
+
+CHECKS = validation_checks()
+
+
+def _failure(definition, table, failed, rows, example):
+    return ValidationError(f"{definition['name']} ({definition['step']}): {failed:,} of {rows:,} "
+                           f"{table} rows fail - {definition['description']} (first: {example})")
+
+
+def tally(checks, table, frame, totals=None, fail_fast=False):
+    """
+    Add one frame's (a whole table or one batch of it) rows and failures to
+    totals ({check name: {'rows', 'failed', 'example'}}); returns totals.
+    """
+    totals = {} if totals is None else totals
+    keys = [k for k in TABLE_KEYS.get(table, []) if k in frame.columns]
+    for definition in checks:
+        if definition['table'] != table:
+            continue
+        passed = np.asarray(definition['expression'](frame), dtype=bool)
+        entry = totals.setdefault(definition['name'], {'rows': 0, 'failed': 0, 'example': None})
+        failed = np.flatnonzero(~passed)
+        if len(failed) and entry['example'] is None:
+            row = frame.iloc[failed[0]]
+            entry['example'] = ', '.join(f"{k}={row[k]}" for k in keys) if keys else f"row {entry['rows'] + failed[0]}"
+        entry['rows'] += len(passed)
+        entry['failed'] += len(failed)
+        if fail_fast and len(failed) and definition['severity'] == 'error':
+            raise _failure(definition, table, len(failed), len(passed), entry['example'])
+    return totals
+
+
+def raise_failures(checks, table, totals):
+    """Raise at a table's first failing error-level check, for totals tallied earlier (e.g. during a scan)."""
+    for definition in checks:
+        entry = totals.get(definition['name'])
+        if definition['table'] == table and definition['severity'] == 'error' and entry and entry['failed']:
+            raise _failure(definition, table, entry['failed'], entry['rows'], entry['example'])
+
+
+def report(checks, totals):
+    """One row per check; checks whose table was not available are 'skipped'."""
+    rows = []
+    for definition in checks:
+        entry = totals.get(definition['name'])
+        status = 'skipped' if entry is None else 'passed' if entry['failed'] == 0 else 'failed'
+        rows.append({
+            'check': definition['name'],
+            'step': definition['step'],
+            'table': definition['table'],
+            'severity': definition['severity'],
+            'status': status,
+            'rows_checked': entry['rows'] if entry else 0,
+            'rows_failed': entry['failed'] if entry else 0,
+            'first_failure': entry['example'] if entry else None,
+            'description': definition['description'],
+        })
+    return pd.DataFrame(rows)
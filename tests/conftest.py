@@ -0,0 +1,54 @@
+"""
+Shared fixtures: small synthetic arrest extracts (synthetic_arrests.py) over
+the real Charleston/Berkeley block groups
+"""
+
+import sys
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+from synthetic_arrests import CENSUS_FILE, write_synthetic
+
+SYNTHETIC_ROWS = 20_000
+
+
+@pytest.fixture(scope='session')
+def synthetic_parquet(tmp_path_factory):
+    """A 20K-row synthetic extract (string GEOIDs and DefendantIds, with Race and extra columns)."""
+    return write_synthetic(tmp_path_factory.mktemp('arrests') / 'arrests.parquet', SYNTHETIC_ROWS,
+                           row_group_size=5_000)
+
+
+@pytest.fixture(scope='session')
+def census_file():
+    return CENSUS_FILE
+
+
+@pytest.fixture(scope='session')
+def parquet_with_null_ids(synthetic_parquet, tmp_path_factory):
+    """The synthetic extract with every 50th DefendantId missing."""
+    table = pq.read_table(synthetic_parquet)
+    ids = table.column('DefendantId').to_pylist()
+    ids = [None if i % 50 == 0 else value for i, value in enumerate(ids)]
+    table = table.set_column(0, 'DefendantId', pa.array(ids, pa.string()))
+    path = tmp_path_factory.mktemp('null_ids') / 'arrests.parquet'
+    pq.write_table(table, path, row_group_size=5_000)
+    return path
+
+
+@pytest.fixture(scope='session')
+def parquet_with_null_categories(synthetic_parquet, tmp_path_factory):
+    """The synthetic extract with every 40th Arrest_crime_category missing."""
+    table = pq.read_table(synthetic_parquet)
+    index = table.schema.get_field_index('Arrest_crime_category')
+    categories = table.column(index).to_pylist()
+    categories = [None if i % 40 == 0 else value for i, value in enumerate(categories)]
+    table = table.set_column(index, 'Arrest_crime_category',
+                             pa.array(categories, pa.string()).dictionary_encode())
+    path = tmp_path_factory.mktemp('null_categories') / 'arrests.parquet'
+    pq.write_table(table, path, row_group_size=5_000)
+    return path
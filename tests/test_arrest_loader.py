@@ -0,0 +1,58 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from arrest_loader import (ARREST_COLUMNS, PARTITION_COUNTY, TARGET_COUNTIES, load_arrests, open_arrest_dataset,
+                           write_partitioned_copy)
+
+
+def _numeric_geoids(table, state_code=None):
+    """The table with int64 GEOIDs, optionally moved to another state (e.g. '06', which drops a digit)."""
+    geoid = pc.cast(table.column('DefendantAddressGEOID10'), pa.int64())
+    if state_code is not None:
+        geoid = pc.add(pc.subtract(geoid, 45 * 10 ** 13), int(state_code) * 10 ** 13)
+    return table.set_column(table.schema.get_field_index('DefendantAddressGEOID10'), 'DefendantAddressGEOID10', geoid)
+
+
+def test_county_filter_matches_full_read(synthetic_parquet):
+    full = pq.read_table(synthetic_parquet).to_pandas()
+    county = full['DefendantAddressGEOID10'].str[2:5]
+    loaded = load_arrests(synthetic_parquet)
+    assert len(loaded) == county.isin(TARGET_COUNTIES).sum()
+    assert list(loaded.columns) == ARREST_COLUMNS + ['Race']
+
+
+def test_numeric_geoids_of_one_digit_states(synthetic_parquet, tmp_path):
+    # 15-digit block GEOIDs of state 06 are 14 digits as integers
+    table = pq.read_table(synthetic_parquet)
+    expected = pc.sum(pc.is_in(pc.utf8_slice_codeunits(table.column('DefendantAddressGEOID10'), 2, 5),
+                               pa.array(TARGET_COUNTIES))).as_py()
+    for state in ['45', '06']:
+        path = tmp_path / f'numeric_{state}.parquet'
+        pq.write_table(_numeric_geoids(table, state), path)
+        assert len(load_arrests(path, state=state)) == expected
+
+
+def test_numeric_geoid_width_uses_every_row(synthetic_parquet, tmp_path):
+    # A first row from a one-digit state must not set the width for the rest
+    table = _numeric_geoids(pq.read_table(synthetic_parquet))
+    first = _numeric_geoids(table.slice(0, 1), '06')
+    path = tmp_path / 'mixed.parquet'
+    pq.write_table(pa.concat_tables([first, table]), path)
+    assert len(load_arrests(path)) == len(load_arrests(synthetic_parquet))
+
+
+def test_partitioned_copy_keeps_optional_and_extra_columns(synthetic_parquet, tmp_path):
+    copy = write_partitioned_copy(synthetic_parquet, tmp_path / 'partitioned', counties=TARGET_COUNTIES)
+    source_columns = pq.read_schema(synthetic_parquet).names
+    assert set(source_columns) <= set(copy.schema.names)
+    assert PARTITION_COUNTY in copy.schema.names
+
+    reopened = open_arrest_dataset(tmp_path / 'partitioned')
+    direct = load_arrests(synthetic_parquet).sort_values(['DefendantId', 'ArrestDate'], ignore_index=True)
+    partitioned = load_arrests(reopened).sort_values(['DefendantId', 'ArrestDate'], ignore_index=True)
+    assert list(partitioned.columns) == list(direct.columns)
+    assert partitioned.astype(str).equals(direct.astype(str))
+
+    pruned = write_partitioned_copy(synthetic_parquet, tmp_path / 'pruned', columns=ARREST_COLUMNS)
+    assert 'Race' in pruned.schema.names and 'AgencyName' not in pruned.schema.names
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from corrected_geographic_analysis import analysis_subgroups, build_parser, discretionary_categories, run_pipeline
+from stage_cache import StageCache
+from streaming_aggregation import stream_arrests
+from subgroup_aggregation import subgroup
+
+BACKENDS = {
+    'pandas': [],
+    'streaming': ['--streaming', '--batch-size', '3000'],
+    'duckdb': ['--backend', 'duckdb', '--workers', '2'],
+}
+
+
+def _run(options, source, census_file, tmp_path):
+    args = build_parser().parse_args(['--headless', '--no-cache', *options])
+    return run_pipeline(args, cache=StageCache(tmp_path / 'cache', enabled=False), arrest_source=source,
+                        census_file=census_file, results_path=tmp_path / 'results',
+                        figures_path=tmp_path / 'figures')
+
+
+@pytest.fixture(scope='module')
+def reference(parquet_with_null_categories, census_file, tmp_path_factory):
+    return _run(BACKENDS['pandas'], parquet_with_null_categories, census_file, tmp_path_factory.mktemp('pandas'))
+
+
+@pytest.mark.parametrize('backend', ['streaming', 'duckdb'])
+def test_backends_match_in_memory(backend, reference, parquet_with_null_categories, census_file, tmp_path):
+    if backend == 'duckdb':
+        pytest.importorskip('duckdb')
+    results = _run(BACKENDS[backend], parquet_with_null_categories, census_file, tmp_path)
+    assert results['load']['streaming'] and 'arrests' not in results['load'].outputs
+
+    assert results['filter']['arrests_analyzed'] == reference['filter']['arrests_analyzed']
+    assert results['filter']['unique_individuals_total'] == reference['filter']['unique_individuals_total']
+    pd.testing.assert_frame_equal(results['categories']['bg_data'], reference['categories']['bg_data'],
+                                  check_dtype=False)
+    pd.testing.assert_frame_equal(results['categories']['category_stats'], reference['categories']['category_stats'],
+                                  check_dtype=False)
+    for table in ['risk_df', 'young_men_df', 'drug_risk_df']:
+        pd.testing.assert_frame_equal(results['risks'][table], reference['risks'][table], check_dtype=False)
+
+
+def _pairs(aggregator):
+    """(blockgroup_id, DefendantId) -> subgroup bits for every distinct pair."""
+    blockgroup_ids, persons, bits = aggregator.blockgroup_pairs()
+    ids = aggregator.to_outputs()['stream_defendants']['DefendantId'].to_numpy()[persons]
+    return pd.Series(bits[:, 0], index=pd.MultiIndex.from_arrays([blockgroup_ids, ids])).sort_index()
+
+
+def test_sql_discretionary_subgroups_treat_missing_categories_as_not_discretionary(parquet_with_null_categories):
+    sql_backend = pytest.importorskip('sql_backend')
+    subgroups = analysis_subgroups() + [subgroup('Discretionary', discretionary=True),
+                                        subgroup('Non-discretionary', discretionary=False)]
+    expected = stream_arrests(parquet_with_null_categories, subgroups, discretionary_categories)
+    result = sql_backend.sql_aggregate(parquet_with_null_categories, subgroups, discretionary_categories)
+    pd.testing.assert_series_equal(_pairs(result), _pairs(expected))
+    assert result.discretionary_arrests == expected.discretionary_arrests
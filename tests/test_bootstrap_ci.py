@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import bootstrap_ci
+from arrest_loader import load_arrests
+from bootstrap_ci import bootstrap_inputs, bootstrap_replicates
+from compact_frame import compact_arrests
+from corrected_geographic_analysis import CUT_TARGETS, analysis_subgroups, discretionary_categories
+
+
+@pytest.fixture(scope='module')
+def inputs(synthetic_parquet):
+    arrests, _ = compact_arrests(load_arrests(synthetic_parquet, as_table=True))
+    arrests = arrests.assign(is_discretionary=arrests['Arrest_crime_category'].isin(discretionary_categories))
+    ids = np.unique(arrests['blockgroup_id'].to_numpy())
+    bg_data = pd.DataFrame({'blockgroup_id': ids,
+                            'total_pop': np.random.default_rng(0).integers(500, 3000, size=len(ids))})
+    return bootstrap_inputs(arrests, bg_data, analysis_subgroups())
+
+
+def test_replicates_do_not_depend_on_workers_or_chunks(inputs, monkeypatch):
+    serial, serial_tallies = bootstrap_replicates(inputs, CUT_TARGETS, 10, seed=3, workers=1, batch_size=4)
+    pooled, pooled_tallies = bootstrap_replicates(inputs, CUT_TARGETS, 10, seed=3, workers=2, batch_size=4)
+    pd.testing.assert_frame_equal(serial, pooled)
+    np.testing.assert_array_equal(serial_tallies, pooled_tallies)
+
+    # One replicate per chunk draws the same defendants as the whole batch at once
+    monkeypatch.setattr(bootstrap_ci, 'CHUNK_BYTES', 1)
+    chunked, chunked_tallies = bootstrap_replicates(inputs, CUT_TARGETS, 10, seed=3, workers=1, batch_size=4)
+    pd.testing.assert_frame_equal(serial, chunked)
+    np.testing.assert_array_equal(serial_tallies, chunked_tallies)
+    assert len(serial) == 10 and serial_tallies.sum(axis=1).tolist() == [10] * len(inputs['population'])
+
+
+def test_chunks_shrink_as_defendants_grow():
+    assert bootstrap_ci._chunk_size(1_000) >= bootstrap_ci.BATCH_SIZE
+    rows = bootstrap_ci._chunk_size(1_000_000)
+    assert 1 <= rows < bootstrap_ci.BATCH_SIZE
+    assert rows * 1_000_000 * bootstrap_ci.CELL_BYTES <= bootstrap_ci.CHUNK_BYTES
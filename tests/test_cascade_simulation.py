@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cascade_simulation import annualize, run_scenarios, simulate
+
+PROBABILITIES = pd.DataFrame({
+    'first_young': [0.12, 0.04],
+    'first_other': [0.05, 0.02],
+    'repeat_1': [0.30, 0.20],
+    'repeat_2': [0.25, 0.15],
+    'repeat_3': [0.40, 0.30],
+}, index=pd.Index(['Ultra-Policed', 'Normally Policed'], name='Category'))
+
+OPTIONS = {'young_age': (18, 21), 'steps_per_year': 2, 'start_age': 18, 'end_age': 26, 'max_arrests': 3}
+
+
+def _loop_reference(probabilities, n_people, seed, diversion, young_age, steps_per_year, start_age, end_age,
+                    max_arrests):
+    """Person-by-person loop over the same uniform draws simulate() takes, step by step."""
+    rng = np.random.default_rng(seed)
+    repeat = [annualize(probabilities[f'repeat_{k}'], steps_per_year) for k in (1, 2, 3)]
+    arrests = [0] * n_people
+    histogram, diverted = [], 0
+    for age in range(start_age, end_age + 1):
+        young = young_age[0] <= age <= young_age[1]
+        first = annualize(probabilities['first_young' if young else 'first_other'], steps_per_year)
+        for _ in range(steps_per_year):
+            hits = rng.random(n_people)
+            diverts = rng.random(n_people) if diversion else None
+            for person in range(n_people):
+                k = arrests[person]
+                if hits[person] < (first if k == 0 else repeat[min(k, 3) - 1]):
+                    if k == 0 and diversion and diverts[person] < diversion:
+                        diverted += 1
+                    else:
+                        arrests[person] += 1
+        histogram.append(np.bincount(np.minimum(arrests, max_arrests), minlength=max_arrests + 1))
+    return np.array(histogram), diverted
+
+
+@pytest.mark.parametrize('diversion', [0.0, 0.5])
+def test_simulate_matches_person_loop(diversion):
+    probabilities = PROBABILITIES.loc['Ultra-Policed'].to_dict()
+    histogram, diverted = simulate(probabilities, 500, seed=7, diversion=diversion, **OPTIONS)
+    expected, expected_diverted = _loop_reference(probabilities, 500, 7, diversion, **OPTIONS)
+    np.testing.assert_array_equal(histogram, expected)
+    assert diverted == expected_diverted
+    assert (diverted > 0) == bool(diversion)
+    assert (histogram.sum(axis=1) == 500).all()
+
+
+def test_scenarios_do_not_depend_on_workers():
+    serial = run_scenarios(PROBABILITIES, n_people=2_000, seed=3, workers=1, **OPTIONS)
+    pooled = run_scenarios(PROBABILITIES, n_people=2_000, seed=3, workers=2, **OPTIONS)
+    for left, right in zip(serial, pooled):
+        pd.testing.assert_frame_equal(left, right)
+
+    distribution, summary = serial
+    assert set(summary['scenario']) == {'baseline', 'equal_enforcement', 'first_arrest_diversion'}
+    shares = distribution.groupby(['scenario', 'Category', 'age'])['share'].sum()
+    np.testing.assert_allclose(shares, 1.0)
+    assert (summary.loc[summary['scenario'] != 'first_arrest_diversion', 'diverted_per_person'] == 0).all()
+    # Equal enforcement gives Ultra-Policed the Normally Policed rates
+    final = summary[summary['age'] == OPTIONS['end_age']].set_index(['scenario', 'Category'])['pct_arrested']
+    assert final['equal_enforcement', 'Ultra-Policed'] < final['baseline', 'Ultra-Policed']
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from categorizers import (categorize, jenks_breaks, kmeans_breaks, optimal_breaks, quantile_breaks, tier_labels,
+                          variance_fit)
+
+
+def _brute_force_breaks(values, weights, tiers):
+    """O(k n^2) dynamic program for the minimum weighted within-tier sum of squares; returns tier starts."""
+    n = len(values)
+
+    def cost(start, end):
+        w, x = weights[start:end], values[start:end]
+        return np.sum(w * (x - np.average(x, weights=w)) ** 2)
+
+    best = np.full((tiers + 1, n + 1), np.inf)
+    split = np.zeros((tiers + 1, n + 1), dtype=int)
+    best[0, 0] = 0
+    for k in range(1, tiers + 1):
+        for end in range(k, n + 1):
+            for start in range(k - 1, end):
+                value = best[k - 1, start] + cost(start, end)
+                if value < best[k, end] - 1e-9:
+                    best[k, end], split[k, end] = value, start
+    starts, end = [], n
+    for k in range(tiers, 1, -1):
+        end = split[k, end]
+        starts.append(end)
+    return best[tiers, n], starts[::-1]
+
+
+def _within(values, weights, starts):
+    bounds = np.r_[0, starts, len(values)]
+    return sum(np.sum(weights[a:b] * (values[a:b] - np.average(values[a:b], weights=weights[a:b])) ** 2)
+               for a, b in zip(bounds[:-1], bounds[1:]))
+
+
+@pytest.mark.parametrize('seed', range(8))
+@pytest.mark.parametrize('tiers', [2, 3, 5])
+def test_optimal_breaks_match_brute_force(seed, tiers):
+    rng = np.random.default_rng(seed)
+    values = np.unique(np.round(rng.gamma(2, 10, size=25), 1))
+    weights = rng.integers(1, 5, size=len(values)).astype(float)
+    expected, _ = _brute_force_breaks(values, weights, tiers)
+    assert np.isclose(_within(values, weights, optimal_breaks(values, weights, tiers)), expected)
+
+
+def test_jenks_counts_tied_block_groups():
+    rates = np.array([30, 30, 30, 12, 11, 10, 10, 2, 1, 0], dtype=float)
+    values, counts = np.unique(rates, return_counts=True)
+    _, starts = _brute_force_breaks(values, counts.astype(float), 3)
+    thresholds = jenks_breaks(rates, np.ones(len(rates)), 3)
+    np.testing.assert_array_equal(thresholds, values[starts][::-1])
+
+
+def _lloyd(rates, population, tiers, max_iter=100):
+    """Weighted Lloyd iterations over the individual block groups, from weighted quantile centers."""
+    values, inverse = np.unique(rates, return_inverse=True)
+    weights = np.bincount(inverse, weights=population)
+    cumulative = np.cumsum(weights)
+    centers = values[np.searchsorted(cumulative, (np.arange(tiers) + 0.5) / tiers * cumulative[-1])]
+    labels = None
+    for _ in range(max_iter):
+        new_labels = np.array([np.sum(rate >= (centers[:-1] + centers[1:]) / 2) for rate in rates])
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        centers = np.array([np.average(rates[labels == k], weights=population[labels == k])
+                            if population[labels == k].sum() else centers[k] for k in range(tiers)])
+    return np.array([rates[labels == k].min() for k in range(tiers - 1, 0, -1)])
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_weighted_kmeans_matches_lloyd(seed):
+    rng = np.random.default_rng(seed)
+    rates = np.sort(np.round(rng.gamma(2, 10, size=200), 1))[::-1]
+    population = rng.integers(100, 3000, size=len(rates)).astype(float)
+    np.testing.assert_allclose(kmeans_breaks(rates, population, 3), _lloyd(rates, population, 3))
+
+
+def _zero_heavy():
+    """50 block groups without discretionary arrests and 3 with."""
+    return np.r_[20.0, 10.0, 5.0, np.zeros(50)], np.full(53, 100.0)
+
+
+def test_collapsed_tiers_raise():
+    rates, population = _zero_heavy()
+    with pytest.raises(ValueError, match='quantile breaks give only 2 distinct tiers of the 3'):
+        quantile_breaks(rates, population, 3)
+    with pytest.raises(ValueError, match='kmeans breaks give only 3 distinct tiers of the 4'):
+        kmeans_breaks(rates, population, 4)
+    with pytest.raises(ValueError, match='need 5 distinct rates'):
+        jenks_breaks(rates, population, 5)
+
+
+def test_quantile_ties_stay_out_of_the_upper_tier():
+    rates, population = _zero_heavy()
+    thresholds, labels = categorize('quantile', rates, population, 2)
+    assert thresholds.tolist() == [5.0]
+    assert (labels[rates == 0] == 1).all() and (labels[rates > 0] == 0).all()
+
+
+def test_quantile_tiers_hold_equal_population():
+    rates = np.arange(90, 0, -1, dtype=float)
+    thresholds, labels = categorize('quantile', rates, np.ones(90), 3)
+    assert thresholds.tolist() == [61.0, 31.0]
+    assert np.bincount(labels).tolist() == [30, 30, 30]
+
+
+def test_tier_labels_and_variance_fit():
+    rates = np.array([9, 8, 5, 4, 1], dtype=float)
+    labels = tier_labels(rates, [8, 4])
+    assert labels.tolist() == [0, 0, 1, 1, 2]
+    assert variance_fit(rates, np.ones(5), np.zeros(5, dtype=int)) == 0
+    assert variance_fit(rates, np.ones(5), np.arange(5)) == 1
+
+
+def test_unknown_scheme():
+    with pytest.raises(ValueError, match='Unknown categorizer'):
+        categorize('hexbins', [1.0], [1.0])
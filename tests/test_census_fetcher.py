@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+
+import mock_census_server
+from census_fetcher import ACS_VARIABLES, CensusFetchError, CensusFetcher, chunk_variables
+
+GEOGRAPHIES = [('45', '019'), ('45', '015')]
+
+# More than one request's worth, so every geography is fetched in three chunks
+MANY_VARIABLES = [f"B01001_{i:03d}E" for i in range(1, 121)]
+
+
+def _fetch(base_url, variables=ACS_VARIABLES, **options):
+    with CensusFetcher(base_url, **options) as fetcher:
+        return fetcher.fetch_block_groups(GEOGRAPHIES, variables), fetcher.requests_made
+
+
+@pytest.fixture(scope='module')
+def expected():
+    with mock_census_server.serve() as base_url:
+        return _fetch(base_url, MANY_VARIABLES)[0]
+
+
+def test_chunked_fetch(expected):
+    assert len(chunk_variables(MANY_VARIABLES)) == 3
+    counts = expected.groupby(expected['blockgroup_id'].str[2:5]).size()
+    assert counts.to_dict() == {'015': 120, '019': 260}
+    assert expected['blockgroup_id'].str.len().eq(12).all()
+    assert set(MANY_VARIABLES) <= set(expected.columns)
+    assert expected[MANY_VARIABLES].notna().all().all()
+
+
+def test_retries_through_failures(expected):
+    with mock_census_server.serve(failure_rate=0.3, seed=1) as base_url:
+        census_data, requests_made = _fetch(base_url, MANY_VARIABLES, retries=8, backoff=0)
+    pd.testing.assert_frame_equal(census_data, expected)
+    assert requests_made > len(GEOGRAPHIES) * 3
+
+
+def test_gives_up_after_retries():
+    with mock_census_server.serve(failure_rate=1.0) as base_url:
+        with pytest.raises(CensusFetchError, match='503'):
+            _fetch(base_url, retries=2, backoff=0)
+
+
+def test_cached_rerun_makes_no_requests(expected, tmp_path):
+    with mock_census_server.serve() as base_url:
+        _fetch(base_url, MANY_VARIABLES, cache_dir=tmp_path)
+        census_data, requests_made = _fetch(base_url, MANY_VARIABLES, cache_dir=tmp_path)
+    pd.testing.assert_frame_equal(census_data, expected)
+    assert requests_made == 0
+    assert not list(tmp_path.glob('part_*'))
+
+
+def test_failed_chunk_resumes_from_cached_chunks(expected, tmp_path, monkeypatch):
+    failing = ('45', '015', MANY_VARIABLES[49])
+    fetch_chunk = CensusFetcher._fetch_chunk
+
+    def flaky(self, state, county, variables, with_name):
+        if (state, county, variables[0]) == failing:
+            raise CensusFetchError('chunk failed')
+        return fetch_chunk(self, state, county, variables, with_name)
+
+    with mock_census_server.serve() as base_url:
+        with monkeypatch.context() as patch:
+            patch.setattr(CensusFetcher, '_fetch_chunk', flaky)
+            with pytest.raises(CensusFetchError):
+                _fetch(base_url, MANY_VARIABLES, cache_dir=tmp_path)
+        assert len(list(tmp_path.glob('part_*'))) == len(GEOGRAPHIES) * 3 - 1
+
+        census_data, requests_made = _fetch(base_url, MANY_VARIABLES, cache_dir=tmp_path)
+    pd.testing.assert_frame_equal(census_data, expected)
+    assert requests_made == 1
+    assert not list(tmp_path.glob('part_*'))
+
+
+def test_non_json_response_raises():
+    with mock_census_server.serve(api_key='right') as base_url:
+        with pytest.raises(CensusFetchError, match='not JSON.*Invalid Key'):
+            _fetch(base_url, api_key='wrong', retries=2, backoff=0)
+        census_data, _ = _fetch(base_url, api_key='right')
+    assert len(census_data) == 380
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from arrest_loader import load_arrests
+from compact_frame import compact_arrests, decode_defendants
+from demographics import AGE_BANDS, RACE_GROUPS, SEXES, risk_matrix
+from streaming_aggregation import stream_arrests
+from subgroup_aggregation import subgroup
+
+
+def _arrests(ids):
+    return pd.DataFrame({
+        'DefendantId': ids,
+        'DefendantAddressGEOID10': ['450190001001001'] * len(ids),
+        'ArrestDate': pd.to_datetime(['2018-01-01'] * len(ids)),
+        'Arrest_crime_category': ['Theft'] * len(ids),
+        'Age_years': [25.0] * len(ids),
+        'Gender': ['Male'] * len(ids),
+        'Race': ['Black'] * len(ids),
+    })
+
+
+def test_null_defendant_ids_are_dropped():
+    compact, codebook = compact_arrests(_arrests(['A', None, 'B', 'A']))
+    assert len(compact) == 3
+    assert (compact['DefendantId'] >= 0).all()
+    assert list(decode_defendants(codebook, compact['DefendantId'])) == ['A', 'B', 'A']
+
+
+def test_risk_matrix_ignores_null_defendant_ids():
+    compact, _ = compact_arrests(_arrests(['A', None]))
+    populations = np.ones((1, len(RACE_GROUPS), len(SEXES), len(AGE_BANDS)), dtype=np.int64)
+    matrix = risk_matrix(compact, np.zeros(len(compact), dtype=np.int64), populations, 1.0, ['Ultra-Policed'])
+    assert matrix['unique_arrested'].max() == 1
+
+
+def test_unique_counts_skip_null_ids_in_every_mode(parquet_with_null_ids):
+    expected = load_arrests(parquet_with_null_ids)['DefendantId'].nunique()
+    compact, _ = compact_arrests(load_arrests(parquet_with_null_ids, as_table=True))
+    assert compact['DefendantId'].nunique() == expected
+
+    subgroups = [subgroup('Overall')]
+    assert stream_arrests(parquet_with_null_ids, subgroups, ['Theft'], batch_size=4_000).unique_individuals \
+        == expected
+
+    sql_backend = pytest.importorskip('sql_backend')
+    pytest.importorskip('duckdb')
+    assert sql_backend.sql_aggregate(parquet_with_null_ids, subgroups, ['Theft']).unique_individuals == expected
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from cut_point_sensitivity import CutPointSweep, blockgroup_pairs, range_distinct_counts
+from subgroup_aggregation import subgroup
+
+SUBGROUPS = [subgroup('all'), subgroup('young_men', sex='Male', age=(18, 35))]
+
+
+def _fixture(seed=0, n_blockgroups=60, n_arrests=3_000):
+    rng = np.random.default_rng(seed)
+    bg_data = pd.DataFrame({
+        'blockgroup_id': np.arange(n_blockgroups) + 450190001001,
+        'total_pop': rng.integers(200, 3_000, n_blockgroups),
+        'discretionary_per_1000': rng.gamma(2.0, 20.0, n_blockgroups).round(1),  # with ties
+    })
+    arrests = pd.DataFrame({
+        'blockgroup_id': rng.choice(bg_data['blockgroup_id'], n_arrests),
+        'DefendantId': rng.integers(0, 800, n_arrests),
+        'Gender': rng.choice(['Male', 'Female'], n_arrests),
+        'Age_years': rng.integers(12, 80, n_arrests),
+    })
+    bg_data['unique_individuals'] = bg_data['blockgroup_id'].map(
+        arrests.groupby('blockgroup_id')['DefendantId'].nunique()).fillna(0).astype(int)
+    return bg_data, arrests
+
+
+def test_range_distinct_counts_matches_brute_force():
+    rng = np.random.default_rng(1)
+    positions, persons, n = rng.integers(0, 12, 200), rng.integers(0, 30, 200), 12
+    counts = range_distinct_counts(positions, persons, n)
+    for a in range(n + 1):
+        for b in range(a, n + 1):
+            in_range = (positions >= a) & (positions < b)
+            assert counts[a, b] == len(np.unique(persons[in_range]))
+
+
+def test_sweep_matches_brute_force():
+    bg_data, arrests = _fixture()
+    sweep = CutPointSweep(bg_data, blockgroup_pairs(arrests, SUBGROUPS), SUBGROUPS)
+    cut1_targets, cut2_targets = np.linspace(2, 20, 7), np.linspace(30, 70, 9)
+    grid = sweep.evaluate(cut1_targets, cut2_targets)
+
+    young_men = (arrests['Gender'] == 'Male') & arrests['Age_years'].between(18, 35)
+    for row in grid.itertuples():
+        rate = bg_data.set_index('blockgroup_id')['discretionary_per_1000']
+        ultra = rate.index[rate >= row.cut1_rate]
+        highly = rate.index[(rate >= row.cut2_rate) & (rate < row.cut1_rate)]
+        normal = rate.index[rate < min(row.cut1_rate, row.cut2_rate)]
+        for prefix, blockgroups in [('ultra', ultra), ('highly', highly), ('normal', normal)]:
+            in_category = arrests['blockgroup_id'].isin(blockgroups)
+            assert getattr(row, f'{prefix}_blockgroups') == len(blockgroups)
+            assert getattr(row, f'{prefix}_pop') == bg_data.set_index('blockgroup_id').loc[blockgroups, 'total_pop'].sum()
+            assert getattr(row, f'{prefix}_all') == arrests.loc[in_category, 'DefendantId'].nunique()
+            assert getattr(row, f'{prefix}_young_men') == arrests.loc[in_category & young_men, 'DefendantId'].nunique()
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from demographics import (AGE_BANDS, ALL_LABEL, RACE_TABLES, SEXES, group_populations, risk_matrix,
+                          total_populations)
+
+CATEGORIES = ['Ultra-Policed', 'Normally Policed']
+
+
+def _populations():
+    """Two block groups; table I (Hispanic) overlaps B (Black) and F (some other race)."""
+    array = np.zeros((2, len(RACE_TABLES), len(SEXES), len(AGE_BANDS)), dtype=np.int32)
+    tables = list(RACE_TABLES)
+    for bg in range(2):
+        array[bg, tables.index('A'), :, 5] = 100   # White alone (90 not Hispanic)
+        array[bg, tables.index('H'), :, 5] = 90
+        array[bg, tables.index('B'), :, 5] = 50    # Black alone (20 Hispanic)
+        array[bg, tables.index('F'), :, 5] = 30    # Some other race alone (all Hispanic)
+        array[bg, tables.index('I'), :, 5] = 60    # Hispanic: 10 White + 20 Black + 30 other
+    return array
+
+
+def test_all_race_margin_uses_partition_totals():
+    array = _populations()
+    totals = total_populations(array)
+    assert (totals[:, :, 5] == 180).all()
+    assert (group_populations(array).sum(axis=1)[:, :, 5] == 230).all()  # Hispanics counted twice
+
+    arrests = pd.DataFrame({'DefendantId': np.array([0, 1, 2, 3]), 'Race': ['Black', 'Hispanic', 'Asian', None],
+                            'Gender': ['Male'] * 4, 'Age_years': [21.0] * 4})
+    category_codes = np.array([0, 0, 1, 1])
+    matrix = risk_matrix(arrests, category_codes, group_populations(array), 1.0, CATEGORIES,
+                         totals=totals).set_index(['policing_category', 'race', 'sex', 'age_band'])
+
+    everyone = matrix.loc[(ALL_LABEL, ALL_LABEL, ALL_LABEL, ALL_LABEL)]
+    assert everyone['population'] == 2 * 2 * 180
+    # People whose Race is in no group still count in the 'All' race margin
+    assert everyone['unique_arrested'] == 4
+    assert matrix.loc[('Normally Policed', ALL_LABEL, 'Male', AGE_BANDS[5]), 'unique_arrested'] == 2
+    assert matrix.loc[(ALL_LABEL, 'Black', ALL_LABEL, ALL_LABEL), 'population'] == 2 * 2 * 50
+    assert matrix.loc[(ALL_LABEL, 'Hispanic', ALL_LABEL, ALL_LABEL), 'unique_arrested'] == 1
+    assert set(matrix.index.get_level_values('race')) == {'White', 'Black', 'Hispanic', 'Other', ALL_LABEL}
+
+    # Without totals the margin falls back to the (overlapping) group sum
+    fallback = risk_matrix(arrests, category_codes, group_populations(array), 1.0, CATEGORIES)
+    assert fallback['population'].max() == 2 * 2 * 230
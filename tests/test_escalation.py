@@ -0,0 +1,59 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from arrest_loader import load_arrests
+from escalation import MAX_BUCKET, arrest_sequences, conditional_probabilities, frequency_distribution
+
+
+def _reference(arrests):
+    """Ordinals, gaps and totals by a stable sort and pandas groupby (persons in order of first arrest)."""
+    frame = arrests.assign(row=np.arange(len(arrests)), person=pd.factorize(arrests['DefendantId'])[0])
+    frame = frame.sort_values(['person', 'ArrestDate'], kind='stable', na_position='last')
+    by_person = frame.groupby('person', sort=False)
+    return pd.DataFrame({
+        'row': frame['row'].to_numpy(),
+        'ordinal': by_person.cumcount().to_numpy() + 1,
+        'gap_days': by_person['ArrestDate'].diff().dt.days.to_numpy(dtype=float),
+        'total': by_person['row'].transform('size').to_numpy(),
+    })
+
+
+def test_sequences_match_pandas(synthetic_parquet):
+    arrests = load_arrests(synthetic_parquet)
+    sequences = arrest_sequences(arrests)
+    expected = _reference(arrests)
+    pd.testing.assert_frame_equal(sequences[expected.columns], expected, check_dtype=False)
+
+
+def test_out_of_order_and_missing_dates():
+    arrests = pd.DataFrame({
+        'DefendantId': ['B', 'A', 'B', 'A', 'C', 'A'],
+        'ArrestDate': pd.to_datetime(['2018-03-01', '2019-01-10', None, '2017-05-01', None, '2017-05-11']),
+    })
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        sequences = arrest_sequences(arrests)
+    assert sequences['row'].tolist() == [0, 2, 3, 5, 1, 4]
+    assert sequences['ordinal'].tolist() == [1, 2, 1, 2, 3, 1]
+    assert sequences['total'].tolist() == [2, 2, 3, 3, 3, 1]
+    np.testing.assert_array_equal(sequences['gap_days'], [np.nan, np.nan, np.nan, 10, 609, np.nan])
+    pd.testing.assert_frame_equal(sequences[['row', 'ordinal', 'gap_days', 'total']], _reference(arrests),
+                                  check_dtype=False)
+
+
+def test_conditional_probabilities_match_counts(synthetic_parquet):
+    arrests = load_arrests(synthetic_parquet)
+    per_person = arrests.groupby('DefendantId').size()
+    totals = arrest_sequences(arrests).drop_duplicates('person')['total'].to_numpy()
+
+    table = conditional_probabilities(totals)
+    for k in range(1, MAX_BUCKET):
+        row = table.iloc[k - 1]
+        assert row['people_at_k'] == (per_person >= k).sum()
+        assert row['people_at_next'] == (per_person >= k + 1).sum()
+        assert np.isclose(row['probability'], (per_person >= k + 1).sum() / (per_person >= k).sum())
+
+    people = frequency_distribution(totals)['people'].to_numpy()
+    assert people.tolist() == [(per_person.clip(upper=MAX_BUCKET) == k).sum() for k in range(1, MAX_BUCKET + 1)]
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from arrest_loader import load_arrests
+from compact_frame import compact_arrests
+from corrected_geographic_analysis import discretionary_categories
+from geography_cube import LEVELS, POPULATION_COLUMNS, GeographyCube, distinct_pairs
+
+
+@pytest.fixture(scope='module')
+def cube_inputs(synthetic_parquet):
+    """
+    Arrests and census rows where a tenth of the arrest block groups are
+    missing from the census and a few census block groups have no arrests.
+    Every 7th arrest moves to another block group, so defendants span units
+    and unique counts above block group level are not sums.
+    """
+    arrests, _ = compact_arrests(load_arrests(synthetic_parquet, as_table=True))
+    bg_id = arrests['blockgroup_id'].to_numpy().copy()
+    bg_id[::7] = np.roll(bg_id, 1)[::7]
+    arrests = arrests.assign(
+        blockgroup_id=bg_id,
+        is_discretionary=arrests['Arrest_crime_category'].isin(discretionary_categories).to_numpy())
+    rng = np.random.default_rng(0)
+    arrest_ids = np.unique(arrests['blockgroup_id'].to_numpy())
+    census_ids = np.union1d(np.delete(arrest_ids, np.s_[::10]), arrest_ids[::40] // 10 * 10 + 9)
+    census_data = pd.DataFrame({'blockgroup_id': census_ids,
+                                **{c: rng.integers(0, 3000, size=len(census_ids)) for c in POPULATION_COLUMNS}})
+    return arrests, census_data
+
+
+def _cube(arrests, census_data):
+    bg_arrests = arrests.groupby('blockgroup_id').agg(total_arrests=('DefendantId', 'size'),
+                                                      unique_individuals=('DefendantId', 'nunique')).reset_index()
+    bg_discretionary = arrests[arrests['is_discretionary']].groupby('blockgroup_id').size() \
+        .reset_index(name='discretionary_arrests')
+    pairs = distinct_pairs(arrests['blockgroup_id'].to_numpy(), arrests['DefendantId'].to_numpy())
+    return GeographyCube.build(census_data, bg_arrests, bg_discretionary, pairs)
+
+
+def _level_reference(arrests, census_data, divisor):
+    """Counts by grouping the arrest rows and census rows directly on the level's GEOID."""
+    unit = arrests['blockgroup_id'] // divisor
+    counts = arrests.groupby(unit).agg(total_arrests=('DefendantId', 'size'),
+                                       discretionary_arrests=('is_discretionary', 'sum'),
+                                       unique_individuals=('DefendantId', 'nunique'))
+    census = census_data.groupby(census_data['blockgroup_id'] // divisor)[POPULATION_COLUMNS].sum()
+    bg_ids = np.union1d(arrests['blockgroup_id'], census_data['blockgroup_id'])
+    blockgroups = pd.Series(bg_ids // divisor).value_counts()
+    index = blockgroups.index.sort_values()
+    return pd.concat([census.reindex(index, fill_value=0), counts.reindex(index, fill_value=0),
+                      blockgroups.reindex(index).rename('blockgroups')], axis=1)
+
+
+@pytest.mark.parametrize('level', list(LEVELS))
+def test_rollup_matches_groupby(cube_inputs, level):
+    arrests, census_data = cube_inputs
+    rollup = _cube(arrests, census_data).rollup(level)
+    expected = _level_reference(arrests, census_data, LEVELS[level])
+    columns = list(expected.columns)
+    pd.testing.assert_frame_equal(rollup[columns], expected, check_dtype=False, check_names=False)
+    population = rollup['total_pop'].where(rollup['total_pop'] > 0)
+    np.testing.assert_allclose(rollup['total_per_1000'], rollup['total_arrests'] / population * 1000)
+
+
+@pytest.mark.parametrize('min_arrests', [1, 30, 400])
+def test_pooled_takes_the_finest_reliable_unit(cube_inputs, min_arrests):
+    arrests, census_data = cube_inputs
+    cube = _cube(arrests, census_data)
+    pooled = cube.pooled(min_arrests=min_arrests).set_index('blockgroup_id')
+    references = {level: _level_reference(arrests, census_data, divisor) for level, divisor in LEVELS.items()}
+
+    for blockgroup_id, row in pooled.iterrows():
+        for level, divisor in LEVELS.items():
+            unit = references[level].loc[blockgroup_id // divisor]
+            if level == 'state' or (unit['total_arrests'] >= min_arrests and unit['total_pop'] >= 1):
+                break
+        assert (row['pooled_level'], row['pooled_geoid']) == (level, blockgroup_id // divisor)
+        assert row[['total_arrests', 'unique_individuals', 'total_pop']].tolist() == \
+            unit[['total_arrests', 'unique_individuals', 'total_pop']].tolist()
+    assert pooled['pooled_level'].nunique() > 1
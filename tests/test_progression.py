@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import progression
+from arrest_loader import load_arrests
+from escalation import arrest_sequences
+from progression import ALL_LABEL, GAP_BINS, ever_progressed, gap_labels, offense_transitions
+
+CATEGORIES = ['Ultra-Policed', 'Highly Policed', 'Normally Policed']
+KEYS = ['steps', 'policing_category', 'subgroup', 'from_offense', 'to_offense']
+
+
+@pytest.fixture(scope='module')
+def inputs(synthetic_parquet):
+    """Arrests with offense codes (every 30th missing), a random category (some none) and subgroup masks."""
+    arrests = load_arrests(synthetic_parquet)
+    offense_codes, offense_labels = pd.factorize(arrests['Arrest_crime_category'].astype(str), sort=True)
+    offense_codes[::30] = -1
+    category_codes = np.random.default_rng(0).integers(-1, len(CATEGORIES), size=len(arrests))
+    masks = {'Overall': np.ones(len(arrests), dtype=bool), 'Men': (arrests['Gender'] == 'Male').to_numpy()}
+    return arrests, arrest_sequences(arrests), offense_codes, list(offense_labels), category_codes, masks
+
+
+def _reference(arrests, offense_codes, offense_labels, category_codes, masks, max_steps):
+    """Pairs each arrest with the person's k-th next one by groupby().shift() and counts with groupby."""
+    frame = arrests.assign(person=pd.factorize(arrests['DefendantId'])[0], offense=offense_codes,
+                           category=category_codes, **masks)
+    frame = frame.sort_values(['person', 'ArrestDate'], kind='stable')
+    labels = np.asarray(offense_labels, dtype=object)
+    transitions, gaps = [], []
+    for steps in range(1, max_steps + 1):
+        later = frame.groupby('person')[['offense', 'ArrestDate']].shift(-steps)
+        pairs = frame.assign(to=later['offense'], days=(later['ArrestDate'] - frame['ArrestDate']).dt.days)
+        pairs = pairs[(pairs['offense'] >= 0) & (pairs['to'] >= 0) & (pairs['category'] >= 0)]
+        for name in masks:
+            chosen = pairs[pairs[name]]
+            both = pd.concat([chosen.assign(policing_category=np.asarray(CATEGORIES)[chosen['category']]),
+                              chosen.assign(policing_category=ALL_LABEL)])
+            both = both.assign(steps=steps, subgroup=name, from_offense=labels[both['offense']],
+                               to_offense=labels[both['to'].astype(int)],
+                               gap_days=pd.cut(both['days'], GAP_BINS + [np.inf], right=False,
+                                               labels=gap_labels()).astype(str))
+            table = both.groupby(KEYS).agg(transitions=('days', 'size'), mean_gap_days=('days', 'mean'))
+            outgoing = table.groupby(level=KEYS[:4])['transitions'].transform('sum')
+            transitions.append(table.assign(probability=table['transitions'] / outgoing))
+            gaps.append(both.groupby(KEYS + ['gap_days']).size().rename('transitions'))
+    return pd.concat(transitions), pd.concat(gaps)
+
+
+@pytest.mark.parametrize('dense_cells', [progression.DENSE_CELLS, 0])
+def test_transitions_match_groupby(inputs, monkeypatch, dense_cells):
+    monkeypatch.setattr(progression, 'DENSE_CELLS', dense_cells)
+    arrests, sequences, offense_codes, offense_labels, category_codes, masks = inputs
+    transitions, gaps = offense_transitions(sequences, offense_codes, offense_labels, category_codes, CATEGORIES,
+                                            masks, max_steps=2)
+    expected, expected_gaps = _reference(arrests, offense_codes, offense_labels, category_codes, masks, 2)
+
+    transitions = transitions.set_index(KEYS).sort_index()
+    expected = expected.sort_index()
+    assert transitions.index.equals(expected.index)
+    np.testing.assert_array_equal(transitions['transitions'], expected['transitions'])
+    np.testing.assert_allclose(transitions['probability'], expected['probability'])
+    np.testing.assert_allclose(transitions['mean_gap_days'], expected['mean_gap_days'])
+
+    gaps = gaps.set_index(KEYS + ['gap_days'])['transitions'].sort_index()
+    pd.testing.assert_series_equal(gaps, expected_gaps.sort_index(), check_dtype=False)
+
+
+def test_ever_progressed_matches_person_sets(inputs):
+    arrests, sequences, offense_codes, offense_labels, _, _ = inputs
+    drugs = [label for label in offense_labels if 'Drug' in label]
+    assert len(drugs) > 1
+    table = ever_progressed(sequences, offense_codes, offense_labels, drugs, drugs).set_index(
+        ['first_offense', 'later_offense'])
+
+    frame = arrests.assign(offense=offense_codes).sort_values(['DefendantId', 'ArrestDate'], kind='stable')
+    first = ~frame.duplicated('DefendantId')
+    for source in drugs:
+        starters = set(frame.loc[first & (frame['offense'] == offense_labels.index(source)), 'DefendantId'])
+        for target in drugs:
+            later = set(frame.loc[~first & (frame['offense'] == offense_labels.index(target)), 'DefendantId'])
+            row = table.loc[(source, target)]
+            assert (row['people_starting'], row['people_progressed']) == (len(starters), len(starters & later))
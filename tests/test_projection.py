@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from arrest_loader import load_arrests
+from projection import project, projection_table
+
+AGES = (16, 18, 25, 50)
+
+
+@pytest.fixture(scope='module')
+def risks(synthetic_parquet):
+    """
+    Annual risk (percent) per block group for everyone and for men, from the
+    synthetic arrests over random populations, plus the 0% and 100% edges.
+    """
+    arrests = load_arrests(synthetic_parquet)
+    arrests = arrests.assign(blockgroup=arrests['DefendantAddressGEOID10'].str[:12],
+                             men=arrests['DefendantId'].where(arrests['Gender'] == 'Male'))
+    by_bg = arrests.groupby('blockgroup').agg(overall=('DefendantId', 'nunique'), men=('men', 'nunique'))
+    population = np.random.default_rng(0).integers(200, 3000, size=len(by_bg))
+    annual = by_bg[['overall', 'men']].to_numpy() / population[:, None] / 5 * 100
+    annual = np.vstack([annual, [[0.0, 100.0]]])
+    units = np.append(by_bg.index.to_numpy(dtype=object), 'edge')
+    household = np.random.default_rng(1).uniform(1.5, 4.0, size=len(units))
+    return units, annual, household
+
+
+def _loop_reference(units, levels, categories, subgroups, annual, household, ages, start_age=18):
+    """Row by row with the plain formulas 1 - (1 - p)^years and 1 - (1 - p)^household_size."""
+    rows = []
+    for i, unit in enumerate(units):
+        for j, name in enumerate(subgroups):
+            p = annual[i, j] / 100
+            for age in ages:
+                years = max(age - start_age, 0)
+                rows.append({
+                    'level': levels[i], 'unit': unit, 'policing_category': categories[i], 'subgroup': name,
+                    'age': age, 'years': years, 'household_size': household[i],
+                    'annual_risk_pct': p * 100,
+                    'lifetime_risk_pct': (1 - (1 - p) ** years) * 100,
+                    'household_annual_risk_pct': (1 - (1 - p) ** household[i]) * 100,
+                    'household_lifetime_risk_pct': (1 - (1 - p) ** (years * household[i])) * 100,
+                })
+    return pd.DataFrame(rows)
+
+
+def test_projection_table_matches_loop(risks):
+    units, annual, household = risks
+    levels = np.where(np.arange(len(units)) % 2, 'blockgroup', 'tract')
+    categories = np.resize(['Ultra-Policed', 'Highly Policed', 'Normally Policed'], len(units))
+    table = projection_table(units, levels, categories, ['Overall', 'Men'], annual, household, AGES)
+    expected = _loop_reference(units, levels, categories, ['Overall', 'Men'], annual, household, AGES)
+
+    labels = ['level', 'unit', 'policing_category', 'subgroup']
+    assert (table[labels].astype(str).to_numpy() == expected[labels].to_numpy()).all()
+    pd.testing.assert_frame_equal(table.drop(columns=labels), expected.drop(columns=labels),
+                                  check_dtype=False, rtol=1e-9)
+    edge = table[(table['unit'] == 'edge') & (table['age'] == 50)].set_index('subgroup')
+    assert edge.loc['Overall', 'household_lifetime_risk_pct'] == 0
+    assert edge.loc['Men', 'lifetime_risk_pct'] == 100
+
+
+def test_small_risks_keep_precision():
+    lifetime, household_annual, _ = project(np.array([[1e-12]]), np.array([3.0]), ages=(50,))
+    np.testing.assert_allclose(lifetime[0, 0, 0], 32e-12, rtol=1e-9)
+    np.testing.assert_allclose(household_annual[0, 0], 3e-12, rtol=1e-9)
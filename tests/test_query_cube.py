@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from arrest_loader import load_arrests
+from compact_frame import POLICING_CATEGORIES, compact_arrests
+from demographics import AGE_BANDS, RACE_TABLES, SEXES, age_bands, group_populations, total_populations
+from query_cube import RACES, UNKNOWN_LABEL, QueryCube, age_band_codes, build_cube, write_cube
+from rolling_risks import month_index, month_label
+
+QUERIES = [
+    {},
+    {'county': ['019'], 'by': ['policing_category', 'race']},
+    {'race': ['Black', 'Hispanic'], 'sex': ['Male'], 'age': [(18, 24)], 'start': '2016', 'end': '2017-06',
+     'by': ['year']},
+    {'category': ['Ultra-Policed'], 'by': ['month']},
+    {'by': ['tract', 'sex', 'age_band']},
+    {'county': ['015'], 'start': '2018-03', 'by': ['blockgroup', 'county']},
+]
+
+
+@pytest.fixture(scope='module')
+def cube_data(synthetic_parquet, tmp_path_factory):
+    """Compact arrests, categorized block groups (a sample of those arrested in) and ACS populations."""
+    arrests, _ = compact_arrests(load_arrests(synthetic_parquet, as_table=True))
+    rng = np.random.default_rng(0)
+    ids = np.unique(arrests['blockgroup_id'].to_numpy())
+    ids = np.sort(rng.choice(ids, size=len(ids) * 3 // 4, replace=False))
+    bg_data = pd.DataFrame({
+        'blockgroup_id': ids,
+        'policing_category': rng.choice(POLICING_CATEGORIES, size=len(ids)),
+        'total_pop': rng.integers(500, 3000, size=len(ids)),
+    })
+    populations = rng.integers(0, 50, size=(len(ids), len(RACE_TABLES), len(SEXES), len(AGE_BANDS)))
+    path = write_cube(tmp_path_factory.mktemp('cube') / 'query_cube', build_cube(arrests, bg_data, populations, ids))
+    return arrests, bg_data, populations, QueryCube.load(path)
+
+
+def _labelled(arrests, bg_data):
+    """One row per arrest in the block groups, with every filter and group-by label."""
+    arrests = arrests[arrests['blockgroup_id'].isin(bg_data['blockgroup_id'])]
+    bg_id = arrests['blockgroup_id'].to_numpy()
+    months = month_index(arrests['ArrestDate'])
+    category = bg_data.set_index('blockgroup_id')['policing_category']
+    band = age_bands(arrests['Age_years'])
+    return pd.DataFrame({
+        'policing_category': category.loc[bg_id].to_numpy(),
+        'county': [f"{c:03d}" for c in bg_id // 10 ** 7 % 1000],
+        'tract': (bg_id // 10).astype(str),
+        'blockgroup': bg_id.astype(str),
+        'race': [r if r in RACES else UNKNOWN_LABEL for r in arrests['Race'].astype(object)],
+        'sex': [s if s in SEXES else UNKNOWN_LABEL for s in arrests['Gender'].astype(object)],
+        'age_band': [AGE_BANDS[b] if b >= 0 else UNKNOWN_LABEL for b in band],
+        'year': months // 12 + 1970,
+        'month': [month_label(m) for m in months],
+        'month_index': months,
+        'person': arrests['DefendantId'].to_numpy(),
+    })
+
+
+def _expected(rows, query):
+    """Arrests and distinct persons per group by brute-force filtering and grouping."""
+    keep = np.ones(len(rows), dtype=bool)
+    for name, column in [('county', 'county'), ('category', 'policing_category'), ('race', 'race'),
+                         ('sex', 'sex')]:
+        if name in query:
+            keep &= rows[column].isin(query[name]).to_numpy()
+    if 'age' in query:
+        bands = [AGE_BANDS[band] for low, high in query['age'] for band in age_band_codes(low, high)]
+        keep &= rows['age_band'].isin(bands).to_numpy()
+    if 'start' in query:
+        start = query['start'] if len(query['start']) > 4 else query['start'] + '-01'
+        keep &= (rows['month_index'] >= month_index(pd.Series(pd.to_datetime([start])))[0]).to_numpy()
+    if 'end' in query:
+        end = query['end'] if len(query['end']) > 4 else query['end'] + '-12'
+        keep &= (rows['month_index'] <= month_index(pd.Series(pd.to_datetime([end])))[0]).to_numpy()
+    rows = rows[keep]
+    by = query.get('by', [])
+    if not by:
+        return pd.DataFrame({'arrests': [len(rows)], 'unique_individuals': [rows['person'].nunique()]})
+    grouped = rows.groupby(by).agg(arrests=('person', 'size'), unique_individuals=('person', 'nunique'))
+    return grouped.reset_index()
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_query_matches_brute_force(cube_data, query):
+    arrests, bg_data, _, cube = cube_data
+    expected = _expected(_labelled(arrests, bg_data), query)
+    result = cube.query(**query)
+    by = query.get('by', [])
+    for frame in (expected, result):
+        for name in by:
+            frame[name] = frame[name].astype(str)
+    result = result.sort_values(by, ignore_index=True) if by else result
+    expected = expected.sort_values(by, ignore_index=True) if by else expected
+    assert len(result) == len(expected)
+    pd.testing.assert_frame_equal(result[by + ['arrests', 'unique_individuals']],
+                                  expected[by + ['arrests', 'unique_individuals']], check_dtype=False)
+
+
+def test_geography_population_sums_block_group_totals(cube_data):
+    _, bg_data, _, cube = cube_data
+    result = cube.query(by=['policing_category']).set_index('policing_category')
+    expected = bg_data.groupby('policing_category')['total_pop'].sum()
+    assert (result['population'] == expected.loc[result.index]).all()
+
+
+def test_population_of_open_race_slice_uses_all_races(cube_data):
+    _, bg_data, populations, cube = cube_data
+    totals = total_populations(populations)
+    groups = group_populations(populations)
+    ultra = (bg_data['policing_category'] == 'Ultra-Policed').to_numpy()
+
+    men = cube.query(category=['Ultra-Policed'], sex=['Male'])
+    assert men['population'].iloc[0] == totals[ultra, 0].sum()
+    # The race groups overlap, so their sum is larger
+    assert groups[ultra, :, 0].sum() > totals[ultra, 0].sum()
+
+    by_age = cube.query(sex=['Female'], by=['age_band']).set_index('age_band')
+    for band, population in by_age['population'].items():
+        if band == UNKNOWN_LABEL:
+            assert np.isnan(population)
+        else:
+            assert population == totals[:, 1, AGE_BANDS.index(band)].sum()
+
+    black = cube.query(category=['Ultra-Policed'], race=['Black'], sex=['Male'])
+    assert black['population'].iloc[0] == groups[ultra, RACES.index('Black'), 0].sum()
+    by_race = cube.query(sex=['Male'], by=['race']).set_index('race')
+    assert by_race.loc['Hispanic', 'population'] == groups[:, RACES.index('Hispanic'), 0].sum()
+
+
+def test_cube_without_totals_falls_back_to_race_groups(cube_data):
+    arrests, bg_data, populations, _ = cube_data
+    tables = build_cube(arrests, bg_data, populations, bg_data['blockgroup_id'])
+    del tables['totals']
+    cube = QueryCube(tables)
+    assert cube.query(sex=['Male'])['population'].iloc[0] == group_populations(populations)[:, :, 0].sum()
+
+
+def test_demographic_population_is_nan_without_census(cube_data):
+    arrests, bg_data, _, _ = cube_data
+    cube = QueryCube(build_cube(arrests, bg_data))
+    assert np.isnan(cube.query(sex=['Male'])['population'].iloc[0])
+    assert cube.query()['population'].iloc[0] == bg_data['total_pop'].sum()
+
+
+def test_invalid_queries_raise(cube_data):
+    cube = cube_data[3]
+    with pytest.raises(ValueError, match='Cannot group by'):
+        cube.query(by=['zipcode'])
+    with pytest.raises(ValueError, match='Unknown race'):
+        cube.query(race=['Martian'])
+    with pytest.raises(ValueError, match='ACS age'):
+        cube.query(age=[(18, 30)])
+    with pytest.raises(ValueError, match='Invalid month'):
+        cube.query(start='2016-13')
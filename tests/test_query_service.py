@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+from arrest_loader import load_arrests
+from compact_frame import POLICING_CATEGORIES, compact_arrests
+from query_cube import QueryCube, build_cube
+from query_service import QueryService, normalize, serve
+
+
+@pytest.fixture(scope='module')
+def cube(synthetic_parquet):
+    arrests, _ = compact_arrests(load_arrests(synthetic_parquet, as_table=True))
+    ids = np.unique(arrests['blockgroup_id'].to_numpy())
+    bg_data = pd.DataFrame({'blockgroup_id': ids,
+                            'policing_category': np.resize(POLICING_CATEGORIES, len(ids)),
+                            'total_pop': np.full(len(ids), 1000)})
+    return QueryCube(build_cube(arrests, bg_data))
+
+
+def test_normalize_canonicalizes_lists():
+    query = normalize({'race': ['White,Black', 'Black'], 'county': '019', 'by': ['year,race', 'year'],
+                       'start': ['2015', '2016'], 'end': ''})
+    assert query == {'race': ('Black', 'White'), 'county': ('019',), 'by': ('year', 'race'), 'start': '2016'}
+    assert normalize({'race': 'Black,White'}) == normalize({'race': ['White', 'Black']})
+
+
+def test_normalize_rejects_unknown_parameters():
+    with pytest.raises(ValueError, match='Unknown query parameters: zipcode'):
+        normalize({'zipcode': '29401'})
+
+
+def test_lru_cache_hits_and_evicts(cube):
+    service = QueryService(cube, cache_size=2)
+    first, cached = service.query({'by': 'year'})
+    assert not cached
+    again, cached = service.query({'by': ['year']})
+    assert cached and again is first
+
+    service.query({'by': 'county'})
+    service.query({'by': 'year'})        # most recently used again
+    service.query({'by': 'month'})       # evicts 'county'
+    assert service.query({'by': 'year'})[1]
+    assert not service.query({'by': 'county'})[1]
+
+    stats = service.stats()
+    assert (stats['cache_hits'], stats['cache_misses'], stats['cache_entries']) == (3, 4, 2)
+
+
+def test_http_server(cube):
+    service = QueryService(cube)
+    with serve(service) as base_url:
+        response = requests.get(f"{base_url}/query", params={'by': 'policing_category'}, timeout=30)
+        assert response.status_code == 200
+        body = response.json()
+        assert body['columns'][0] == 'policing_category' and not body['cached']
+        assert sum(row[body['columns'].index('arrests')] for row in body['rows']) == cube.arrests.sum()
+        assert requests.get(f"{base_url}/query", params={'by': 'policing_category'}, timeout=30).json()['cached']
+
+        bad = requests.get(f"{base_url}/query", params={'race': 'Martian'}, timeout=30)
+        assert bad.status_code == 400 and 'Unknown race' in bad.json()['error']
+        assert requests.get(f"{base_url}/query", params={'zipcode': '1'}, timeout=30).status_code == 400
+        assert requests.get(f"{base_url}/nowhere", timeout=30).status_code == 404
+
+        stats = requests.get(f"{base_url}/stats", timeout=30).json()
+        assert stats['cache_hits'] == 1 and stats['pairs'] == len(cube)
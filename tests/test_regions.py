@@ -0,0 +1,57 @@
+import pandas as pd
+
+from arrest_loader import region_description, region_label
+from compact_frame import county_codes
+from corrected_geographic_analysis import build_parser, run_pipeline, stage_census
+from report import report_sections
+from results_bundle import ResultsBundle, write_bundle
+from stage_cache import StageCache
+
+
+def _statewide_census(census_file, path):
+    """The Charleston/Berkeley census rows plus a county 035 copy and an out-of-state (37019) copy."""
+    census = pd.read_csv(census_file, dtype={'county': str, 'state': str})
+    other_county = census.assign(blockgroup_id=census['blockgroup_id'] % 10 ** 10 + 45035 * 10 ** 7)
+    other_state = census.assign(blockgroup_id=census['blockgroup_id'] % 10 ** 10 + 37019 * 10 ** 7)
+    pd.concat([census, other_county, other_state]).to_csv(path, index=False)
+    return census
+
+
+def test_census_stage_keeps_only_region_counties(census_file, tmp_path):
+    census = _statewide_census(census_file, tmp_path / 'census_statewide.csv')
+    bg_arrests = pd.DataFrame({'blockgroup_id': census['blockgroup_id'], 'total_arrests': 1, 'unique_individuals': 1})
+
+    outputs = stage_census({'bg_arrests': bg_arrests}, tmp_path / 'census_statewide.csv', ['019'], state='45')
+    census_data = outputs['census_data']
+    assert (census_data['blockgroup_id'] // 10 ** 10 == 45).all()
+    assert set(county_codes(census_data['blockgroup_id'])) == {'019'}
+    assert len(census_data) == (census['county'] == '019').sum()
+    assert outputs['bg_data']['total_pop'].sum() == census.loc[census['county'] == '019', 'total_pop'].sum()
+
+
+def test_labels_follow_the_region(tmp_path):
+    assert region_label(['019', '015'], '45') == 'Charleston/Berkeley Counties'
+    assert region_label(['035'], '45') == '035 County'
+    assert region_description(['019', '035'], '45') == 'Charleston County (45019) and County 45035'
+
+    stats = pd.DataFrame({'policing_category': ['Ultra-Policed', 'Highly Policed', 'Normally Policed'],
+                          'total_pop': [100, 200, 700], 'pop_pct': [10.0, 20.0, 70.0]})
+    values = {'blockgroups': 3, 'total_pop': 1000, 'arrests_analyzed': 90, 'arrests_in_source': 100,
+              'ultra_overall': 2.0, 'normal_overall': 1.0, 'overall_ratio': 2.0, 'young_men_label': 'Young men',
+              'ultra_young': 4.0, 'normal_young': 1.0, 'young_ratio': 4.0, 'ultra_drug': 3.0, 'normal_drug': 1.0,
+              'drug_ratio': 3.0}
+    path = write_bundle(tmp_path / 'bundle', {'category_stats': stats}, values,
+                        parameters={'region': {'name': 'dorchester', 'state': '45', 'counties': ['035']}})
+    report = ''.join(report_sections(ResultsBundle(path)))
+    assert 'Charleston' not in report and 'Berkeley' not in report
+    assert 'County 45035' in report and '035 County as intended' in report
+
+
+def test_pipeline_output_is_labelled_by_region(synthetic_parquet, census_file, tmp_path, capsys):
+    args = build_parser().parse_args(['--headless', '--no-cache'])
+    run_pipeline(args, cache=StageCache(tmp_path / 'cache', enabled=False), arrest_source=synthetic_parquet,
+                 results_path=tmp_path / 'results', figures_path=tmp_path / 'figures',
+                 region={'name': 'berkeley', 'state': '45', 'counties': ['015'], 'census_file': census_file})
+    output = capsys.readouterr().out
+    assert 'KEY DISPARITIES (BERKELEY COUNTY ONLY)' in output
+    assert 'Charleston/Berkeley' not in output and 'CHARLESTON' not in output
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
+
+from arrest_loader import TARGET_COUNTIES
+from corrected_geographic_analysis import (analysis_subgroups, build_parser, discretionary_categories, run_pipeline,
+                                           stage_load, stage_rolling)
+from rolling_risks import month_fingerprints, month_index
+from stage_cache import StageCache
+
+
+@pytest.fixture(params=['str', 'int'])
+def extract(request, synthetic_parquet, tmp_path):
+    """The synthetic extract with string or integer DefendantIds, plus a copy cut off before 2019."""
+    table = pq.read_table(synthetic_parquet)
+    if request.param == 'int':
+        ids = pc.cast(pc.utf8_slice_codeunits(table['DefendantId'], 1), pa.int64())
+        table = table.set_column(table.schema.get_field_index('DefendantId'), 'DefendantId', ids)
+    pq.write_table(table, tmp_path / 'full.parquet')
+    early = table.filter(pc.less(table['ArrestDate'], pa.scalar(pd.Timestamp('2019-01-01'), pa.timestamp('ns'))))
+    pq.write_table(early, tmp_path / 'early.parquet')
+    return tmp_path / 'early.parquet', tmp_path / 'full.parquet'
+
+
+def _rolling(source, census_file, state_path, results_path, verify=False):
+    census_data = pd.read_csv(census_file)
+    return stage_rolling(stage_load(source, TARGET_COUNTIES), {'census_data': census_data}, analysis_subgroups(),
+                         discretionary_categories, results_path, state_path, verify=verify)['rolling']
+
+
+def test_resume_matches_full_run(extract, census_file, tmp_path):
+    early, full = extract
+    expected = _rolling(full, census_file, tmp_path / 'fresh', tmp_path / 'results')
+
+    _rolling(early, census_file, tmp_path / 'state', tmp_path / 'results')
+    resumed = _rolling(full, census_file, tmp_path / 'state', tmp_path / 'results', verify=True)
+    pd.testing.assert_frame_equal(resumed, expected)
+
+
+def test_changed_history_starts_over(extract, census_file, tmp_path, capsys):
+    early, full = extract
+    _rolling(full, census_file, tmp_path / 'state', tmp_path / 'results')
+
+    # A corrected extract: one 2016 month loses its first arrests
+    table = pq.read_table(full)
+    month = pc.equal(pc.strftime(table['ArrestDate'], '%Y-%m'), '2016-03')
+    drop = pc.and_(month, pc.less(pc.cumulative_sum(pc.cast(month, pa.int64())), 10))
+    pq.write_table(table.filter(pc.invert(drop)), tmp_path / 'corrected.parquet')
+
+    expected = _rolling(tmp_path / 'corrected.parquet', census_file, tmp_path / 'fresh', tmp_path / 'results')
+    capsys.readouterr()
+    resumed = _rolling(tmp_path / 'corrected.parquet', census_file, tmp_path / 'state', tmp_path / 'results')
+    assert 'Arrests changed in 1 month(s) the rolling state covers (first 2016-03)' in capsys.readouterr().out
+    pd.testing.assert_frame_equal(resumed, expected)
+
+
+def test_edit_to_last_saved_month_starts_over(extract, census_file, tmp_path, capsys):
+    early, _ = extract
+    _rolling(early, census_file, tmp_path / 'state', tmp_path / 'results')
+
+    # Same number of arrests in the state's last month, one moved to another block group
+    table = pq.read_table(early)
+    last = pc.index(pc.strftime(table['ArrestDate'], '%Y-%m'), '2018-12').as_py()
+    geoids = table['DefendantAddressGEOID10'].to_pylist()
+    geoids[last] = next(g for g in geoids if g[:12] != geoids[last][:12])
+    table = table.set_column(table.schema.get_field_index('DefendantAddressGEOID10'), 'DefendantAddressGEOID10',
+                             pa.array(geoids, table.schema.field('DefendantAddressGEOID10').type))
+    pq.write_table(table, tmp_path / 'edited.parquet')
+
+    capsys.readouterr()
+    _rolling(tmp_path / 'edited.parquet', census_file, tmp_path / 'state', tmp_path / 'results')
+    assert 'Arrests changed in 1 month(s) the rolling state covers (first 2018-12)' in capsys.readouterr().out
+
+
+def test_fingerprints_before_since_are_counts_only(synthetic_parquet):
+    load = stage_load(synthetic_parquet, TARGET_COUNTIES)
+    arrests, defendant_ids = load['arrests'], load['defendant_ids']['DefendantId'].to_numpy()
+    months = month_index(arrests['ArrestDate'])
+    since = int(np.median(months))
+
+    full = month_fingerprints(months, arrests, defendant_ids)
+    partial = month_fingerprints(months, arrests, defendant_ids, since=since)
+    assert full.keys() == partial.keys()
+    for month, fingerprint in partial.items():
+        if month >= since:
+            assert fingerprint == full[month]
+        else:
+            assert fingerprint == full[month][:full[month].index(':') + 1]
+
+
+def test_pipeline_keeps_rolling_state_under_results(synthetic_parquet, census_file, tmp_path):
+    args = build_parser().parse_args(['--headless', '--no-cache', '--rolling', '12'])
+    run_pipeline(args, cache=StageCache(tmp_path / 'cache', enabled=False), arrest_source=synthetic_parquet,
+                 census_file=census_file, results_path=tmp_path / 'results', figures_path=tmp_path / 'figures')
+    assert list((tmp_path / 'results' / 'rolling_state').glob('*/config.json'))
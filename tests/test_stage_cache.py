@@ -0,0 +1,96 @@
+import importlib
+import sys
+import textwrap
+
+import pytest
+
+from stage_cache import StageCache, stage_key
+
+HELPER = '''
+SCALE = {scale}
+
+
+def scaled(values):
+    return [v * SCALE for v in values]
+'''
+
+STAGES = '''
+import helper_module
+
+OFFSET = {offset}
+
+
+def shifted(values):
+    return [v + OFFSET for v in values]
+
+
+def stage_scaled(values):
+    return {{'values': helper_module.scaled(shifted(values))}}
+
+
+def stage_lazy(values):
+    from helper_module import scaled
+    return {{'values': scaled(values)}}
+
+
+def stage_other(values):
+    return {{'values': list(values)}}
+'''
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """Write (and re-import) a two-module project: stages_module using helper_module."""
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    def write(scale=2, offset=0):
+        (tmp_path / 'helper_module.py').write_text(textwrap.dedent(HELPER.format(scale=scale)))
+        (tmp_path / 'stages_module.py').write_text(textwrap.dedent(STAGES.format(offset=offset)))
+        for name in ['helper_module', 'stages_module']:
+            sys.modules.pop(name, None)
+        importlib.invalidate_caches()
+        return importlib.import_module('stages_module')
+
+    yield write
+    for name in ['helper_module', 'stages_module']:
+        sys.modules.pop(name, None)
+
+
+def test_key_tracks_imported_helpers(project):
+    module = project(scale=2)
+    before = {name: stage_key(name, getattr(module, name)) for name in ['stage_scaled', 'stage_lazy', 'stage_other']}
+    module = project(scale=3)
+    after = {name: stage_key(name, getattr(module, name)) for name in before}
+    assert after['stage_scaled'] != before['stage_scaled']
+    assert after['stage_lazy'] != before['stage_lazy']
+    assert after['stage_other'] == before['stage_other']
+
+
+def test_key_tracks_same_module_helpers_and_constants(project):
+    module = project(offset=0)
+    scaled, other = stage_key('s', module.stage_scaled), stage_key('o', module.stage_other)
+    module = project(offset=1)
+    assert stage_key('s', module.stage_scaled) != scaled
+    assert stage_key('o', module.stage_other) == other
+
+
+def test_cache_reruns_after_a_helper_change(project, tmp_path):
+    cache = StageCache(tmp_path / 'cache')
+    module = project(scale=2)
+    first = cache.run('scaled', module.stage_scaled, params={'values': [1, 2]})
+    again = cache.run('scaled', module.stage_scaled, params={'values': [1, 2]})
+    assert not first.cached and again.cached and again['values'] == [2, 4]
+
+    module = project(scale=3)
+    changed = cache.run('scaled', module.stage_scaled, params={'values': [1, 2]})
+    assert not changed.cached and changed['values'] == [3, 6]
+
+
+def test_key_tracks_params_sources_and_upstream(project, tmp_path):
+    module = project()
+    source = tmp_path / 'input.csv'
+    source.write_text('a\n1\n')
+    key = stage_key('s', module.stage_other, {'values': [1]}, [source])
+    assert stage_key('s', module.stage_other, {'values': [2]}, [source]) != key
+    source.write_text('a\n2\n')
+    assert stage_key('s', module.stage_other, {'values': [1]}, [source]) != key
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from arrest_loader import load_arrests
+from corrected_geographic_analysis import analysis_subgroups, discretionary_categories
+from streaming_aggregation import Codebook, StreamingAggregator, stream_arrests
+
+
+@pytest.mark.parametrize('labels', [['b', 'a', 'b', 'c'], [30, 10, 30, 20]])
+def test_codebook_codes_follow_first_appearance(labels):
+    codebook = Codebook()
+    assert codebook.encode(labels).tolist() == [0, 1, 0, 2]
+    more = labels[::-1] + [labels[0] * 2]
+    assert codebook.encode(more).tolist() == [2, 0, 1, 0, 3]
+    assert codebook.labels().tolist() == [labels[0], labels[1], labels[3], labels[0] * 2]
+    assert Codebook(codebook.labels()).encode(labels[:2]).tolist() == [0, 1]
+
+
+def test_streamed_batches_and_merges_match_in_memory(synthetic_parquet):
+    arrests = load_arrests(synthetic_parquet)
+    subgroups = analysis_subgroups()
+    streamed = stream_arrests(synthetic_parquet, subgroups, discretionary_categories, batch_size=3_000)
+    assert streamed.unique_individuals == arrests['DefendantId'].nunique()
+    assert streamed.rows == len(arrests)
+
+    # Two halves aggregated apart, merged, and round-tripped through to_outputs
+    table = load_arrests(synthetic_parquet, as_table=True)
+    halves = [StreamingAggregator(subgroups, discretionary_categories).update(part)
+              for part in (table.slice(0, 7_000), table.slice(7_000))]
+    merged = StreamingAggregator.from_outputs(halves[0].merge(halves[1]).to_outputs())
+
+    by_bg = arrests.assign(blockgroup_id=arrests['DefendantAddressGEOID10'].str[:12].astype(np.int64)) \
+        .groupby('blockgroup_id').agg(total_arrests=('DefendantId', 'size'),
+                                      unique_individuals=('DefendantId', 'nunique')).reset_index()
+    for aggregator in (streamed, merged):
+        totals = aggregator.blockgroup_totals()
+        assert totals['total_arrests'].tolist() == by_bg['total_arrests'].tolist()
+        assert totals['unique_individuals'].tolist() == by_bg['unique_individuals'].tolist()
+    assert merged.unique_individuals == streamed.unique_individuals
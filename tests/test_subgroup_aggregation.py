@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from arrest_loader import load_arrests
+from compact_frame import POLICING_CATEGORIES, compact_arrests
+from corrected_geographic_analysis import discretionary_categories
+from subgroup_aggregation import MARGIN_LABEL, aggregate_subgroups, subgroup
+
+# Definitions and the same filters written as plain pandas conditions
+SUBGROUPS = [
+    (subgroup('Overall'), lambda a: np.ones(len(a), dtype=bool)),
+    (subgroup('Young Men', sex='Male', age=(18, 35)),
+     lambda a: (a['Gender'] == 'Male') & (a['Age_years'] >= 18) & (a['Age_years'] <= 35)),
+    (subgroup('Drug', offense='Drug'), lambda a: a['Arrest_crime_category'].astype(str).str.contains('Drug')),
+    (subgroup('Black or Hispanic women', sex='Female', race=['Black', 'Hispanic']),
+     lambda a: (a['Gender'] == 'Female') & a['Race'].isin(['Black', 'Hispanic'])),
+    (subgroup('Non-discretionary', discretionary=False), lambda a: ~a['is_discretionary']),
+]
+
+
+@pytest.fixture(scope='module')
+def arrests(synthetic_parquet):
+    """
+    Compact arrests with a policing category per block group (a few left
+    uncategorized); every 7th arrest moves to another block group, so
+    defendants span block groups and categories.
+    """
+    arrests, _ = compact_arrests(load_arrests(synthetic_parquet, as_table=True))
+    bg_id = arrests['blockgroup_id'].to_numpy().copy()
+    bg_id[::7] = np.roll(bg_id, 1)[::7]
+    ids = np.unique(bg_id)
+    category = pd.Series(np.random.default_rng(0).choice(POLICING_CATEGORIES, size=len(ids)), index=ids)
+    category.iloc[::10] = np.nan
+    return arrests.assign(
+        blockgroup_id=bg_id,
+        policing_category=pd.Categorical(category.loc[bg_id].to_numpy(), categories=POLICING_CATEGORIES),
+        is_discretionary=arrests['Arrest_crime_category'].isin(discretionary_categories).to_numpy())
+
+
+def _reference(arrests):
+    """One filter + nunique per category x subgroup cell, plus the all-category margin."""
+    categorized = arrests[arrests['policing_category'].notna()]
+    levels = [(label, categorized[categorized['policing_category'] == label]) for label in POLICING_CATEGORIES]
+    rows = []
+    for label, rows_in in levels + [(MARGIN_LABEL, categorized)]:
+        for definition, condition in SUBGROUPS:
+            cell = rows_in[np.asarray(condition(rows_in), dtype=bool)]
+            rows.append({
+                'policing_category': label,
+                'subgroup': definition['name'],
+                'arrests': len(cell),
+                'unique_individuals': cell['DefendantId'].nunique(),
+                'unit_unique_individuals': cell.groupby('blockgroup_id')['DefendantId'].nunique().sum(),
+            })
+    return pd.DataFrame(rows)
+
+
+def test_cells_and_margins_match_pandas(arrests):
+    result = aggregate_subgroups(arrests, [s for s, _ in SUBGROUPS], unit='blockgroup_id', margins=True)
+    pd.testing.assert_frame_equal(result, _reference(arrests), check_dtype=False)
+
+
+def test_without_margins_or_units(arrests):
+    result = aggregate_subgroups(arrests, [s for s, _ in SUBGROUPS])
+    expected = _reference(arrests)
+    expected = expected[expected['policing_category'] != MARGIN_LABEL].drop(columns='unit_unique_individuals')
+    pd.testing.assert_frame_equal(result, expected.reset_index(drop=True), check_dtype=False)
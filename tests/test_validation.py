@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from arrest_loader import load_arrests
+from corrected_geographic_analysis import build_parser, run_pipeline
+from stage_cache import StageCache
+from validation import ValidationError, tally, validation_checks
+
+MODES = {'in_memory': [], 'streaming': ['--streaming', '--batch-size', '3000']}
+
+
+def _run(options, source, census_file, tmp_path):
+    args = build_parser().parse_args(['--headless', '--no-cache', *options])
+    return run_pipeline(args, cache=StageCache(tmp_path / 'cache', enabled=False), arrest_source=source,
+                        census_file=census_file, results_path=tmp_path / 'results',
+                        figures_path=tmp_path / 'figures')
+
+
+def test_geoid_check_follows_the_state():
+    arrests = pd.DataFrame({
+        # Numeric GEOIDs lose the leading zero of states 01-09
+        'blockgroup_id': [60371234001, 450190001001, 6037123400, np.nan],
+        'DefendantId': 0, 'ArrestDate': pd.Timestamp('2018-01-01'), 'Age_years': 30.0,
+    })
+    california = tally(validation_checks('06'), 'arrests', arrests)
+    assert california['arrest_geoid_valid']['failed'] == 3
+    assert california['arrest_geoid_valid']['example'] == 'row 1'
+    assert tally(validation_checks('45'), 'arrests', arrests)['arrest_geoid_valid']['failed'] == 3
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_fail_fast_on_missing_defendant_ids(mode, parquet_with_null_ids, census_file, tmp_path):
+    with pytest.raises(ValidationError, match='arrest_defendant_present'):
+        _run(MODES[mode] + ['--validate-fail-fast'], parquet_with_null_ids, census_file, tmp_path)
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_arrest_checks_come_from_the_load_scan(mode, parquet_with_null_ids, census_file, tmp_path):
+    missing = load_arrests(parquet_with_null_ids)['DefendantId'].isna().sum()
+    results = _run(MODES[mode] + ['--validate'], parquet_with_null_ids, census_file, tmp_path)
+
+    assert results['load']['arrest_checks']['arrest_defendant_present']['failed'] == missing > 0
+    report = results['validation']['report'].set_index('check')
+    assert report.loc['arrest_defendant_present', 'rows_failed'] == missing
+    # Every loaded row is checked, including the ones later dropped for a missing ID
+    assert report.loc['arrest_defendant_present', 'rows_checked'] == results['filter']['arrests_analyzed'] + missing
+    assert report.loc['arrest_geoid_valid', 'status'] == 'passed'
+
+
+def test_clean_extract_passes(synthetic_parquet, census_file, tmp_path):
+    results = _run(['--validate-fail-fast'], synthetic_parquet, census_file, tmp_path)
+    report = results['validation']['report']
+    assert not ((report['status'] == 'failed') & (report['severity'] == 'error')).any()